@@ -5,15 +5,21 @@ import csv
 import logging
 import zipfile
 from datetime import datetime
-from flask import Flask, render_template, request, redirect, url_for, flash, send_file, jsonify, session
+from flask import Flask, render_template, request, redirect, url_for, flash, send_file, send_from_directory, jsonify, session, g, message_flashed
 from werkzeug.middleware.proxy_fix import ProxyFix
 from werkzeug.exceptions import BadRequest
-from werkzeug.security import generate_password_hash, check_password_hash
+from itsdangerous import BadData, URLSafeTimedSerializer
 from io import BytesIO, StringIO
+import functools
 import hashlib
+import mimetypes
 import re
 import secrets
+import subprocess
+import sys
+import threading
 import time
+import click
 from cover_images import (
     CoverImageError,
     MAX_IMAGE_SIZE,
@@ -27,6 +33,42 @@ from cover_images import (
     resolve_cover_path,
     store_cover,
 )
+import assets
+import blame
+from compression import COMPRESS_MIN_SIZE, CompressionMiddleware, PrecompressedStatic
+import diff_engine
+from diff_engine import DIFF_CACHE_MAX_CHARS, DiffCache
+from export_jobs import (
+    EXPORT_FORMATS,
+    ExportJobError,
+    ExportJobManager,
+    job_as_of,
+    parse_job_id,
+)
+import history_search
+import i18n
+import lineage
+from password_pool import (
+    PASSWORD_HASH_MAX_PENDING,
+    PASSWORD_HASH_WORKERS,
+    PasswordPool,
+    PasswordPoolBusy,
+)
+from page_cache import CSRF_PLACEHOLDER, PAGE_CACHE_MAX_CHARS, PageCache, make_page
+from process_lock import ProcessLock
+from rate_limit import RATE_LIMIT_MAX_KEYS, RateLimiter
+import session_store
+import retention
+import snapshots
+import version_store
+from write_queue import (
+    WRITE_QUEUE_MAX_BATCH,
+    WRITE_QUEUE_MAX_PENDING,
+    WRITE_QUEUE_TIMEOUT_SECONDS,
+    WriteQueue,
+    WriteQueueBusy,
+    may_have_committed,
+)
 
 
 # Database path: allow override via env, default to container volume
@@ -35,6 +77,19 @@ COVER_DIR = os.environ.get(
     'COVER_DIR',
     os.path.join(os.path.dirname(DB_PATH) or '.', 'uploads', 'covers'),
 )
+EXPORT_DIR = os.environ.get(
+    'EXPORT_DIR',
+    os.path.join(os.path.dirname(DB_PATH) or '.', 'exports'),
+)
+VERSION_LABEL_MAX_LENGTH = 40
+VERSIONS_PER_PAGE = 50
+VERSIONS_PER_PAGE_MAX = 200
+HISTORY_SEARCH_PER_PAGE = 20
+LINEAGE_LIMIT_MAX = 100
+VERSION_LIST_ORDERS = {
+    'time': 'created_at DESC, id DESC',
+    'changes': 'chars_changed DESC, created_at DESC, id DESC',
+}
 logger = logging.getLogger(__name__)
 
 
@@ -44,6 +99,16 @@ def get_db():
     return conn
 
 
+# 所有编辑类写操作交给同一个写线程：相近时间到达的写入合并为一个事务提交，
+# 不再各自争抢 SQLite 的写锁；路由中的写操作不得自行 commit
+write_queue = WriteQueue(
+    get_db,
+    max_batch=int(os.environ.get('WRITE_QUEUE_MAX_BATCH', WRITE_QUEUE_MAX_BATCH)),
+    max_pending=int(os.environ.get('WRITE_QUEUE_MAX_PENDING', WRITE_QUEUE_MAX_PENDING)),
+    timeout=float(os.environ.get('WRITE_QUEUE_TIMEOUT', WRITE_QUEUE_TIMEOUT_SECONDS)),
+)
+
+
 def init_db():
     conn = get_db()
     cur = conn.cursor()
@@ -69,7 +134,9 @@ def init_db():
             created_at TEXT,
             updated_at TEXT,
             current_version_id INTEGER,
-            require_password INTEGER DEFAULT 0
+            require_password INTEGER DEFAULT 0,
+            history_pruned_from TEXT,
+            history_pruned_to TEXT
         )
         """
     )
@@ -82,10 +149,81 @@ def init_db():
             content TEXT NOT NULL,
             created_at TEXT,
             parent_version_id INTEGER,
+            storage TEXT DEFAULT 'full',
+            delta_base_id INTEGER,
+            codec TEXT,
+            content_hash TEXT,
+            size INTEGER,
+            lines_added INTEGER,
+            lines_removed INTEGER,
+            chars_changed INTEGER,
+            similarity REAL,
+            pinned INTEGER DEFAULT 0,
+            label TEXT,
             FOREIGN KEY(prompt_id) REFERENCES prompts(id)
         )
         """
     )
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_versions_content_hash ON versions(content_hash)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_versions_prompt_created ON versions(prompt_id, created_at, id)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_versions_prompt_changes ON versions(prompt_id, chars_changed)")
+    # 被清理的历史版本可选择压缩归档而非删除
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS versions_archive (
+            id INTEGER PRIMARY KEY,
+            prompt_id INTEGER NOT NULL,
+            version TEXT NOT NULL,
+            content BLOB NOT NULL,
+            codec TEXT,
+            content_hash TEXT,
+            created_at TEXT,
+            parent_version_id INTEGER,
+            label TEXT,
+            archived_at TEXT
+        )
+        """
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_versions_archive_prompt ON versions_archive(prompt_id, created_at)")
+    # 逐行溯源索引：每个版本每行由哪个版本引入（游程编码）
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS version_blame (
+            version_id INTEGER PRIMARY KEY,
+            prompt_id INTEGER NOT NULL,
+            runs TEXT NOT NULL
+        )
+        """
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_version_blame_prompt ON version_blame(prompt_id)")
+    # 版本谱系闭包表：祖先/后代/共同祖先查询
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS version_lineage (
+            ancestor_id INTEGER NOT NULL,
+            descendant_id INTEGER NOT NULL,
+            depth INTEGER NOT NULL,
+            PRIMARY KEY (ancestor_id, descendant_id)
+        )
+        """
+    )
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_version_lineage_descendant ON version_lineage(descendant_id, depth)")
+    # 保存授权的服务端记录：退出登录或修改认证设置时可撤销
+    cur.execute("CREATE TABLE IF NOT EXISTS edit_grants (nonce TEXT PRIMARY KEY, expires REAL NOT NULL)")
+    # 全部历史版本的全文索引（需要 SQLite 支持 FTS5 trigram）
+    if not history_search.create_index(conn):
+        logger.warning("SQLite lacks FTS5 trigram support; history search is disabled")
+    # 历史快照按内容哈希去重存储
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS content_blobs (
+            hash TEXT PRIMARY KEY,
+            content BLOB NOT NULL,
+            codec TEXT,
+            size INTEGER
+        )
+        """
+    )
     cur.execute(
         """
         CREATE TABLE IF NOT EXISTS settings (
@@ -96,12 +234,23 @@ def init_db():
     )
     # 默认阈值 200
     cur.execute("INSERT OR IGNORE INTO settings(key, value) VALUES('version_cleanup_threshold', '200')")
+    # 分层保留：最近 N 个之外，另保留每日/每周检查点与已固定或带标签的版本
+    cur.execute("INSERT OR IGNORE INTO settings(key, value) VALUES('version_keep_daily_days', '0')")
+    cur.execute("INSERT OR IGNORE INTO settings(key, value) VALUES('version_keep_weekly_weeks', '0')")
+    cur.execute("INSERT OR IGNORE INTO settings(key, value) VALUES('version_archive_pruned', '0')")
+    # 每 N 个版本保留一个完整快照，其余版本存储为差量
+    cur.execute("INSERT OR IGNORE INTO settings(key, value) VALUES('version_snapshot_interval', '10')")
+    # 历史版本内容压缩：off | zlib | lzma，超过阈值（字节）才压缩
+    cur.execute("INSERT OR IGNORE INTO settings(key, value) VALUES('version_compression', 'zlib')")
+    cur.execute("INSERT OR IGNORE INTO settings(key, value) VALUES('version_compression_threshold', '1024')")
     # 简易认证默认设置
     cur.execute("INSERT OR IGNORE INTO settings(key, value) VALUES('auth_mode', 'off')")
     cur.execute("INSERT OR IGNORE INTO settings(key, value) VALUES('auth_password_hash', '')")
     cur.execute("INSERT OR IGNORE INTO settings(key, value) VALUES('auth_session_version', '0')")
     # 全局语言设置，默认中文
     cur.execute("INSERT OR IGNORE INTO settings(key, value) VALUES('language', 'zh')")
+    # 数据写入代数：每次写操作递增，用于缓存失效
+    cur.execute("INSERT OR IGNORE INTO settings(key, value) VALUES('data_generation', '0')")
     conn.commit()
     conn.close()
     ensure_cover_dir(COVER_DIR)
@@ -136,6 +285,51 @@ def get_setting(conn, key, default=None):
 
 def set_setting(conn, key, value):
     conn.execute("INSERT INTO settings(key, value) VALUES(?, ?) ON CONFLICT(key) DO UPDATE SET value=excluded.value", (key, value))
+    invalidate_settings_cache()
+
+
+# 设置缓存：每个请求都要读的设置（语言等）不再单独打开数据库连接；
+# 本进程写入时立即失效，其他进程的写入最多延迟 SETTINGS_CACHE_TTL 秒可见
+SETTINGS_CACHE_TTL = float(os.environ.get('SETTINGS_CACHE_TTL', '2'))
+_settings_cache = {'values': None, 'expires': 0.0}
+_settings_cache_lock = threading.Lock()
+
+
+def cached_settings() -> dict:
+    """All settings as a dict, re-read from the database at most every SETTINGS_CACHE_TTL seconds."""
+    now = time.monotonic()
+    with _settings_cache_lock:
+        if _settings_cache['values'] is not None and now < _settings_cache['expires']:
+            return _settings_cache['values']
+    conn = get_db()
+    try:
+        values = {r['key']: r['value'] for r in conn.execute("SELECT key, value FROM settings").fetchall()}
+    finally:
+        conn.close()
+    with _settings_cache_lock:
+        _settings_cache['values'] = values
+        _settings_cache['expires'] = now + SETTINGS_CACHE_TTL
+    return values
+
+
+def invalidate_settings_cache():
+    with _settings_cache_lock:
+        _settings_cache['values'] = None
+
+
+def get_data_generation(conn):
+    try:
+        return int(get_setting(conn, 'data_generation', '0') or 0)
+    except ValueError:
+        return 0
+
+
+def bump_data_generation(conn):
+    """Advance the write generation inside the caller's transaction."""
+    conn.execute(
+        "INSERT INTO settings(key, value) VALUES('data_generation', '1') "
+        "ON CONFLICT(key) DO UPDATE SET value=CAST(value AS INTEGER) + 1"
+    )
 
 
 def bump_version(current, kind='patch'):
@@ -158,18 +352,90 @@ def bump_version(current, kind='patch'):
     return f"{major}.{minor}.{patch}"
 
 
-def prune_versions(conn, prompt_id):
-    threshold_s = get_setting(conn, 'version_cleanup_threshold', '200')
+def storage_policy(conn):
+    """Build the version storage policy from settings."""
     try:
-        threshold = int(threshold_s)
-    except Exception:
-        threshold = 200
-    rows = conn.execute(
-        "SELECT id FROM versions WHERE prompt_id=? ORDER BY created_at DESC", (prompt_id,)
-    ).fetchall()
-    if len(rows) > threshold:
-        to_delete = [r['id'] for r in rows[threshold:]]
-        conn.executemany("DELETE FROM versions WHERE id=?", [(vid,) for vid in to_delete])
+        interval = max(1, int(get_setting(conn, 'version_snapshot_interval', '10')))
+    except (TypeError, ValueError):
+        interval = version_store.DEFAULT_SNAPSHOT_INTERVAL
+    try:
+        threshold = max(0, int(get_setting(conn, 'version_compression_threshold', '1024')))
+    except (TypeError, ValueError):
+        threshold = version_store.DEFAULT_COMPRESS_THRESHOLD
+    codec = (get_setting(conn, 'version_compression', 'zlib') or 'off').lower()
+    return version_store.StoragePolicy(
+        snapshot_interval=interval,
+        codec=codec if codec in version_store.CODECS else None,
+        compress_threshold=threshold,
+    )
+
+
+def create_version(conn, prompt_id, version, content, created_at, parent_version_id=None, version_id=None):
+    """Insert a version through the storage engine, index it (blame, search, lineage), return its id."""
+    parent_content = version_store.load_content(conn, parent_version_id) if parent_version_id else None
+    new_id = version_store.insert_version(
+        conn, prompt_id, version, content, created_at, parent_version_id,
+        version_id=version_id, policy=storage_policy(conn),
+    )
+    blame.record_version(conn, new_id, prompt_id, content, parent_version_id, parent_content)
+    history_search.index_version(conn, new_id, content)
+    lineage.record_version(conn, new_id, parent_version_id)
+    return new_id
+
+
+def current_content_hash(conn, row):
+    """Hash of a prompt's current version; ``row`` has current_version_id/content_hash."""
+    if row['content_hash']:
+        return row['content_hash']
+    content = version_store.load_content(conn, row['current_version_id'])
+    return version_store.content_hash(content) if content is not None else None
+
+
+def load_version(conn, version_id, prompt_id=None):
+    """Return one version as a dict with its full content, or None."""
+    if prompt_id is None:
+        row = conn.execute("SELECT * FROM versions WHERE id=?", (version_id,)).fetchone()
+    else:
+        row = conn.execute("SELECT * FROM versions WHERE id=? AND prompt_id=?", (version_id, prompt_id)).fetchone()
+    return version_store.with_content(conn, [row])[0] if row else None
+
+
+def retention_policy(conn):
+    """Build the tiered version retention policy from settings."""
+    def int_setting(key, default):
+        try:
+            return max(0, int(get_setting(conn, key, str(default))))
+        except (TypeError, ValueError):
+            return default
+
+    return retention.RetentionPolicy(
+        keep_last=int_setting('version_cleanup_threshold', retention.DEFAULT_KEEP_LAST) or retention.DEFAULT_KEEP_LAST,
+        daily_days=int_setting('version_keep_daily_days', 0),
+        weekly_weeks=int_setting('version_keep_weekly_weeks', 0),
+        archive=get_setting(conn, 'version_archive_pruned', '0') == '1',
+    )
+
+
+def normalize_version_label(value):
+    label = (value or '').strip() if isinstance(value, str) else ''
+    return label[:VERSION_LABEL_MAX_LENGTH] or None
+
+
+def prune_versions(conn, prompt_id):
+    policy = retention_policy(conn)
+    doomed = retention.prunable_version_ids(conn, prompt_id, policy)
+    if not doomed:
+        return
+    # 全文索引不保存原文，需在删除前用原文移除条目
+    history_search.unindex_versions(conn, doomed)
+    if policy.archive:
+        version_store.archive_versions(conn, doomed, now_ts(), storage_policy(conn))
+    else:
+        # 直接删除会让时间点视图缺少当时的版本，记录被删除的时间范围
+        snapshots.note_pruned(conn, prompt_id, doomed)
+        version_store.delete_versions(conn, doomed, storage_policy(conn))
+    blame.forget(conn, doomed)
+    lineage.forget(conn, doomed)
 
 
 def compute_current_version(conn, prompt_id):
@@ -178,6 +444,8 @@ def compute_current_version(conn, prompt_id):
         (prompt_id,),
     ).fetchone()
     if row:
+        # 当前版本始终完整存储（明文或共享 blob），列表与搜索无需重建差量
+        version_store.materialize(conn, [row['id']])
         conn.execute("UPDATE prompts SET current_version_id=?, updated_at=? WHERE id=?",
                      (row['id'], now_ts(), prompt_id))
 
@@ -195,25 +463,42 @@ def get_all_tags(conn):
     return sorted(tags)
 
 
+# 建表与迁移每个进程只需成功执行一次；之后每个请求只检查数据库文件是否仍在
+_db_ready = False
+_db_ready_lock = threading.Lock()
+
+
 def ensure_db():
-    # Ensure parent directory exists to avoid 'unable to open database file'
-    try:
-        os.makedirs(os.path.dirname(DB_PATH) or '.', exist_ok=True)
-    except Exception:
-        # best-effort; continue to let sqlite raise helpful error if needed
-        pass
-    if not os.path.exists(DB_PATH):
-        init_db()
-    else:
-        # best-effort migrations for new versions
-        migrate_schema()
+    global _db_ready
+    if _db_ready and os.path.exists(DB_PATH):
+        return
+    with _db_ready_lock:
+        if _db_ready and os.path.exists(DB_PATH):
+            return
+        # Ensure parent directory exists to avoid 'unable to open database file'
+        try:
+            os.makedirs(os.path.dirname(DB_PATH) or '.', exist_ok=True)
+        except Exception:
+            # best-effort; continue to let sqlite raise helpful error if needed
+            pass
+        # 多个工作进程同时启动时逐个建表/迁移，避免重复 ALTER TABLE
+        with ProcessLock(f'{DB_PATH}.lock'):
+            if not os.path.exists(DB_PATH):
+                init_db()
+            # best-effort migrations for new versions; retried on the next request if they fail
+            _db_ready = migrate_schema()
 
 
 def migrate_schema():
-    """Run lightweight schema migrations to add new columns/settings if missing."""
+    """Run lightweight schema migrations to add new columns/settings if missing.
+
+    Returns True when every step succeeded.
+    """
     try:
         conn = get_db()
         cur = conn.cursor()
+        # WAL：读请求不会阻塞写线程提交，写线程也不会阻塞读请求
+        cur.execute('PRAGMA journal_mode=WAL')
         # ensure prompts.require_password exists
         cols = [r['name'] for r in cur.execute('PRAGMA table_info(prompts)').fetchall()]
         if 'require_password' not in cols:
@@ -240,17 +525,103 @@ def migrate_schema():
         for column, definition in cover_columns.items():
             if column not in cols:
                 cur.execute(f"ALTER TABLE prompts ADD COLUMN {column} {definition}")
+        # 未归档清理掉的历史时间范围，时间点查询据此标记可能缺失的版本
+        for column in ('history_pruned_from', 'history_pruned_to'):
+            if column not in cols:
+                cur.execute(f"ALTER TABLE prompts ADD COLUMN {column} TEXT")
+        version_columns = {
+            'storage': "TEXT DEFAULT 'full'",
+            'delta_base_id': 'INTEGER',
+            'codec': 'TEXT',
+            'content_hash': 'TEXT',
+            'size': 'INTEGER',
+            'lines_added': 'INTEGER',
+            'lines_removed': 'INTEGER',
+            'chars_changed': 'INTEGER',
+            'similarity': 'REAL',
+            'pinned': 'INTEGER DEFAULT 0',
+            'label': 'TEXT',
+        }
+        cols = [r['name'] for r in cur.execute('PRAGMA table_info(versions)').fetchall()]
+        for column, definition in version_columns.items():
+            if column not in cols:
+                cur.execute(f"ALTER TABLE versions ADD COLUMN {column} {definition}")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_versions_content_hash ON versions(content_hash)")
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS content_blobs (
+                hash TEXT PRIMARY KEY,
+                content BLOB NOT NULL,
+                codec TEXT,
+                size INTEGER
+            )
+            """
+        )
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_versions_prompt_created ON versions(prompt_id, created_at, id)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_versions_prompt_changes ON versions(prompt_id, chars_changed)")
+        cur.execute(
+            """
+                CREATE TABLE IF NOT EXISTS versions_archive (
+                id INTEGER PRIMARY KEY,
+                prompt_id INTEGER NOT NULL,
+                version TEXT NOT NULL,
+                content BLOB NOT NULL,
+                codec TEXT,
+                content_hash TEXT,
+                created_at TEXT,
+                parent_version_id INTEGER,
+                label TEXT,
+                archived_at TEXT
+            )
+            """
+        )
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_versions_archive_prompt ON versions_archive(prompt_id, created_at)")
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS version_blame (
+                version_id INTEGER PRIMARY KEY,
+                prompt_id INTEGER NOT NULL,
+                runs TEXT NOT NULL
+            )
+            """
+        )
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_version_blame_prompt ON version_blame(prompt_id)")
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS version_lineage (
+                ancestor_id INTEGER NOT NULL,
+                descendant_id INTEGER NOT NULL,
+                depth INTEGER NOT NULL,
+                PRIMARY KEY (ancestor_id, descendant_id)
+            )
+            """
+        )
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_version_lineage_descendant ON version_lineage(descendant_id, depth)")
+        cur.execute("CREATE TABLE IF NOT EXISTS edit_grants (nonce TEXT PRIMARY KEY, expires REAL NOT NULL)")
+        if not history_search.create_index(conn):
+            logger.warning("SQLite lacks FTS5 trigram support; history search is disabled")
+        if 'content_hash' not in cols or 'size' not in cols:
+            version_store.backfill_metadata(conn)
+        cur.execute("INSERT OR IGNORE INTO settings(key, value) VALUES('version_keep_daily_days', '0')")
+        cur.execute("INSERT OR IGNORE INTO settings(key, value) VALUES('version_keep_weekly_weeks', '0')")
+        cur.execute("INSERT OR IGNORE INTO settings(key, value) VALUES('version_archive_pruned', '0')")
+        cur.execute("INSERT OR IGNORE INTO settings(key, value) VALUES('version_snapshot_interval', '10')")
+        cur.execute("INSERT OR IGNORE INTO settings(key, value) VALUES('version_compression', 'zlib')")
+        cur.execute("INSERT OR IGNORE INTO settings(key, value) VALUES('version_compression_threshold', '1024')")
         # ensure auth settings keys exist
         cur.execute("INSERT OR IGNORE INTO settings(key, value) VALUES('auth_mode', 'off')")
         cur.execute("INSERT OR IGNORE INTO settings(key, value) VALUES('auth_password_hash', '')")
         cur.execute("INSERT OR IGNORE INTO settings(key, value) VALUES('auth_session_version', '0')")
         # ensure language setting exists
         cur.execute("INSERT OR IGNORE INTO settings(key, value) VALUES('language', 'zh')")
+        cur.execute("INSERT OR IGNORE INTO settings(key, value) VALUES('data_generation', '0')")
         conn.commit()
         ensure_cover_dir(COVER_DIR)
         migrate_legacy_covers(conn)
+        return True
     except Exception:
         logger.exception("Schema or cover migration failed")
+        return False
     finally:
         try:
             conn.close()
@@ -262,6 +633,8 @@ app = Flask(__name__)
 # Respect X-Forwarded-* headers when behind reverse proxies (e.g., Nginx)
 # This ensures request.url/request.host reflect the external scheme/host.
 app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1, x_host=1, x_port=1, x_prefix=1)
+# 文本响应按 Accept-Encoding 压缩（brotli 可选，否则 gzip）
+app.wsgi_app = CompressionMiddleware(app.wsgi_app, int(os.environ.get('COMPRESS_MIN_SIZE', COMPRESS_MIN_SIZE)))
 _is_debug_env = os.environ.get('FLASK_DEBUG') == '1' or os.environ.get('FLASK_ENV') == 'development'
 _configured_secret = os.environ.get('SECRET_KEY')
 if not _configured_secret and not _is_debug_env:
@@ -273,330 +646,128 @@ app.config.update(
     SESSION_COOKIE_SECURE=os.environ.get('SESSION_COOKIE_SECURE') == '1',
     SEND_FILE_MAX_AGE_DEFAULT=31536000,
 )
+# 可选的服务端会话：Cookie 只保存签名后的会话 ID，数据存放在 SQLite（多进程共享）或内存（单进程）中
+SESSION_BACKEND = (os.environ.get('SESSION_BACKEND') or 'cookie').lower()
+if SESSION_BACKEND in ('sqlite', 'memory'):
+    if SESSION_BACKEND == 'sqlite':
+        _session_backend_store = session_store.SqliteSessionStore(
+            os.environ.get('SESSION_DB_PATH') or os.path.join(os.path.dirname(DB_PATH) or '.', 'sessions.sqlite3')
+        )
+    else:
+        _session_backend_store = session_store.MemorySessionStore()
+    app.session_interface = session_store.ServerSessionInterface(
+        _session_backend_store,
+        lifetime=float(os.environ.get('SESSION_LIFETIME', session_store.SESSION_LIFETIME)),
+    )
 # Jinja 过滤器：JSON 反序列化
 app.jinja_env.filters['loads'] = json.loads
 
 
+# 构建产物（打包文件与预压缩副本）的输出目录，默认写在静态目录内
+STATIC_BUILD_DIR = os.environ.get('STATIC_BUILD_DIR') or app.static_folder
+
+# 静态资源清单：启动时按内容哈希一次，模板渲染时不再访问文件系统
+asset_manifest = assets.AssetManifest(
+    app.static_folder,
+    manifest_path=os.environ.get('ASSET_MANIFEST') or None,
+    live=_is_debug_env,
+    bundles=assets.BUNDLES,
+    build_root=STATIC_BUILD_DIR,
+)
+STATIC_IMMUTABLE_MAX_AGE = 31536000
+
+
 def static_asset(filename):
-    """Build a cache-busted URL for a file in the static directory."""
-    asset_path = os.path.join(app.static_folder, *filename.split('/'))
-    try:
-        version = int(os.path.getmtime(asset_path))
-    except OSError:
-        version = 0
+    """Build a content-fingerprinted URL for a file in the static directory."""
+    version = asset_manifest.version(filename)
+    if not version:
+        return url_for('static', filename=filename)
     return url_for('static', filename=filename, v=version)
 
 
 app.jinja_env.globals['static_asset'] = static_asset
 
+# 静态文件预压缩副本（.br/.gz），命中时直接发送，不再实时压缩
+# 副本按清单中的内容哈希命名，不可变地址只会拿到与哈希一致的压缩内容
+precompressed_static = PrecompressedStatic(
+    app.static_folder,
+    int(os.environ.get('COMPRESS_MIN_SIZE', COMPRESS_MIN_SIZE)),
+    live=_is_debug_env,
+    hashes=asset_manifest.load,
+    build_root=STATIC_BUILD_DIR,
+)
+
+
+def serve_static(filename):
+    """Static route that sends a precompressed variant when the client accepts one."""
+    asset_manifest.load()  # 先生成打包产物，预压缩时才能包含它们
+    encoding, variant = precompressed_static.lookup(filename, request.headers.get('Accept-Encoding', ''))
+    if encoding is None:
+        response = send_from_directory(
+            asset_manifest.directory(filename), filename, max_age=app.get_send_file_max_age(filename)
+        )
+    else:
+        response = send_from_directory(
+            STATIC_BUILD_DIR,
+            variant,
+            mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+        )
+        response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+    # 带当前内容哈希的地址内容永不变化；其他地址（无版本或旧版本）每次重新验证
+    if asset_manifest.is_current(filename, request.args.get('v')):
+        response.cache_control.public = True
+        response.cache_control.max_age = STATIC_IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.public = True
+        response.cache_control.max_age = 0
+        response.cache_control.no_cache = True
+    return response
+
+
+app.view_functions['static'] = serve_static
+
 # === 简易国际化（无第三方依赖） ===
-# 通过 settings 表中的 key=language 控制全局语言，默认 zh。
-# 在模板中使用 {{ t('中文文案') }} 进行翻译；未命中时回退原文。
-LANG_DEFAULT = 'zh'
-TRANSLATIONS = {
-    'en': {
-        # 通用 / 导航
-        '提示词管理': 'Prompt Manager',
-        '设置': 'Settings',
-        '切换主题': 'Toggle Theme',
-        '返回': 'Back',
-        '取消': 'Cancel',
-        '保存': 'Save',
-        'Prompt 管理器': 'Prompt Manager',
-        '列表': 'List',
-        '详情': 'Details',
-        '首页': 'Home',
-
-        # 设置页
-        '系统设置': 'System Settings',
-        '管理您的提示词库配置': 'Manage your prompt library configuration',
-        '版本历史清理': 'Version History Cleanup',
-        '每个提示词仅保留最近 N 个版本，超出将自动清理（默认 200）。': 'Keep only the latest N versions per prompt. Older versions beyond this limit are auto-pruned (default 200).',
-        '清理阈值 N': 'Cleanup threshold N',
-        '个版本': 'versions',
-        '访问密码': 'Access Password',
-        '三选一：关闭（不需要密码）、指定提示词密码（仅对勾选了“需要密码”的提示词生效）、全局密码（访问本站任意页面需要密码）。': 'Choose one: Off (no password), Per-prompt password (only for prompts marked "Require password"), or Global password (require password for any page).',
-        '密码模式': 'Password mode',
-        '关闭': 'Off',
-        '指定提示词密码': 'Per-prompt password',
-        '全局密码': 'Global password',
-        '设置/修改密码（4-64 字符）': 'Set/Change password (4-64 characters)',
-        '当前密码（已设置时必填）': 'Current password (required if already set)',
-        '新密码（留空则不修改）': 'New password (leave empty to keep)',
-        '确认新密码': 'Confirm new password',
-        '已设置密码：修改密码或切换密码模式需先验证当前密码。': 'Password set: verify current password before changing it or switching modes.',
-        '如从未设置过密码，请先设置后再开启对应模式。': 'If no password was set, set one first before enabling a mode.',
-        '数据导入 / 导出': 'Import / Export',
-        '导出数据': 'Export data',
-        '将所有提示词和版本历史导出为 JSON 格式文件': 'Export all prompts and version history as a JSON file',
-        '将所有提示词和版本历史导出为 JSON、CSV 或 ZIP 格式文件': 'Export all prompts and version history as JSON, CSV, or ZIP',
-        'ZIP 包含图片文件，是推荐的完整备份格式。JSON/CSV 为兼容格式，图片会增加文件体积。': 'ZIP includes image files and is the recommended full backup. JSON/CSV are compatibility formats and images increase file size.',
-        '导出全部数据': 'Export all data',
-        '导出 ZIP（推荐）': 'Export ZIP (recommended)',
-        '导出 JSON': 'Export JSON',
-        '导出 CSV': 'Export CSV',
-        '导入数据': 'Import data',
-        '导入将覆盖所有现有数据，请谨慎操作': 'Import will overwrite all existing data. Proceed with caution.',
-        '选择 JSON 文件': 'Choose JSON file',
-        '选择 ZIP/JSON/CSV 文件': 'Choose ZIP/JSON/CSV file',
-        '已选择文件：': 'Selected file: ',
-        '未选择文件': 'No file selected',
-        '文件大小：': 'File size: ',
-        '保存设置 / 执行导入': 'Save settings / Run import',
+# 通过 settings 表中的 key=language 控制全局语言（zh|en|auto），默认 zh；auto 跟随浏览器 Accept-Language。
+# 在模板中使用 {{ t('中文文案') }} 进行翻译；译文在 translations/<lang>.json，未命中时回退原文。
+LANG_DEFAULT = i18n.DEFAULT_LANGUAGE
 
-        # 语言设置
-        '语言': 'Language',
-        '系统语言': 'System language',
-        '中文': 'Chinese',
-        '英文': 'English',
-
-        # Flash/消息
-        '已保存': 'Saved',
-        '未找到该提示词': 'Prompt not found',
-        '已创建提示词并保存首个版本': 'Prompt created and first version saved',
-        '提示词不存在或已被删除': 'Prompt does not exist or has been deleted',
-        '已删除提示词及其所有版本': 'Prompt and all versions deleted',
-        '删除失败，请重试': 'Deletion failed, please try again',
-        '版本不存在': 'Version not found',
-        '已从历史版本回滚并创建新版本': 'Rolled back from history and created a new version',
-        '阈值需为正整数': 'Threshold must be a positive integer',
-        '设置已保存': 'Settings saved',
-        '请先输入当前密码以修改认证设置': 'Enter current password to modify authentication settings',
-        '当前密码不正确，无法修改认证设置': 'Incorrect current password, cannot modify authentication settings',
-        '两次输入的密码不一致': 'Passwords do not match',
-        '请先设置访问密码（4-64 字符）': 'Please set an access password (4-64 characters) first',
-        '密码长度需为 4-64 字符': 'Password length must be 4-64 characters',
-        '请输入访问密码以保存修改': 'Enter the access password to save changes',
-        '保存修改前请确认访问密码。': 'Confirm the access password before saving changes.',
-        '尝试次数过多，请稍后再试': 'Too many attempts, please try again later',
-        '已导入并覆盖所有数据': 'Imported and overwrote all data',
-        '导入失败：上传表单解析错误': 'Import failed: invalid upload form data',
-        '导入失败：JSON 格式无效': 'Import failed: invalid JSON',
-        '导入失败：仅支持 ZIP、JSON 或 CSV 文件': 'Import failed: only ZIP, JSON, or CSV is supported',
-        '导入失败：ZIP 备份无效': 'Import failed: invalid ZIP backup',
-        '导入失败：封面图片数据无效': 'Import failed: invalid cover image data',
-        '导入失败：封面图片 Base64 无效': 'Import failed: invalid cover image Base64',
-        '导入失败：CSV 文件编码无效，请使用 UTF-8': 'Import failed: invalid CSV encoding, please use UTF-8',
-        '导入失败：CSV 格式无效': 'Import failed: invalid CSV format',
-        '导入失败，请重试': 'Import failed, please try again',
-        '暂无版本': 'No versions yet',
-        '所选版本不存在': 'Selected version does not exist',
-        '已通过认证': 'Authenticated',
-        '密码不正确': 'Incorrect password',
-        '已退出登录': 'Logged out',
-        '已解锁该提示词': 'Prompt unlocked',
-
-        # 首页 index
-        '搜索（名称/来源/备注/标签/当前内容）': 'Search (name/source/notes/tags/content)',
-        '排序': 'Sort',
-        '最近修改': 'Recently updated',
-        '创建时间': 'Created time',
-        '名称 A-Z': 'Name A–Z',
-        '标签': 'Tags',
-        '应用': 'Apply',
-        '新建提示词': 'New Prompt',
-        '展开/收起筛选': 'Toggle filters',
-        '筛选侧边栏': 'Filter sidebar',
-        '筛选': 'Filters',
-        '收起筛选': 'Collapse filters',
-        '全部': 'All',
-        '封面': 'Cover',
-        '全部封面': 'All covers',
-        '有封面': 'With cover',
-        '无封面': 'Without cover',
-        '暂无标签': 'No tags',
-        '来源': 'Source',
-        '未设置': 'Not set',
-        '暂无来源': 'No sources',
-        '没有符合筛选条件的结果': 'No results match the filters',
-        '调整或清空筛选条件后再试试': 'Try adjusting or clearing filters',
-        '清空筛选条件': 'Clear filters',
-        '暂无提示词': 'No prompts yet',
-        '点击"新建提示词"开始创建您的第一个提示词': 'Click "New Prompt" to create your first one',
-        '创建第一个提示词': 'Create first prompt',
-        '总计': 'Total',
-        '置顶': 'Pinned',
-        '切换布局': 'Toggle view',
-        '置顶/取消置顶': 'Pin/Unpin',
-        '来源：': 'Source: ',
-        '需要密码': 'Password required',
-        '修改：': 'Updated: ',
-        '版本：': 'Version: ',
-        '备注：': 'Notes: ',
-        '该提示词受密码保护': 'This prompt is password-protected',
-        '内容预览': 'Preview',
-        '复制预览内容': 'Copy preview',
-        '封面图片': 'Cover image',
-        '上传图片（仅 1 张）': 'Upload image (1 only)',
-        '支持 jpg/jpeg/png/webp，最大 5MB。': 'Supports jpg/jpeg/png/webp, max 5MB.',
-        '当前图片': 'Current image',
-        '移除当前图片': 'Remove current image',
-        '替换封面': 'Replace cover',
-        '拖放、粘贴或点击选择图片': 'Drop, paste, or click to choose an image',
-        '拖动图片可调整封面焦点': 'Drag the image to adjust its focal point',
-        '撤销移除': 'Undo removal',
-        '封面说明': 'Cover description',
-        '用于图片替代文本，可选': 'Optional alternative text for the image',
-        '封面图片不参与版本历史。': 'Cover images are not included in version history.',
-        '重新上传': 'Upload again',
-        '查看完整封面': 'View full cover',
-        '关闭图片预览': 'Close image preview',
-        '图片加载失败': 'Image failed to load',
-        '格式：': 'Format: ',
-        '尺寸：': 'Dimensions: ',
-        '图片上传失败：仅支持 jpg/jpeg/png/webp 格式': 'Image upload failed: only jpg/jpeg/png/webp are supported',
-        '图片上传失败：文件大小不能超过 5MB': 'Image upload failed: file size must be <= 5MB',
-        '图片上传失败：图片不能为空': 'Image upload failed: image file is empty',
-        '图片上传失败：暂不支持动画 WebP': 'Image upload failed: animated WebP is not supported',
-        '图片上传失败：图片尺寸无效': 'Image upload failed: invalid image dimensions',
-        '图片上传失败：图片像素不能超过 4000 万': 'Image upload failed: image pixels cannot exceed 40 million',
-        '图片上传失败：图片文件已损坏或格式无效': 'Image upload failed: the image is corrupt or invalid',
-
-        # 详情/编辑 prompt_detail
-        '提示词编辑': 'Edit Prompt',
-        '返回列表': 'Back to list',
-        '历史版本': 'Versions',
-        '基本信息': 'Basic Info',
-        '提示词名称': 'Prompt name',
-        '输入提示词的名称': 'Enter prompt name',
-        '提示词内容': 'Prompt content',
-        '在此输入提示词的完整内容...': 'Enter full prompt content here...',
-        '字符': 'chars',
-        '复制内容': 'Copy content',
-        '自动调整大小': 'Auto-resize',
-        '清空内容': 'Clear content',
-        '高级设置': 'Advanced Settings',
-        '提示词来源': 'Prompt source',
-        '标签，用逗号分隔': 'Tags, separated by commas',
-        '颜色': 'Color',
-        '选择颜色': 'Pick color',
-        '例如 #409eff，留空不设置': 'e.g. #409eff, leave empty to unset',
-        '清除颜色': 'Clear color',
-        '用于首页卡片边框的细微彩色外圈。留空则不设置。': 'Used for a subtle colored ring on the home card border. Leave empty to skip.',
-        '备注': 'Notes',
-        '补充说明或使用注意事项': 'Additional notes or usage tips',
-        '该提示词需要密码访问': 'This prompt requires a password',
-        '已开启全局密码，单个提示词的密码设置不再生效。': 'Global password is enabled; per-prompt password no longer applies.',
-        '当前未启用“指定提示词密码”模式，本项暂不生效。': 'Per-prompt password mode is not enabled; this setting is inactive.',
-        '保存修改': 'Save changes',
-        '创建提示词': 'Create prompt',
-        '删除提示词': 'Delete prompt',
-        '保存为新版本': 'Save as new version',
-        '补丁版本 (+0.0.1)': 'Patch (+0.0.1)',
-        '次版本 (+0.1.0)': 'Minor (+0.1.0)',
-        '主版本 (+1.0.0)': 'Major (+1.0.0)',
-        '提示词预览': 'Prompt preview',
-        '保存中...': 'Saving...',
-        '确定要删除该提示词及其所有版本吗？此操作不可恢复。': 'Delete this prompt and all versions? This cannot be undone.',
-        '请输入访问密码以确认删除': 'Enter the access password to confirm deletion',
-        '访问密码不能为空': 'Access password is required',
-        '确认删除': 'Confirm delete',
-        '删除中...': 'Deleting...',
-        '请输入提示词名称': 'Please enter a prompt name',
-        '请输入提示词内容': 'Please enter prompt content',
-        '未命名提示词': 'Untitled prompt',
-        '无内容': 'No content',
-        '已开启自动调整大小': 'Auto-resize enabled',
-        '没有内容可复制': 'No content to copy',
-        '复制失败，请手动选择文本复制': 'Copy failed, please select text manually',
-        '确定要清空内容吗？此操作不可撤销。': 'Clear content? This cannot be undone.',
-
-        # 历史版本 versions
-        '历史版本 -': 'Version History -',
-        '创建于': 'Created at',
-        '暂无历史版本': 'No version history',
-        '该提示词还没有保存过任何版本历史。': 'This prompt has no saved version history yet.',
-        '开始编辑并保存版本来追踪内容变化。': 'Start editing and saving versions to track changes.',
-        '返回首页': 'Back to Home',
-        '总版本数': 'Total versions',
-        '最近更新': 'Last updated',
-        '当前版本': 'Current version',
-        '选择版本对比': 'Choose versions to compare',
-        '版本历史': 'Version history',
-        '按时间倒序排列，最新的版本显示在最前面': 'Ordered by time (newest first)',
-        '查看完整版本内容': 'View full version content',
-        '查看详情': 'View details',
-        '与当前版本对比': 'Compare with current',
-        '对比差异': 'Compare differences',
-        '基于此版本内容创建新版本': 'Create a new version based on this content',
-        '恢复到此版本': 'Roll back to this version',
-        '当前使用中': 'In use',
-        '版本内容': 'Version content',
-        '复制': 'Copy',
-        '选择对比版本': 'Choose versions to compare',
-        '左侧版本：': 'Left version: ',
-        '右侧版本：': 'Right version: ',
-        '开始对比': 'Compare',
-        '版本': 'Version',
-        '版本信息不存在，请刷新页面重试': 'Version not found, please refresh and retry',
-        '页面加载错误，请刷新页面重试': 'Page load error, please refresh and retry',
-        '请选择要对比的版本': 'Please select versions to compare',
-        '请选择两个不同的版本进行对比': 'Please select two different versions',
-        '未知': 'Unknown',
-        '确定要回滚到版本 {version} 吗？': 'Confirm rollback to version {version}?',
-        '📝 回滚说明：': 'Notes:',
-        '• 这将基于版本 {version} 的内容创建一个新版本': '• A new version will be created based on version {version}\'s content',
-        '• 当前版本 {current} 不会被删除': '• Current version {current} will not be deleted',
-        '• 新版本号将在当前版本基础上递增': '• The new version number will be incremented from current version',
-        '• 所有版本历史都会保留': '• All version history will be kept',
-        '此操作不可撤销，是否继续？': 'This action cannot be undone. Continue?',
-        '操作失败，请刷新页面重试': 'Operation failed, please refresh and retry',
-
-        # Diff 页面
-        '版本对比': 'Compare Versions',
-        '返回编辑': 'Back to edit',
-        '左（旧）': 'Left (old)',
-        '右（新）': 'Right (new)',
-        '模式': 'Mode',
-        '词级': 'Word-level',
-        '行级': 'Line-level',
-        '刷新': 'Refresh',
-        '旧版本：': 'Old: ',
-        '新版本：': 'New: ',
-
-        # Auth 页面
-        '安全验证': 'Security Check',
-        '访问验证': 'Access Verification',
-        '解锁提示词': 'Unlock Prompt',
-        '请输入访问密码以进入站点': 'Enter password to access the site',
-        '该提示词已启用密码保护，请输入密码解锁': 'This prompt is password-protected; enter password to unlock',
-        '提示词': 'Prompt',
-        '访问密码': 'Access password',
-        '请输入密码': 'Enter password',
-        '进入': 'Enter',
-        '解锁': 'Unlock',
-    }
-}
 
+def get_language():
+    """Language of the current request, resolved once from cached settings and Accept-Language."""
+    if 'language' not in g:
+        try:
+            setting = cached_settings().get('language')
+        except Exception:
+            setting = LANG_DEFAULT
+        g.language, g.language_from_browser = i18n.resolve(setting, request.headers.get('Accept-Language', ''))
+    return g.language
 
-def _get_language():
-    """读取全局语言设置（zh|en），默认 zh。"""
-    try:
-        conn = get_db()
-        lang = get_setting(conn, 'language', LANG_DEFAULT) or LANG_DEFAULT
-        conn.close()
-        return 'en' if lang.lower() == 'en' else 'zh'
-    except Exception:
-        return LANG_DEFAULT
+
+def t(s: object) -> str:
+    """Translate UI text outside templates (responses built in Python)."""
+    return i18n.translate(get_language(), s)
 
 
 @app.context_processor
 def inject_i18n():
-    lang = _get_language()
-
-    def t(s: object) -> str:
-        text = '' if s is None else str(s)
-        if lang == 'en':
-            return TRANSLATIONS.get('en', {}).get(text, text)
-        return text
-
+    lang = get_language()
     return {
         't': t,
         'lang': lang,
-        'lang_html': 'en' if lang == 'en' else 'zh-CN',
+        'lang_html': i18n.HTML_LANG.get(lang, lang),
     }
 
 
+@app.after_request
+def vary_on_language(response):
+    # 语言跟随浏览器时，同一地址的内容随 Accept-Language 变化
+    if g.get('language_from_browser') and response.mimetype == 'text/html':
+        response.vary.add('Accept-Language')
+    return response
+
+
 def sanitize_color(val):
     """Normalize color to #RRGGBB or return None if invalid/empty.
     Accepts #RGB or #RRGGBB (case-insensitive). Returns lowercase #rrggbb.
@@ -697,6 +868,17 @@ def read_cover_bytes(row):
     return None, None
 
 
+def discard_stored_cover(stored, exc):
+    """Remove cover files stored for a write that failed, unless it may still commit."""
+    if not stored:
+        return
+    if may_have_committed(exc):
+        # 写操作仍可能提交，保留文件；若最终未引用，由未引用封面清理移除
+        logger.warning("Write timed out while running; keeping cover %s", stored.get('cover_file'))
+        return
+    delete_cover_files(COVER_DIR, cover_filenames(stored))
+
+
 def cleanup_unreferenced_covers(conn):
     rows = conn.execute(
         "SELECT cover_file, cover_thumb FROM prompts WHERE cover_file IS NOT NULL OR cover_thumb IS NOT NULL"
@@ -844,84 +1026,106 @@ def apply_import_payload(conn, data):
     """Validate everything first, then atomically replace database content."""
     prepared = prepare_import_payload(data)
     created_files = []
-    committed = False
     try:
         for prompt in prepared:
             asset = prompt.get('_cover_asset')
             stored = store_cover(asset, COVER_DIR) if asset else {}
             prompt['_stored_cover'] = stored
             created_files.extend(cover_filenames(stored))
-
-        conn.execute("BEGIN")
-        conn.execute("DELETE FROM versions")
-        conn.execute("DELETE FROM prompts")
-        for prompt in prepared:
-            stored = prompt.get('_stored_cover') or {}
-            conn.execute(
-                """
-                INSERT INTO prompts(
-                    id, name, source, notes, color, tags, image_data,
-                    cover_file, cover_thumb, cover_mime, cover_width, cover_height,
-                    cover_focus_x, cover_focus_y, cover_alt,
-                    pinned, created_at, updated_at, current_version_id, require_password
-                ) VALUES(?,?,?,?,?,?,NULL,?,?,?,?,?,?,?,?,?,?,?,?,?)
-                """,
-                (
-                    prompt.get('id'),
-                    prompt.get('name') or '未命名提示词',
-                    prompt.get('source'),
-                    prompt.get('notes'),
-                    sanitize_color(prompt.get('color')),
-                    json.dumps(prompt.get('tags') or [], ensure_ascii=False),
-                    stored.get('cover_file'),
-                    stored.get('cover_thumb'),
-                    stored.get('cover_mime'),
-                    stored.get('cover_width'),
-                    stored.get('cover_height'),
-                    prompt.get('_cover_focus_x', 50),
-                    prompt.get('_cover_focus_y', 50),
-                    (prompt.get('_cover_alt') or '').strip() or None,
-                    1 if prompt.get('pinned') else 0,
-                    prompt.get('created_at') or now_ts(),
-                    prompt.get('updated_at') or now_ts(),
-                    None,
-                    1 if prompt.get('require_password') else 0,
-                ),
-            )
-            pid = conn.execute("SELECT last_insert_rowid() AS id").fetchone()['id'] if prompt.get('id') is None else prompt.get('id')
-            for version in (prompt.get('versions') or []):
-                if not isinstance(version, dict):
-                    continue
-                conn.execute(
-                    "INSERT INTO versions(id, prompt_id, version, content, created_at, parent_version_id) VALUES(?,?,?,?,?,?)",
-                    (
-                        version.get('id'),
-                        pid,
-                        version.get('version') or '1.0.0',
-                        version.get('content') or '',
-                        version.get('created_at') or now_ts(),
-                        version.get('parent_version_id'),
-                    ),
-                )
-            compute_current_version(conn, pid)
-        conn.commit()
-        committed = True
-    except Exception:
-        conn.rollback()
-        delete_cover_files(COVER_DIR, created_files)
+        # 整体替换作为一个写操作提交，失败时整体回滚
+        write_queue.submit(functools.partial(replace_all_data, prepared=prepared))
+    except Exception as exc:
+        if may_have_committed(exc):
+            logger.warning("Import write timed out while running; keeping %d new cover files", len(created_files))
+        else:
+            delete_cover_files(COVER_DIR, created_files)
         raise
-    if committed:
-        try:
-            cleanup_unreferenced_covers(conn)
-        except OSError:
-            logger.exception("Could not clean unreferenced cover files after import")
+    # 导入可能复用版本 id，清空重建缓存
+    version_store.clear_cache()
+    try:
+        cleanup_unreferenced_covers(conn)
+    except OSError:
+        logger.exception("Could not clean unreferenced cover files after import")
+
+
+def replace_all_data(conn, prepared):
+    """Write-queue operation for an import: replace every prompt and version."""
+    conn.execute("DELETE FROM versions")
+    conn.execute("DELETE FROM content_blobs")
+    conn.execute("DELETE FROM versions_archive")
+    conn.execute("DELETE FROM version_blame")
+    history_search.clear(conn)
+    conn.execute("DELETE FROM version_lineage")
+    conn.execute("DELETE FROM prompts")
+    for prompt in prepared:
+        stored = prompt.get('_stored_cover') or {}
+        conn.execute(
+            """
+            INSERT INTO prompts(
+                id, name, source, notes, color, tags, image_data,
+                cover_file, cover_thumb, cover_mime, cover_width, cover_height,
+                cover_focus_x, cover_focus_y, cover_alt,
+                pinned, created_at, updated_at, current_version_id, require_password
+            ) VALUES(?,?,?,?,?,?,NULL,?,?,?,?,?,?,?,?,?,?,?,?,?)
+            """,
+            (
+                prompt.get('id'),
+                prompt.get('name') or '未命名提示词',
+                prompt.get('source'),
+                prompt.get('notes'),
+                sanitize_color(prompt.get('color')),
+                json.dumps(prompt.get('tags') or [], ensure_ascii=False),
+                stored.get('cover_file'),
+                stored.get('cover_thumb'),
+                stored.get('cover_mime'),
+                stored.get('cover_width'),
+                stored.get('cover_height'),
+                prompt.get('_cover_focus_x', 50),
+                prompt.get('_cover_focus_y', 50),
+                (prompt.get('_cover_alt') or '').strip() or None,
+                1 if prompt.get('pinned') else 0,
+                prompt.get('created_at') or now_ts(),
+                prompt.get('updated_at') or now_ts(),
+                None,
+                1 if prompt.get('require_password') else 0,
+            ),
+        )
+        pid = conn.execute("SELECT last_insert_rowid() AS id").fetchone()['id'] if prompt.get('id') is None else prompt.get('id')
+        for version in (prompt.get('versions') or []):
+            if not isinstance(version, dict):
+                continue
+            vid = create_version(
+                conn,
+                pid,
+                version.get('version') or '1.0.0',
+                version.get('content') or '',
+                version.get('created_at') or now_ts(),
+                version.get('parent_version_id'),
+                version_id=version.get('id'),
+            )
+            label = normalize_version_label(version.get('label'))
+            if parse_bool_value(version.get('pinned')) or label:
+                conn.execute("UPDATE versions SET pinned=?, label=? WHERE id=?",
+                             (1 if parse_bool_value(version.get('pinned')) else 0, label, vid))
+        compute_current_version(conn, pid)
+    bump_data_generation(conn)
 
 
-def collect_export_payload(conn, include_image_data=True):
+def collect_export_payload(conn, include_image_data=True, progress=None, as_of=None):
     prompts = conn.execute("SELECT * FROM prompts ORDER BY id ASC").fetchall()
+    # 时间点导出：仅包含 T 时刻已存在的提示词及其当时的版本
+    snapshot = snapshots.resolve(conn, as_of) if as_of else None
+    if snapshot is not None:
+        prompts = [p for p in prompts if p['id'] in snapshot]
     result = []
-    for p in prompts:
-        versions = conn.execute("SELECT * FROM versions WHERE prompt_id=? ORDER BY created_at ASC", (p['id'],)).fetchall()
+    for index, p in enumerate(prompts):
+        if snapshot is not None:
+            versions = conn.execute(
+                "SELECT * FROM versions WHERE prompt_id=? AND created_at <= ? ORDER BY created_at ASC",
+                (p['id'], as_of),
+            ).fetchall()
+        else:
+            versions = conn.execute("SELECT * FROM versions WHERE prompt_id=? ORDER BY created_at ASC", (p['id'],)).fetchall()
         image_data = None
         if include_image_data:
             try:
@@ -944,23 +1148,45 @@ def collect_export_payload(conn, include_image_data=True):
             'require_password': bool(p['require_password']) if 'require_password' in p.keys() else False,
             'created_at': p['created_at'],
             'updated_at': p['updated_at'],
-            'current_version_id': p['current_version_id'],
+            'current_version_id': snapshot[p['id']]['id'] if snapshot is not None else p['current_version_id'],
             'versions': [
                 {
                     'id': v['id'],
                     'prompt_id': v['prompt_id'],
                     'version': v['version'],
-                    'content': v['content'],
+                    'content': version_store.row_content(conn, v),
                     'created_at': v['created_at'],
                     'parent_version_id': v['parent_version_id'],
+                    'pinned': bool(v['pinned']),
+                    'label': v['label'],
                 } for v in versions
             ]
         })
+        if snapshot is not None:
+            # 当时生效的版本可能已被清理且未归档，导出的只是更早的版本
+            result[-1]['pruned_gap'] = snapshot[p['id']]['pruned_gap']
+        if snapshot is not None and snapshot[p['id']]['archived']:
+            # 当时生效的版本已被归档，也一并导出
+            entry = snapshot[p['id']]
+            result[-1]['versions'].append({
+                'id': entry['id'],
+                'prompt_id': entry['prompt_id'],
+                'version': entry['version'],
+                'content': snapshots.load_content(conn, entry),
+                'created_at': entry['created_at'],
+                'parent_version_id': None,
+                'pinned': False,
+                'label': None,
+            })
+        if progress:
+            progress(index + 1, len(prompts))
+    if as_of:
+        return {'as_of': as_of, 'prompts': result}
     return {'prompts': result}
 
 
-def build_zip_export(conn):
-    data = collect_export_payload(conn, include_image_data=False)
+def build_zip_export(conn, progress=None, as_of=None):
+    data = collect_export_payload(conn, include_image_data=False, progress=progress, as_of=as_of)
     rows = {
         row['id']: row
         for row in conn.execute("SELECT id, cover_file, cover_mime FROM prompts").fetchall()
@@ -989,6 +1215,8 @@ def build_zip_export(conn):
             'exported_at': now_ts(),
             'prompts': data['prompts'],
         }
+        if data.get('as_of'):
+            manifest['as_of'] = data['as_of']
         archive.writestr(
             'manifest.json',
             json.dumps(manifest, ensure_ascii=False, indent=2).encode('utf-8'),
@@ -1024,6 +1252,12 @@ def _before():
             return redirect(url_for('login', next=nxt))
 
 
+@app.errorhandler(WriteQueueBusy)
+def write_queue_busy(_error):
+    # 写队列已满或写入超时：请客户端稍后重试，而不是让请求线程无限等待
+    return t('服务器繁忙，请稍后重试'), 503, {'Retry-After': '1'}
+
+
 @app.route('/logo.png')
 def logo_png():
     """Serve logo from project root for header/favicon use."""
@@ -1075,11 +1309,83 @@ def prompt_cover(prompt_id, variant):
     return response
 
 
+# 页面缓存：按 (端点, 参数, 认证上下文, 语言, 数据代数) 缓存渲染结果
+page_cache = PageCache(int(os.environ.get('PAGE_CACHE_MAX_CHARS', PAGE_CACHE_MAX_CHARS)))
+
+
+def page_auth_context(conn):
+    """Everything about the caller that changes what a page may show."""
+    mode = get_setting(conn, 'auth_mode', 'off') or 'off'
+    return (
+        mode,
+        is_site_authenticated(conn),
+        session_store.pack_ids(get_unlocked_prompt_ids(conn)),
+        has_edit_grant(conn),
+    )
+
+
+def _note_flash(sender, **extra):
+    g.page_flashed = True
+
+
+message_flashed.connect(_note_flash, app)
+
+
+def cached_page(view):
+    """Serve GET renders from page_cache and answer revalidation with 304."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        # 待显示的提示消息属于单次请求，带着它的页面不能缓存
+        if request.method != 'GET' or session.get('_flashes'):
+            return view(*args, **kwargs)
+        token = csrf_token()
+        conn = get_db()
+        try:
+            key = page_cache.key(
+                request.endpoint,
+                [*request.args.items(multi=True), *((k, str(v)) for k, v in (request.view_args or {}).items())],
+                page_auth_context(conn),
+                get_language(),
+                get_data_generation(conn),
+            )
+        finally:
+            conn.close()
+        page = page_cache.get(key)
+        if page is not None:
+            response = app.response_class(page.render(token), mimetype='text/html')
+            state = 'hit'
+        else:
+            g.page_cache_render = True
+            try:
+                response = app.make_response(view(*args, **kwargs))
+            finally:
+                g.page_cache_render = False
+            if response.status_code != 200 or response.mimetype != 'text/html' or response.direct_passthrough:
+                return response
+            page = make_page(response.get_data(as_text=True))
+            response.set_data(page.render(token))
+            if g.get('page_flashed') or g.get('page_uncacheable'):
+                return response
+            page_cache.put(key, page)
+            state = 'miss'
+        response.set_etag(page.etag(token))
+        response.last_modified = page.last_modified
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+        response.vary.add('Cookie')
+        response.headers['X-Page-Cache'] = state
+        return response.make_conditional(request)
+    return wrapper
+
+
 @app.route('/')
+@cached_page
 def index():
     conn = get_db()
     auth_mode = get_setting(conn, 'auth_mode', 'off') or 'off'
     q = request.args.get('q', '').strip()
+    # 时间点模式：展示 T 时刻各提示词生效的版本
+    as_of = snapshots.parse_as_of(request.args.get('as_of'))
     sort = request.args.get('sort', 'updated')  # updated|created|name|tags
     cover_filter = request.args.get('cover', 'all')
     if cover_filter not in {'all', 'with', 'without'}:
@@ -1108,16 +1414,17 @@ def index():
             p.created_at, p.updated_at, p.current_version_id, p.require_password,
             p.cover_file, p.cover_thumb, p.cover_mime, p.cover_width, p.cover_height,
             p.cover_focus_x, p.cover_focus_y, p.cover_alt,
-            v.content as current_content, v.version as current_version
+            v.content as current_content, v.version as current_version, v.storage as current_storage
         FROM prompts p
         LEFT JOIN versions v ON v.id = p.current_version_id
     """
     params = []
     conditions = []
-    if q:
+    if q and not as_of:
         like = f"%{q}%"
-        conditions.append("(p.name LIKE ? OR p.source LIKE ? OR p.notes LIKE ? OR p.tags LIKE ? OR v.content LIKE ?)")
-        params.extend([like, like, like, like, like])
+        # 共享 blob 中的当前版本正文不在 versions 表内，读出后再匹配
+        conditions.append("(p.name LIKE ? OR p.source LIKE ? OR p.notes LIKE ? OR p.tags LIKE ? OR v.content LIKE ? OR v.storage = ?)")
+        params.extend([like, like, like, like, like, version_store.STORAGE_BLOB])
     if cover_filter == 'with':
         conditions.append("p.cover_file IS NOT NULL AND p.cover_file != ''")
     elif cover_filter == 'without':
@@ -1126,6 +1433,10 @@ def index():
         sql += " WHERE " + " AND ".join(conditions)
     sql += f" ORDER BY {order_clause}"
     prompts = conn.execute(sql, params).fetchall()
+    if as_of:
+        prompts = apply_snapshot(conn, prompts, as_of, q)
+    else:
+        prompts = with_shared_content(conn, prompts, q)
     # 需要密码且未解锁的提示词（仅在“指定提示词密码”模式下生效）
     unlocked = get_unlocked_prompt_ids(conn)
     locked_ids = set()
@@ -1206,16 +1517,57 @@ def index():
         cover_filter=cover_filter,
         auth_mode=auth_mode,
         locked_ids=list(locked_ids),
+        as_of=as_of,
     )
 
 
-def render_prompt_editor(conn, prompt=None, versions=None, current=None, auth_mode='off',
-                         form_values=None, image_error=None, status=200):
+def with_shared_content(conn, prompts, q=''):
+    """Load current versions stored as shared blobs; with ``q``, drop those that do not match."""
+    needle = q.lower()
+    result = []
+    for row in prompts:
+        if row['current_storage'] != version_store.STORAGE_BLOB:
+            result.append(row)
+            continue
+        item = dict(row)
+        item['current_content'] = version_store.load_content(conn, row['current_version_id'])
+        if needle:
+            haystack = [item['name'], item['source'], item['notes'], item['tags'], item['current_content']]
+            if not any(needle in (value or '').lower() for value in haystack):
+                continue
+        result.append(item)
+    return result
+
+
+def apply_snapshot(conn, prompts, as_of, q=''):
+    """Swap listing rows to the versions in effect at ``as_of``; drops prompts that did not exist yet."""
+    snapshot = snapshots.with_content(conn, snapshots.resolve(conn, as_of, [r['id'] for r in prompts]))
+    needle = q.lower()
+    result = []
+    for row in prompts:
+        entry = snapshot.get(row['id'])
+        if not entry:
+            continue
+        item = dict(row)
+        item['current_content'] = entry['content']
+        item['current_version'] = entry['version']
+        item['current_version_id'] = entry['id']
+        item['pruned_gap'] = entry['pruned_gap']
+        if needle:
+            haystack = [item['name'], item['source'], item['notes'], item['tags'], item['current_content']]
+            if not any(needle in (value or '').lower() for value in haystack):
+                continue
+        result.append(item)
+    return result
+
+
+def render_prompt_editor(conn, prompt=None, current=None, auth_mode='off',
+                         form_values=None, image_error=None, status=200, as_of=None):
     response = render_template(
         'prompt_detail.html',
         prompt=prompt,
-        versions=versions or [],
         current=current,
+        as_of=as_of,
         auth_mode=auth_mode,
         has_password=has_access_password(conn),
         save_requires_password=save_requires_password(conn, prompt),
@@ -1255,14 +1607,14 @@ def new_prompt():
             conn.close()
             return response
 
-        cur = conn.cursor()
         ts = now_ts()
         stored = store_cover(asset, COVER_DIR) if asset else {}
         focus_x = clamp_focus(request.form.get('cover_focus_x'))
         focus_y = clamp_focus(request.form.get('cover_focus_y'))
         cover_alt = request.form.get('cover_alt', '').strip() if stored else None
-        try:
-            cur.execute(
+
+        def insert_prompt(wconn):
+            cur = wconn.execute(
                 """
                 INSERT INTO prompts(
                     name, source, notes, color, tags, image_data,
@@ -1280,17 +1632,16 @@ def new_prompt():
             )
             pid = cur.lastrowid
             version = bump_version(None, bump_kind)
-            cur.execute(
-                "INSERT INTO versions(prompt_id, version, content, created_at, parent_version_id) VALUES(?,?,?,?,NULL)",
-                (pid, version, content, ts)
-            )
-            vid = cur.lastrowid
-            cur.execute("UPDATE prompts SET current_version_id=? WHERE id=?", (vid, pid))
-            prune_versions(conn, pid)
-            conn.commit()
-        except Exception:
-            conn.rollback()
-            delete_cover_files(COVER_DIR, cover_filenames(stored))
+            vid = create_version(wconn, pid, version, content, ts)
+            wconn.execute("UPDATE prompts SET current_version_id=? WHERE id=?", (vid, pid))
+            prune_versions(wconn, pid)
+            bump_data_generation(wconn)
+            return pid
+
+        try:
+            pid = write_queue.submit(insert_prompt)
+        except Exception as exc:
+            discard_stored_cover(stored, exc)
             conn.close()
             raise
         conn.close()
@@ -1305,6 +1656,7 @@ def new_prompt():
 
 
 @app.route('/prompt/<int:prompt_id>', methods=['GET', 'POST'])
+@cached_page
 def prompt_detail(prompt_id):
     conn = get_db()
     auth_mode = get_setting(conn, 'auth_mode', 'off') or 'off'
@@ -1335,18 +1687,10 @@ def prompt_detail(prompt_id):
         ts = now_ts()
         asset, remove_image, image_error = parse_cover_upload(request)
         if image_error:
-            versions = conn.execute(
-                "SELECT * FROM versions WHERE prompt_id=? ORDER BY created_at DESC",
-                (prompt_id,),
-            ).fetchall()
-            current = conn.execute(
-                "SELECT * FROM versions WHERE id=?",
-                (prompt_for_auth['current_version_id'],),
-            ).fetchone() if prompt_for_auth['current_version_id'] else None
+            current = load_version(conn, prompt_for_auth['current_version_id']) if prompt_for_auth['current_version_id'] else None
             response = render_prompt_editor(
                 conn,
                 prompt=prompt_for_auth,
-                versions=versions,
                 current=current,
                 auth_mode=auth_mode,
                 form_values=request.form.to_dict(),
@@ -1369,9 +1713,8 @@ def prompt_detail(prompt_id):
         focus_x = clamp_focus(request.form.get('cover_focus_x'), prompt_for_auth['cover_focus_x'] or 50)
         focus_y = clamp_focus(request.form.get('cover_focus_y'), prompt_for_auth['cover_focus_y'] or 50)
         cover_alt = request.form.get('cover_alt', '').strip() if has_cover else None
-
-        try:
-            conn.execute(
+        def save_prompt(wconn):
+            wconn.execute(
                 """
                 UPDATE prompts
                 SET name=?, source=?, notes=?, color=?, tags=?, image_data=NULL,
@@ -1387,34 +1730,39 @@ def prompt_detail(prompt_id):
                     focus_x, focus_y, cover_alt, ts, require_password, prompt_id,
                 ),
             )
-
+            unchanged = False
             if do_save_version:
-                row = conn.execute("SELECT v.version FROM prompts p LEFT JOIN versions v ON v.id=p.current_version_id WHERE p.id=?",
-                                   (prompt_id,)).fetchone()
-                current_ver = row['version'] if row else None
-                new_ver = bump_version(current_ver, bump_kind)
-                conn.execute(
-                    "INSERT INTO versions(prompt_id, version, content, created_at, parent_version_id) VALUES(?,?,?,?,(SELECT current_version_id FROM prompts WHERE id=?))",
-                    (prompt_id, new_ver, content, ts, prompt_id)
-                )
-                compute_current_version(conn, prompt_id)
-                prune_versions(conn, prompt_id)
+                row = wconn.execute(
+                    "SELECT p.current_version_id, v.version, v.content_hash FROM prompts p LEFT JOIN versions v ON v.id=p.current_version_id WHERE p.id=?",
+                    (prompt_id,),
+                ).fetchone()
+                if row and row['current_version_id'] and current_content_hash(wconn, row) == version_store.content_hash(content):
+                    # 内容与当前版本逐字节相同：不创建重复版本
+                    unchanged = True
+                else:
+                    current_ver = row['version'] if row else None
+                    new_ver = bump_version(current_ver, bump_kind)
+                    create_version(wconn, prompt_id, new_ver, content, ts, row['current_version_id'] if row else None)
+                    compute_current_version(wconn, prompt_id)
+                    prune_versions(wconn, prompt_id)
             else:
-                row = conn.execute("SELECT COUNT(*) AS c FROM versions WHERE prompt_id=?", (prompt_id,)).fetchone()
+                row = wconn.execute("SELECT COUNT(*) AS c FROM versions WHERE prompt_id=?", (prompt_id,)).fetchone()
                 if row['c'] == 0:
-                    conn.execute("INSERT INTO versions(prompt_id, version, content, created_at, parent_version_id) VALUES(?,?,?,?,NULL)",
-                                 (prompt_id, '1.0.0', content, ts))
-                    compute_current_version(conn, prompt_id)
-            conn.commit()
-        except Exception:
-            conn.rollback()
-            delete_cover_files(COVER_DIR, cover_filenames(stored))
+                    create_version(wconn, prompt_id, '1.0.0', content, ts)
+                    compute_current_version(wconn, prompt_id)
+            bump_data_generation(wconn)
+            return unchanged
+
+        try:
+            unchanged = write_queue.submit(save_prompt)
+        except Exception as exc:
+            discard_stored_cover(stored, exc)
             conn.close()
             raise
         conn.close()
         if stored or remove_image:
             delete_cover_files(COVER_DIR, old_files)
-        flash('已保存', 'success')
+        flash('内容未变化，未创建新版本' if unchanged else '已保存', 'info' if unchanged else 'success')
         return redirect(url_for('prompt_detail', prompt_id=prompt_id))
 
     # GET: 展示
@@ -1423,20 +1771,29 @@ def prompt_detail(prompt_id):
         conn.close()
         flash('未找到该提示词', 'error')
         return redirect(url_for('index'))
+    as_of = snapshots.parse_as_of(request.args.get('as_of'))
     # 指定提示词密码模式：未解锁则跳转解锁页
     if auth_mode == 'per' and prompt['require_password']:
         unlocked = get_unlocked_prompt_ids(conn)
         if prompt['id'] not in unlocked:
             conn.close()
-            return redirect(url_for('unlock_prompt', prompt_id=prompt_id, next=url_for('prompt_detail', prompt_id=prompt_id)))
-    versions = conn.execute("SELECT * FROM versions WHERE prompt_id=? ORDER BY created_at DESC", (prompt_id,)).fetchall()
-    current = conn.execute("SELECT * FROM versions WHERE id=?", (prompt['current_version_id'],)).fetchone() if prompt['current_version_id'] else None
+            return redirect(url_for('unlock_prompt', prompt_id=prompt_id, next=url_for('prompt_detail', prompt_id=prompt_id, as_of=as_of)))
+    if as_of:
+        # 时间点模式只读展示 T 时刻生效的版本
+        entry = snapshots.resolve(conn, as_of, [prompt_id]).get(prompt_id)
+        if not entry:
+            conn.close()
+            flash('该时间点尚无此提示词的版本', 'info')
+            return redirect(url_for('prompt_detail', prompt_id=prompt_id))
+        current = dict(entry, content=snapshots.load_content(conn, entry))
+    else:
+        current = load_version(conn, prompt['current_version_id']) if prompt['current_version_id'] else None
     response = render_prompt_editor(
         conn,
         prompt=prompt,
-        versions=versions,
         current=current,
         auth_mode=auth_mode,
+        as_of=as_of,
     )
     conn.close()
     return response
@@ -1451,14 +1808,48 @@ def toggle_pin(prompt_id):
         if access_redirect:
             conn.close()
             return access_redirect
-    if row:
-        new_val = 0 if row['pinned'] else 1
-        conn.execute("UPDATE prompts SET pinned=?, updated_at=? WHERE id=?", (new_val, now_ts(), prompt_id))
-        conn.commit()
     conn.close()
+    if row:
+        def toggle(wconn):
+            # 在写事务内取反，并发的两次点击不会互相覆盖
+            wconn.execute(
+                "UPDATE prompts SET pinned=CASE WHEN pinned THEN 0 ELSE 1 END, updated_at=? WHERE id=?",
+                (now_ts(), prompt_id),
+            )
+            bump_data_generation(wconn)
+
+        write_queue.submit(toggle)
     return redirect(request.referrer or url_for('index'))
 
 
+@app.route('/prompt/<int:prompt_id>/versions/<int:version_id>/keep', methods=['POST'])
+def keep_version(prompt_id, version_id):
+    # 固定或标记历史版本：分层保留时不会被清理
+    conn = get_db()
+    back = url_for('versions_page', prompt_id=prompt_id)
+    prompt = conn.execute("SELECT * FROM prompts WHERE id=?", (prompt_id,)).fetchone()
+    if prompt:
+        access_redirect = require_prompt_access(conn, prompt, back)
+        if access_redirect:
+            conn.close()
+            return access_redirect
+    ver = conn.execute("SELECT id FROM versions WHERE id=? AND prompt_id=?", (version_id, prompt_id)).fetchone()
+    if not ver:
+        conn.close()
+        flash('版本不存在', 'error')
+        return redirect(back)
+    pinned = 1 if parse_bool_value(request.form.get('pinned')) else 0
+    label = normalize_version_label(request.form.get('label'))
+    conn.close()
+
+    def keep(wconn):
+        wconn.execute("UPDATE versions SET pinned=?, label=? WHERE id=?", (pinned, label, version_id))
+        bump_data_generation(wconn)
+
+    write_queue.submit(keep)
+    return redirect(back)
+
+
 @app.route('/prompt/<int:prompt_id>/delete', methods=['POST'])
 def delete_prompt(prompt_id):
     # 删除提示词：先删关联版本，再删提示词本身
@@ -1486,18 +1877,31 @@ def delete_prompt(prompt_id):
             return redirect(request.referrer or url_for('prompt_detail', prompt_id=prompt_id))
         clear_auth_failures(action)
 
+    conn.close()
+
+    def delete(wconn):
+        version_rows = wconn.execute("SELECT id, content_hash FROM versions WHERE prompt_id=?", (prompt_id,)).fetchall()
+        blob_hashes = [r['content_hash'] for r in version_rows]
+        history_search.unindex_versions(wconn, [r['id'] for r in version_rows])
+        lineage.forget(wconn, [r['id'] for r in version_rows])
+        wconn.execute("DELETE FROM versions WHERE prompt_id=?", (prompt_id,))
+        wconn.execute("DELETE FROM versions_archive WHERE prompt_id=?", (prompt_id,))
+        wconn.execute("DELETE FROM version_blame WHERE prompt_id=?", (prompt_id,))
+        version_store.gc_blobs(wconn, blob_hashes)
+        wconn.execute("DELETE FROM prompts WHERE id=?", (prompt_id,))
+        bump_data_generation(wconn)
+
     try:
-        conn.execute("DELETE FROM versions WHERE prompt_id=?", (prompt_id,))
-        conn.execute("DELETE FROM prompts WHERE id=?", (prompt_id,))
-        conn.commit()
-        delete_cover_files(COVER_DIR, cover_filenames(row))
-        flash('已删除提示词及其所有版本', 'success')
+        write_queue.submit(delete)
+    except WriteQueueBusy:
+        raise
     except Exception:
-        conn.rollback()
+        logger.exception("Deleting prompt %s failed", prompt_id)
         flash('删除失败，请重试', 'error')
-    finally:
-        conn.close()
-    return redirect(url_for('index'))
+    else:
+        delete_cover_files(COVER_DIR, cover_filenames(row))
+        flash('已删除提示词及其所有版本', 'success')
+    return redirect(url_for('index'))
 
 @app.route('/prompt/<int:prompt_id>/rollback/<int:version_id>', methods=['POST'])
 def rollback_version(prompt_id, version_id):
@@ -1514,20 +1918,29 @@ def rollback_version(prompt_id, version_id):
         conn.close()
         flash('版本不存在', 'error')
         return redirect(url_for('prompt_detail', prompt_id=prompt_id))
-    # 计算新的版本号
-    row = conn.execute("SELECT v.version FROM prompts p LEFT JOIN versions v ON v.id=p.current_version_id WHERE p.id=?",
-                       (prompt_id,)).fetchone()
-    current_ver = row['version'] if row else None
-    new_ver = bump_version(current_ver, bump_kind)
-    ts = now_ts()
-    conn.execute(
-        "INSERT INTO versions(prompt_id, version, content, created_at, parent_version_id) VALUES(?,?,?,?,(SELECT current_version_id FROM prompts WHERE id=?))",
-        (prompt_id, new_ver, ver['content'], ts, prompt_id)
-    )
-    compute_current_version(conn, prompt_id)
-    prune_versions(conn, prompt_id)
-    conn.commit()
+    target_content = version_store.row_content(conn, ver)
     conn.close()
+
+    def rollback(wconn):
+        # 计算新的版本号（在写事务内读取当前版本，避免与并发保存交错）
+        row = wconn.execute(
+            "SELECT p.current_version_id, v.version, v.content_hash FROM prompts p LEFT JOIN versions v ON v.id=p.current_version_id WHERE p.id=?",
+            (prompt_id,),
+        ).fetchone()
+        if row and row['current_version_id'] and current_content_hash(wconn, row) == version_store.content_hash(target_content):
+            return False
+        current_ver = row['version'] if row else None
+        new_ver = bump_version(current_ver, bump_kind)
+        create_version(wconn, prompt_id, new_ver, target_content, now_ts(),
+                       row['current_version_id'] if row else None)
+        compute_current_version(wconn, prompt_id)
+        prune_versions(wconn, prompt_id)
+        bump_data_generation(wconn)
+        return True
+
+    if not write_queue.submit(rollback):
+        flash('该版本内容与当前版本相同，无需回滚', 'info')
+        return redirect(url_for('prompt_detail', prompt_id=prompt_id))
     flash('已从历史版本回滚并创建新版本', 'success')
     return redirect(url_for('prompt_detail', prompt_id=prompt_id))
 
@@ -1543,19 +1956,31 @@ def settings():
             flash('导入失败：上传表单解析错误', 'error')
             conn.close()
             return redirect(url_for('settings'))
+        # 先收集要写入的设置，最后作为一个写操作提交
+        updates = {}
         threshold = request.form.get('version_cleanup_threshold', '200').strip()
         if not threshold.isdigit() or int(threshold) < 1:
             flash('阈值需为正整数', 'error')
         else:
-            set_setting(conn, 'version_cleanup_threshold', threshold)
-            conn.commit()
+            updates['version_cleanup_threshold'] = threshold
             flash('设置已保存', 'success')
+        # 分层保留：每日/每周检查点与归档
+        for key in ('version_keep_daily_days', 'version_keep_weekly_weeks'):
+            value = (request.form.get(key) or '').strip()
+            if value.isdigit():
+                updates[key] = str(int(value))
+        if request.form.get('version_archive_pruned') in ('0', '1'):
+            updates['version_archive_pruned'] = request.form.get('version_archive_pruned')
+        # 历史版本压缩
+        compression = (request.form.get('version_compression') or '').lower()
+        recompress = compression in ('off', 'zlib', 'lzma') and compression != get_setting(conn, 'version_compression', 'zlib')
+        if recompress:
+            updates['version_compression'] = compression
         # 语言设置
         language = (request.form.get('language') or 'zh').lower()
-        if language not in ('zh', 'en'):
+        if language not in i18n.LANGUAGE_SETTINGS:
             language = 'zh'
-        set_setting(conn, 'language', language)
-        conn.commit()
+        updates['language'] = language
         # 访问密码：模式 + 修改密码
         mode = request.form.get('auth_mode', 'off')
         if mode not in ('off', 'per', 'global'):
@@ -1603,16 +2028,28 @@ def settings():
                     flash('密码长度需为 4-64 字符', 'error')
                     mode_to_set = prev_mode
                 else:
-                    set_setting(conn, 'auth_password_hash', hash_pw(new_pw))
+                    updates['auth_password_hash'] = hash_pw(new_pw)
                     password_changed = True
         if not auth_allowed:
             mode_to_set = prev_mode
-        set_setting(conn, 'auth_mode', mode_to_set)
-        if auth_allowed and auth_settings_changed and (mode_to_set != prev_mode or password_changed):
-            bump_auth_session_version(conn)
+        updates['auth_mode'] = mode_to_set
+        reset_sessions = auth_allowed and auth_settings_changed and (mode_to_set != prev_mode or password_changed)
+
+        def save_settings(wconn):
+            for key, value in updates.items():
+                set_setting(wconn, key, value)
+            if reset_sessions:
+                bump_auth_session_version(wconn)
+                wconn.execute("DELETE FROM edit_grants")
+            bump_data_generation(wconn)
+
+        write_queue.submit(save_settings)
+        invalidate_settings_cache()
+        if reset_sessions:
             session.pop('auth_ok', None)
             session.pop('unlocked_prompts', None)
-        conn.commit()
+        if recompress:
+            threading.Thread(target=recompress_history, name='recompress-versions', daemon=True).start()
         # 导入（健壮性：捕获表单/JSON 解析异常，避免 400）
         try:
             files = request.files
@@ -1644,30 +2081,37 @@ def settings():
     auth_mode = get_setting(conn, 'auth_mode', 'off') or 'off'
     has_password = bool(get_setting(conn, 'auth_password_hash', '') or '')
     language = get_setting(conn, 'language', LANG_DEFAULT) or LANG_DEFAULT
+    version_compression = get_setting(conn, 'version_compression', 'zlib') or 'off'
+    keep_daily_days = get_setting(conn, 'version_keep_daily_days', '0') or '0'
+    keep_weekly_weeks = get_setting(conn, 'version_keep_weekly_weeks', '0') or '0'
+    archive_pruned = get_setting(conn, 'version_archive_pruned', '0') == '1'
     conn.close()
-    return render_template('settings.html', threshold=threshold, auth_mode=auth_mode, has_password=has_password, language=language)
+    # /export 跳转过来时继续显示该导出任务的进度，完成后自动下载
+    export_job = None
+    try:
+        export_job_id = request.args.get('export_job')
+        if export_job_id:
+            parse_job_id(export_job_id)
+            status = export_jobs.status(export_job_id)
+            export_job = export_job_data(status) if status else None
+    except ExportJobError:
+        export_job = None
+    return render_template(
+        'settings.html',
+        export_job=export_job,
+        threshold=threshold,
+        auth_mode=auth_mode,
+        has_password=has_password,
+        language=language,
+        version_compression=version_compression,
+        keep_daily_days=keep_daily_days,
+        keep_weekly_weeks=keep_weekly_weeks,
+        archive_pruned=archive_pruned,
+    )
 
 
-@app.route('/export')
-def export_all():
-    conn = get_db()
-    if has_access_password(conn) and not is_site_authenticated(conn):
-        nxt = request.full_path if request.query_string else request.path
-        nxt = nxt.rstrip('?')
-        conn.close()
-        return redirect(url_for('login', next=nxt))
-    export_format = (request.args.get('format') or 'json').lower()
-    if export_format == 'zip':
-        bio = build_zip_export(conn)
-        conn.close()
-        return send_file(
-            bio,
-            mimetype='application/zip',
-            as_attachment=True,
-            download_name='prompts_backup.zip',
-        )
-    data = collect_export_payload(conn)
-    conn.close()
+def render_export_payload(data, export_format):
+    """Serialize collected export data as JSON or CSV bytes."""
     if export_format == 'csv':
         fieldnames = [
             'id', 'name', 'source', 'notes', 'color', 'tags', 'image_data', 'pinned',
@@ -1696,157 +2140,428 @@ def export_all():
                 'current_version_id': p.get('current_version_id'),
                 'versions': json.dumps(p.get('versions') or [], ensure_ascii=False),
             })
-        payload = sio.getvalue()
-        bio = BytesIO(payload.encode('utf-8'))
-        bio.seek(0)
-        return send_file(
-            bio,
-            mimetype='text/csv; charset=utf-8',
-            as_attachment=True,
-            download_name='prompts_export.csv'
-        )
+        return sio.getvalue().encode('utf-8')
+    return json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
 
-    payload = json.dumps(data, ensure_ascii=False, indent=2)
-    bio = BytesIO(payload.encode('utf-8'))
-    bio.seek(0)
-    return send_file(
-        bio,
-        mimetype='application/json; charset=utf-8',
-        as_attachment=True,
-        download_name='prompts_export.json'
-    )
 
+def build_export_artifact(export_format, progress=None, as_of=None):
+    """Build one export from a single read snapshot; return (generation, bytes)."""
+    conn = get_db()
+    try:
+        conn.execute("BEGIN")
+        generation = get_data_generation(conn)
+        if export_format == 'zip':
+            payload = build_zip_export(conn, progress=progress, as_of=as_of).getvalue()
+        else:
+            data = collect_export_payload(conn, progress=progress, as_of=as_of)
+            payload = render_export_payload(data, export_format)
+        conn.rollback()
+    finally:
+        conn.close()
+    return generation, payload
+
+
+export_jobs = ExportJobManager(EXPORT_DIR, build_export_artifact)
+
+
+def require_export_access(conn):
+    if has_access_password(conn) and not is_site_authenticated(conn):
+        nxt = request.full_path if request.query_string else request.path
+        return redirect(url_for('login', next=nxt.rstrip('?')))
+    return None
+
+
+def export_job_data(status):
+    data = {
+        'id': status.get('id'),
+        'format': status.get('format'),
+        'state': status.get('state'),
+        'progress': status.get('progress') or 0,
+        'total': status.get('total') or 0,
+        'error': status.get('error'),
+        'status_url': url_for('export_job_status', job_id=status.get('id')),
+    }
+    if status.get('state') == 'done':
+        data['download_url'] = url_for('export_job_download', job_id=status.get('id'))
+    return data
 
-# Diff 视图
-from markupsafe import Markup, escape
-import re
-import difflib
-
-
-def word_diff_html(a: str, b: str) -> str:
-    # 先按行对齐，然后对每对行做词级 diff
-    a_lines = a.splitlines()
-    b_lines = b.splitlines()
-    sm = difflib.SequenceMatcher(None, a_lines, b_lines)
-    rows = []
-
-    def tokens(s):
-        # 用词与空白/标点作为分隔，并保留分隔符
-        return re.findall(r"\w+|\s+|[^\w\s]", s, flags=re.UNICODE)
-
-    def wrap_span(cls, s):
-        return Markup(f'<span class="{cls}">{escape(s)}</span>')
-
-    def highlight_pair(al, bl):
-        ta = tokens(al)
-        tb = tokens(bl)
-        sm2 = difflib.SequenceMatcher(None, ta, tb)
-        ra = []
-        rb = []
-        for tag, i1, i2, j1, j2 in sm2.get_opcodes():
-            if tag == 'equal':
-                ra.append(escape(''.join(ta[i1:i2])))
-                rb.append(escape(''.join(tb[j1:j2])))
-            elif tag == 'delete':
-                ra.append(wrap_span('diff-del', ''.join(ta[i1:i2])))
-            elif tag == 'insert':
-                rb.append(wrap_span('diff-ins', ''.join(tb[j1:j2])))
-            else:  # replace
-                ra.append(wrap_span('diff-del', ''.join(ta[i1:i2])))
-                rb.append(wrap_span('diff-ins', ''.join(tb[j1:j2])))
-        return Markup('').join(ra), Markup('').join(rb)
-
-    for tag, i1, i2, j1, j2 in sm.get_opcodes():
-        if tag == 'equal':
-            for k in range(i2 - i1):
-                left = escape(a_lines[i1 + k])
-                right = escape(b_lines[j1 + k])
-                rows.append((left, right, ''))
-        elif tag == 'delete':
-            for line in a_lines[i1:i2]:
-                rows.append((wrap_span('diff-del', line), '', 'del'))
-        elif tag == 'insert':
-            for line in b_lines[j1:j2]:
-                rows.append(('', wrap_span('diff-ins', line), 'ins'))
-        else:  # replace
-            al = a_lines[i1:i2]
-            bl = b_lines[j1:j2]
-            maxlen = max(len(al), len(bl))
-            for k in range(maxlen):
-                l = al[k] if k < len(al) else ''
-                r = bl[k] if k < len(bl) else ''
-                hl, hr = highlight_pair(l, r)
-                rows.append((hl, hr, 'chg'))
-
-    # 生成表格 HTML
-    html = [
-        '<table class="diff-table">',
-        '<thead><tr><th>旧版本</th><th>新版本</th></tr></thead>',
-        '<tbody>'
-    ]
-    for l, r, cls in rows:
-        html.append(f'<tr class="{cls}"><td class="cell-left">{l}</td><td class="cell-right">{r}</td></tr>')
-    html.append('</tbody></table>')
-    return Markup('\n'.join(html))
 
+def export_job_json(status):
+    return jsonify(export_job_data(status))
 
-def line_diff_html(a: str, b: str) -> str:
-    # 使用 HtmlDiff 生成左右并排行级 diff
-    d = difflib.HtmlDiff(wrapcolumn=120)
-    html = d.make_table(a.splitlines(), b.splitlines(), context=False, numlines=0)
-    # 包装简化，覆写样式类名以与全站风格一致
-    # 将 difflib 输出的表格包在容器内
-    return Markup(f'<div class="line-diff">{html}</div>')
+
+def send_export_artifact(path, export_format, as_of=None):
+    mimetype, download_name = EXPORT_FORMATS[export_format]
+    if as_of:
+        stem, ext = os.path.splitext(download_name)
+        stamp = re.sub(r'[^0-9T]', '', as_of[:19])
+        download_name = f"{stem}_{stamp}{ext}"
+    return send_file(path, mimetype=mimetype, as_attachment=True, download_name=download_name)
+
+
+@app.route('/export')
+def export_all():
+    conn = get_db()
+    login_redirect = require_export_access(conn)
+    if login_redirect:
+        conn.close()
+        return login_redirect
+    export_format = (request.args.get('format') or 'json').lower()
+    if export_format not in EXPORT_FORMATS:
+        export_format = 'json'
+    generation = get_data_generation(conn)
+    conn.close()
+    as_of = snapshots.parse_as_of(request.args.get('as_of'))
+    # 请求线程不生成导出：已有当前代数的产物时直接下载，否则启动（或复用）后台任务后立即返回
+    status = export_jobs.start(export_format, generation, as_of)
+    path = export_jobs.artifact_for(status['id']) if status.get('state') == 'done' else None
+    if path:
+        return send_export_artifact(path, export_format, as_of)
+    if request.accept_mimetypes.best == 'application/json':
+        return export_job_json(status), 202
+    return redirect(url_for('settings', export_job=status['id']))
+
+
+@app.route('/export/jobs', methods=['POST'])
+def start_export_job():
+    conn = get_db()
+    if require_export_access(conn):
+        conn.close()
+        return jsonify({'error': 'auth_required'}), 401
+    export_format = (request.form.get('format') or request.args.get('format') or 'json').lower()
+    as_of = snapshots.parse_as_of(request.form.get('as_of') or request.args.get('as_of'))
+    generation = get_data_generation(conn)
+    conn.close()
+    try:
+        status = export_jobs.start(export_format, generation, as_of)
+    except ExportJobError:
+        return jsonify({'error': 'invalid_format'}), 400
+    return export_job_json(status), 202
+
+
+@app.route('/export/jobs/<job_id>')
+def export_job_status(job_id):
+    conn = get_db()
+    denied = require_export_access(conn)
+    conn.close()
+    if denied:
+        return jsonify({'error': 'auth_required'}), 401
+    try:
+        parse_job_id(job_id)
+    except ExportJobError:
+        return jsonify({'error': 'not_found'}), 404
+    status = export_jobs.status(job_id)
+    if not status:
+        return jsonify({'error': 'not_found'}), 404
+    return export_job_json(status)
+
+
+@app.route('/export/jobs/<job_id>/download')
+def export_job_download(job_id):
+    conn = get_db()
+    login_redirect = require_export_access(conn)
+    conn.close()
+    if login_redirect:
+        return login_redirect
+    try:
+        export_format, _ = parse_job_id(job_id)
+    except ExportJobError:
+        return ('', 404)
+    path = export_jobs.artifact_for(job_id)
+    if not path:
+        return ('', 404)
+    return send_export_artifact(path, export_format, job_as_of(job_id))
+
+
+# Diff 视图
+diff_cache = DiffCache(int(os.environ.get('DIFF_CACHE_MAX_CHARS', DIFF_CACHE_MAX_CHARS)))
+
+
+DIFF_TIME_BUDGET = float(os.environ.get('DIFF_TIME_BUDGET', diff_engine.DEFAULT_TIME_BUDGET))
+
+
+def diff_json(left, right, mode):
+    """Serialize (or reuse) the diff of two loaded versions; returns (json_text, cache_hit)."""
+    mode = mode if mode in diff_engine.MODES else 'word'
+    left_hash = left.get('content_hash') or version_store.content_hash(left['content'])
+    right_hash = right.get('content_hash') or version_store.content_hash(right['content'])
+    key = DiffCache.key(left_hash, right_hash, mode)
+    cached = diff_cache.get(key)
+    if cached is not None:
+        return cached, True
+    result = diff_engine.compute_diff(left['content'], right['content'], mode, DIFF_TIME_BUDGET)
+    payload = diff_engine.to_json(result)
+    if result.degraded:
+        # 超出 CPU 预算的降级结果只对本次请求有效，下次仍尝试完整 diff
+        g.page_uncacheable = True
+    else:
+        diff_cache.put(key, payload)
+    return payload, False
+
+
+def resolve_diff_pair(conn, prompt, left_id, right_id):
+    """Load the two versions to compare; defaults to parent vs current."""
+    if not right_id:
+        right_id = prompt['current_version_id']
+    right = load_version(conn, right_id, prompt['id']) if right_id else None
+    if not left_id and right:
+        # 默认对比最近的仍然存在的祖先版本；没有血缘记录时退回按时间的上一版
+        left_id = lineage.nearest_ancestor(conn, right['id'])
+    if not left_id and right:
+        previous = conn.execute(
+            """
+            SELECT id FROM versions
+            WHERE prompt_id=? AND (created_at < ? OR (created_at = ? AND id < ?))
+            ORDER BY created_at DESC, id DESC LIMIT 1
+            """,
+            (prompt['id'], right['created_at'], right['created_at'], right['id']),
+        ).fetchone()
+        left_id = previous['id'] if previous else right['id']
+    left = load_version(conn, left_id, prompt['id']) if left_id else None
+    return left, right
+
+
+def version_summary(version):
+    return {'id': version['id'], 'version': version['version'], 'created_at': version['created_at']}
+
+
+def diff_response_json(left, right, mode):
+    """Full diff API body; returns (json_text, cache_hit)."""
+    payload, cache_hit = diff_json(left, right, mode)
+    body = '{"left":%s,"right":%s,"diff":%s}' % (
+        json.dumps(version_summary(left), ensure_ascii=False),
+        json.dumps(version_summary(right), ensure_ascii=False),
+        payload,
+    )
+    return body, cache_hit
 
 
 @app.route('/prompt/<int:prompt_id>/diff')
+@cached_page
 def diff_view(prompt_id):
     left_id = request.args.get('left')
     right_id = request.args.get('right')
     mode = request.args.get('mode', 'word')  # word|line
+    mode = mode if mode in diff_engine.MODES else 'word'
     conn = get_db()
     prompt = conn.execute("SELECT * FROM prompts WHERE id=?", (prompt_id,)).fetchone()
+    if not prompt:
+        conn.close()
+        flash('未找到该提示词', 'error')
+        return redirect(url_for('index'))
     # 未解锁受保护提示词则跳转解锁
     auth_mode = get_setting(conn, 'auth_mode', 'off') or 'off'
-    if auth_mode == 'per' and prompt and prompt['require_password'] and not is_prompt_unlocked(conn, prompt_id):
+    if auth_mode == 'per' and prompt['require_password'] and not is_prompt_unlocked(conn, prompt_id):
         conn.close()
         return redirect(url_for('unlock_prompt', prompt_id=prompt_id, next=url_for('diff_view', prompt_id=prompt_id, left=left_id, right=right_id, mode=mode)))
-    versions = conn.execute("SELECT * FROM versions WHERE prompt_id=? ORDER BY created_at DESC", (prompt_id,)).fetchall()
+    versions = list_version_options(conn, prompt_id)
     if not versions:
         conn.close()
         flash('暂无版本', 'info')
         return redirect(url_for('prompt_detail', prompt_id=prompt_id))
-    # 默认对比：上一版本 vs 当前版本
-    if not right_id and prompt['current_version_id']:
-        right_id = str(prompt['current_version_id'])
-    if not left_id:
-        # 找到 right 的前一个版本
-        idx = 0
-        for i, v in enumerate(versions):
-            if str(v['id']) == str(right_id):
-                idx = i
-                break
-        if idx + 1 < len(versions):
-            left_id = str(versions[idx + 1]['id'])
-        else:
-            left_id = str(versions[idx]['id'])
+    left, right = resolve_diff_pair(conn, prompt, left_id, right_id)
+    conn.close()
+    if not left or not right:
+        flash('所选版本不存在', 'error')
+        return redirect(url_for('prompt_detail', prompt_id=prompt_id))
+
+    # 首屏直接内嵌 JSON，由前端渲染；切换版本/模式时再请求 diff API
+    diff_data, cache_hit = diff_response_json(left, right, mode)
+    response = app.make_response(
+        render_template('diff.html', prompt=prompt, versions=versions, left=left, right=right, mode=mode, diff_data=diff_data)
+    )
+    response.headers['X-Diff-Cache'] = 'hit' if cache_hit else 'miss'
+    return response
 
-    left = conn.execute("SELECT * FROM versions WHERE id=? AND prompt_id=?", (left_id, prompt_id)).fetchone()
-    right = conn.execute("SELECT * FROM versions WHERE id=? AND prompt_id=?", (right_id, prompt_id)).fetchone()
+
+@app.route('/api/prompts/<int:prompt_id>/diff')
+def api_prompt_diff(prompt_id):
+    conn = get_db()
+    prompt, error = prompt_api_access(conn, prompt_id)
+    if error:
+        conn.close()
+        return error
+    left, right = resolve_diff_pair(conn, prompt, request.args.get('left'), request.args.get('right'))
     conn.close()
     if not left or not right:
+        return jsonify({'error': 'not_found'}), 404
+    body, cache_hit = diff_response_json(left, right, request.args.get('mode', 'word'))
+    response = app.response_class(body, mimetype='application/json')
+    response.headers['X-Diff-Cache'] = 'hit' if cache_hit else 'miss'
+    return response
+
+
+@app.route('/prompt/<int:prompt_id>/diff/context')
+def diff_context(prompt_id):
+    # 按需展开折叠的未变化内容：两侧内容相同，只需读取左侧版本
+    conn = get_db()
+    _, error = prompt_api_access(conn, prompt_id)
+    if error:
+        conn.close()
+        return error
+    left = load_version(conn, request.args.get('left'), prompt_id)
+    conn.close()
+    try:
+        a_start = max(0, int(request.args.get('a', 0)))
+        b_start = max(0, int(request.args.get('b', 0)))
+        count = max(0, int(request.args.get('count', 0)))
+    except ValueError:
+        return jsonify({'error': 'bad_range'}), 400
+    if not left:
+        return jsonify({'error': 'not_found'}), 404
+    lines = left['content'].splitlines()[a_start:a_start + count]
+    rows = [
+        {'op': 'equal', 'a': a_start + k, 'b': b_start + k, 'left': line, 'right': line}
+        for k, line in enumerate(lines)
+    ]
+    return jsonify({'rows': diff_engine.compact_rows(rows)})
+
+
+def blame_origins(conn, origin_ids):
+    """Version info for blame origins; pruned versions fall back to the archive."""
+    ids = sorted(set(origin_ids))
+    found = {}
+    for table, archived in (('versions', False), ('versions_archive', True)):
+        missing = [i for i in ids if i not in found]
+        for start in range(0, len(missing), 500):
+            chunk = missing[start:start + 500]
+            rows = conn.execute(
+                f"SELECT id, version, created_at FROM {table} WHERE id IN ({','.join('?' * len(chunk))})",
+                chunk,
+            ).fetchall()
+            for r in rows:
+                found[r['id']] = {'id': r['id'], 'version': r['version'], 'created_at': r['created_at'], 'archived': archived}
+    return {i: found.get(i, {'id': i, 'version': None, 'created_at': None, 'archived': False}) for i in ids}
+
+
+def version_blame(conn, version):
+    """Blame of a loaded version: (runs, origins, lines)."""
+    # 只读：旧数据尚未补建索引时在内存中计算
+    origins = blame.blame_for(conn, version['id']) or []
+    lines = version['content'].splitlines()
+    runs = json.loads(blame.encode_runs(origins))
+    return runs, blame_origins(conn, origins), lines
+
+
+@app.route('/prompt/<int:prompt_id>/blame')
+def blame_view(prompt_id):
+    conn = get_db()
+    prompt = conn.execute("SELECT * FROM prompts WHERE id=?", (prompt_id,)).fetchone()
+    if not prompt:
+        conn.close()
+        flash('未找到该提示词', 'error')
+        return redirect(url_for('index'))
+    version_id = request.args.get('version') or prompt['current_version_id']
+    # 未解锁受保护提示词则跳转解锁
+    auth_mode = get_setting(conn, 'auth_mode', 'off') or 'off'
+    if auth_mode == 'per' and prompt['require_password'] and not is_prompt_unlocked(conn, prompt_id):
+        conn.close()
+        return redirect(url_for('unlock_prompt', prompt_id=prompt_id, next=url_for('blame_view', prompt_id=prompt_id, version=request.args.get('version'))))
+    version = load_version(conn, version_id, prompt_id) if version_id else None
+    if not version:
+        conn.close()
         flash('所选版本不存在', 'error')
         return redirect(url_for('prompt_detail', prompt_id=prompt_id))
+    runs, origins, lines = version_blame(conn, version)
+    version_options = list_version_options(conn, prompt_id)
+    conn.close()
+    hunks = []
+    line_no = 0
+    for origin_id, count in runs:
+        hunks.append({
+            'origin': origins[origin_id],
+            'start': line_no + 1,
+            'lines': lines[line_no:line_no + count],
+        })
+        line_no += count
+    return render_template(
+        'blame.html',
+        prompt=prompt,
+        version=version,
+        version_options=version_options,
+        hunks=hunks,
+        origin_count=len(origins),
+    )
 
-    if mode == 'line':
-        diff_html = line_diff_html(left['content'], right['content'])
-    else:
-        diff_html = word_diff_html(left['content'], right['content'])
 
-    return render_template('diff.html', prompt=prompt, versions=versions, left=left, right=right, mode=mode, diff_html=diff_html)
+@app.route('/api/prompts/<int:prompt_id>/blame')
+def api_prompt_blame(prompt_id):
+    conn = get_db()
+    prompt, error = prompt_api_access(conn, prompt_id)
+    if error:
+        conn.close()
+        return error
+    version_id = request.args.get('version') or prompt['current_version_id']
+    version = load_version(conn, version_id, prompt_id) if version_id else None
+    if not version:
+        conn.close()
+        return jsonify({'error': 'not_found'}), 404
+    runs, origins, lines = version_blame(conn, version)
+    conn.close()
+    return jsonify({
+        'version': version_summary(version),
+        'runs': runs,
+        'origins': {str(k): v for k, v in origins.items()},
+        'lines': lines,
+    })
+
+
+def locked_prompt_ids(conn):
+    """Protected prompts this session has not unlocked (per-prompt password mode only)."""
+    if (get_setting(conn, 'auth_mode', 'off') or 'off') != 'per':
+        return set()
+    protected = {r['id'] for r in conn.execute("SELECT id FROM prompts WHERE require_password=1").fetchall()}
+    return protected - get_unlocked_prompt_ids(conn)
+
+
+@app.route('/search/history')
+def history_search_page():
+    q = request.args.get('q', '').strip()
+    page = parse_page_arg(request.args.get('page'))
+    conn = get_db()
+    results = None
+    unavailable = False
+    try:
+        if q:
+            results = history_search.search(conn, q, page, HISTORY_SEARCH_PER_PAGE, locked_prompt_ids(conn))
+    except history_search.SearchUnavailable:
+        unavailable = True
+    finally:
+        conn.close()
+    return render_template(
+        'history_search.html',
+        q=q,
+        results=results,
+        unavailable=unavailable,
+        min_chars=history_search.MIN_QUERY_CHARS,
+    )
+
+
+@app.route('/api/search/versions')
+def api_search_versions():
+    q = request.args.get('q', '').strip()
+    page = parse_page_arg(request.args.get('page'))
+    per_page = min(VERSIONS_PER_PAGE_MAX, parse_page_arg(request.args.get('per_page'), HISTORY_SEARCH_PER_PAGE))
+    if len(q) < history_search.MIN_QUERY_CHARS:
+        return jsonify({'error': 'query_too_short', 'min_chars': history_search.MIN_QUERY_CHARS}), 400
+    conn = get_db()
+    try:
+        results = history_search.search(conn, q, page, per_page, locked_prompt_ids(conn))
+    except history_search.SearchUnavailable:
+        return jsonify({'error': 'search_unavailable'}), 503
+    finally:
+        conn.close()
+    return jsonify({
+        'items': results.items,
+        'page': results.page,
+        'per_page': results.per_page,
+        'total': results.total,
+        'has_more': results.has_more,
+    })
 
 
 @app.route('/prompt/<int:prompt_id>/versions')
+@cached_page
 def versions_page(prompt_id):
     conn = get_db()
     prompt = conn.execute("SELECT * FROM prompts WHERE id=?", (prompt_id,)).fetchone()
@@ -1860,17 +2575,179 @@ def versions_page(prompt_id):
         conn.close()
         return redirect(url_for('unlock_prompt', prompt_id=prompt_id, next=url_for('versions_page', prompt_id=prompt_id)))
     
-    # Convert Row objects to dictionaries for JSON serialization
-    versions = conn.execute("SELECT * FROM versions WHERE prompt_id=? ORDER BY created_at DESC", (prompt_id,)).fetchall()
-    versions_dict = [dict(version) for version in versions]
-    
-    current = conn.execute("SELECT * FROM versions WHERE id=?", (prompt['current_version_id'],)).fetchone() if prompt['current_version_id'] else None
-    current_dict = dict(current) if current else None
-    
+    # 仅渲染当前页的轻量版本信息，完整内容在弹窗中按需加载
+    page = parse_page_arg(request.args.get('page'))
+    order = request.args.get('order') if request.args.get('order') in VERSION_LIST_ORDERS else 'time'
+    versions, total = list_versions(conn, prompt_id, page, VERSIONS_PER_PAGE, order)
+    version_options = list_version_options(conn, prompt_id)
+    current_dict = next((v for v in version_options if v['id'] == prompt['current_version_id']), None)
     prompt_dict = dict(prompt)
+    archived_count = conn.execute(
+        "SELECT COUNT(*) FROM versions_archive WHERE prompt_id=?", (prompt_id,)
+    ).fetchone()[0]
+    latest_created_at = version_options[0]['created_at'] if version_options else None
     
     conn.close()
-    return render_template('versions.html', prompt=prompt_dict, versions=versions_dict, current=current_dict)
+    return render_template(
+        'versions.html',
+        prompt=prompt_dict,
+        versions=versions,
+        version_options=version_options,
+        current=current_dict,
+        total_versions=total,
+        latest_created_at=latest_created_at,
+        page=page,
+        order=order,
+        page_count=max(1, -(-total // VERSIONS_PER_PAGE)),
+        archived_count=archived_count,
+    )
+
+
+def parse_page_arg(value, default=1):
+    try:
+        return max(1, int(value))
+    except (TypeError, ValueError):
+        return default
+
+
+def list_versions(conn, prompt_id, page=1, per_page=VERSIONS_PER_PAGE, order='time'):
+    """Return one page of lightweight version rows (no content) and the total count."""
+    total = conn.execute("SELECT COUNT(*) FROM versions WHERE prompt_id=?", (prompt_id,)).fetchone()[0]
+    order_by = VERSION_LIST_ORDERS.get(order, VERSION_LIST_ORDERS['time'])
+    rows = conn.execute(
+        f"""
+        SELECT id, version, created_at, parent_version_id, size, pinned, label,
+               lines_added, lines_removed, chars_changed, similarity
+        FROM versions WHERE prompt_id=?
+        ORDER BY {order_by}
+        LIMIT ? OFFSET ?
+        """,
+        (prompt_id, per_page, (page - 1) * per_page),
+    ).fetchall()
+    return [dict(r) for r in rows], total
+
+
+def list_version_options(conn, prompt_id):
+    """All versions of a prompt as (id, version, created_at) for pickers."""
+    rows = conn.execute(
+        "SELECT id, version, created_at FROM versions WHERE prompt_id=? ORDER BY created_at DESC, id DESC",
+        (prompt_id,),
+    ).fetchall()
+    return [dict(r) for r in rows]
+
+
+def prompt_api_access(conn, prompt_id):
+    """Return (prompt, error_response) for JSON endpoints scoped to one prompt."""
+    prompt = conn.execute("SELECT * FROM prompts WHERE id=?", (prompt_id,)).fetchone()
+    if not prompt:
+        return None, (jsonify({'error': 'not_found'}), 404)
+    auth_mode = get_setting(conn, 'auth_mode', 'off') or 'off'
+    if auth_mode == 'per' and prompt['require_password'] and not is_prompt_unlocked(conn, prompt_id):
+        return None, (jsonify({'error': 'auth_required'}), 401)
+    return prompt, None
+
+
+@app.route('/api/prompts/<int:prompt_id>/versions')
+def api_versions(prompt_id):
+    conn = get_db()
+    prompt, error = prompt_api_access(conn, prompt_id)
+    if error:
+        conn.close()
+        return error
+    page = parse_page_arg(request.args.get('page'))
+    per_page = min(VERSIONS_PER_PAGE_MAX, parse_page_arg(request.args.get('per_page'), VERSIONS_PER_PAGE))
+    order = request.args.get('order') if request.args.get('order') in VERSION_LIST_ORDERS else 'time'
+    items, total = list_versions(conn, prompt_id, page, per_page, order)
+    conn.close()
+    for item in items:
+        item['pinned'] = bool(item['pinned'])
+        item['is_current'] = item['id'] == prompt['current_version_id']
+    return jsonify({
+        'items': items,
+        'page': page,
+        'per_page': per_page,
+        'order': order,
+        'total': total,
+        'has_more': page * per_page < total,
+    })
+
+
+@app.route('/api/prompts/<int:prompt_id>/versions/<int:version_id>')
+def api_version_detail(prompt_id, version_id):
+    conn = get_db()
+    _, error = prompt_api_access(conn, prompt_id)
+    if error:
+        conn.close()
+        return error
+    version = load_version(conn, version_id, prompt_id)
+    conn.close()
+    if not version:
+        return jsonify({'error': 'not_found'}), 404
+    return jsonify({
+        'id': version['id'],
+        'version': version['version'],
+        'created_at': version['created_at'],
+        'content': version['content'],
+    })
+
+
+def lineage_limit_arg():
+    try:
+        return max(1, min(LINEAGE_LIMIT_MAX, int(request.args.get('limit', LINEAGE_LIMIT_MAX))))
+    except (TypeError, ValueError):
+        return LINEAGE_LIMIT_MAX
+
+
+def lineage_api(prompt_id, version_id, query):
+    conn = get_db()
+    _, error = prompt_api_access(conn, prompt_id)
+    if error:
+        conn.close()
+        return error
+    version = conn.execute(
+        "SELECT id, version, created_at FROM versions WHERE id=? AND prompt_id=?", (version_id, prompt_id)
+    ).fetchone()
+    if not version:
+        conn.close()
+        return jsonify({'error': 'not_found'}), 404
+    items = query(conn, version_id, limit=lineage_limit_arg())
+    conn.close()
+    return jsonify({'version': dict(version), 'items': items})
+
+
+@app.route('/api/prompts/<int:prompt_id>/versions/<int:version_id>/ancestors')
+def api_version_ancestors(prompt_id, version_id):
+    return lineage_api(prompt_id, version_id, lineage.ancestors)
+
+
+@app.route('/api/prompts/<int:prompt_id>/versions/<int:version_id>/descendants')
+def api_version_descendants(prompt_id, version_id):
+    return lineage_api(prompt_id, version_id, lineage.descendants)
+
+
+@app.route('/api/prompts/<int:prompt_id>/versions/common-ancestor')
+def api_versions_common_ancestor(prompt_id):
+    conn = get_db()
+    _, error = prompt_api_access(conn, prompt_id)
+    if error:
+        conn.close()
+        return error
+    ids = []
+    for name in ('a', 'b'):
+        try:
+            version_id = int(request.args.get(name, ''))
+        except ValueError:
+            version_id = None
+        found = version_id and conn.execute(
+            "SELECT 1 FROM versions WHERE id=? AND prompt_id=?", (version_id, prompt_id)
+        ).fetchone()
+        if not found:
+            conn.close()
+            return jsonify({'error': 'not_found'}), 404
+        ids.append(version_id)
+    ancestor = lineage.common_ancestor(conn, ids[0], ids[1])
+    conn.close()
+    return jsonify({'a': ids[0], 'b': ids[1], 'ancestor': ancestor})
 
 
 @app.route('/api/tags')
@@ -1899,11 +2776,26 @@ from urllib.parse import urlparse
 
 RATE_LIMIT_WINDOW = 300
 RATE_LIMIT_MAX_FAILURES = 8
-_rate_limit_failures = {}
+# 失败计数存放在独立的 SQLite 文件中，所有工作进程共享
+auth_rate_limiter = RateLimiter(
+    os.environ.get('RATE_LIMIT_DB_PATH') or os.path.join(os.path.dirname(DB_PATH) or '.', 'ratelimit.sqlite3'),
+    RATE_LIMIT_MAX_FAILURES,
+    RATE_LIMIT_WINDOW,
+    max_keys=int(os.environ.get('RATE_LIMIT_MAX_KEYS', RATE_LIMIT_MAX_KEYS)),
+)
+
+
+# 密码哈希在独立的有界线程池中计算，限制同时占用的 CPU
+password_pool = PasswordPool(
+    workers=int(os.environ.get('PASSWORD_HASH_WORKERS', PASSWORD_HASH_WORKERS)),
+    max_pending=int(os.environ.get('PASSWORD_HASH_MAX_PENDING', PASSWORD_HASH_MAX_PENDING)),
+)
+# 保存授权：一次密码验证成功后签发，有效期内的保存不再重复计算密码哈希
+EDIT_GRANT_TTL = int(os.environ.get('EDIT_GRANT_TTL', '600'))
 
 
 def hash_pw(pw: str) -> str:
-    return generate_password_hash(pw or '')
+    return password_pool.hash(pw or '')
 
 
 def is_legacy_hash(value: str) -> bool:
@@ -1917,11 +2809,27 @@ def verify_password(conn, password: str, migrate_on_success: bool = True) -> boo
     if is_legacy_hash(saved_hash):
         ok = hashlib.sha256((password or '').encode('utf-8')).hexdigest() == saved_hash
         if ok and migrate_on_success:
-            set_setting(conn, 'auth_password_hash', hash_pw(password or ''))
-            conn.commit()
+            new_hash = hash_pw(password or '')
+
+            def migrate(wconn):
+                # 仅当仍是旧哈希时替换，避免覆盖并发修改的密码
+                wconn.execute(
+                    "UPDATE settings SET value=? WHERE key='auth_password_hash' AND value=?",
+                    (new_hash, saved_hash),
+                )
+
+            try:
+                write_queue.submit(migrate)
+                invalidate_settings_cache()
+            except Exception:
+                # 迁移失败不影响本次验证，下次登录时重试
+                logger.exception("Could not upgrade legacy password hash")
         return ok
     try:
-        return check_password_hash(saved_hash, password or '')
+        return password_pool.check(saved_hash, password or '')
+    except PasswordPoolBusy:
+        logger.warning("Password check rejected: hashing pool is busy")
+        return False
     except Exception:
         return False
 
@@ -1950,7 +2858,15 @@ def has_access_password(conn) -> bool:
     return bool(get_setting(conn, 'auth_password_hash', '') or '')
 
 
+def rotate_session_id():
+    """Issue a new server-side session id after a privilege change (no-op for cookie sessions)."""
+    regenerate = getattr(session, 'regenerate', None)
+    if regenerate is not None:
+        regenerate()
+
+
 def mark_site_authenticated(conn):
+    rotate_session_id()
     session['auth_ok'] = True
     session['auth_session_version'] = get_auth_session_version(conn)
 
@@ -1964,7 +2880,7 @@ def get_unlocked_prompt_ids(conn) -> set:
         session.pop('auth_ok', None)
         session.pop('unlocked_prompts', None)
         return set()
-    return set(session.get('unlocked_prompts') or [])
+    return session_store.unpack_ids(session.get('unlocked_prompts'))
 
 
 def is_prompt_unlocked(conn, prompt_id: int) -> bool:
@@ -1972,10 +2888,12 @@ def is_prompt_unlocked(conn, prompt_id: int) -> bool:
 
 
 def unlock_prompt_in_session(conn, prompt_id: int):
+    rotate_session_id()
     session['auth_session_version'] = get_auth_session_version(conn)
     unlocked = get_unlocked_prompt_ids(conn)
     unlocked.add(prompt_id)
-    session['unlocked_prompts'] = list(unlocked)
+    # 以区间形式保存（如 "1-40,52"），解锁数百个提示词后依然很小
+    session['unlocked_prompts'] = session_store.pack_ids(unlocked)
 
 
 def prompt_requires_unlock(conn, prompt) -> bool:
@@ -1990,11 +2908,82 @@ def require_prompt_access(conn, prompt, next_url: str = None):
     return None
 
 
+def _edit_grant_serializer():
+    return URLSafeTimedSerializer(app.secret_key, salt='edit-grant')
+
+
+def _edit_grant_binding() -> str:
+    """What a grant is bound to: the server-side session id if any, else the CSRF token."""
+    bound = getattr(session, 'sid', None) or session.get('_csrf_token') or ''
+    return hashlib.sha256(bound.encode('utf-8')).hexdigest()[:16]
+
+
+def issue_edit_grant(conn):
+    """Let this session save without re-entering the password for EDIT_GRANT_TTL seconds."""
+    if EDIT_GRANT_TTL <= 0 or not session.get('_csrf_token'):
+        return
+    # 授权携带服务端随机数：重放的 Cookie 在退出登录或修改认证设置后即失效
+    nonce = secrets.token_urlsafe(16)
+    now = time.time()
+
+    def store(wconn):
+        wconn.execute("DELETE FROM edit_grants WHERE expires<=?", (now,))
+        wconn.execute("INSERT INTO edit_grants(nonce, expires) VALUES(?, ?)", (nonce, now + EDIT_GRANT_TTL))
+
+    try:
+        write_queue.submit(store)
+    except WriteQueueBusy:
+        logger.warning("Edit grant not issued: write queue is busy")
+        return
+    session['edit_grant'] = _edit_grant_serializer().dumps(
+        {'v': get_auth_session_version(conn), 't': _edit_grant_binding(), 'n': nonce}
+    )
+
+
+def _edit_grant_data():
+    grant = session.get('edit_grant')
+    if not grant or EDIT_GRANT_TTL <= 0:
+        return None
+    try:
+        data = _edit_grant_serializer().loads(grant, max_age=EDIT_GRANT_TTL)
+    except BadData:
+        session.pop('edit_grant', None)
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def has_edit_grant(conn) -> bool:
+    """True while this session holds an unexpired, unrevoked grant for the current auth_session_version."""
+    data = _edit_grant_data()
+    # 绑定本会话与认证版本：修改密码或访问模式后立即失效
+    if (
+        data is None
+        or data.get('v') != get_auth_session_version(conn)
+        or not secrets.compare_digest(str(data.get('t', '')), _edit_grant_binding())
+    ):
+        return False
+    row = conn.execute(
+        "SELECT 1 FROM edit_grants WHERE nonce=? AND expires>?", (str(data.get('n', '')), time.time())
+    ).fetchone()
+    return row is not None
+
+
+def revoke_edit_grant():
+    """Drop this session's grant, including its server-side record."""
+    data = _edit_grant_data()
+    session.pop('edit_grant', None)
+    if data and data.get('n'):
+        nonce = str(data['n'])
+        write_queue.submit(lambda wconn: wconn.execute("DELETE FROM edit_grants WHERE nonce=?", (nonce,)))
+
+
 def save_requires_password(conn, prompt=None) -> bool:
     if not has_access_password(conn):
         return False
     if is_site_authenticated(conn):
         return False
+    if has_edit_grant(conn):
+        return False
     if prompt and prompt_requires_unlock(conn, prompt) and is_prompt_unlocked(conn, prompt['id']):
         return False
     return True
@@ -2013,6 +3002,7 @@ def require_save_password(conn, prompt=None, next_url: str = None):
     save_password = request.form.get('save_password') or ''
     if verify_password(conn, save_password):
         clear_auth_failures(action)
+        issue_edit_grant(conn)
         return None
 
     record_auth_failure(action)
@@ -2020,32 +3010,27 @@ def require_save_password(conn, prompt=None, next_url: str = None):
     return redirect(target)
 
 
-def rate_limit_key(action: str):
-    ip = request.headers.get('X-Forwarded-For', request.remote_addr or 'unknown').split(',')[0].strip()
-    return action, ip
+def rate_limit_key(action: str) -> str:
+    # ProxyFix 已按可信代理层数解析 X-Forwarded-For；直接读取请求头会让客户端伪造任意地址
+    return f"{action}:{request.remote_addr or 'unknown'}"
 
 
 def is_rate_limited(action: str) -> bool:
-    now = time.time()
-    key = rate_limit_key(action)
-    entries = [ts for ts in _rate_limit_failures.get(key, []) if now - ts < RATE_LIMIT_WINDOW]
-    _rate_limit_failures[key] = entries
-    return len(entries) >= RATE_LIMIT_MAX_FAILURES
+    return auth_rate_limiter.is_limited(rate_limit_key(action))
 
 
 def record_auth_failure(action: str):
-    now = time.time()
-    key = rate_limit_key(action)
-    entries = [ts for ts in _rate_limit_failures.get(key, []) if now - ts < RATE_LIMIT_WINDOW]
-    entries.append(now)
-    _rate_limit_failures[key] = entries
+    auth_rate_limiter.hit(rate_limit_key(action))
 
 
 def clear_auth_failures(action: str):
-    _rate_limit_failures.pop(rate_limit_key(action), None)
+    auth_rate_limiter.reset(rate_limit_key(action))
 
 
 def csrf_token() -> str:
+    if g.get('page_cache_render'):
+        # 缓存的页面只保存占位符，发送时再换成各会话自己的令牌
+        return CSRF_PLACEHOLDER
     token = session.get('_csrf_token')
     if not token:
         token = secrets.token_urlsafe(32)
@@ -2116,6 +3101,7 @@ def login():
 def logout():
     session.pop('auth_ok', None)
     session.pop('unlocked_prompts', None)
+    revoke_edit_grant()
     flash('已退出登录', 'success')
     return redirect(url_for('index'))
 
@@ -2150,8 +3136,366 @@ def unlock_prompt(prompt_id):
     return render_template('auth.html', mode=mode, action='unlock', prompt=prompt, next=nxt)
 
 
-def run():
+@app.cli.command('repack-versions')
+def repack_versions_command():
+    """Delta-encode version history that was stored before delta storage."""
     ensure_db()
+    conn = get_db()
+    try:
+        policy = storage_policy(conn)
+        total = 0
+        for row in conn.execute("SELECT id FROM prompts ORDER BY id").fetchall():
+            total += version_store.repack_prompt(conn, row['id'], policy)
+            conn.commit()
+        print(f"Repacked {total} versions")
+    finally:
+        conn.close()
+
+
+def recompress_history(batch_size=200, pause=0.05):
+    """Re-encode stored version payloads with the configured codec, batch by batch."""
+    conn = get_db()
+    total = 0
+    try:
+        policy = storage_policy(conn)
+        last_id = 0
+        while last_id is not None:
+            conn.execute("BEGIN IMMEDIATE")
+            last_id, rewritten = version_store.recompress_versions(conn, policy, last_id, batch_size)
+            conn.commit()
+            total += rewritten
+            if pause:
+                time.sleep(pause)
+        last_hash = ''
+        while last_hash is not None:
+            conn.execute("BEGIN IMMEDIATE")
+            last_hash, rewritten = version_store.recompress_blobs(conn, policy, last_hash, batch_size)
+            conn.commit()
+            total += rewritten
+            if pause:
+                time.sleep(pause)
+    except Exception:
+        conn.rollback()
+        logger.exception("Version recompression stopped")
+    finally:
+        conn.close()
+    return total
+
+
+_recompression_started = False
+
+
+def start_background_recompression():
+    """Run recompress_history() once per process in a daemon thread."""
+    global _recompression_started
+    if _recompression_started:
+        return
+    _recompression_started = True
+    threading.Thread(target=recompress_history, name='recompress-versions', daemon=True).start()
+
+
+@app.cli.command('recompress-versions')
+def recompress_versions_command():
+    """Compress (or decompress) stored version history to match settings."""
+    ensure_db()
+    print(f"Recompressed {recompress_history(pause=0)} versions")
+
+
+def backfill_diff_stats_history(batch_size=200, pause=0.05):
+    """Compute diff statistics for versions saved before they were recorded."""
+    conn = get_db()
+    total = 0
+    try:
+        last_id = 0
+        while last_id is not None:
+            conn.execute("BEGIN IMMEDIATE")
+            last_id, filled = version_store.backfill_diff_stats(conn, last_id, batch_size)
+            if filled:
+                # 历史页会显示改动统计，补算后旧的页面缓存需要失效
+                bump_data_generation(conn)
+            conn.commit()
+            total += filled
+            if pause:
+                time.sleep(pause)
+    except Exception:
+        conn.rollback()
+        logger.exception("Diff statistics backfill stopped")
+    finally:
+        conn.close()
+    return total
+
+
+_diff_stats_backfill_started = False
+_search_backfill_started = False
+_lineage_backfill_started = False
+_blame_backfill_started = False
+
+
+def start_background_diff_stats_backfill():
+    """Run backfill_diff_stats_history() once per process in a daemon thread."""
+    global _diff_stats_backfill_started
+    if _diff_stats_backfill_started:
+        return
+    _diff_stats_backfill_started = True
+    threading.Thread(target=backfill_diff_stats_history, name='backfill-diff-stats', daemon=True).start()
+
+
+def backfill_search_index_history(batch_size=200, pause=0.05):
+    """Add versions saved before history search existed to the full-text index."""
+    conn = get_db()
+    total = 0
+    try:
+        last_id = 0
+        while last_id is not None:
+            conn.execute("BEGIN IMMEDIATE")
+            last_id, indexed = history_search.backfill(conn, last_id, batch_size)
+            conn.commit()
+            total += indexed
+            if pause:
+                time.sleep(pause)
+    except Exception:
+        conn.rollback()
+        logger.exception("History search backfill stopped")
+    finally:
+        conn.close()
+    return total
+
+
+def start_background_search_backfill():
+    """Run backfill_search_index_history() once per process in a daemon thread."""
+    global _search_backfill_started
+    if _search_backfill_started:
+        return
+    _search_backfill_started = True
+    threading.Thread(target=backfill_search_index_history, name='backfill-search-index', daemon=True).start()
+
+
+def backfill_lineage_history(batch_size=200, pause=0.05):
+    """Link versions saved before the lineage index existed into the closure table."""
+    conn = get_db()
+    total = 0
+    try:
+        last_id = 0
+        while last_id is not None:
+            conn.execute("BEGIN IMMEDIATE")
+            last_id, linked = lineage.backfill(conn, last_id, batch_size)
+            if linked:
+                # Diff 默认左侧取父版本，补建后旧的页面缓存需要失效
+                bump_data_generation(conn)
+            conn.commit()
+            total += linked
+            if pause:
+                time.sleep(pause)
+    except Exception:
+        conn.rollback()
+        logger.exception("Lineage backfill stopped")
+    finally:
+        conn.close()
+    return total
+
+
+def start_background_lineage_backfill():
+    """Run backfill_lineage_history() once per process in a daemon thread."""
+    global _lineage_backfill_started
+    if _lineage_backfill_started:
+        return
+    _lineage_backfill_started = True
+    threading.Thread(target=backfill_lineage_history, name='backfill-lineage', daemon=True).start()
+
+
+def backfill_blame_history(batch_size=200, pause=0.05):
+    """Store per-line blame for versions saved before the blame index existed."""
+    conn = get_db()
+    total = 0
+    try:
+        last_id = 0
+        while last_id is not None:
+            conn.execute("BEGIN IMMEDIATE")
+            last_id, stored = blame.backfill(conn, last_id, batch_size)
+            conn.commit()
+            total += stored
+            if pause:
+                time.sleep(pause)
+    except Exception:
+        conn.rollback()
+        logger.exception("Blame backfill stopped")
+    finally:
+        conn.close()
+    return total
+
+
+def start_background_blame_backfill():
+    """Run backfill_blame_history() once per process in a daemon thread."""
+    global _blame_backfill_started
+    if _blame_backfill_started:
+        return
+    _blame_backfill_started = True
+    threading.Thread(target=backfill_blame_history, name='backfill-blame', daemon=True).start()
+
+
+# 多进程部署时只由持锁的一个进程运行后台补算；其他进程在后台线程中等待，
+# 持锁进程退出（重启、回收）后由其中一个接手
+_background_jobs_lock = None
+_background_jobs_lock_guard = threading.Lock()
+
+
+def _run_background_jobs():
+    start_background_recompression()
+    start_background_diff_stats_backfill()
+    start_background_search_backfill()
+    start_background_lineage_backfill()
+    start_background_blame_backfill()
+
+
+def _wait_for_background_jobs(lock):
+    lock.acquire()
+    _run_background_jobs()
+
+
+def start_background_jobs():
+    """Start the background maintenance threads in one process of the deployment.
+
+    Returns True when this process runs them now; otherwise a daemon thread
+    waits to take over when the current holder exits.
+    """
+    global _background_jobs_lock
+    with _background_jobs_lock_guard:
+        if _background_jobs_lock is not None:
+            return _background_jobs_lock.held
+        _background_jobs_lock = ProcessLock(f'{DB_PATH}.jobs.lock')
+    if _background_jobs_lock.acquire(blocking=False):
+        _run_background_jobs()
+        return True
+    threading.Thread(
+        target=_wait_for_background_jobs, args=(_background_jobs_lock,),
+        name='background-jobs-standby', daemon=True,
+    ).start()
+    return False
+
+
+@app.cli.command('backfill-diff-stats')
+def backfill_diff_stats_command():
+    """Compute missing per-version diff statistics."""
+    ensure_db()
+    print(f"Computed diff statistics for {backfill_diff_stats_history(pause=0)} versions")
+
+
+@app.cli.command('index-history')
+def index_history_command():
+    """Add all stored versions to the full-text history search index."""
+    ensure_db()
+    print(f"Indexed {backfill_search_index_history(pause=0)} versions")
+
+
+@app.cli.command('index-lineage')
+def index_lineage_command():
+    """Link all stored versions into the lineage closure table."""
+    ensure_db()
+    print(f"Linked {backfill_lineage_history(pause=0)} versions")
+
+
+@app.cli.command('index-blame')
+def index_blame_command():
+    """Store per-line blame for all stored versions."""
+    ensure_db()
+    print(f"Stored blame for {backfill_blame_history(pause=0)} versions")
+
+
+@app.cli.command('precompress-static')
+def precompress_static_command():
+    """Write .br/.gz copies of static text assets (run at image build)."""
+    print(f"Precompressed {len(precompressed_static.prepare())} static files")
+
+
+@app.cli.command('build-asset-manifest')
+def build_asset_manifest_command():
+    """Build minified bundles and hash static files into ASSET_MANIFEST (run at image build)."""
+    target = os.environ.get('ASSET_MANIFEST') or os.path.join(app.root_path, 'asset-manifest.json')
+    built = assets.build_bundles(app.static_folder, force=True, out=STATIC_BUILD_DIR)
+    print(f"Built {len(built)} minified bundles")
+    files = asset_manifest.scan()
+    assets.write_manifest(target, files)
+    print(f"Wrote {len(files)} entries to {target}")
+
+
+def warm_up():
+    """Do the per-process start-up work before the first request arrives.
+
+    Migrates and opens the database, primes the settings cache, loads the
+    translation catalogs and static manifest, and compiles every template.
+    Returns the milliseconds spent on each step.
+    """
+    timings = {}
+
+    def step(name, func):
+        started = time.perf_counter()
+        func()
+        timings[name] = round((time.perf_counter() - started) * 1000, 2)
+
+    def compile_templates():
+        for name in app.jinja_env.list_templates():
+            app.jinja_env.get_template(name)
+
+    def load_catalogs():
+        for language in i18n.SUPPORTED_LANGUAGES:
+            i18n.catalog(language)
+
+    step('database', ensure_db)
+    step('settings', cached_settings)
+    step('translations', load_catalogs)
+    step('assets', asset_manifest.load)
+    step('precompressed', precompressed_static.prepare)
+    step('templates', compile_templates)
+    return timings
+
+
+# 启动基准的子进程脚本：每次都在全新的解释器中测量导入、预热与首个请求
+_STARTUP_BENCH_SCRIPT = """
+import json, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+steps = app.warm_up()
+warmed = time.perf_counter()
+app.app.test_client().get('/')
+served = time.perf_counter()
+print(json.dumps({
+    'import': (imported - started) * 1000,
+    'warm_up': (warmed - imported) * 1000,
+    'first_request': (served - warmed) * 1000,
+    'steps': steps,
+}))
+"""
+
+
+@app.cli.command('warm-up')
+def warm_up_command():
+    """Run the start-up warm-up once and print how long each step took."""
+    for name, ms in warm_up().items():
+        print(f"{name:>14}: {ms:8.2f} ms")
+
+
+@app.cli.command('bench-startup')
+@click.option('--runs', default=5, show_default=True, help='Fresh interpreters to start.')
+def bench_startup_command(runs):
+    """Measure cold import, warm-up and first-request time in fresh processes."""
+    results = []
+    for _ in range(max(1, runs)):
+        output = subprocess.run(
+            [sys.executable, '-c', _STARTUP_BENCH_SCRIPT],
+            cwd=app.root_path, env=os.environ.copy(),
+            check=True, capture_output=True, text=True,
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    for key in ('import', 'warm_up', 'first_request'):
+        values = sorted(r[key] for r in results)
+        print(f"{key:>14}: median {values[len(values) // 2]:8.2f} ms  min {values[0]:8.2f} ms  max {values[-1]:8.2f} ms")
+
+
+def run():
+    """Single-process server for local use; production serves with gunicorn.conf.py."""
+    warm_up()
+    start_background_jobs()
     app.run(host='0.0.0.0', port=3501, debug=_is_debug_env)
 
 
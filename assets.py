@@ -0,0 +1,373 @@
+"""Content-hashed manifest of the static directory.
+
+The manifest maps every static file (relative path) to a short SHA-256 of its
+bytes. It is built once per process, or read from a JSON file written at
+image build time, so templates can fingerprint asset URLs without touching
+the filesystem on each render. Content hashes survive rebuilt image layers
+and copied checkouts, where modification times do not.
+
+A URL whose ``v`` matches the current hash names immutable content and can
+be cached for a year; anything else must be revalidated.
+
+Page styles and scripts live as plain sources under ``static/css`` and
+``static/js``; ``build_bundles`` concatenates and minifies them into ``dist/``
+(``BUNDLES``) before the manifest is hashed. Whether a bundle is stale is
+decided by content, not modification time: ``dist/bundles.json`` records the
+hash of the sources each bundle was built from and of the bundle itself, and
+a bundle is rebuilt only when either no longer matches. Build output goes to
+the static directory unless a separate ``build_root`` is given, which keeps
+the source tree untouched (tests, read-only checkouts). The minifiers are
+deliberately conservative: they drop comments and layout whitespace but keep
+line breaks in JavaScript, so automatic semicolon insertion behaves exactly
+as in the source.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+
+
+MANIFEST_VERSION = 1
+HASH_LENGTH = 12
+# 预压缩副本与写入中的临时文件不单独编号
+SKIP_SUFFIXES = (".gz", ".br")
+
+
+# 打包产物的来源记录（相对静态目录），本身不进入静态资源清单
+BUNDLE_MANIFEST = "dist/bundles.json"
+PAGES = ("index", "prompt_detail", "versions", "settings", "diff", "blame", "history_search")
+BUNDLES = {
+    "dist/style.min.css": ["css/style.css"],
+    "dist/main.min.js": ["js/main.js"],
+    **{f"dist/{page}.min.css": [f"css/pages/{page}.css"] for page in PAGES},
+    **{f"dist/{page}.min.js": [f"js/pages/{page}.js"] for page in ("index", "prompt_detail", "versions", "settings")},
+}
+_REGEX_PRECEDERS = set("(,=:[!&|?{};+-*%<>~^")
+_REGEX_KEYWORDS = {
+    "return", "typeof", "case", "do", "else", "in", "of", "new", "delete",
+    "void", "throw", "instanceof", "yield", "await",
+}
+
+
+class ManifestError(ValueError):
+    """A persisted manifest could not be read or has the wrong format."""
+
+
+def _scan_string(text: str, start: int, quote: str) -> int:
+    """Index just past the string literal opened at ``start``."""
+    i = start + 1
+    while i < len(text):
+        if text[i] == "\\":
+            i += 2
+            continue
+        if text[i] == quote or (quote != "`" and text[i] == "\n"):
+            return i + 1
+        i += 1
+    return i
+
+
+def minify_css(text: str) -> str:
+    """Remove comments and redundant whitespace from a stylesheet."""
+    out = []
+    i = 0
+    while i < len(text):
+        ch = text[i]
+        if ch in "\"'":
+            end = _scan_string(text, i, ch)
+            out.append(text[i:end])
+            i = end
+        elif text.startswith("/*", i):
+            end = text.find("*/", i + 2)
+            i = len(text) if end < 0 else end + 2
+        elif ch.isspace():
+            while i < len(text) and text[i].isspace():
+                i += 1
+            prev = out[-1][-1:] if out else ""
+            nxt = text[i:i + 1]
+            # 选择器中的后代空格（如 ".a :hover"）有意义，只去掉符号两侧的
+            if prev and prev not in "{};,>:" and nxt not in "{};,>" and nxt:
+                out.append(" ")
+        else:
+            if ch == "}" and out and out[-1] == ";":
+                out.pop()
+            out.append(ch)
+            i += 1
+    return "".join(out).strip() + "\n"
+
+
+def minify_js(text: str) -> str:
+    """Remove comments, indentation and blank lines from a script.
+
+    Strings, template literals (including ``${}`` code) and regular
+    expression literals are copied verbatim; line breaks are kept.
+    """
+    out = []
+    # 模板字符串中 ${...} 的花括号深度栈
+    templates = []
+    last = ""
+    i = 0
+    n = len(text)
+
+    def emit(chunk):
+        nonlocal last
+        out.append(chunk)
+        stripped = chunk.strip()
+        if stripped:
+            last = stripped
+
+    while i < n:
+        ch = text[i]
+        if ch == "`" or (ch == "}" and templates and templates[-1] == 0):
+            if ch == "}":
+                templates.pop()
+            start = i
+            i += 1
+            while i < n:
+                if text[i] == "\\":
+                    i += 2
+                elif text[i] == "`":
+                    i += 1
+                    break
+                elif text.startswith("${", i):
+                    templates.append(0)
+                    i += 2
+                    break
+                else:
+                    i += 1
+            emit(text[start:i])
+        elif ch in "\"'":
+            end = _scan_string(text, i, ch)
+            emit(text[i:end])
+            i = end
+        elif text.startswith("//", i):
+            while i < n and text[i] != "\n":
+                i += 1
+        elif text.startswith("/*", i):
+            end = text.find("*/", i + 2)
+            i = n if end < 0 else end + 2
+            if out and not out[-1].endswith((" ", "\n")):
+                out.append(" ")
+        elif ch == "/" and (not last or last[-1] in _REGEX_PRECEDERS or last.split()[-1] in _REGEX_KEYWORDS):
+            start = i
+            i += 1
+            in_class = False
+            while i < n and text[i] != "\n":
+                if text[i] == "\\":
+                    i += 2
+                    continue
+                if text[i] == "[":
+                    in_class = True
+                elif text[i] == "]":
+                    in_class = False
+                elif text[i] == "/" and not in_class:
+                    i += 1
+                    break
+                i += 1
+            while i < n and (text[i].isalnum() or text[i] == "_"):
+                i += 1
+            emit(text[start:i])
+        elif ch.isspace():
+            newline = False
+            while i < n and text[i].isspace():
+                newline = newline or text[i] == "\n"
+                i += 1
+            while out and out[-1] == " ":
+                out.pop()
+            if not out or out[-1].endswith("\n"):
+                continue
+            out.append("\n" if newline else " ")
+        else:
+            if templates and ch == "{":
+                templates[-1] += 1
+            elif templates and ch == "}":
+                templates[-1] -= 1
+            start = i
+            if ch.isalnum() or ch in "_$":
+                while i < n and (text[i].isalnum() or text[i] in "_$"):
+                    i += 1
+                emit(text[start:i])
+                # 关键字后可能是正则字面量
+                last = text[start:i]
+            else:
+                i += 1
+                emit(ch)
+    return "".join(out).strip() + "\n"
+
+
+def _sources_hash(root: str, sources: list) -> str:
+    digest = hashlib.sha256()
+    for source in sources:
+        with open(os.path.join(root, *source.split("/")), "rb") as handle:
+            data = handle.read()
+        digest.update(f"{source}\0{len(data)}\0".encode("utf-8"))
+        digest.update(data)
+    return digest.hexdigest()[:HASH_LENGTH]
+
+
+def build_bundles(root: str, bundles: dict = BUNDLES, force: bool = False, out: str | None = None) -> list:
+    """Write every stale bundle below ``out`` (default ``root``); returns the names written.
+
+    Sources are read from ``root``. A bundle is stale when the content hash
+    of its sources or of the bundle file differs from what
+    ``BUNDLE_MANIFEST`` recorded when it was built.
+    """
+    out = out or root
+    record_path = os.path.join(out, *BUNDLE_MANIFEST.split("/"))
+    try:
+        recorded = read_manifest(record_path)
+    except ManifestError:
+        recorded = {}
+    written = []
+    for name, sources in bundles.items():
+        target = os.path.join(out, *name.split("/"))
+        try:
+            sources_hash = _sources_hash(root, sources)
+        except OSError:
+            continue
+        entry = recorded.get(name)
+        if not force and isinstance(entry, dict) and entry.get("sources") == sources_hash:
+            try:
+                if file_hash(target) == entry.get("output"):
+                    continue
+            except OSError:
+                pass
+        parts = []
+        for source in sources:
+            with open(os.path.join(root, *source.split("/")), "r", encoding="utf-8") as handle:
+                parts.append(handle.read())
+        minify = minify_css if name.endswith(".css") else minify_js
+        content = "".join(minify(part) for part in parts)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp = f"{target}.tmp{os.getpid()}"
+        with open(tmp, "w", encoding="utf-8") as handle:
+            handle.write(content)
+        os.replace(tmp, target)
+        recorded[name] = {"sources": sources_hash, "output": data_hash(content.encode("utf-8"))}
+        written.append(name)
+    if written:
+        os.makedirs(os.path.dirname(record_path), exist_ok=True)
+        write_manifest(record_path, recorded)
+    return written
+
+
+def data_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(65536), b""):
+            digest.update(block)
+    return digest.hexdigest()[:HASH_LENGTH]
+
+
+def build_manifest(root: str) -> dict:
+    """Hash every file below ``root``; returns {relative path: hash}."""
+    files = {}
+    for folder, _, names in os.walk(root):
+        for name in names:
+            if name.endswith(SKIP_SUFFIXES) or ".tmp" in name:
+                continue
+            path = os.path.join(folder, name)
+            relative = os.path.relpath(path, root).replace(os.sep, "/")
+            if relative == BUNDLE_MANIFEST:
+                continue
+            try:
+                files[relative] = file_hash(path)
+            except OSError:
+                continue
+    return files
+
+
+def write_manifest(path: str, files: dict) -> None:
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as handle:
+        json.dump({"version": MANIFEST_VERSION, "files": files}, handle, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def read_manifest(path: str) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as handle:
+            data = json.load(handle)
+    except (OSError, ValueError) as exc:
+        raise ManifestError(str(exc)) from exc
+    if not isinstance(data, dict) or data.get("version") != MANIFEST_VERSION or not isinstance(data.get("files"), dict):
+        raise ManifestError("unsupported manifest format")
+    return data["files"]
+
+
+class AssetManifest:
+    """Lazily built, thread-safe view of the static manifest.
+
+    With ``manifest_path`` the persisted build-time manifest is used when it
+    can be read; otherwise stale ``bundles`` are rebuilt and the tree is
+    hashed on first use. ``live=True`` (debug mode) rebuilds and re-hashes on
+    every lookup so edits show up without restart. Bundles are written to and
+    served from ``build_root`` (default: ``root``).
+    """
+
+    def __init__(self, root: str, manifest_path: str | None = None, live: bool = False, bundles: dict | None = None,
+                 build_root: str | None = None):
+        self.root = root
+        self.build_root = build_root or root
+        self.manifest_path = manifest_path
+        self.live = live
+        self.bundles = bundles or {}
+        self._files: dict | None = None
+        self._lock = threading.Lock()
+
+    def _build_bundles(self, bundles: dict) -> None:
+        try:
+            build_bundles(self.root, bundles, out=self.build_root)
+        except OSError:
+            # 只读目录等情况：沿用已有的构建产物
+            pass
+
+    def load(self) -> dict:
+        with self._lock:
+            if self._files is None:
+                files = None
+                if self.manifest_path:
+                    try:
+                        files = read_manifest(self.manifest_path)
+                    except ManifestError:
+                        files = None
+                if files is None:
+                    self._build_bundles(self.bundles)
+                    files = self.scan()
+                self._files = files
+            return self._files
+
+    def scan(self) -> dict:
+        """Hash the source tree and the build output; built files win."""
+        files = build_manifest(self.root)
+        if os.path.abspath(self.build_root) != os.path.abspath(self.root):
+            files.update(build_manifest(self.build_root))
+        return files
+
+    def directory(self, filename: str) -> str:
+        """Folder a static file is served from: the build output for bundles."""
+        return self.build_root if filename in self.bundles else self.root
+
+    def reset(self) -> None:
+        with self._lock:
+            self._files = None
+
+    def version(self, filename: str) -> str | None:
+        """Content hash for a static file, or None if it does not exist."""
+        if self.live:
+            if filename in self.bundles:
+                self._build_bundles({filename: self.bundles[filename]})
+            try:
+                return file_hash(os.path.join(self.directory(filename), *filename.split("/")))
+            except OSError:
+                return None
+        return self.load().get(filename)
+
+    def is_current(self, filename: str, version: str | None) -> bool:
+        return bool(version) and version == self.version(filename)
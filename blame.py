@@ -0,0 +1,157 @@
+"""Per-line blame index for prompt versions.
+
+Every stored version keeps, for each line of its content, the id of the
+version that introduced that line. The index is built incrementally: a new
+version carries its parent's attribution forward through a line diff and
+marks every inserted or rewritten line as its own. Attributions are stored
+run-length encoded (``[[origin_id, line_count], ...]``) in ``version_blame``,
+so looking up the blame of any version is a single row read.
+
+Versions written before the index existed are stored by ``backfill`` from a
+background job. Until then ``blame_for`` computes their blame in memory by
+walking back to the nearest ancestor that has an entry (or to the root) and
+replaying the chain forward; it never writes, so requests stay read-only.
+"""
+
+from __future__ import annotations
+
+import json
+
+import diff_engine
+import version_store
+
+
+def encode_runs(origins) -> str:
+    runs = []
+    for origin in origins:
+        if runs and runs[-1][0] == origin:
+            runs[-1][1] += 1
+        else:
+            runs.append([origin, 1])
+    return json.dumps(runs, separators=(",", ":"))
+
+
+def decode_runs(text: str) -> list[int]:
+    origins = []
+    for origin, count in json.loads(text):
+        origins.extend([origin] * count)
+    return origins
+
+
+def carry_forward(parent_origins, parent_content: str, content: str, version_id: int,
+                  budget_seconds: float | None = diff_engine.DEFAULT_TIME_BUDGET) -> list[int]:
+    """Attribute each line of ``content`` given its parent's attribution.
+
+    If the diff budget runs out the alignment degrades to the common prefix
+    and suffix, so lines in between are attributed to ``version_id``.
+    """
+    lines = content.splitlines()
+    parent_lines = parent_content.splitlines() if parent_content is not None else []
+    if parent_origins is None or len(parent_origins) != len(parent_lines):
+        return [version_id] * len(lines)
+    origins = []
+    for tag, i1, i2, j1, j2 in diff_engine.line_opcodes(parent_lines, lines, budget_seconds):
+        if tag == "equal":
+            origins.extend(parent_origins[i1:i2])
+        else:
+            origins.extend([version_id] * (j2 - j1))
+    return origins
+
+
+def _stored(conn, version_id):
+    row = conn.execute("SELECT runs FROM version_blame WHERE version_id=?", (version_id,)).fetchone()
+    return decode_runs(row["runs"]) if row else None
+
+
+def _store(conn, version_id, prompt_id, origins) -> None:
+    conn.execute(
+        "INSERT OR REPLACE INTO version_blame(version_id, prompt_id, runs) VALUES(?,?,?)",
+        (version_id, prompt_id, encode_runs(origins)),
+    )
+
+
+def record_version(conn, version_id, prompt_id, content: str, parent_version_id=None,
+                   parent_content: str | None = None) -> list[int]:
+    """Compute and store the blame of a freshly inserted version."""
+    parent_origins = None
+    if parent_version_id:
+        if parent_content is None:
+            parent_content = version_store.load_content(conn, parent_version_id)
+        if parent_content is not None:
+            parent_origins = blame_for(conn, parent_version_id)
+    origins = carry_forward(parent_origins, parent_content, content, version_id)
+    _store(conn, version_id, prompt_id, origins)
+    return origins
+
+
+def _replay(conn, version_id):
+    """[(row, origins)] from the nearest stored ancestor down to ``version_id``."""
+    origins = _stored(conn, version_id)
+    if origins is not None:
+        return []
+    # Walk back to the nearest ancestor with an entry, then replay forward.
+    chain = []
+    seen = set()
+    current = version_id
+    origins = None
+    while current and current not in seen:
+        seen.add(current)
+        row = conn.execute(
+            "SELECT id, prompt_id, parent_version_id FROM versions WHERE id=?", (current,)
+        ).fetchone()
+        if row is None:
+            break
+        chain.append(row)
+        current = row["parent_version_id"]
+        if current:
+            origins = _stored(conn, current)
+            if origins is not None:
+                break
+    replayed = []
+    parent_content = version_store.load_content(conn, current) if origins is not None else None
+    for row in reversed(chain):
+        content = version_store.load_content(conn, row["id"])
+        origins = carry_forward(origins, parent_content, content, row["id"])
+        replayed.append((row, origins))
+        parent_content = content
+    return replayed
+
+
+def blame_for(conn, version_id) -> list[int] | None:
+    """Line origins of a version; None if unknown. Never writes."""
+    origins = _stored(conn, version_id)
+    if origins is not None:
+        return origins
+    replayed = _replay(conn, version_id)
+    return replayed[-1][1] if replayed else None
+
+
+def backfill(conn, after_id: int = 0, batch_size: int = 200):
+    """Store blame for one batch of versions above ``after_id``; returns (last_id or None, stored).
+
+    Batches run in id order, so a version's parent normally has its entry
+    already and each version costs one line diff.
+    """
+    rows = conn.execute(
+        "SELECT id FROM versions WHERE id > ? ORDER BY id LIMIT ?",
+        (after_id, batch_size),
+    ).fetchall()
+    stored = 0
+    for row in rows:
+        for version, origins in _replay(conn, row["id"]):
+            _store(conn, version["id"], version["prompt_id"], origins)
+            stored += 1
+    if len(rows) < batch_size:
+        return None, stored
+    return rows[-1]["id"], stored
+
+
+def forget(conn, version_ids) -> None:
+    """Drop the index entries of removed versions."""
+    ids = list(version_ids)
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        conn.execute(
+            f"DELETE FROM version_blame WHERE version_id IN ({','.join('?' * len(chunk))})",
+            chunk,
+        )
@@ -0,0 +1,342 @@
+"""gzip/brotli response compression and precompressed static files.
+
+``CompressionMiddleware`` wraps the WSGI app and encodes text responses
+(HTML, CSS, JS, JSON, SVG) for clients that accept it. Responses with a known
+length below ``min_size`` are left alone; responses without a length (streamed
+exports, generators) are compressed chunk by chunk and flushed after every
+chunk so progress still reaches the client. A compressed response gets a weak
+ETag, which still matches the strong one on revalidation.
+
+Static files are compressed once into ``.gz``/``.br`` siblings by
+``PrecompressedStatic.prepare()`` (at image build, startup or the first static
+request) and served as-is, so the hot path does no compression work. Each
+copy is named after the content hash of the bytes it was made from
+(``style.css.<hash>.gz``) and only used while that hash matches the source,
+so an edited file can never be answered with an older compressed body.
+
+brotli is optional: without the ``brotli`` package only gzip is offered.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import zlib
+
+from assets import data_hash, file_hash
+
+try:
+    import brotli
+except ImportError:  # 可选依赖：未安装时只提供 gzip
+    brotli = None
+
+
+COMPRESS_MIN_SIZE = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+BROTLI_STATIC_QUALITY = 11
+
+COMPRESSIBLE_TYPES = {
+    "application/javascript",
+    "application/json",
+    "application/xml",
+    "image/svg+xml",
+    "text/css",
+    "text/csv",
+    "text/html",
+    "text/javascript",
+    "text/plain",
+    "text/xml",
+}
+STATIC_EXTENSIONS = {".css", ".js", ".json", ".svg", ".txt", ".html"}
+SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+
+def supported_encodings() -> tuple:
+    """Encodings this process can produce, in order of preference."""
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate(accept_encoding: str, available=None):
+    """Pick the best encoding from an Accept-Encoding header, or None."""
+    available = tuple(available if available is not None else supported_encodings())
+    weights = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        weights[name] = quality
+    best = None
+    for index, encoding in enumerate(available):
+        quality = weights.get(encoding, weights.get("*", 0.0))
+        if quality <= 0:
+            continue
+        # 权重相同时按服务端偏好（br 优先）
+        rank = (quality, -index)
+        if best is None or rank > best[0]:
+            best = (rank, encoding)
+    return best[1] if best else None
+
+
+def is_compressible(content_type: str) -> bool:
+    mimetype = (content_type or "").split(";")[0].strip().lower()
+    return mimetype in COMPRESSIBLE_TYPES
+
+
+class _Encoder:
+    def __init__(self, encoding: str, flush_chunks: bool):
+        self.flush_chunks = flush_chunks
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=BROTLI_QUALITY)
+            self._zlib = None
+        else:
+            self._brotli = None
+            self._zlib = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, chunk: bytes) -> bytes:
+        if self._brotli is not None:
+            data = self._brotli.process(chunk)
+            return data + self._brotli.flush() if self.flush_chunks else data
+        data = self._zlib.compress(chunk)
+        return data + self._zlib.flush(zlib.Z_SYNC_FLUSH) if self.flush_chunks else data
+
+    def finish(self) -> bytes:
+        if self._brotli is not None:
+            return self._brotli.finish()
+        return self._zlib.flush()
+
+
+def compress_bytes(data: bytes, encoding: str, static: bool = False) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_STATIC_QUALITY if static else BROTLI_QUALITY)
+    compressor = zlib.compressobj(9 if static else GZIP_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+def _header(headers, name):
+    name = name.lower()
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+def _vary_on_encoding(headers) -> list:
+    vary = _header(headers, "Vary")
+    if vary is None:
+        return list(headers) + [("Vary", "Accept-Encoding")]
+    if "accept-encoding" in vary.lower():
+        return list(headers)
+    return [(k, f"{v}, Accept-Encoding" if k.lower() == "vary" else v) for k, v in headers]
+
+
+class CompressionMiddleware:
+    """WSGI middleware that compresses eligible responses on the fly."""
+
+    def __init__(self, app, min_size: int = COMPRESS_MIN_SIZE):
+        self.app = app
+        self.min_size = min_size
+
+    def _should_compress(self, status: str, headers) -> bool:
+        if not status.startswith("200"):
+            return False
+        if _header(headers, "Content-Encoding") or not is_compressible(_header(headers, "Content-Type")):
+            return False
+        if "no-transform" in (_header(headers, "Cache-Control") or ""):
+            return False
+        length = _header(headers, "Content-Length")
+        return length is None or not length.isdigit() or int(length) >= self.min_size
+
+    def __call__(self, environ, start_response):
+        encoding = None
+        if environ.get("REQUEST_METHOD") != "HEAD":
+            encoding = negotiate(environ.get("HTTP_ACCEPT_ENCODING", ""))
+        if encoding is None:
+            return self.app(environ, start_response)
+        state = {"encoder": None, "started": False}
+
+        def compressing_start_response(status, headers, exc_info=None):
+            state["started"] = True
+            if self._should_compress(status, headers):
+                streamed = _header(headers, "Content-Length") is None
+                kept = []
+                for key, value in headers:
+                    if key.lower() == "content-length":
+                        continue
+                    if key.lower() == "etag" and not value.startswith("W/"):
+                        value = "W/" + value
+                    kept.append((key, value))
+                kept.append(("Content-Encoding", encoding))
+                state["encoder"] = _Encoder(encoding, flush_chunks=streamed)
+                headers = kept
+            if is_compressible(_header(headers, "Content-Type")):
+                headers = _vary_on_encoding(headers)
+            write = start_response(status, headers, exc_info)
+            encoder = state["encoder"]
+            if encoder is None:
+                return write
+            return lambda data: write(encoder.compress(data))
+
+        body = self.app(environ, compressing_start_response)
+        if state["started"] and state["encoder"] is None:
+            # 不压缩时原样返回，保留 wsgi.file_wrapper 等服务器优化
+            return body
+        return self._iterate(body, state)
+
+    @staticmethod
+    def _iterate(body, state):
+        try:
+            for chunk in body:
+                encoder = state["encoder"]
+                if encoder is None:
+                    yield chunk
+                    continue
+                data = encoder.compress(chunk)
+                if data:
+                    yield data
+            encoder = state["encoder"]
+            if encoder is not None:
+                tail = encoder.finish()
+                if tail:
+                    yield tail
+        finally:
+            close = getattr(body, "close", None)
+            if close is not None:
+                close()
+
+
+class PrecompressedStatic:
+    """Content-hashed ``.gz``/``.br`` copies of static text files.
+
+    ``hashes`` returns the static manifest ({relative path: content hash});
+    only files listed there are compressed, and a file whose bytes no longer
+    match its entry gets no copy, because its fingerprinted URL would promise
+    different content. Sources are read from ``root`` and then ``build_root``
+    (bundles), and the copies are written below ``build_root`` (default:
+    ``root``). ``live=True`` (debug mode) re-hashes the source on every
+    lookup, so edited files are served uncompressed instead of stale.
+    """
+
+    def __init__(self, root: str, min_size: int = COMPRESS_MIN_SIZE, live: bool = False, hashes=None,
+                 build_root: str | None = None):
+        self.root = root
+        self.build_root = build_root or root
+        self.min_size = min_size
+        self.live = live
+        self.hashes = hashes
+        self._variants: dict | None = None
+        self._sources: dict = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _variant_name(name: str, digest: str, encoding: str) -> str:
+        return f"{name}.{digest}{SUFFIXES[encoding]}"
+
+    def _compress_file(self, path: str, relative: str, expected: str | None, listings: dict):
+        with open(path, "rb") as handle:
+            data = handle.read()
+        digest = data_hash(data)
+        folder = os.path.join(self.build_root, *relative.split("/")[:-1])
+        name = relative.rsplit("/", 1)[-1]
+        if folder not in listings:
+            try:
+                listings[folder] = set(os.listdir(folder))
+            except OSError:
+                listings[folder] = set()
+        siblings = listings[folder]
+        built = set()
+        keep = set()
+        if expected is None or expected == digest:
+            for encoding in supported_encodings():
+                variant = self._variant_name(name, digest, encoding)
+                target = os.path.join(folder, variant)
+                if variant in siblings:
+                    built.add(encoding)
+                    keep.add(variant)
+                    continue
+                encoded = compress_bytes(data, encoding, static=True)
+                if len(encoded) >= len(data):
+                    continue
+                try:
+                    os.makedirs(folder, exist_ok=True)
+                    tmp = f"{target}.tmp{os.getpid()}"
+                    with open(tmp, "wb") as handle:
+                        handle.write(encoded)
+                    os.replace(tmp, target)
+                except OSError:
+                    # 只读文件系统等情况：放弃预压缩，交给中间件实时压缩
+                    continue
+                siblings.add(variant)
+                built.add(encoding)
+                keep.add(variant)
+        # 旧内容的副本（含未带哈希的旧式命名）不再使用，顺手清理
+        for sibling in list(siblings):
+            if sibling.startswith(name + ".") and sibling.endswith(tuple(SUFFIXES.values())) and sibling not in keep:
+                try:
+                    os.remove(os.path.join(folder, sibling))
+                    siblings.discard(sibling)
+                except OSError:
+                    pass
+        return digest, built
+
+    def prepare(self) -> dict:
+        """Build missing variants; returns {relative path: (content hash, encodings)}."""
+        with self._lock:
+            if self._variants is not None:
+                return self._variants
+            manifest = self.hashes() if self.hashes is not None else None
+            roots = [self.root]
+            if os.path.abspath(self.build_root) != os.path.abspath(self.root):
+                roots.append(self.build_root)
+            variants = {}
+            sources = {}
+            listings: dict = {}
+            for root in roots:
+                for folder, _, files in os.walk(root):
+                    for name in files:
+                        if os.path.splitext(name)[1].lower() not in STATIC_EXTENSIONS:
+                            continue
+                        path = os.path.join(folder, name)
+                        relative = os.path.relpath(path, root).replace(os.sep, "/")
+                        if manifest is not None and relative not in manifest:
+                            continue
+                        try:
+                            if os.path.getsize(path) < self.min_size:
+                                continue
+                            expected = manifest[relative] if manifest is not None else None
+                            digest, built = self._compress_file(path, relative, expected, listings)
+                        except OSError:
+                            continue
+                        if built:
+                            variants[relative] = (digest, built)
+                            sources[relative] = path
+                        else:
+                            variants.pop(relative, None)
+            self._sources = sources
+            self._variants = variants
+            return variants
+
+    def lookup(self, filename: str, accept_encoding: str):
+        """Return (encoding, variant path below ``build_root``) or (None, filename)."""
+        digest, available = self.prepare().get(filename) or (None, ())
+        if not available:
+            return None, filename
+        encoding = negotiate(accept_encoding, [e for e in supported_encodings() if e in available])
+        if encoding is None:
+            return None, filename
+        if self.live:
+            try:
+                if file_hash(self._sources[filename]) != digest:
+                    return None, filename
+            except (KeyError, OSError):
+                return None, filename
+        return encoding, self._variant_name(filename, digest, encoding)
@@ -1,4 +1,8 @@
-"""Secure cover-image normalization and filesystem storage helpers."""
+"""Secure cover-image normalization and filesystem storage helpers.
+
+Pillow is imported on first use, so processes that never touch a cover
+(workers serving pages, CLI maintenance commands) do not pay for loading it.
+"""
 
 from __future__ import annotations
 
@@ -10,8 +14,10 @@ import uuid
 from dataclasses import dataclass
 from io import BytesIO
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-from PIL import Image, ImageOps, UnidentifiedImageError
+if TYPE_CHECKING:
+    from PIL import Image
 
 
 MAX_IMAGE_SIZE = 5 * 1024 * 1024
@@ -34,7 +40,15 @@ class CoverAsset:
     height: int
 
 
+def _pil():
+    """Import Pillow lazily; returns (Image, ImageOps, UnidentifiedImageError)."""
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    return Image, ImageOps, UnidentifiedImageError
+
+
 def _save_image(image: Image.Image, image_format: str) -> tuple[bytes, str, str]:
+    Image, _, _ = _pil()
     output = BytesIO()
     if image_format == "JPEG":
         if image.mode not in ("RGB", "L"):
@@ -64,6 +78,7 @@ def normalize_cover(raw: bytes) -> CoverAsset:
     if len(raw) > MAX_IMAGE_SIZE:
         raise CoverImageError("图片上传失败：文件大小不能超过 5MB")
 
+    Image, ImageOps, UnidentifiedImageError = _pil()
     try:
         with Image.open(BytesIO(raw)) as opened:
             image_format = (opened.format or "").upper()
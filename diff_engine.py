@@ -0,0 +1,386 @@
+"""Version diffs: line alignment, word highlighting, serialization and caching.
+
+Lines are interned to integers and aligned with patience diff: lines that
+occur exactly once on both sides anchor the alignment (longest increasing
+run), the gaps between anchors are handled the same way, and only small
+anchor-free gaps fall back to difflib. Changed line pairs are then refined
+to word level. All work runs under a per-diff CPU budget; once it is spent
+the remaining changes are shown line by line instead of word by word.
+Long unchanged stretches collapse into hunks that the page expands on
+demand. Results are serialized as compact JSON rows and rendered in the
+browser.
+
+Versions never change once written, so a diff is fully determined by
+the two contents and the diff mode. Serialized output is cached keyed by the
+versions' content hashes (ids can be reused after an import) and bounded by
+the total size of the cached output rather than by entry count.
+"""
+
+from __future__ import annotations
+
+import bisect
+import difflib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+
+DIFF_CACHE_MAX_CHARS = 16 * 1024 * 1024
+DEFAULT_TIME_BUDGET = 0.5
+CONTEXT_LINES = 3
+# Unchanged runs shorter than this stay expanded.
+MIN_COLLAPSE_LINES = 8
+# Largest anchor-free gap (lines x lines) handed to difflib.
+MAX_FALLBACK_CELLS = 250_000
+# Largest changed line pair (tokens x tokens) refined to word level.
+MAX_TOKEN_CELLS = 100_000
+MODES = ("word", "line")
+_TOKEN_RE = re.compile(r"\w+|\s+|[^\w\s]", re.UNICODE)
+
+
+class DiffBudgetExceeded(Exception):
+    """The CPU budget of one diff ran out."""
+
+
+class _Budget:
+    def __init__(self, seconds: float | None):
+        self.deadline = None if seconds is None else time.thread_time() + seconds
+        self.exhausted = False
+
+    def spent(self) -> bool:
+        if not self.exhausted and self.deadline is not None and time.thread_time() > self.deadline:
+            self.exhausted = True
+        return self.exhausted
+
+    def check(self) -> None:
+        if self.spent():
+            raise DiffBudgetExceeded()
+
+
+def _intern(a_lines, b_lines):
+    ids: dict = {}
+    a = [ids.setdefault(line, len(ids)) for line in a_lines]
+    b = [ids.setdefault(line, len(ids)) for line in b_lines]
+    return a, b
+
+
+def _unique_anchors(a, alo, ahi, b, blo, bhi):
+    """Pairs of lines unique on both sides, reduced to their longest increasing run."""
+    counts: dict = {}
+    for i in range(alo, ahi):
+        entry = counts.get(a[i])
+        counts[a[i]] = [1, i, None] if entry is None else [entry[0] + 1, i, None]
+    for j in range(blo, bhi):
+        entry = counts.get(b[j])
+        if entry is None or entry[0] != 1:
+            continue
+        entry[2] = j if entry[2] is None else -1
+    pairs = [(entry[1], entry[2]) for entry in counts.values() if entry[0] == 1 and entry[2] not in (None, -1)]
+    if not pairs:
+        return []
+    pairs.sort()
+    # Patience sorting over b positions.
+    tails: list = []
+    tail_idx: list = []
+    prev = [None] * len(pairs)
+    for k, (_, j) in enumerate(pairs):
+        pos = bisect.bisect_left(tails, j)
+        if pos == len(tails):
+            tails.append(j)
+            tail_idx.append(k)
+        else:
+            tails[pos] = j
+            tail_idx[pos] = k
+        prev[k] = tail_idx[pos - 1] if pos else None
+    run = []
+    k = tail_idx[-1]
+    while k is not None:
+        run.append(pairs[k])
+        k = prev[k]
+    run.reverse()
+    return run
+
+
+def _matching_lines(a, b, budget: _Budget):
+    matches = []
+    stack = [(0, len(a), 0, len(b))]
+    while stack:
+        budget.check()
+        alo, ahi, blo, bhi = stack.pop()
+        while alo < ahi and blo < bhi and a[alo] == b[blo]:
+            matches.append((alo, blo))
+            alo += 1
+            blo += 1
+        while alo < ahi and blo < bhi and a[ahi - 1] == b[bhi - 1]:
+            ahi -= 1
+            bhi -= 1
+            matches.append((ahi, bhi))
+        if alo == ahi or blo == bhi:
+            continue
+        anchors = _unique_anchors(a, alo, ahi, b, blo, bhi)
+        if anchors:
+            prev_a, prev_b = alo, blo
+            for i, j in anchors:
+                stack.append((prev_a, i, prev_b, j))
+                matches.append((i, j))
+                prev_a, prev_b = i + 1, j + 1
+            stack.append((prev_a, ahi, prev_b, bhi))
+        elif (ahi - alo) * (bhi - blo) <= MAX_FALLBACK_CELLS:
+            matcher = difflib.SequenceMatcher(None, a[alo:ahi], b[blo:bhi], autojunk=False)
+            for i, j, size in matcher.get_matching_blocks():
+                matches.extend((alo + i + k, blo + j + k) for k in range(size))
+        # Otherwise the gap is reported as one replaced block.
+    matches.sort()
+    return matches
+
+
+def _opcodes(matches, n, m):
+    ops = []
+    i = j = 0
+    for mi, mj in matches + [(n, m)]:
+        if mi > i and mj > j:
+            ops.append(("replace", i, mi, j, mj))
+        elif mi > i:
+            ops.append(("delete", i, mi, j, j))
+        elif mj > j:
+            ops.append(("insert", i, i, j, mj))
+        if mi < n:
+            if ops and ops[-1][0] == "equal" and ops[-1][2] == mi:
+                _, i1, _, j1, _ = ops.pop()
+                ops.append(("equal", i1, mi + 1, j1, mj + 1))
+            else:
+                ops.append(("equal", mi, mi + 1, mj, mj + 1))
+        i, j = mi + 1, mj + 1
+    return ops
+
+
+def line_opcodes(a_lines, b_lines, budget_seconds: float | None = DEFAULT_TIME_BUDGET):
+    """difflib-style opcodes aligning two lists of lines.
+
+    If the budget runs out, only the common prefix and suffix are matched and
+    everything between them is one replaced block.
+    """
+    return _line_opcodes(a_lines, b_lines, _Budget(budget_seconds))
+
+
+def _line_opcodes(a_lines, b_lines, budget: _Budget):
+    a, b = _intern(a_lines, b_lines)
+    try:
+        matches = _matching_lines(a, b, budget)
+    except DiffBudgetExceeded:
+        matches = []
+        n, m = len(a), len(b)
+        lo = 0
+        while lo < n and lo < m and a[lo] == b[lo]:
+            matches.append((lo, lo))
+            lo += 1
+        hi = 0
+        while hi < n - lo and hi < m - lo and a[n - 1 - hi] == b[m - 1 - hi]:
+            hi += 1
+            matches.append((n - hi, m - hi))
+        matches.sort()
+    return _opcodes(matches, len(a), len(b))
+
+
+def _changed_spans(left: str, right: str):
+    """Character ranges that differ between two lines, at token granularity."""
+    ta = _TOKEN_RE.findall(left)
+    tb = _TOKEN_RE.findall(right)
+    if len(ta) * len(tb) > MAX_TOKEN_CELLS:
+        return None
+    left_spans, right_spans = [], []
+    a_offsets = [0]
+    for token in ta:
+        a_offsets.append(a_offsets[-1] + len(token))
+    b_offsets = [0]
+    for token in tb:
+        b_offsets.append(b_offsets[-1] + len(token))
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, ta, tb, autojunk=False).get_opcodes():
+        if tag == "equal":
+            continue
+        if i2 > i1:
+            left_spans.append((a_offsets[i1], a_offsets[i2]))
+        if j2 > j1:
+            right_spans.append((b_offsets[j1], b_offsets[j2]))
+    return left_spans, right_spans
+
+
+@dataclass
+class DiffResult:
+    """Rows of a side-by-side diff.
+
+    Each row is a dict with ``op`` in equal/delete/insert/change/skip, the
+    0-based line numbers ``a``/``b`` where they apply, the ``left``/``right``
+    texts and, for changed pairs refined to word level, ``left_spans`` and
+    ``right_spans`` as ``(start, end)`` character ranges. ``skip`` rows stand
+    for ``count`` collapsed unchanged lines starting at ``a``/``b``.
+    """
+
+    mode: str
+    rows: list = field(default_factory=list)
+    degraded: bool = False
+
+
+def _context_rows(a_lines, i1, i2, j1, first: bool, last: bool, context: int):
+    rows = []
+    total = i2 - i1
+    head = 0 if first else context
+    tail = 0 if last else context
+    if total < max(MIN_COLLAPSE_LINES, head + tail + 1):
+        head, tail = total, 0
+    for k in range(head):
+        rows.append({"op": "equal", "a": i1 + k, "b": j1 + k, "left": a_lines[i1 + k], "right": a_lines[i1 + k]})
+    hidden = total - head - tail
+    if hidden > 0:
+        rows.append({"op": "skip", "a": i1 + head, "b": j1 + head, "count": hidden})
+    for k in range(total - tail, total):
+        if k < head:
+            continue
+        rows.append({"op": "equal", "a": i1 + k, "b": j1 + k, "left": a_lines[i1 + k], "right": a_lines[i1 + k]})
+    return rows
+
+
+def compute_diff(a: str, b: str, mode: str = "word", budget_seconds: float | None = DEFAULT_TIME_BUDGET,
+                 context: int | None = CONTEXT_LINES) -> DiffResult:
+    """Diff two texts; ``context=None`` keeps every unchanged line."""
+    mode = mode if mode in MODES else "word"
+    a_lines = a.splitlines()
+    b_lines = b.splitlines()
+    budget = _Budget(budget_seconds)
+    ops = _line_opcodes(a_lines, b_lines, budget)
+    result = DiffResult(mode=mode)
+    rows = result.rows
+    for index, (tag, i1, i2, j1, j2) in enumerate(ops):
+        if tag == "equal":
+            if context is None:
+                rows.extend(
+                    {"op": "equal", "a": i1 + k, "b": j1 + k, "left": a_lines[i1 + k], "right": a_lines[i1 + k]}
+                    for k in range(i2 - i1)
+                )
+            else:
+                rows.extend(_context_rows(a_lines, i1, i2, j1, index == 0, index == len(ops) - 1, context))
+            continue
+        paired = min(i2 - i1, j2 - j1) if tag == "replace" else 0
+        for k in range(paired):
+            row = {"op": "change", "a": i1 + k, "b": j1 + k, "left": a_lines[i1 + k], "right": b_lines[j1 + k]}
+            if mode == "word":
+                spans = None if budget.spent() else _changed_spans(row["left"], row["right"])
+                if spans is None:
+                    result.degraded = True
+                else:
+                    row["left_spans"], row["right_spans"] = spans
+            rows.append(row)
+        for i in range(i1 + paired, i2):
+            rows.append({"op": "delete", "a": i, "left": a_lines[i]})
+        for j in range(j1 + paired, j2):
+            rows.append({"op": "insert", "b": j, "right": b_lines[j]})
+    if budget.spent():
+        result.degraded = True
+    return result
+
+
+_OP_CODES = {"equal": "=", "delete": "-", "insert": "+", "change": "!", "skip": "~"}
+
+
+def _utf16_spans(text: str, spans):
+    """Flatten ``(start, end)`` ranges into UTF-16 offsets for the browser."""
+    flat = [offset for span in spans for offset in span]
+    if len(text.encode("utf-16-le")) == 2 * len(text):
+        return flat
+    units = [0]
+    for char in text:
+        units.append(units[-1] + (2 if ord(char) > 0xFFFF else 1))
+    return [units[offset] for offset in flat]
+
+
+def compact_rows(rows) -> list:
+    """Encode diff rows as short arrays for the JSON API.
+
+    ``["=", a, b, text]``, ``["-", a, text]``, ``["+", b, text]``,
+    ``["~", a, b, count]`` and ``["!", a, b, left, right[, left_spans,
+    right_spans]]`` where spans are flat ``[start, end, ...]`` lists in
+    UTF-16 code units; a change without spans is highlighted as a whole.
+    """
+    out = []
+    for row in rows:
+        op = row["op"]
+        code = _OP_CODES[op]
+        if op == "equal":
+            out.append([code, row["a"], row["b"], row["left"]])
+        elif op == "delete":
+            out.append([code, row["a"], row["left"]])
+        elif op == "insert":
+            out.append([code, row["b"], row["right"]])
+        elif op == "skip":
+            out.append([code, row["a"], row["b"], row["count"]])
+        else:
+            item = [code, row["a"], row["b"], row["left"], row["right"]]
+            if "left_spans" in row:
+                item.append(_utf16_spans(row["left"], row["left_spans"]))
+                item.append(_utf16_spans(row["right"], row["right_spans"]))
+            out.append(item)
+    return out
+
+
+def to_json(result: DiffResult) -> str:
+    """Serialize a DiffResult as the compact payload rendered by the client."""
+    payload = {"mode": result.mode, "degraded": result.degraded, "rows": compact_rows(result.rows)}
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+
+
+class DiffCache:
+    """Thread-safe LRU of serialized diffs with hit and miss counters."""
+
+    def __init__(self, max_chars: int = DIFF_CACHE_MAX_CHARS):
+        self.max_chars = max_chars
+        self.hits = 0
+        self.misses = 0
+        self._items: OrderedDict = OrderedDict()
+        self._chars = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(left_hash: str, right_hash: str, mode: str) -> tuple:
+        return (left_hash, right_hash, mode)
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value) -> None:
+        size = len(value)
+        if size > self.max_chars:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._chars -= len(old)
+            self._items[key] = value
+            self._chars += size
+            while self._chars > self.max_chars:
+                _, evicted = self._items.popitem(last=False)
+                self._chars -= len(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._chars = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._items),
+                "chars": self._chars,
+                "max_chars": self.max_chars,
+            }
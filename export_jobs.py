@@ -0,0 +1,302 @@
+"""Background export jobs with generation-keyed artifacts cached on disk.
+
+Job state lives next to the artifacts as small JSON status files, and a job is
+claimed with an exclusive lock file, so every worker process sees the same
+jobs and concurrent export requests share a single build. A job is keyed by
+format, data generation and, for point-in-time exports, the ``as_of`` moment.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+
+
+EXPORT_FORMATS = {
+    "zip": ("application/zip", "prompts_backup.zip"),
+    "json": ("application/json; charset=utf-8", "prompts_export.json"),
+    "csv": ("text/csv; charset=utf-8", "prompts_export.csv"),
+}
+STALE_JOB_SECONDS = 600
+PROGRESS_WRITE_INTERVAL = 0.25
+_JOB_ID_RE = re.compile(r"(zip|json|csv)-g(\d+)(?:-t(\d{14}(?:\d{6})?))?")
+_ARTIFACT_GENERATION_RE = re.compile(r"prompts-g(\d+)[.-]")
+
+logger = logging.getLogger(__name__)
+
+
+class ExportJobError(ValueError):
+    """An unknown export format or malformed job id."""
+
+
+def as_of_stamp(as_of: str | None) -> str:
+    """Compact digits-only form of a normalized ``as_of`` ISO timestamp ("" for none)."""
+    if not as_of:
+        return ""
+    stamp = re.sub(r"\D", "", as_of)
+    if len(stamp) not in (14, 20):
+        raise ExportJobError("Unsupported as_of moment")
+    return stamp
+
+
+def _as_of_from_stamp(stamp: str | None) -> str | None:
+    if not stamp:
+        return None
+    text = f"{stamp[0:4]}-{stamp[4:6]}-{stamp[6:8]}T{stamp[8:10]}:{stamp[10:12]}:{stamp[12:14]}"
+    return f"{text}.{stamp[14:]}" if len(stamp) > 14 else text
+
+
+def job_id_for(export_format: str, generation: int, as_of: str | None = None) -> str:
+    if export_format not in EXPORT_FORMATS:
+        raise ExportJobError("Unsupported export format")
+    stamp = as_of_stamp(as_of)
+    return f"{export_format}-g{int(generation)}" + (f"-t{stamp}" if stamp else "")
+
+
+def parse_job_id(job_id: str) -> tuple[str, int]:
+    match = _JOB_ID_RE.fullmatch(job_id or "")
+    if not match:
+        raise ExportJobError("Unknown export job")
+    return match.group(1), int(match.group(2))
+
+
+def job_as_of(job_id: str) -> str | None:
+    """The ``as_of`` moment of a point-in-time job, or None for a current export."""
+    match = _JOB_ID_RE.fullmatch(job_id or "")
+    if not match:
+        raise ExportJobError("Unknown export job")
+    return _as_of_from_stamp(match.group(3))
+
+
+def artifact_name(export_format: str, generation: int, as_of: str | None = None) -> str:
+    stamp = as_of_stamp(as_of)
+    return f"prompts-g{int(generation)}" + (f"-t{stamp}" if stamp else "") + f".{export_format}"
+
+
+def _atomic_write(directory: str, filename: str, payload: bytes) -> None:
+    temp_name = None
+    try:
+        with tempfile.NamedTemporaryFile(
+            mode="wb",
+            dir=directory,
+            prefix=".export-",
+            delete=False,
+        ) as temp_file:
+            temp_name = temp_file.name
+            temp_file.write(payload)
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+        os.replace(temp_name, os.path.join(directory, filename))
+    finally:
+        if temp_name and os.path.exists(temp_name):
+            os.unlink(temp_name)
+
+
+class ExportJobManager:
+    """Start, deduplicate and track export builds.
+
+    ``build_artifact(export_format, progress, as_of)`` must read one
+    consistent snapshot and return ``(generation, payload_bytes)``;
+    ``progress(done, total)`` may be called any number of times while it runs.
+    """
+
+    def __init__(self, export_dir: str, build_artifact):
+        self.export_dir = export_dir
+        self.build_artifact = build_artifact
+
+    # -- paths -------------------------------------------------------------
+    def _path(self, filename: str) -> str:
+        return os.path.join(self.export_dir, filename)
+
+    def _status_path(self, job_id: str) -> str:
+        return self._path(f"{job_id}.status.json")
+
+    def _lock_path(self, job_id: str) -> str:
+        return self._path(f"{job_id}.lock")
+
+    def ensure_dir(self) -> None:
+        os.makedirs(self.export_dir, exist_ok=True)
+
+    # -- status files ------------------------------------------------------
+    def status(self, job_id: str) -> dict | None:
+        try:
+            with open(self._status_path(job_id), "r", encoding="utf-8") as status_file:
+                return json.load(status_file)
+        except (OSError, ValueError):
+            return None
+
+    def _write_status(self, job_id: str, **fields) -> dict:
+        export_format, generation = parse_job_id(job_id)
+        status = {
+            "id": job_id,
+            "format": export_format,
+            "generation": generation,
+            "as_of": job_as_of(job_id),
+            "state": "queued",
+            "progress": 0,
+            "total": 0,
+            "artifact": None,
+            "error": None,
+        }
+        status.update(self.status(job_id) or {})
+        status.update(fields)
+        status["updated_at"] = time.time()
+        self.ensure_dir()
+        _atomic_write(
+            self.export_dir,
+            os.path.basename(self._status_path(job_id)),
+            json.dumps(status).encode("utf-8"),
+        )
+        return status
+
+    # -- locking -----------------------------------------------------------
+    def _claim(self, job_id: str) -> bool:
+        self.ensure_dir()
+        lock_path = self._lock_path(job_id)
+        for _ in range(2):
+            try:
+                fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if not self._lock_is_stale(job_id):
+                    return False
+                try:
+                    os.unlink(lock_path)
+                except OSError:
+                    return False
+                continue
+            with os.fdopen(fd, "w") as lock_file:
+                lock_file.write(str(os.getpid()))
+            return True
+        return False
+
+    def _lock_is_stale(self, job_id: str) -> bool:
+        status = self.status(job_id) or {}
+        try:
+            touched = max(status.get("updated_at") or 0, os.path.getmtime(self._lock_path(job_id)))
+        except OSError:
+            return True
+        return time.time() - touched > STALE_JOB_SECONDS
+
+    def _release(self, job_id: str) -> None:
+        try:
+            os.unlink(self._lock_path(job_id))
+        except OSError:
+            pass
+
+    def is_running(self, job_id: str) -> bool:
+        return os.path.exists(self._lock_path(job_id)) and not self._lock_is_stale(job_id)
+
+    # -- artifacts ---------------------------------------------------------
+    def cached_artifact(self, export_format: str, generation: int, as_of: str | None = None) -> str | None:
+        path = self._path(artifact_name(export_format, generation, as_of))
+        return path if os.path.isfile(path) else None
+
+    def artifact_for(self, job_id: str) -> str | None:
+        """Return the finished artifact of a job, if it is still on disk."""
+        export_format, generation = parse_job_id(job_id)
+        as_of = job_as_of(job_id)
+        status = self.status(job_id) or {}
+        if status.get("state") == "done" and status.get("artifact"):
+            path = self._path(os.path.basename(status["artifact"]))
+            if os.path.isfile(path):
+                return path
+        return self.cached_artifact(export_format, generation, as_of)
+
+    def _prune_artifacts(self, export_format: str, keep: str) -> None:
+        """Drop artifacts and finished job files left behind by other generations.
+
+        Point-in-time artifacts of the kept generation stay; they may still be
+        waiting to be downloaded.
+        """
+        suffix = f".{export_format}"
+        keep_generation = _ARTIFACT_GENERATION_RE.match(keep).group(1)
+        for entry in os.scandir(self.export_dir):
+            name = entry.name
+            if not entry.is_file() or name == keep:
+                continue
+            if name.startswith("prompts-g") and name.endswith(suffix):
+                match = _ARTIFACT_GENERATION_RE.match(name)
+                if not match or match.group(1) != keep_generation:
+                    os.unlink(entry.path)
+            elif name.startswith(f"{export_format}-g") and name.endswith(".status.json"):
+                job_id = name[: -len(".status.json")]
+                if not self.is_running(job_id) and self.artifact_for(job_id) is None:
+                    os.unlink(entry.path)
+
+    # -- running -----------------------------------------------------------
+    def _run(self, job_id: str) -> None:
+        export_format, _ = parse_job_id(job_id)
+        last_write = 0.0
+
+        def progress(done: int, total: int) -> None:
+            nonlocal last_write
+            now = time.monotonic()
+            if done < total and now - last_write < PROGRESS_WRITE_INTERVAL:
+                return
+            last_write = now
+            self._write_status(job_id, state="running", progress=done, total=total)
+
+        try:
+            self._write_status(job_id, state="running", progress=0, total=0, error=None)
+            as_of = job_as_of(job_id)
+            generation, payload = self.build_artifact(export_format, progress, as_of)
+            filename = artifact_name(export_format, generation, as_of)
+            _atomic_write(self.export_dir, filename, payload)
+            status = self.status(job_id) or {}
+            total = status.get("total") or 0
+            self._write_status(job_id, state="done", progress=total, artifact=filename)
+            try:
+                self._prune_artifacts(export_format, keep=filename)
+            except OSError:
+                logger.exception("Could not prune old export artifacts")
+        except Exception as exc:
+            logger.exception("Export job %s failed", job_id)
+            self._write_status(job_id, state="failed", error=str(exc) or exc.__class__.__name__)
+        finally:
+            self._release(job_id)
+
+    def start(self, export_format: str, generation: int, as_of: str | None = None) -> dict:
+        """Return the job for ``generation``, starting a build only if needed."""
+        job_id = job_id_for(export_format, generation, as_of)
+        if self.artifact_for(job_id):
+            status = self.status(job_id) or {}
+            if status.get("state") != "done":
+                status = self._write_status(
+                    job_id,
+                    state="done",
+                    artifact=artifact_name(export_format, generation, as_of),
+                )
+            return status
+        if not self._claim(job_id):
+            return self.status(job_id) or self._write_status(job_id, state="queued")
+        status = self._write_status(job_id, state="queued", progress=0, total=0, error=None)
+        worker = threading.Thread(target=self._run, args=(job_id,), name=f"export-{job_id}", daemon=True)
+        try:
+            worker.start()
+        except Exception:
+            self._release(job_id)
+            raise
+        return status
+
+    def run_sync(self, export_format: str, generation: int, timeout: float = STALE_JOB_SECONDS) -> str | None:
+        """Build (or wait for) the artifact in the calling thread and return its path.
+
+        Meant for command-line and maintenance use; request handlers call
+        ``start`` and let the client poll instead of blocking a worker.
+        """
+        job_id = job_id_for(export_format, generation)
+        cached = self.artifact_for(job_id)
+        if cached:
+            return cached
+        if self._claim(job_id):
+            self._run(job_id)
+            return self.artifact_for(job_id)
+        deadline = time.monotonic() + timeout
+        while self.is_running(job_id) and time.monotonic() < deadline:
+            time.sleep(0.1)
+        return self.artifact_for(job_id)
@@ -0,0 +1,57 @@
+"""Production server settings: ``gunicorn --config gunicorn.conf.py app:app``.
+
+Pre-forked worker processes, each with a pool of request threads. Every
+setting can be overridden through the environment:
+
+- WEB_BIND: listen address (default ``0.0.0.0:3501``)
+- WEB_WORKERS: worker processes (default 2 x CPU cores + 1, at most 8)
+- WEB_THREADS: request threads per worker (default 4; 1 selects the sync
+  worker, whose timeout then bounds every single request)
+- WEB_TIMEOUT: seconds a silent worker may stay busy before it is killed and
+  replaced (default 60)
+- WEB_GRACEFUL_TIMEOUT: seconds in-flight requests get to finish on reload or
+  shutdown (default 30)
+- WEB_KEEPALIVE: seconds an idle keep-alive connection stays open (default 5)
+- WEB_MAX_REQUESTS: recycle a worker after this many requests, 0 = never
+
+``kill -HUP <master pid>`` reloads gracefully: new workers start on the new
+code and old ones finish their requests first. Workers import the app
+themselves (no preload) so that a reload picks up code changes.
+
+Data shared by the workers lives in SQLite or on disk; the in-process caches
+are keyed by the database write generation, so a write made by one worker
+invalidates the pages cached by every other.
+"""
+
+import multiprocessing
+import os
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+bind = os.environ.get("WEB_BIND", "0.0.0.0:3501")
+workers = max(1, _env_int("WEB_WORKERS", min(multiprocessing.cpu_count() * 2 + 1, 8)))
+threads = max(1, _env_int("WEB_THREADS", 4))
+timeout = _env_int("WEB_TIMEOUT", 60)
+graceful_timeout = _env_int("WEB_GRACEFUL_TIMEOUT", 30)
+keepalive = _env_int("WEB_KEEPALIVE", 5)
+max_requests = _env_int("WEB_MAX_REQUESTS", 0)
+max_requests_jitter = max_requests // 10
+preload_app = False
+accesslog = "-"
+errorlog = "-"
+
+
+def post_worker_init(worker):
+    """Warm the worker up before it accepts its first request."""
+    import app
+
+    timings = app.warm_up()
+    worker.log.info("Worker %s warmed up: %s", worker.pid, timings)
+    if app.start_background_jobs():
+        worker.log.info("Worker %s runs the background maintenance jobs", worker.pid)
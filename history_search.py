@@ -0,0 +1,179 @@
+"""Full-text search across every stored version.
+
+History rows hold reverse deltas and compressed snapshots, so the raw
+``versions.content`` column cannot be indexed directly. Instead the decoded
+text of each version is fed into a contentless FTS5 table (``versions_fts``,
+rowid = version id) using the trigram tokenizer, which gives substring
+matching that also works for CJK text without word boundaries. Contentless
+means the text is not stored twice; snippets are cut in Python from the
+decoded content of the rows on the requested page only.
+
+Because a contentless table can only forget a row when given its original
+text, versions must be unindexed before they are deleted or archived.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+from dataclasses import dataclass
+
+import version_store
+
+
+MIN_QUERY_CHARS = 3
+SNIPPET_CONTEXT = 40
+
+CREATE_SQL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS versions_fts "
+    "USING fts5(content, content='', tokenize='trigram')"
+)
+
+
+class SearchUnavailable(RuntimeError):
+    """SQLite was built without FTS5 or the trigram tokenizer."""
+
+
+@dataclass
+class SearchPage:
+    items: list
+    total: int
+    page: int
+    per_page: int
+
+    @property
+    def has_more(self) -> bool:
+        return self.page * self.per_page < self.total
+
+
+def create_index(conn) -> bool:
+    """Create the index table; returns False if this SQLite cannot."""
+    try:
+        conn.execute(CREATE_SQL)
+    except sqlite3.OperationalError:
+        return False
+    return True
+
+
+def available(conn) -> bool:
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE name='versions_fts'").fetchone()
+    return row is not None
+
+
+def _indexed(conn, version_id) -> bool:
+    return conn.execute("SELECT 1 FROM versions_fts WHERE rowid=?", (version_id,)).fetchone() is not None
+
+
+def index_version(conn, version_id, text: str) -> None:
+    if not available(conn) or _indexed(conn, version_id):
+        return
+    conn.execute("INSERT INTO versions_fts(rowid, content) VALUES(?,?)", (version_id, text))
+
+
+def unindex_versions(conn, version_ids) -> None:
+    """Remove versions from the index; call before their rows go away."""
+    if not available(conn):
+        return
+    for version_id in version_ids:
+        if not _indexed(conn, version_id):
+            continue
+        text = version_store.load_content(conn, version_id)
+        if text is None:
+            continue
+        conn.execute(
+            "INSERT INTO versions_fts(versions_fts, rowid, content) VALUES('delete', ?, ?)",
+            (version_id, text),
+        )
+
+
+def clear(conn) -> None:
+    if available(conn):
+        conn.execute("INSERT INTO versions_fts(versions_fts) VALUES('delete-all')")
+
+
+def backfill(conn, after_id: int = 0, batch_size: int = 200):
+    """Index one batch of versions above ``after_id``; returns (last_id or None, indexed)."""
+    if not available(conn):
+        return None, 0
+    rows = conn.execute(
+        "SELECT id FROM versions WHERE id > ? ORDER BY id LIMIT ?",
+        (after_id, batch_size),
+    ).fetchall()
+    indexed = 0
+    for row in rows:
+        if _indexed(conn, row["id"]):
+            continue
+        text = version_store.load_content(conn, row["id"])
+        if text is None:
+            continue
+        conn.execute("INSERT INTO versions_fts(rowid, content) VALUES(?,?)", (row["id"], text))
+        indexed += 1
+    if len(rows) < batch_size:
+        return None, indexed
+    return rows[-1]["id"], indexed
+
+
+def match_expression(query: str) -> str:
+    """Quote the query as a single FTS5 phrase."""
+    return '"' + query.replace('"', '""') + '"'
+
+
+def snippet(text: str, query: str, context: int = SNIPPET_CONTEXT):
+    """Return (before, match, after) around the first case-insensitive hit."""
+    start = text.lower().find(query.lower())
+    if start < 0:
+        return text[: 2 * context], "", ""
+    end = start + len(query)
+    before = text[max(0, start - context):start]
+    after = text[end:end + context]
+    if start > context:
+        before = "…" + before
+    if end + context < len(text):
+        after = after + "…"
+    return before, text[start:end], after
+
+
+_SEARCH_SQL = """
+    FROM versions_fts f
+    JOIN versions v ON v.id = f.rowid
+    JOIN prompts p ON p.id = v.prompt_id
+    WHERE versions_fts MATCH ? {exclude}
+"""
+
+
+def search(conn, query: str, page: int = 1, per_page: int = 20, exclude_prompt_ids=()) -> SearchPage:
+    """Versions whose content contains ``query``, newest first."""
+    if not available(conn):
+        raise SearchUnavailable("versions_fts is not available")
+    query = query.strip()
+    page = max(1, page)
+    if len(query) < MIN_QUERY_CHARS:
+        return SearchPage(items=[], total=0, page=page, per_page=per_page)
+    excluded = sorted(set(exclude_prompt_ids))
+    exclude = f"AND v.prompt_id NOT IN ({','.join('?' * len(excluded))})" if excluded else ""
+    body = _SEARCH_SQL.format(exclude=exclude)
+    params = [match_expression(query), *excluded]
+    total = conn.execute(f"SELECT COUNT(*) {body}", params).fetchone()[0]
+    rows = conn.execute(
+        f"""
+        SELECT v.id AS version_id, v.version, v.created_at, v.prompt_id,
+               p.name AS prompt_name, p.current_version_id
+        {body}
+        ORDER BY v.created_at DESC, v.id DESC
+        LIMIT ? OFFSET ?
+        """,
+        [*params, per_page, (page - 1) * per_page],
+    ).fetchall()
+    items = []
+    for row in rows:
+        text = version_store.load_content(conn, row["version_id"]) or ""
+        before, match, after = snippet(text, query)
+        items.append({
+            "prompt_id": row["prompt_id"],
+            "prompt_name": row["prompt_name"],
+            "version_id": row["version_id"],
+            "version": row["version"],
+            "created_at": row["created_at"],
+            "is_current": row["version_id"] == row["current_version_id"],
+            "snippet": {"before": before, "match": match, "after": after},
+        })
+    return SearchPage(items=items, total=total, page=page, per_page=per_page)
@@ -0,0 +1,86 @@
+"""UI translations and per-request language resolution.
+
+Templates are written in Chinese, the source language; other languages are
+JSON catalogs under ``translations/`` mapping the Chinese text to its
+translation. A catalog is read once per process, on first use, and missing
+entries fall back to the source text.
+
+The site language setting is ``zh``, ``en`` or ``auto``; ``auto`` follows
+the browser's Accept-Language header on every request.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+
+
+DEFAULT_LANGUAGE = "zh"
+SUPPORTED_LANGUAGES = ("zh", "en")
+LANGUAGE_AUTO = "auto"
+LANGUAGE_SETTINGS = SUPPORTED_LANGUAGES + (LANGUAGE_AUTO,)
+CATALOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "translations")
+HTML_LANG = {"zh": "zh-CN", "en": "en"}
+
+_catalogs: dict = {}
+_lock = threading.Lock()
+
+
+def catalog(language: str) -> dict:
+    """The translation table for ``language`` (empty for the source language)."""
+    found = _catalogs.get(language)
+    if found is not None:
+        return found
+    with _lock:
+        if language not in _catalogs:
+            table = {}
+            if language != DEFAULT_LANGUAGE:
+                try:
+                    with open(os.path.join(CATALOG_DIR, f"{language}.json"), "r", encoding="utf-8") as handle:
+                        table = json.load(handle)
+                except (OSError, ValueError):
+                    table = {}
+            _catalogs[language] = table
+        return _catalogs[language]
+
+
+def translate(language: str, text) -> str:
+    text = "" if text is None else str(text)
+    if language == DEFAULT_LANGUAGE:
+        return text
+    return catalog(language).get(text, text)
+
+
+def negotiate(accept_language: str, supported=SUPPORTED_LANGUAGES, default: str = DEFAULT_LANGUAGE) -> str:
+    """Best supported language for an Accept-Language header (``en-US`` matches ``en``)."""
+    best = None
+    for position, part in enumerate((accept_language or "").split(",")):
+        tag, _, params = part.strip().partition(";")
+        primary = tag.strip().lower().split("-")[0]
+        if primary == "*":
+            primary = default
+        if primary not in supported:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality <= 0:
+            continue
+        rank = (quality, -position)
+        if best is None or rank > best[0]:
+            best = (rank, primary)
+    return best[1] if best else default
+
+
+def resolve(setting, accept_language: str = "") -> tuple:
+    """Return (language, followed_browser) for a language setting and request header."""
+    value = (setting or DEFAULT_LANGUAGE).lower()
+    if value == LANGUAGE_AUTO:
+        return negotiate(accept_language), True
+    return (value if value in SUPPORTED_LANGUAGES else DEFAULT_LANGUAGE), False
@@ -0,0 +1,138 @@
+"""Closure-table index over the ``parent_version_id`` graph.
+
+``version_lineage`` holds one row per (ancestor, descendant) pair with the
+number of parent hops between them, including a depth-0 row for every
+version itself. Inserting a version copies its parent's ancestor rows one
+level deeper, so ancestor, descendant and common-ancestor queries are single
+indexed lookups instead of walking the chain row by row.
+
+When versions are pruned their own rows go away, but rows linking their
+ancestors to their descendants stay, so surviving versions keep their
+lineage across gaps in history. Versions saved before the index existed are
+linked by ``backfill``, batch by batch, from a background job; the query
+functions only read, so a request never pays for a write transaction.
+"""
+
+from __future__ import annotations
+
+
+def _has_entry(conn, version_id) -> bool:
+    row = conn.execute(
+        "SELECT 1 FROM version_lineage WHERE descendant_id=? AND depth=0", (version_id,)
+    ).fetchone()
+    return row is not None
+
+
+def _link(conn, version_id, parent_version_id) -> None:
+    conn.execute(
+        "INSERT OR IGNORE INTO version_lineage(ancestor_id, descendant_id, depth) VALUES(?,?,0)",
+        (version_id, version_id),
+    )
+    if parent_version_id:
+        conn.execute(
+            """
+            INSERT OR IGNORE INTO version_lineage(ancestor_id, descendant_id, depth)
+            SELECT ancestor_id, ?, depth + 1 FROM version_lineage WHERE descendant_id=?
+            """,
+            (version_id, parent_version_id),
+        )
+
+
+def ensure(conn, version_id) -> None:
+    """Index a version and any unindexed ancestors (versions saved before the index)."""
+    chain = []
+    seen = set()
+    current = version_id
+    while current and current not in seen and not _has_entry(conn, current):
+        seen.add(current)
+        row = conn.execute("SELECT id, parent_version_id FROM versions WHERE id=?", (current,)).fetchone()
+        if row is None:
+            break
+        chain.append(row)
+        current = row["parent_version_id"]
+    for row in reversed(chain):
+        _link(conn, row["id"], row["parent_version_id"])
+
+
+def backfill(conn, after_id: int = 0, batch_size: int = 200):
+    """Link one batch of versions above ``after_id``; returns (last_id or None, linked).
+
+    Batches run in id order, so a version's parent is normally linked already
+    and each version costs one copy of its parent's ancestor rows.
+    """
+    rows = conn.execute(
+        "SELECT id FROM versions WHERE id > ? ORDER BY id LIMIT ?",
+        (after_id, batch_size),
+    ).fetchall()
+    linked = 0
+    for row in rows:
+        if not _has_entry(conn, row["id"]):
+            ensure(conn, row["id"])
+            linked += 1
+    if len(rows) < batch_size:
+        return None, linked
+    return rows[-1]["id"], linked
+
+
+def record_version(conn, version_id, parent_version_id=None) -> None:
+    """Index a freshly inserted version below its parent."""
+    if parent_version_id:
+        ensure(conn, parent_version_id)
+    _link(conn, version_id, parent_version_id)
+
+
+def forget(conn, version_ids) -> None:
+    """Drop the rows of removed versions; paths through them are kept."""
+    ids = list(version_ids)
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        marks = ",".join("?" * len(chunk))
+        conn.execute(
+            f"DELETE FROM version_lineage WHERE ancestor_id IN ({marks}) OR descendant_id IN ({marks})",
+            chunk + chunk,
+        )
+
+
+_RELATIVES_SQL = """
+SELECT v.id, v.version, v.created_at, l.depth
+FROM version_lineage l
+JOIN versions v ON v.id = l.{other}
+WHERE l.{anchor} = ? AND l.depth > 0
+ORDER BY l.depth, v.id
+LIMIT ?
+"""
+
+
+def ancestors(conn, version_id, limit: int = 100) -> list[dict]:
+    """Surviving ancestors of a version, nearest first."""
+    sql = _RELATIVES_SQL.format(anchor="descendant_id", other="ancestor_id")
+    return [dict(r) for r in conn.execute(sql, (version_id, limit)).fetchall()]
+
+
+def descendants(conn, version_id, limit: int = 100) -> list[dict]:
+    """Surviving descendants of a version, nearest first."""
+    sql = _RELATIVES_SQL.format(anchor="ancestor_id", other="descendant_id")
+    return [dict(r) for r in conn.execute(sql, (version_id, limit)).fetchall()]
+
+
+def nearest_ancestor(conn, version_id):
+    """Id of the closest surviving ancestor, or None."""
+    found = ancestors(conn, version_id, limit=1)
+    return found[0]["id"] if found else None
+
+
+def common_ancestor(conn, a_id, b_id):
+    """Closest surviving version that is an ancestor of (or equal to) both; None if unrelated."""
+    row = conn.execute(
+        """
+        SELECT v.id, v.version, v.created_at, a.depth AS depth_a, b.depth AS depth_b
+        FROM version_lineage a
+        JOIN version_lineage b ON b.ancestor_id = a.ancestor_id
+        JOIN versions v ON v.id = a.ancestor_id
+        WHERE a.descendant_id = ? AND b.descendant_id = ?
+        ORDER BY a.depth + b.depth, v.id DESC
+        LIMIT 1
+        """,
+        (a_id, b_id),
+    ).fetchone()
+    return dict(row) if row else None
@@ -0,0 +1,110 @@
+"""Cache of rendered HTML pages keyed by the data write generation.
+
+Every mutating route bumps ``data_generation`` in the same transaction as its
+write, so a rendered page stays valid for exactly as long as the generation
+it was rendered under. Keys also carry the endpoint, its arguments, the
+caller's auth context (password mode, site login, unlocked prompts) and the
+UI language, so a page rendered for a session that unlocked a prompt is
+never served to one that has not.
+
+Pages are stored with a per-process placeholder in place of the CSRF token;
+the caller substitutes the session's own token on the way out. Storing a page
+from a different generation drops everything else, since entries from a
+superseded generation can never match again.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import secrets
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+
+
+PAGE_CACHE_MAX_CHARS = 8_000_000
+
+# 随机占位符：用户内容无法预知，也就无法借它换出别人的令牌
+CSRF_PLACEHOLDER = "csrf-" + secrets.token_hex(16)
+
+
+@dataclass
+class CachedPage:
+    body: str
+    digest: str
+    last_modified: datetime = field(default_factory=lambda: datetime.now(timezone.utc).replace(microsecond=0))
+
+    def etag(self, csrf_token: str) -> str:
+        """Strong validator for the body as sent, i.e. with this session's token filled in."""
+        return hashlib.sha256(f"{self.digest}:{csrf_token}".encode("utf-8")).hexdigest()[:32]
+
+    def render(self, csrf_token: str) -> str:
+        return self.body.replace(CSRF_PLACEHOLDER, csrf_token)
+
+
+def make_page(body: str) -> CachedPage:
+    return CachedPage(body=body, digest=hashlib.sha256(body.encode("utf-8")).hexdigest())
+
+
+class PageCache:
+    """Thread-safe LRU of rendered pages bounded by total characters."""
+
+    def __init__(self, max_chars: int = PAGE_CACHE_MAX_CHARS):
+        self.max_chars = max_chars
+        self.hits = 0
+        self.misses = 0
+        self._items: OrderedDict = OrderedDict()
+        self._chars = 0
+        self._generation = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(endpoint: str, args, auth_context, language: str, generation: int) -> tuple:
+        return (generation, endpoint, tuple(sorted(args)), auth_context, language)
+
+    def get(self, key):
+        with self._lock:
+            page = self._items.get(key)
+            if page is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return page
+
+    def put(self, key, page: CachedPage) -> None:
+        size = len(page.body)
+        if size > self.max_chars:
+            return
+        generation = key[0]
+        with self._lock:
+            if generation != self._generation:
+                self._items.clear()
+                self._chars = 0
+                self._generation = generation
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._chars -= len(old.body)
+            self._items[key] = page
+            self._chars += size
+            while self._chars > self.max_chars:
+                _, evicted = self._items.popitem(last=False)
+                self._chars -= len(evicted.body)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._chars = 0
+            self._generation = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._items),
+                "chars": self._chars,
+                "max_chars": self.max_chars,
+                "generation": self._generation,
+            }
@@ -0,0 +1,64 @@
+"""Bounded thread pool for password hashing.
+
+Password hashes are deliberately slow (tens to hundreds of milliseconds of
+CPU each). Running them on a small dedicated pool caps how many can burn CPU
+at once in a process, so a burst of login or save attempts cannot take every
+core away from page rendering. The request thread that asked for the hash
+still waits for the result; the pool limits concurrency, it does not free
+the calling thread.
+
+At most ``max_pending`` hashes may be running or queued; a caller that cannot
+get a slot within ``wait`` seconds gets ``PasswordPoolBusy`` instead of
+queueing without bound.
+"""
+
+from __future__ import annotations
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+PASSWORD_HASH_WORKERS = 2
+PASSWORD_HASH_MAX_PENDING = 16
+PASSWORD_HASH_WAIT_SECONDS = 5.0
+
+
+class PasswordPoolBusy(RuntimeError):
+    """Too many password hashes are already running or queued."""
+
+
+class PasswordPool:
+    def __init__(
+        self,
+        workers: int = PASSWORD_HASH_WORKERS,
+        max_pending: int = PASSWORD_HASH_MAX_PENDING,
+        wait: float = PASSWORD_HASH_WAIT_SECONDS,
+    ):
+        self.workers = max(1, workers)
+        self.wait = wait
+        self._slots = threading.BoundedSemaphore(max(self.workers, max_pending))
+        self._executor: ThreadPoolExecutor | None = None
+        self._executor_lock = threading.Lock()
+
+    def _pool(self) -> ThreadPoolExecutor:
+        # Threads start on first use, so each pre-forked worker gets its own pool.
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+            return self._executor
+
+    def run(self, func, *args):
+        if not self._slots.acquire(timeout=self.wait):
+            raise PasswordPoolBusy("password hashing is overloaded")
+        try:
+            return self._pool().submit(func, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password: str) -> str:
+        return self.run(generate_password_hash, password)
+
+    def check(self, pwhash: str, password: str) -> bool:
+        return self.run(check_password_hash, pwhash, password)
@@ -0,0 +1,179 @@
+"""Failed-attempt rate limiting shared by every worker process.
+
+Counters live in a small SQLite file of their own, so all workers see the
+same attempts and a burst of failed logins never queues behind (or delays)
+writes to the main database.
+
+Each key keeps a sliding-window counter: the failures in the current fixed
+window plus the previous window's count weighted by how much of it still
+overlaps the sliding window. That is one row and O(1) work per check or
+update, instead of a list of timestamps per key.
+
+At most ``max_keys`` keys are stored. Inserting a key beyond that evicts the
+least recently touched ones, so spraying many client addresses cannot grow
+the table without bound; keys idle for two windows hold no state anyway.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+
+RATE_LIMIT_MAX_KEYS = 10_000
+BUSY_TIMEOUT_SECONDS = 5.0
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS rate_limits (
+        key TEXT PRIMARY KEY,
+        bucket INTEGER NOT NULL,
+        count INTEGER NOT NULL,
+        previous INTEGER NOT NULL,
+        touched REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_rate_limits_touched ON rate_limits(touched)",
+    "CREATE TABLE IF NOT EXISTS rate_limit_meta (id INTEGER PRIMARY KEY CHECK (id = 0), keys INTEGER NOT NULL)",
+    "INSERT OR IGNORE INTO rate_limit_meta(id, keys) VALUES(0, 0)",
+)
+
+
+class RateLimiter:
+    """Allow at most ``limit`` failures per key within a sliding ``window``.
+
+    Storage errors are logged and treated as "not limited", so a broken
+    counter file cannot lock everyone out.
+    """
+
+    def __init__(self, path: str, limit: int, window: float, max_keys: int = RATE_LIMIT_MAX_KEYS, clock=time.time):
+        self.path = path
+        self.limit = limit
+        self.window = window
+        self.max_keys = max_keys
+        self.clock = clock
+        self._ready = False
+        self._ready_lock = threading.Lock()
+
+    def _connect(self):
+        if not self._ready:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None)
+        if not self._ready:
+            with self._ready_lock:
+                if not self._ready:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    for statement in SCHEMA:
+                        conn.execute(statement)
+                    self._ready = True
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _estimate(self, row, now: float) -> tuple[int, int, int, float]:
+        """Return (bucket, count, previous, estimate) for a stored row at ``now``."""
+        bucket = int(now // self.window)
+        count = previous = 0
+        if row is not None:
+            if row[0] == bucket:
+                count, previous = row[1], row[2]
+            elif row[0] == bucket - 1:
+                previous = row[1]
+        overlap = 1.0 - (now - bucket * self.window) / self.window
+        return bucket, count, previous, previous * overlap + count
+
+    def _read(self, conn, key: str):
+        return conn.execute("SELECT bucket, count, previous FROM rate_limits WHERE key=?", (key,)).fetchone()
+
+    def failures(self, key: str) -> float:
+        """Weighted number of failures for ``key`` in the current window."""
+        try:
+            conn = self._connect()
+            try:
+                row = self._read(conn, key)
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            logger.exception("Rate limit lookup failed")
+            return 0.0
+        return self._estimate(row, self.clock())[3]
+
+    def is_limited(self, key: str) -> bool:
+        return self.failures(key) >= self.limit
+
+    def hit(self, key: str) -> None:
+        """Record one failure for ``key``."""
+        try:
+            conn = self._connect()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                now = self.clock()
+                row = self._read(conn, key)
+                bucket, count, previous, _ = self._estimate(row, now)
+                conn.execute(
+                    "INSERT INTO rate_limits(key, bucket, count, previous, touched) VALUES(?, ?, ?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET bucket=excluded.bucket, count=excluded.count, "
+                    "previous=excluded.previous, touched=excluded.touched",
+                    (key, bucket, count + 1, previous, now),
+                )
+                if row is None:
+                    self._evict(conn)
+                conn.execute("COMMIT")
+            except BaseException:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            logger.exception("Rate limit update failed")
+
+    def _evict(self, conn) -> None:
+        conn.execute("UPDATE rate_limit_meta SET keys = keys + 1 WHERE id=0")
+        keys = conn.execute("SELECT keys FROM rate_limit_meta WHERE id=0").fetchone()[0]
+        excess = keys - self.max_keys
+        if excess > 0:
+            removed = conn.execute(
+                "DELETE FROM rate_limits WHERE key IN (SELECT key FROM rate_limits ORDER BY touched LIMIT ?)",
+                (excess,),
+            ).rowcount
+            conn.execute("UPDATE rate_limit_meta SET keys = keys - ? WHERE id=0", (removed,))
+
+    def reset(self, key: str) -> None:
+        """Forget the failures of ``key`` (after a successful attempt)."""
+        try:
+            conn = self._connect()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                if conn.execute("DELETE FROM rate_limits WHERE key=?", (key,)).rowcount:
+                    conn.execute("UPDATE rate_limit_meta SET keys = keys - 1 WHERE id=0")
+                conn.execute("COMMIT")
+            except BaseException:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            logger.exception("Rate limit reset failed")
+
+    def clear(self) -> None:
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM rate_limits")
+            conn.execute("UPDATE rate_limit_meta SET keys = 0 WHERE id=0")
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def __len__(self) -> int:
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT keys FROM rate_limit_meta WHERE id=0").fetchone()[0]
+        finally:
+            conn.close()
@@ -0,0 +1,97 @@
+"""Tiered retention for prompt version history.
+
+A version survives pruning if it is among the newest ``keep_last`` versions,
+is the last version of a day (within ``daily_days``) or of a week (within
+``weekly_weeks``), or has been pinned or labelled by the user.
+
+Only versions older than the ``keep_last`` boundary are examined: one
+indexed probe finds the boundary (and skips everything when the prompt has
+no more than ``keep_last`` versions), and the candidate query is a range
+scan below it on the ``(prompt_id, created_at, id)`` index. Day and week
+checkpoints are tested with a probe for a newer version in the same day or
+week, so the cost follows the number of versions past the boundary (those
+being pruned plus the checkpoints and marked versions still kept), not the
+length of the history. The selected ids are returned to the caller, which
+deletes or archives them in chunks because surviving deltas may need to be
+re-based first.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+
+DEFAULT_KEEP_LAST = 200
+_NEVER = "9999"
+
+_BOUNDARY_SQL = """
+SELECT created_at, id FROM versions
+WHERE prompt_id = ?
+ORDER BY created_at DESC, id DESC
+LIMIT 1 OFFSET ?
+"""
+
+# A version is a day (week) checkpoint when no newer version of the prompt
+# falls in the same day (week). Each probe is a short range on the
+# (prompt_id, created_at, id) index starting at the candidate itself.
+_PRUNABLE_SQL = """
+SELECT c.id FROM versions c
+WHERE c.prompt_id = :prompt_id
+  AND (c.created_at < :boundary_at OR (c.created_at = :boundary_at AND c.id <= :boundary_id))
+  AND c.id IS NOT (SELECT current_version_id FROM prompts WHERE id = :prompt_id)
+  AND NOT (:keep_marked AND (COALESCE(c.pinned, 0) = 1 OR COALESCE(c.label, '') != ''))
+  AND NOT (c.created_at >= :daily_cutoff AND NOT EXISTS (
+      SELECT 1 FROM versions n
+      WHERE n.prompt_id = c.prompt_id
+        AND n.created_at >= c.created_at
+        AND n.created_at < date(substr(c.created_at, 1, 10), '+1 day')
+        AND (n.created_at > c.created_at OR n.id > c.id)
+  ))
+  AND NOT (c.created_at >= :weekly_cutoff AND NOT EXISTS (
+      SELECT 1 FROM versions n
+      WHERE n.prompt_id = c.prompt_id
+        AND n.created_at >= c.created_at
+        AND n.created_at < date(substr(c.created_at, 1, 10), '+1 day', 'weekday 1')
+        AND strftime('%Y-%W', n.created_at) = strftime('%Y-%W', c.created_at)
+        AND (n.created_at > c.created_at OR n.id > c.id)
+  ))
+ORDER BY c.created_at, c.id
+"""
+
+
+@dataclass(frozen=True)
+class RetentionPolicy:
+    keep_last: int = DEFAULT_KEEP_LAST
+    daily_days: int = 0
+    weekly_weeks: int = 0
+    keep_marked: bool = True
+    archive: bool = False
+
+
+def _cutoff(now: datetime, days: int) -> str:
+    if days <= 0:
+        return _NEVER
+    return (now - timedelta(days=days)).date().isoformat()
+
+
+def prunable_version_ids(conn, prompt_id, policy: RetentionPolicy, now: datetime | None = None) -> list[int]:
+    """Return ids of versions the policy no longer retains, oldest first."""
+    keep_last = max(1, int(policy.keep_last))
+    # Nothing beyond the newest N means nothing can be pruned.
+    boundary = conn.execute(_BOUNDARY_SQL, (prompt_id, keep_last)).fetchone()
+    if boundary is None:
+        return []
+    now = now or datetime.utcnow()
+    rows = conn.execute(
+        _PRUNABLE_SQL,
+        {
+            "prompt_id": prompt_id,
+            "boundary_at": boundary[0],
+            "boundary_id": boundary[1],
+            "keep_marked": 1 if policy.keep_marked else 0,
+            "daily_cutoff": _cutoff(now, policy.daily_days),
+            "weekly_cutoff": _cutoff(now, policy.weekly_weeks * 7),
+        },
+    ).fetchall()
+    return [row[0] for row in rows]
@@ -0,0 +1,339 @@
+"""Optional server-side sessions: the cookie carries only a signed session id.
+
+Flask's default session serializes the whole session into a signed cookie,
+which is sent, parsed and verified on every request. With a server-side
+backend the data stays in a store keyed by a random session id:
+
+- ``SqliteSessionStore`` keeps sessions in their own SQLite file, shared by
+  every worker process, with a per-process cache that is revalidated by a
+  row version on each load (unchanged sessions are not decoded again).
+- ``MemorySessionStore`` keeps them in a dict; it is only correct for a
+  single process (development and tests).
+
+Sessions expire after ``lifetime`` seconds without use. Active sessions are
+extended at most every ``touch_interval`` seconds, and expired rows are
+deleted by a sweep that runs at most every ``sweep_interval`` seconds.
+
+``pack_ids`` and ``unpack_ids`` store sets of integer ids as ranges
+(``"1-5,9"``), which keeps large unlocked-prompt sets small in either
+session backend.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask.sessions import SessionInterface, SessionMixin, session_json_serializer
+from itsdangerous import BadSignature, Signer
+from werkzeug.datastructures import CallbackDict
+
+
+SESSION_LIFETIME = 7 * 24 * 3600
+SESSION_TOUCH_INTERVAL = 3600
+SESSION_SWEEP_INTERVAL = 600
+SESSION_CACHE_SIZE = 1024
+BUSY_TIMEOUT_SECONDS = 5.0
+
+logger = logging.getLogger(__name__)
+
+
+def pack_ids(ids) -> str:
+    """Encode integer ids as sorted ranges, e.g. {1, 2, 3, 9} -> "1-3,9"."""
+    parts = []
+    start = previous = None
+    for value in sorted(set(int(i) for i in ids)):
+        if previous is not None and value == previous + 1:
+            previous = value
+            continue
+        if start is not None:
+            parts.append(str(start) if start == previous else f"{start}-{previous}")
+        start = previous = value
+    if start is not None:
+        parts.append(str(start) if start == previous else f"{start}-{previous}")
+    return ",".join(parts)
+
+
+def unpack_ids(packed) -> set:
+    """Inverse of pack_ids; also accepts a plain list of ids (older sessions)."""
+    if not packed:
+        return set()
+    if isinstance(packed, (list, tuple, set)):
+        return {int(i) for i in packed}
+    ids = set()
+    for part in str(packed).split(","):
+        low, _, high = part.partition("-")
+        try:
+            ids.update(range(int(low), int(high or low) + 1))
+        except ValueError:
+            continue
+    return ids
+
+
+class MemorySessionStore:
+    """Process-local session store (single-process deployments and tests)."""
+
+    def __init__(self):
+        self._rows: dict = {}
+        self._lock = threading.Lock()
+
+    def load(self, sid: str, now: float):
+        """Return (data, expires) for a live session, or None."""
+        with self._lock:
+            row = self._rows.get(sid)
+            if row is None or row[1] <= now:
+                return None
+            return session_json_serializer.loads(row[0]), row[1]
+
+    def save(self, sid: str, data: dict, expires: float) -> None:
+        with self._lock:
+            self._rows[sid] = (session_json_serializer.dumps(data), expires)
+
+    def touch(self, sid: str, expires: float) -> None:
+        with self._lock:
+            if sid in self._rows:
+                self._rows[sid] = (self._rows[sid][0], expires)
+
+    def delete(self, sid: str) -> None:
+        with self._lock:
+            self._rows.pop(sid, None)
+
+    def sweep(self, now: float) -> int:
+        with self._lock:
+            expired = [sid for sid, row in self._rows.items() if row[1] <= now]
+            for sid in expired:
+                del self._rows[sid]
+        return len(expired)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+
+class SqliteSessionStore:
+    """Sessions in a SQLite file shared by all worker processes."""
+
+    def __init__(self, path: str, cache_size: int = SESSION_CACHE_SIZE):
+        self.path = path
+        self.cache_size = cache_size
+        self._cache: OrderedDict = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._ready = False
+        self._ready_lock = threading.Lock()
+
+    def _connect(self):
+        if not self._ready:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_SECONDS)
+        if not self._ready:
+            with self._ready_lock:
+                if not self._ready:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute(
+                        "CREATE TABLE IF NOT EXISTS sessions ("
+                        "sid TEXT PRIMARY KEY, data TEXT NOT NULL, "
+                        "version INTEGER NOT NULL, expires REAL NOT NULL)"
+                    )
+                    conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions(expires)")
+                    conn.commit()
+                    self._ready = True
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _cached(self, sid: str):
+        with self._cache_lock:
+            entry = self._cache.get(sid)
+            if entry is not None:
+                self._cache.move_to_end(sid)
+            return entry
+
+    def _remember(self, sid: str, version: int, text: str) -> None:
+        with self._cache_lock:
+            self._cache[sid] = (version, text)
+            self._cache.move_to_end(sid)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _forget(self, sid: str) -> None:
+        with self._cache_lock:
+            self._cache.pop(sid, None)
+
+    def load(self, sid: str, now: float):
+        cached = self._cached(sid)
+        known = cached[0] if cached else -1
+        conn = self._connect()
+        try:
+            # 缓存中的版本仍是最新时不再传回数据本身
+            row = conn.execute(
+                "SELECT version, expires, CASE WHEN version=? THEN NULL ELSE data END FROM sessions WHERE sid=?",
+                (known, sid),
+            ).fetchone()
+        finally:
+            conn.close()
+        if row is None or row[1] <= now:
+            self._forget(sid)
+            return None
+        version, expires, text = row
+        if text is None:
+            text = cached[1]
+        else:
+            self._remember(sid, version, text)
+        return session_json_serializer.loads(text), expires
+
+    def save(self, sid: str, data: dict, expires: float) -> None:
+        text = session_json_serializer.dumps(data)
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT INTO sessions(sid, data, version, expires) VALUES(?, ?, 1, ?) "
+                    "ON CONFLICT(sid) DO UPDATE SET data=excluded.data, version=sessions.version + 1, "
+                    "expires=excluded.expires",
+                    (sid, text, expires),
+                )
+                version = conn.execute("SELECT version FROM sessions WHERE sid=?", (sid,)).fetchone()[0]
+        finally:
+            conn.close()
+        self._remember(sid, version, text)
+
+    def touch(self, sid: str, expires: float) -> None:
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("UPDATE sessions SET expires=? WHERE sid=?", (expires, sid))
+        finally:
+            conn.close()
+
+    def delete(self, sid: str) -> None:
+        self._forget(sid)
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM sessions WHERE sid=?", (sid,))
+        finally:
+            conn.close()
+
+    def sweep(self, now: float) -> int:
+        conn = self._connect()
+        try:
+            with conn:
+                return conn.execute("DELETE FROM sessions WHERE expires<=?", (now,)).rowcount
+        finally:
+            conn.close()
+
+    def __len__(self) -> int:
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        finally:
+            conn.close()
+
+
+class ServerSideSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid: str | None = None, new: bool = False, expires: float = 0.0):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.expires = expires
+        self.modified = False
+        self.rotate = False
+
+    def regenerate(self) -> None:
+        """Move the data to a fresh session id (call on privilege changes)."""
+        self.rotate = True
+        self.modified = True
+
+
+class ServerSessionInterface(SessionInterface):
+    """Flask session interface over a MemorySessionStore or SqliteSessionStore."""
+
+    def __init__(
+        self,
+        store,
+        lifetime: float = SESSION_LIFETIME,
+        touch_interval: float = SESSION_TOUCH_INTERVAL,
+        sweep_interval: float = SESSION_SWEEP_INTERVAL,
+        clock=time.time,
+    ):
+        self.store = store
+        self.lifetime = lifetime
+        self.touch_interval = min(touch_interval, lifetime / 2)
+        self.sweep_interval = sweep_interval
+        self.clock = clock
+        self._next_sweep = 0.0
+        self._sweep_lock = threading.Lock()
+
+    def _signer(self, app):
+        return Signer(app.secret_key, salt="server-session")
+
+    def _sweep(self, now: float) -> None:
+        with self._sweep_lock:
+            if now < self._next_sweep:
+                return
+            self._next_sweep = now + self.sweep_interval
+        try:
+            self.store.sweep(now)
+        except Exception:
+            logger.exception("Session sweep failed")
+
+    def open_session(self, app, request):
+        now = self.clock()
+        self._sweep(now)
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                sid = self._signer(app).unsign(cookie).decode("ascii")
+            except (BadSignature, UnicodeDecodeError):
+                sid = None
+            if sid:
+                loaded = self.store.load(sid, now)
+                if loaded is not None:
+                    data, expires = loaded
+                    return ServerSideSession(data, sid=sid, expires=expires)
+        return ServerSideSession(new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        if session.accessed:
+            response.vary.add("Cookie")
+        if not session:
+            if session.sid:
+                self.store.delete(session.sid)
+            if session.modified or session.sid:
+                response.delete_cookie(name, domain=domain, path=path)
+                response.vary.add("Cookie")
+            return
+
+        now = self.clock()
+        expires = now + self.lifetime
+        if session.rotate or not session.sid:
+            if session.sid:
+                self.store.delete(session.sid)
+            session.sid = secrets.token_urlsafe(32)
+            self.store.save(session.sid, dict(session), expires)
+        elif session.modified:
+            self.store.save(session.sid, dict(session), expires)
+            return
+        else:
+            if session.expires - now < self.lifetime - self.touch_interval:
+                self.store.touch(session.sid, expires)
+            return
+        response.set_cookie(
+            name,
+            self._signer(app).sign(session.sid).decode("ascii"),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+        response.vary.add("Cookie")
@@ -0,0 +1,148 @@
+"""Point-in-time ("as of T") view of the prompt library.
+
+For every prompt the version in effect at T is the newest one created at or
+before T. It is resolved with one statement: a correlated ``ORDER BY
+created_at DESC LIMIT 1`` subquery per prompt (the SQLite equivalent of a
+lateral join) that seeks the ``(prompt_id, created_at, id)`` index instead of
+scanning history. Versions that retention moved to ``versions_archive`` are
+looked up the same way, so pruning does not silently change the past.
+When retention deletes versions without archiving them, the prompt keeps
+the time span of what was deleted; a pick that such a deletion may have
+superseded at T is returned with ``pruned_gap`` set rather than passed off
+as the version in effect.
+
+Only version content is historical; prompt metadata (name, tags, cover) is
+shown as it is now.
+"""
+
+from __future__ import annotations
+
+from datetime import date, datetime, time, timezone
+
+import version_store
+
+
+_AS_OF_SQL = """
+SELECT p.id AS prompt_id,
+       (SELECT v.id FROM versions v
+        WHERE v.prompt_id = p.id AND v.created_at <= :as_of
+        ORDER BY v.created_at DESC, v.id DESC LIMIT 1) AS version_id,
+       (SELECT a.id FROM versions_archive a
+        WHERE a.prompt_id = p.id AND a.created_at <= :as_of
+        ORDER BY a.created_at DESC, a.id DESC LIMIT 1) AS archived_id,
+       p.history_pruned_from, p.history_pruned_to
+FROM prompts p
+{where}
+"""
+
+
+def parse_as_of(value) -> str | None:
+    """Normalize a user supplied date/time to the UTC ISO form of created_at.
+
+    A bare date means the end of that day. Returns None for empty or
+    unparseable input.
+    """
+    text = (value or "").strip() if isinstance(value, str) else ""
+    if not text:
+        return None
+    try:
+        if len(text) == 10:
+            return datetime.combine(date.fromisoformat(text), time.max).isoformat()
+        moment = datetime.fromisoformat(text.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment.isoformat()
+
+
+def note_pruned(conn, prompt_id, version_ids) -> None:
+    """Widen the prompt's pruned span to cover versions about to be deleted."""
+    ids = list(version_ids)
+    first = last = None
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        row = conn.execute(
+            f"SELECT MIN(created_at) AS first, MAX(created_at) AS last FROM versions WHERE id IN ({','.join('?' * len(chunk))})",
+            chunk,
+        ).fetchone()
+        if row["first"] is not None:
+            first = row["first"] if first is None else min(first, row["first"])
+            last = row["last"] if last is None else max(last, row["last"])
+    if first is None:
+        return
+    conn.execute(
+        "UPDATE prompts SET history_pruned_from = MIN(COALESCE(history_pruned_from, :first), :first),"
+        " history_pruned_to = MAX(COALESCE(history_pruned_to, :last), :last) WHERE id = :id",
+        {"first": first, "last": last, "id": prompt_id},
+    )
+
+
+def _rows_by_id(conn, table: str, ids) -> dict:
+    found = {}
+    ids = list(ids)
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        rows = conn.execute(
+            f"SELECT id, prompt_id, version, created_at FROM {table} WHERE id IN ({','.join('?' * len(chunk))})",
+            chunk,
+        ).fetchall()
+        found.update((r["id"], r) for r in rows)
+    return found
+
+
+def resolve(conn, as_of: str, prompt_ids=None) -> dict:
+    """Map prompt id -> the version in effect at ``as_of``.
+
+    Each value is a dict with id, prompt_id, version, created_at,
+    ``archived`` and ``pruned_gap``. The latter is True when versions deleted
+    by retention fall between the pick and ``as_of``, so the version really
+    in effect may be gone. Prompts without any version at that time are
+    absent.
+    """
+    where = ""
+    params: dict = {"as_of": as_of}
+    if prompt_ids is not None:
+        ids = sorted(set(prompt_ids))
+        if not ids:
+            return {}
+        where = f"WHERE p.id IN ({','.join(f':p{i}' for i in range(len(ids)))})"
+        params.update((f"p{i}", pid) for i, pid in enumerate(ids))
+    picks = conn.execute(_AS_OF_SQL.format(where=where), params).fetchall()
+    live = _rows_by_id(conn, "versions", [r["version_id"] for r in picks if r["version_id"]])
+    archived = _rows_by_id(conn, "versions_archive", [r["archived_id"] for r in picks if r["archived_id"]])
+    result = {}
+    for pick in picks:
+        candidates = []
+        if pick["version_id"] in live:
+            candidates.append((live[pick["version_id"]], False))
+        if pick["archived_id"] in archived:
+            candidates.append((archived[pick["archived_id"]], True))
+        if not candidates:
+            continue
+        row, is_archived = max(candidates, key=lambda c: (c[0]["created_at"] or "", c[0]["id"]))
+        pruned_from, pruned_to = pick["history_pruned_from"], pick["history_pruned_to"]
+        result[pick["prompt_id"]] = {
+            "id": row["id"],
+            "prompt_id": row["prompt_id"],
+            "version": row["version"],
+            "created_at": row["created_at"],
+            "archived": is_archived,
+            "pruned_gap": bool(pruned_from and pruned_from <= as_of and pruned_to > (row["created_at"] or "")),
+        }
+    return result
+
+
+def load_content(conn, entry) -> str | None:
+    """Full text of a resolved snapshot entry."""
+    if not entry["archived"]:
+        return version_store.load_content(conn, entry["id"])
+    row = conn.execute("SELECT content, codec FROM versions_archive WHERE id=?", (entry["id"],)).fetchone()
+    return version_store.decompress_payload(row["content"], row["codec"]) if row else None
+
+
+def with_content(conn, snapshot: dict) -> dict:
+    """Attach ``content`` to every entry of a resolved snapshot."""
+    for entry in snapshot.values():
+        entry["content"] = load_content(conn, entry)
+    return snapshot
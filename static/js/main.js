@@ -418,6 +418,185 @@ document.addEventListener('DOMContentLoaded', () => {
   });
 });
 
+// Version diff: render compact JSON rows, switch versions/modes without reload
+(function(){
+  const ROW_CLASS = { '=': '', '-': 'del', '+': 'ins', '!': 'chg' };
+
+  function cell(side, content) {
+    const td = document.createElement('td');
+    td.className = side;
+    if (content) td.appendChild(content);
+    return td;
+  }
+  function highlight(text, spans, css) {
+    const frag = document.createDocumentFragment();
+    if (!spans) {
+      const mark = document.createElement('span');
+      mark.className = css;
+      mark.textContent = text;
+      frag.appendChild(mark);
+      return frag;
+    }
+    let pos = 0;
+    for (let k = 0; k < spans.length; k += 2) {
+      const start = spans[k];
+      const end = spans[k + 1];
+      if (start > pos) frag.appendChild(document.createTextNode(text.slice(pos, start)));
+      const mark = document.createElement('span');
+      mark.className = css;
+      mark.textContent = text.slice(start, end);
+      frag.appendChild(mark);
+      pos = end;
+    }
+    if (pos < text.length) frag.appendChild(document.createTextNode(text.slice(pos)));
+    return frag;
+  }
+  function renderRows(rows, labels) {
+    const frag = document.createDocumentFragment();
+    rows.forEach(row => {
+      const op = row[0];
+      const tr = document.createElement('tr');
+      if (op === '~') {
+        tr.className = 'diff-skip';
+        const td = document.createElement('td');
+        td.colSpan = 2;
+        const button = document.createElement('button');
+        button.type = 'button';
+        button.className = 'diff-expand';
+        button.dataset.a = row[1];
+        button.dataset.b = row[2];
+        button.dataset.count = row[3];
+        button.textContent = labels.expand.replace('{count}', row[3]);
+        td.appendChild(button);
+        tr.appendChild(td);
+        frag.appendChild(tr);
+        return;
+      }
+      tr.className = ROW_CLASS[op] || '';
+      if (op === '=') {
+        tr.appendChild(cell('cell-left', document.createTextNode(row[3])));
+        tr.appendChild(cell('cell-right', document.createTextNode(row[3])));
+      } else if (op === '-') {
+        tr.appendChild(cell('cell-left', highlight(row[2], null, 'diff-del')));
+        tr.appendChild(cell('cell-right'));
+      } else if (op === '+') {
+        tr.appendChild(cell('cell-left'));
+        tr.appendChild(cell('cell-right', highlight(row[2], null, 'diff-ins')));
+      } else {
+        tr.appendChild(cell('cell-left', highlight(row[3], row[5] || null, 'diff-del')));
+        tr.appendChild(cell('cell-right', highlight(row[4], row[6] || null, 'diff-ins')));
+      }
+      frag.appendChild(tr);
+    });
+    return frag;
+  }
+  function renderDiff(container, diff, labels) {
+    container.textContent = '';
+    if (diff.degraded && labels.degraded) {
+      const notice = document.createElement('div');
+      notice.className = 'diff-notice';
+      notice.textContent = labels.degraded;
+      container.appendChild(notice);
+    }
+    const table = document.createElement('table');
+    table.className = `diff-table diff-mode-${diff.mode}`;
+    const head = table.createTHead().insertRow();
+    [labels.left, labels.right].forEach(text => {
+      const th = document.createElement('th');
+      th.textContent = text;
+      head.appendChild(th);
+    });
+    const body = table.createTBody();
+    body.appendChild(renderRows(diff.rows, labels));
+    container.appendChild(table);
+  }
+  function versionLabel(version) {
+    return `${version.version} · ${(version.created_at || '').slice(0, 19).replace('T', ' ')}`;
+  }
+
+  document.addEventListener('DOMContentLoaded', () => {
+    const container = document.getElementById('diffView');
+    const dataEl = document.getElementById('diffData');
+    if (!container || !dataEl) return;
+    const form = document.getElementById('diffForm');
+    const labels = {
+      left: container.dataset.labelLeft,
+      right: container.dataset.labelRight,
+      expand: container.dataset.labelExpand,
+      degraded: container.dataset.labelDegraded,
+      error: container.dataset.labelError,
+    };
+    let state = JSON.parse(dataEl.textContent);
+    let pending = null;
+
+    function show(data) {
+      state = data;
+      renderDiff(container, data.diff, labels);
+      ['left', 'right'].forEach(side => {
+        const label = document.querySelector(`[data-diff-side="${side}"]`);
+        if (label) label.textContent = versionLabel(data[side]);
+        if (form && form.elements[side]) form.elements[side].value = String(data[side].id);
+      });
+    }
+
+    async function load() {
+      const params = new URLSearchParams(new FormData(form));
+      if (pending) pending.abort();
+      pending = new AbortController();
+      container.classList.add('is-loading');
+      try {
+        const response = await fetch(`${container.dataset.apiUrl}?${params}`, {
+          headers: { 'Accept': 'application/json' }, credentials: 'same-origin', signal: pending.signal
+        });
+        if (!response.ok) {
+          // 需要解锁等情况交给完整页面处理
+          form.submit();
+          return;
+        }
+        show(await response.json());
+        history.replaceState(null, '', `${form.action}?${params}`);
+      } catch (error) {
+        if (error.name !== 'AbortError') console.error('Load diff error:', error);
+      } finally {
+        container.classList.remove('is-loading');
+      }
+    }
+
+    show(state);
+    if (form) {
+      form.addEventListener('change', (event) => {
+        if (event.target.matches('select')) load();
+      });
+      form.addEventListener('submit', (event) => {
+        event.preventDefault();
+        load();
+      });
+    }
+
+    container.addEventListener('click', async (event) => {
+      const button = event.target.closest('.diff-expand');
+      if (!button) return;
+      const row = button.closest('tr');
+      const params = new URLSearchParams({
+        left: state.left.id, a: button.dataset.a, b: button.dataset.b, count: button.dataset.count
+      });
+      button.disabled = true;
+      try {
+        const response = await fetch(`${container.dataset.contextUrl}?${params}`, {
+          headers: { 'Accept': 'application/json' }, credentials: 'same-origin'
+        });
+        if (!response.ok) throw new Error(`HTTP ${response.status}`);
+        const data = await response.json();
+        row.replaceWith(renderRows(data.rows, labels));
+      } catch (error) {
+        console.error('Expand context error:', error);
+        button.disabled = false;
+        button.title = labels.error;
+      }
+    });
+  });
+})();
+
 // Add utility functions
 const utils = {
   // Debounce function for search
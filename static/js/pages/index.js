@@ -0,0 +1,317 @@
+// 抽屉侧边栏：仅桌面端显示，覆盖式，不挤压内容
+(function() {
+  const panel = document.getElementById('sidebarPanel');
+  const toggle = document.getElementById('sidebarToggle');
+  const closeBtn = document.getElementById('drawerCloseBtn');
+  if (!panel || !toggle) return;
+
+  const SBW = 280; // 与 --drawer-w 同步
+  const key = 'sidebarOpen';
+  const saved = localStorage.getItem(key);
+  if (saved === 'true') {
+    panel.dataset.open = 'true';
+    panel.setAttribute('aria-hidden', 'false');
+    toggle.style.left = '0px';
+    toggle.style.display = 'none';
+    toggle.innerHTML = '<i class="fas fa-angle-left"></i>';
+    toggle.setAttribute('data-open', 'true');
+    if (closeBtn) closeBtn.style.display = 'inline-flex';
+  }
+
+  function setOpen(open) {
+    panel.dataset.open = open ? 'true' : 'false';
+    panel.setAttribute('aria-hidden', open ? 'false' : 'true');
+    localStorage.setItem(key, String(open));
+    toggle.style.left = '0px';
+    toggle.innerHTML = open ? '<i class="fas fa-angle-left"></i>' : '<i class="fas fa-angle-right"></i>';
+    toggle.setAttribute('data-open', open ? 'true' : 'false');
+    // 打开时隐藏外侧按钮，显示抽屉内关闭按钮；收起相反
+    toggle.style.display = open ? 'none' : 'inline-flex';
+    if (closeBtn) closeBtn.style.display = open ? 'inline-flex' : 'none';
+    toggle.classList.remove('clicked');
+    // 触发轻微弹跳动画
+    requestAnimationFrame(() => {
+      toggle.classList.add('clicked');
+      setTimeout(() => toggle.classList.remove('clicked'), 200);
+    });
+  }
+
+  toggle.addEventListener('click', () => {
+    const isOpen = panel.dataset.open === 'true';
+    setOpen(!isOpen);
+  });
+  if (closeBtn) {
+    closeBtn.addEventListener('click', () => setOpen(false));
+  }
+
+  // 点击抽屉外部区域关闭（可选：目前不加遮罩，保持轻量）
+})();
+
+  // 构建查询并跳转
+  function applyFilters() {
+    const params = new URLSearchParams(window.location.search);
+    // 保留搜索、排序与封面筛选
+    const keep = {
+      q: params.get('q') || '',
+      sort: params.get('sort') || '',
+      cover: params.get('cover') || ''
+    };
+    params.forEach((_, k) => { if (!['q','sort','cover'].includes(k)) params.delete(k); });
+
+    // tags
+    const tags = Array.from(document.querySelectorAll('input[name="ftag"]:checked')).map(i => i.value);
+    tags.forEach(t => params.append('tag', t));
+    // sources
+    const srcs = Array.from(document.querySelectorAll('input[name="fsrc"]:checked')).map(i => i.value);
+    srcs.forEach(s => params.append('source', s));
+
+    if (keep.q) params.set('q', keep.q);
+    if (keep.sort) params.set('sort', keep.sort);
+    if (keep.cover && keep.cover !== 'all') params.set('cover', keep.cover);
+    const url = `${window.location.pathname}?${params.toString()}`;
+    window.location.assign(url);
+  }
+
+  // 绑定复选框事件
+  document.querySelectorAll('input[name="ftag"], input[name="fsrc"]').forEach(el => {
+    el.addEventListener('change', applyFilters);
+  });
+  // 重置按钮
+  document.querySelectorAll('.reset-btn').forEach(btn => {
+    btn.addEventListener('click', () => {
+      const type = btn.dataset.reset;
+      if (type === 'tags') {
+        document.querySelectorAll('input[name="ftag"]').forEach(i => i.checked = false);
+      } else if (type === 'sources') {
+        document.querySelectorAll('input[name="fsrc"]').forEach(i => i.checked = false);
+      }
+      applyFilters();
+    });
+  });
+
+  // 清空筛选按钮（空结果时显示）
+  const clearBtn = document.getElementById('clearFiltersBtn');
+  if (clearBtn) {
+    clearBtn.addEventListener('click', () => {
+      const params = new URLSearchParams();
+      const sort = new URLSearchParams(window.location.search).get('sort');
+      if (sort) params.set('sort', sort);
+      const query = params.toString();
+      window.location.assign(query ? `${window.location.pathname}?${query}` : window.location.pathname);
+    });
+  }
+
+// 视图切换：在桌面端于列表上方显示，按钮图标在网格/列表间切换
+(function() {
+  const listEl = document.getElementById('promptList');
+  const btn = document.getElementById('viewModeToggle');
+  if (!listEl || !btn) return;
+
+  // 仅桌面端展示切换
+  const isDesktop = () => window.matchMedia('(min-width: 769px)').matches;
+
+  // 恢复偏好
+  const saved = localStorage.getItem('viewMode') || 'grid';
+  setMode(saved);
+
+  // 绑定事件
+  btn.addEventListener('click', () => {
+    const next = listEl.classList.contains('grid-view') ? 'list' : 'grid';
+    setMode(next);
+    localStorage.setItem('viewMode', next);
+  });
+
+  // 根据窗口变化（如缩放到移动端）调整可见性与布局
+  window.addEventListener('resize', () => {
+    if (!isDesktop()) {
+      btn.setAttribute('aria-pressed', 'false');
+    } else {
+      const current = localStorage.getItem('viewMode') || 'grid';
+      setMode(current);
+    }
+  });
+
+  function setMode(mode) {
+    if (mode === 'list') {
+      listEl.classList.remove('grid-view');
+      listEl.classList.add('list-view');
+      btn.setAttribute('aria-pressed', 'true');
+      btn.innerHTML = '<i class="fas fa-list"></i>';
+    } else {
+      listEl.classList.remove('list-view');
+      listEl.classList.add('grid-view');
+      btn.setAttribute('aria-pressed', 'false');
+      btn.innerHTML = '<i class="fas fa-table-cells"></i>';
+    }
+  }
+})();
+
+(function setupCoverLightbox() {
+  const lightbox = document.getElementById('coverLightbox');
+  const lightboxImage = document.getElementById('coverLightboxImage');
+  const closeButton = lightbox?.querySelector('.cover-lightbox-close');
+  if (!lightbox || !lightboxImage || !closeButton) return;
+  let previousFocus = null;
+  let loadingTrigger = null;
+  let openRequestId = 0;
+  const coverCache = new Map();
+
+  function setLoading(trigger, loading) {
+    if (!trigger) return;
+    const icon = trigger.querySelector('.cover-expand-btn i');
+    trigger.setAttribute('aria-busy', loading ? 'true' : 'false');
+    if (icon) {
+      icon.className = loading ? 'fas fa-spinner fa-spin' : 'fas fa-expand';
+    }
+  }
+
+  function preloadCover(url) {
+    if (coverCache.has(url)) return coverCache.get(url);
+
+    const loadPromise = new Promise((resolve, reject) => {
+      const image = new Image();
+      image.onload = async () => {
+        try {
+          if (typeof image.decode === 'function') await image.decode();
+        } catch (_) {
+          // onload 已确认图片可用；个别浏览器可能仍拒绝 decode()。
+        }
+        resolve(url);
+      };
+      image.onerror = reject;
+      image.src = url;
+    });
+
+    coverCache.set(url, loadPromise);
+    loadPromise.catch(() => coverCache.delete(url));
+    return loadPromise;
+  }
+
+  async function open(trigger) {
+    const url = trigger.dataset.coverUrl;
+    if (!url || trigger.classList.contains('is-broken')) return;
+    const requestId = ++openRequestId;
+
+    setLoading(loadingTrigger, false);
+    loadingTrigger = trigger;
+    setLoading(trigger, true);
+    previousFocus = document.activeElement;
+
+    try {
+      await preloadCover(url);
+      if (requestId !== openRequestId) return;
+
+      lightboxImage.src = url;
+      lightboxImage.alt = trigger.dataset.coverAlt || '';
+      lightbox.hidden = false;
+      lightbox.setAttribute('aria-hidden', 'false');
+      document.body.style.overflow = 'hidden';
+      closeButton.focus();
+    } catch (_) {
+      if (requestId === openRequestId) {
+        trigger.classList.add('is-broken');
+      }
+    } finally {
+      if (requestId === openRequestId) {
+        setLoading(loadingTrigger, false);
+        loadingTrigger = null;
+      }
+    }
+  }
+
+  function close() {
+    openRequestId += 1;
+    setLoading(loadingTrigger, false);
+    loadingTrigger = null;
+    lightbox.hidden = true;
+    lightbox.setAttribute('aria-hidden', 'true');
+    lightboxImage.removeAttribute('src');
+    document.body.style.overflow = '';
+    previousFocus?.focus();
+  }
+
+  document.querySelectorAll('.cover-lightbox-trigger').forEach(trigger => {
+    const image = trigger.querySelector('.card-image');
+    image?.addEventListener('error', () => trigger.classList.add('is-broken'));
+    trigger.querySelector('.cover-image-hit')?.addEventListener('click', () => open(trigger));
+    trigger.querySelector('.cover-expand-btn')?.addEventListener('click', () => open(trigger));
+  });
+  closeButton.addEventListener('click', close);
+  lightbox.addEventListener('click', event => {
+    if (event.target === lightbox) close();
+  });
+  document.addEventListener('keydown', event => {
+    if (!lightbox.hidden && event.key === 'Escape') close();
+    if (!lightbox.hidden && event.key === 'Tab') {
+      event.preventDefault();
+      closeButton.focus();
+    }
+  });
+})();
+
+async function copyPreviewContent(button) {
+  const content = button.getAttribute('data-content');
+
+  if (!content) {
+    return;
+  }
+
+  // Check if clipboard API is available
+  if (!navigator.clipboard) {
+    fallbackCopyTextToClipboard(content, button);
+    return;
+  }
+
+  try {
+    await navigator.clipboard.writeText(content);
+
+    // Show success feedback
+    const originalHTML = button.innerHTML;
+    button.innerHTML = '<i class="fas fa-check"></i>';
+    button.classList.add('copied');
+
+    setTimeout(() => {
+      button.innerHTML = originalHTML;
+      button.classList.remove('copied');
+    }, 2000);
+  } catch (err) {
+    console.error('Clipboard API failed:', err);
+    // Fallback to traditional method
+    fallbackCopyTextToClipboard(content, button);
+  }
+}
+
+function fallbackCopyTextToClipboard(text, button) {
+  const textArea = document.createElement("textarea");
+  textArea.value = text;
+
+  // Avoid scrolling to bottom
+  textArea.style.top = "0";
+  textArea.style.left = "0";
+  textArea.style.position = "fixed";
+
+  document.body.appendChild(textArea);
+  textArea.focus();
+  textArea.select();
+
+  try {
+    const successful = document.execCommand('copy');
+    if (successful) {
+      const originalHTML = button.innerHTML;
+      button.innerHTML = '<i class="fas fa-check"></i>';
+      button.classList.add('copied');
+
+      setTimeout(() => {
+        button.innerHTML = originalHTML;
+        button.classList.remove('copied');
+      }, 2000);
+    } else {
+      throw new Error('execCommand failed');
+    }
+  } catch (err) {
+    console.error('Fallback copy failed:', err);
+    alert('复制失败，请手动选择文本复制');
+  }
+
+  document.body.removeChild(textArea);
+}
@@ -0,0 +1,707 @@
+// 页面数据（文案等）由模板以 JSON 提供
+const PAGE_DATA = JSON.parse(document.getElementById('pageData').textContent);
+const I18N = PAGE_DATA.i18n;
+// Auto-resize toggle state (default: off)
+let autoResizeEnabled = false;
+
+document.addEventListener('DOMContentLoaded', () => {
+  // Initialize form interactions
+  initializeForm();
+
+  // Textarea setup (no auto-resize by default)
+  const textarea = document.getElementById('content');
+  if (textarea) {
+    updateCharCounter(textarea);
+
+    textarea.addEventListener('input', () => {
+      if (autoResizeEnabled) {
+        autoResizeTextarea(textarea);
+      }
+      updateCharCounter(textarea);
+    });
+  }
+
+  // Setup tag autocomplete
+  setupTagAutocomplete();
+
+  // Initialize collapsible sections
+  initializeCollapsibleSections();
+
+  const deletePasswordInput = document.getElementById('deletePasswordInput');
+  if (deletePasswordInput) {
+    deletePasswordInput.addEventListener('keydown', (e) => {
+      if (e.key === 'Enter') {
+        e.preventDefault();
+        submitDelete();
+      }
+    });
+  }
+});
+
+function initializeForm() {
+  const form = document.querySelector('.prompt-form');
+  const submitBtn = form.querySelector('button[type="submit"]');
+  const imageInput = document.getElementById('image_file');
+  // 时间点快照只读，没有提交按钮
+  if (!submitBtn) return;
+
+  // Store original button text
+  submitBtn.dataset.originalText = submitBtn.textContent.trim();
+
+  // Form submission handler
+  form.addEventListener('submit', (e) => {
+    if (imageInput && imageInput.files && imageInput.files[0]) {
+      const file = imageInput.files[0];
+      const coverError = validateCoverFile(file);
+      if (coverError) {
+        e.preventDefault();
+        showCoverClientError(coverError);
+        return;
+      }
+    }
+
+    if (!validateForm()) {
+      e.preventDefault();
+      return;
+    }
+
+    // Show loading state
+    submitBtn.disabled = true;
+    submitBtn.innerHTML = '<span class="loading"></span> ' + I18N.SAVE_PROCESSING;
+
+    // Re-enable after 5 seconds (fallback)
+    setTimeout(() => {
+      submitBtn.disabled = false;
+      submitBtn.innerHTML = submitBtn.dataset.originalText;
+    }, 5000);
+  });
+}
+
+function triggerDelete() {
+  const modal = document.getElementById('deleteModal');
+  const error = document.getElementById('deletePasswordError');
+  const confirmBtn = document.getElementById('deleteConfirmBtn');
+  const passwordInput = document.getElementById('deletePasswordInput');
+  if (!modal) return;
+
+  if (error) error.textContent = '';
+  if (confirmBtn) {
+    confirmBtn.disabled = false;
+    confirmBtn.innerHTML = '<i class="fas fa-trash"></i> ' + I18N.DELETE_CONFIRM;
+  }
+  if (passwordInput) passwordInput.value = '';
+  modal.style.display = 'block';
+  setTimeout(() => {
+    if (passwordInput) passwordInput.focus();
+    else if (confirmBtn) confirmBtn.focus();
+  }, 0);
+}
+
+function closeDeleteModal() {
+  const modal = document.getElementById('deleteModal');
+  if (modal) modal.style.display = 'none';
+}
+
+function submitDelete() {
+  const form = document.getElementById('deleteForm');
+  const passwordField = document.getElementById('deletePasswordField');
+  const passwordInput = document.getElementById('deletePasswordInput');
+  const error = document.getElementById('deletePasswordError');
+  const confirmBtn = document.getElementById('deleteConfirmBtn');
+
+  if (passwordInput && !passwordInput.value.trim()) {
+    if (error) error.textContent = I18N.DELETE_PASSWORD_REQUIRED;
+    passwordInput.focus();
+    return;
+  }
+
+  if (passwordField) passwordField.value = passwordInput ? passwordInput.value : '';
+  if (confirmBtn) {
+    confirmBtn.disabled = true;
+    confirmBtn.innerHTML = '<span class="loading"></span> ' + I18N.DELETE_PROCESSING;
+  }
+  if (form) form.submit();
+}
+
+function autoResizeTextarea(textarea) {
+  textarea.style.height = 'auto';
+  textarea.style.height = Math.max(200, textarea.scrollHeight) + 'px';
+}
+
+function updateCharCounter(textarea) {
+  const counter = document.querySelector('.char-counter');
+  if (counter) {
+    const length = textarea.value.length;
+    counter.textContent = `${length} ` + I18N.CHAR;
+
+    // Change color based on length
+    if (length > 2000) {
+      counter.style.color = 'var(--del)';
+    } else if (length > 1000) {
+      counter.style.color = 'var(--ins)';
+    } else {
+      counter.style.color = 'var(--muted)';
+    }
+  }
+}
+
+function setupTagAutocomplete() {
+  const tagsInput = document.getElementById('tags');
+  if (!tagsInput) return;
+
+  let suggestions = [];
+
+  // Fetch tag suggestions
+  fetch('/api/tags')
+    .then(r => r.json())
+    .then(list => {
+      suggestions = list;
+      createAutocompleteDropdown(tagsInput, suggestions);
+    })
+    .catch(() => {});
+}
+
+function createAutocompleteDropdown(input, suggestions) {
+  const dropdown = document.createElement('div');
+  dropdown.className = 'tag-suggestions';
+  dropdown.style.cssText = `
+    position: absolute;
+    top: 100%;
+    left: 0;
+    right: 0;
+    background: var(--card);
+    border: 1px solid var(--border);
+    border-radius: 8px;
+    max-height: 200px;
+    overflow-y: auto;
+    z-index: 100;
+    display: none;
+    box-shadow: 0 4px 16px var(--shadow);
+  `;
+
+  input.parentNode.style.position = 'relative';
+  input.parentNode.appendChild(dropdown);
+
+  // Show/hide dropdown
+  input.addEventListener('focus', () => showSuggestions(input, dropdown, suggestions));
+  input.addEventListener('input', () => showSuggestions(input, dropdown, suggestions));
+  input.addEventListener('blur', () => {
+    setTimeout(() => dropdown.style.display = 'none', 200);
+  });
+}
+
+function showSuggestions(input, dropdown, suggestions) {
+  const val = input.value;
+  const parts = val.replace(/，/g, ',').split(',');
+  const lastPart = parts[parts.length - 1] || '';
+  const lastTag = lastPart.trim();
+
+  if (lastTag.length >= 1) {
+    const matches = suggestions.filter(tag => 
+      tag.toLowerCase().includes(lastTag.toLowerCase())
+    ).slice(0, 5);
+
+    if (matches.length > 0) {
+      dropdown.innerHTML = matches.map(tag => 
+        `<div class="tag-suggestion" style="padding: 8px 12px; cursor: pointer; transition: background 0.2s ease;" data-tag="${tag}">
+          ${highlightMatch(tag, lastTag)}
+        </div>`
+      ).join('');
+
+      dropdown.style.display = 'block';
+
+      // Add click handlers
+      dropdown.querySelectorAll('.tag-suggestion').forEach(item => {
+        item.addEventListener('click', () => {
+          const tag = item.dataset.tag;
+          parts[parts.length - 1] = tag;
+          input.value = parts.join(', ') + ', ';
+          input.focus();
+          dropdown.style.display = 'none';
+        });
+
+        item.addEventListener('mouseenter', () => {
+          item.style.background = 'color-mix(in srgb, var(--primary) 10%, transparent)';
+        });
+
+        item.addEventListener('mouseleave', () => {
+          item.style.background = '';
+        });
+      });
+    } else {
+      dropdown.style.display = 'none';
+    }
+  } else {
+    dropdown.style.display = 'none';
+  }
+}
+
+function highlightMatch(tag, search) {
+  if (!search) return tag;
+  const regex = new RegExp(`(${search})`, 'gi');
+  return tag.replace(regex, '<strong style="color: var(--primary);">$1</strong>');
+}
+
+function initializeCollapsibleSections() {
+  const collapsibles = document.querySelectorAll('.collapsible');
+  collapsibles.forEach(collapsible => {
+    // Start with collapsed state for non-primary sections
+    if (!collapsible.closest('.primary-section')) {
+      collapsible.classList.add('active');
+      const content = collapsible.nextElementSibling;
+      content.style.display = 'block';
+    }
+  });
+}
+
+function toggleSection(header) {
+  header.classList.toggle('active');
+  const content = header.nextElementSibling;
+
+  if (content.style.display === 'none') {
+    content.style.display = 'block';
+    content.style.animation = 'fadeInUp 0.3s ease-out';
+  } else {
+    content.style.display = 'none';
+  }
+}
+
+function validateForm() {
+  const nameInput = document.getElementById('name');
+  const contentInput = document.getElementById('content');
+  const savePasswordInput = document.getElementById('save_password');
+
+  let isValid = true;
+
+  // Validate name
+  if (!nameInput.value.trim()) {
+    showFieldError(nameInput, I18N.ENTER_NAME);
+    isValid = false;
+  } else {
+    clearFieldError(nameInput);
+  }
+
+  // Validate content
+  if (!contentInput.value.trim()) {
+    showFieldError(contentInput, I18N.ENTER_CONTENT);
+    isValid = false;
+  } else {
+    clearFieldError(contentInput);
+  }
+
+  if (savePasswordInput) {
+    if (!savePasswordInput.value.trim()) {
+      showFieldError(savePasswordInput, I18N.SAVE_PASSWORD_REQUIRED);
+      isValid = false;
+    } else {
+      clearFieldError(savePasswordInput);
+    }
+  }
+
+  return isValid;
+}
+
+function showFieldError(field, message) {
+  field.style.borderColor = 'var(--del)';
+  field.style.animation = 'shake 0.5s ease-in-out';
+
+  // Show error message
+  let errorDiv = field.parentNode.querySelector('.field-error');
+  if (!errorDiv) {
+    errorDiv = document.createElement('div');
+    errorDiv.className = 'field-error';
+    errorDiv.style.cssText = `
+      color: var(--del);
+      font-size: 12px;
+      margin-top: 4px;
+      font-weight: 500;
+    `;
+    field.parentNode.appendChild(errorDiv);
+  }
+  errorDiv.textContent = message;
+
+  setTimeout(() => {
+    field.style.animation = '';
+  }, 500);
+}
+
+function clearFieldError(field) {
+  field.style.borderColor = '';
+  const errorDiv = field.parentNode.querySelector('.field-error');
+  if (errorDiv) {
+    errorDiv.remove();
+  }
+}
+
+function previewPrompt() {
+  const name = document.getElementById('name').value || I18N.UNTITLED;
+  const content = document.getElementById('content').value || I18N.NO_CONTENT;
+
+  document.getElementById('previewName').textContent = name;
+  document.getElementById('previewText').textContent = content;
+  document.getElementById('previewModal').style.display = 'block';
+}
+
+function closePreview() {
+  document.getElementById('previewModal').style.display = 'none';
+}
+
+// Add shake animation
+const style = document.createElement('style');
+style.textContent = `
+  @keyframes shake {
+    0%, 100% { transform: translateX(0); }
+    25% { transform: translateX(-5px); }
+    75% { transform: translateX(5px); }
+  }
+
+  @keyframes fadeInUp {
+    from { opacity: 0; transform: translateY(10px); }
+    to { opacity: 1; transform: translateY(0); }
+  }
+`;
+document.head.appendChild(style);
+
+// Close modal when clicking outside
+window.addEventListener('click', (e) => {
+  const previewModal = document.getElementById('previewModal');
+  const deleteModal = document.getElementById('deleteModal');
+  if (e.target === previewModal) {
+    closePreview();
+  }
+  if (e.target === deleteModal) {
+    closeDeleteModal();
+  }
+});
+
+// Keyboard shortcuts
+document.addEventListener('keydown', (e) => {
+  // Ctrl/Cmd + S to save
+  if ((e.ctrlKey || e.metaKey) && e.key === 's') {
+    e.preventDefault();
+    document.querySelector('.prompt-form').dispatchEvent(new Event('submit'));
+  }
+
+  // Ctrl/Cmd + P to preview
+  if ((e.ctrlKey || e.metaKey) && e.key === 'p') {
+    e.preventDefault();
+    previewPrompt();
+  }
+
+  // Escape to close modal
+  if (e.key === 'Escape') {
+    closePreview();
+    closeDeleteModal();
+  }
+});
+
+// Button actions
+document.getElementById('resizeBtn')?.addEventListener('click', () => {
+  const textarea = document.getElementById('content');
+  autoResizeEnabled = !autoResizeEnabled;
+  if (autoResizeEnabled) {
+    autoResizeTextarea(textarea);
+    document.getElementById('resizeBtn').title = I18N.AUTOSIZE_ON;
+  } else {
+    textarea.style.height = '';
+    document.getElementById('resizeBtn').title = I18N.AUTOSIZE_OFF;
+  }
+});
+
+document.getElementById('copyBtn')?.addEventListener('click', async () => {
+  const textarea = document.getElementById('content');
+  const content = textarea.value.trim();
+
+  if (!content) {
+    showFieldError(textarea, I18N.NO_COPY_SOURCE);
+    return;
+  }
+
+  // Check if clipboard API is available
+  if (!navigator.clipboard) {
+    // Fallback to traditional method
+    fallbackCopyTextToClipboard(content);
+    return;
+  }
+
+  try {
+    await navigator.clipboard.writeText(content);
+
+    // Show success feedback
+    const btn = document.getElementById('copyBtn');
+    const originalHTML = btn.innerHTML;
+    btn.innerHTML = '<i class="fas fa-check"></i>';
+    btn.style.background = 'var(--ins)';
+    btn.style.color = 'var(--text-on-success)';
+
+    setTimeout(() => {
+      btn.innerHTML = originalHTML;
+      btn.style.background = '';
+      btn.style.color = '';
+    }, 2000);
+  } catch (err) {
+    console.error('Clipboard API failed:', err);
+    // Fallback to traditional method
+    fallbackCopyTextToClipboard(content);
+  }
+});
+
+function fallbackCopyTextToClipboard(text) {
+  const textArea = document.createElement("textarea");
+  textArea.value = text;
+
+  // Avoid scrolling to bottom
+  textArea.style.top = "0";
+  textArea.style.left = "0";
+  textArea.style.position = "fixed";
+
+  document.body.appendChild(textArea);
+  textArea.focus();
+  textArea.select();
+
+  try {
+    const successful = document.execCommand('copy');
+    if (successful) {
+      const btn = document.getElementById('copyBtn');
+      const originalHTML = btn.innerHTML;
+      btn.innerHTML = '<i class="fas fa-check"></i>';
+      btn.style.background = 'var(--ins)';
+      btn.style.color = 'var(--text-on-success)';
+
+      setTimeout(() => {
+        btn.innerHTML = originalHTML;
+        btn.style.background = '';
+        btn.style.color = '';
+      }, 2000);
+    } else {
+      throw new Error('execCommand failed');
+    }
+  } catch (err) {
+    console.error('Fallback copy failed:', err);
+    alert(I18N.COPY_FAIL);
+  }
+
+  document.body.removeChild(textArea);
+}
+
+document.getElementById('clearBtn')?.addEventListener('click', () => {
+  if (confirm(I18N.CLEAR_CONFIRM)) {
+    document.getElementById('content').value = '';
+    updateCharCounter(document.getElementById('content'));
+    document.getElementById('content').focus();
+  }
+});
+
+function validateCoverFile(file) {
+  if (!file) return null;
+  if (file.size > 5 * 1024 * 1024) return I18N.IMAGE_SIZE_ERROR;
+  const allow = ['image/jpeg', 'image/png', 'image/webp'];
+  if (file.type && !allow.includes(file.type)) return I18N.IMAGE_TYPE_ERROR;
+  return null;
+}
+
+function showCoverClientError(message) {
+  const wrap = document.querySelector('.image-upload-wrap');
+  if (!wrap) return;
+  let error = document.getElementById('coverClientError');
+  if (!error) {
+    error = document.createElement('div');
+    error.id = 'coverClientError';
+    error.className = 'field-error cover-server-error';
+    error.setAttribute('role', 'alert');
+    const altLabel = wrap.querySelector('.cover-alt-label');
+    wrap.insertBefore(error, altLabel);
+  }
+  error.textContent = message;
+}
+
+function clearCoverClientError() {
+  document.getElementById('coverClientError')?.remove();
+  document.querySelector('.cover-server-error')?.remove();
+}
+
+(function setupCoverEditor() {
+  const input = document.getElementById('image_file');
+  const dropZone = document.getElementById('coverDropZone');
+  const emptyState = document.getElementById('coverEmptyState');
+  const previewBox = document.getElementById('coverPreviewBox');
+  const preview = document.getElementById('coverPreview');
+  const meta = document.getElementById('coverMeta');
+  const removeBtn = document.getElementById('removeCoverBtn');
+  const replaceBtn = document.getElementById('replaceCoverBtn');
+  const retryBtn = document.getElementById('retryCoverBtn');
+  const loadError = document.getElementById('coverLoadError');
+  const removeInput = document.getElementById('removeImage');
+  const focusX = document.getElementById('coverFocusX');
+  const focusY = document.getElementById('coverFocusY');
+  const marker = document.getElementById('focusMarker');
+  if (!input || !dropZone || !preview || !previewBox) return;
+
+  const initial = {
+    src: preview.getAttribute('src') || '',
+    meta: meta?.innerHTML || '',
+    x: Number(focusX?.value || 50),
+    y: Number(focusY?.value || 50)
+  };
+  let objectUrl = null;
+  let isRemoved = removeInput?.value === '1';
+  let draggingFocus = false;
+
+  const formatBytes = (bytes) => bytes < 1024 * 1024
+    ? `${(bytes / 1024).toFixed(1)} KB`
+    : `${(bytes / (1024 * 1024)).toFixed(2)} MB`;
+
+  function setFocus(x, y) {
+    x = Math.max(0, Math.min(100, x));
+    y = Math.max(0, Math.min(100, y));
+    if (focusX) focusX.value = x.toFixed(2);
+    if (focusY) focusY.value = y.toFixed(2);
+    preview.style.objectPosition = `${x}% ${y}%`;
+    if (marker) {
+      marker.style.left = `${x}%`;
+      marker.style.top = `${y}%`;
+    }
+  }
+
+  function showPreview(src) {
+    preview.src = src;
+    previewBox.hidden = false;
+    emptyState.hidden = true;
+    dropZone.classList.add('has-cover');
+    if (removeBtn) removeBtn.hidden = false;
+    if (loadError) loadError.hidden = true;
+  }
+
+  function showEmpty() {
+    preview.removeAttribute('src');
+    previewBox.hidden = true;
+    emptyState.hidden = false;
+    meta.hidden = true;
+    dropZone.classList.remove('has-cover');
+  }
+
+  function updateRemoveButton() {
+    if (!removeBtn) return;
+    const text = removeBtn.querySelector('span');
+    if (text) text.textContent = isRemoved ? I18N.UNDO_REMOVE : I18N.REMOVE_COVER;
+    const icon = removeBtn.querySelector('i');
+    if (icon) icon.className = isRemoved ? 'fas fa-rotate-left' : 'fas fa-trash';
+  }
+
+  function selectFile(file) {
+    const error = validateCoverFile(file);
+    if (error) {
+      input.value = '';
+      showCoverClientError(error);
+      return;
+    }
+    clearCoverClientError();
+    const transfer = new DataTransfer();
+    transfer.items.add(file);
+    input.files = transfer.files;
+    if (objectUrl) URL.revokeObjectURL(objectUrl);
+    objectUrl = URL.createObjectURL(file);
+    preview.onload = () => {
+      if (meta) {
+        meta.hidden = false;
+        meta.innerHTML = `<span>${I18N.FORMAT}${file.type || '—'}</span>` +
+          `<span>${I18N.DIMENSIONS}${preview.naturalWidth} × ${preview.naturalHeight}</span>` +
+          `<span>${formatBytes(file.size)}</span>`;
+      }
+    };
+    showPreview(objectUrl);
+    isRemoved = false;
+    if (removeInput) removeInput.value = '0';
+    setFocus(50, 50);
+    updateRemoveButton();
+  }
+
+  input.addEventListener('change', () => {
+    const file = input.files && input.files[0];
+    if (file) selectFile(file);
+  });
+
+  dropZone.addEventListener('click', (event) => {
+    if (event.target.closest('button') || !previewBox.hidden) return;
+    input.click();
+  });
+  dropZone.addEventListener('keydown', (event) => {
+    if ((event.key === 'Enter' || event.key === ' ') && previewBox.hidden) {
+      event.preventDefault();
+      input.click();
+    }
+  });
+  replaceBtn?.addEventListener('click', () => input.click());
+  retryBtn?.addEventListener('click', (event) => {
+    event.stopPropagation();
+    input.click();
+  });
+
+  ['dragenter', 'dragover'].forEach(type => dropZone.addEventListener(type, event => {
+    event.preventDefault();
+    dropZone.classList.add('is-dragging');
+  }));
+  ['dragleave', 'drop'].forEach(type => dropZone.addEventListener(type, event => {
+    event.preventDefault();
+    dropZone.classList.remove('is-dragging');
+  }));
+  dropZone.addEventListener('drop', event => {
+    const file = event.dataTransfer?.files?.[0];
+    if (file) selectFile(file);
+  });
+  dropZone.addEventListener('paste', event => {
+    const file = Array.from(event.clipboardData?.files || [])[0];
+    if (file) {
+      event.preventDefault();
+      selectFile(file);
+    }
+  });
+
+  removeBtn?.addEventListener('click', () => {
+    isRemoved = !isRemoved;
+    if (removeInput) removeInput.value = isRemoved ? '1' : '0';
+    input.value = '';
+    if (objectUrl) {
+      URL.revokeObjectURL(objectUrl);
+      objectUrl = null;
+    }
+    if (isRemoved) {
+      showEmpty();
+      removeBtn.hidden = false;
+    } else if (initial.src) {
+      showPreview(initial.src);
+      if (meta) {
+        meta.innerHTML = initial.meta;
+        meta.hidden = false;
+      }
+      setFocus(initial.x, initial.y);
+    } else {
+      showEmpty();
+      removeBtn.hidden = true;
+    }
+    updateRemoveButton();
+  });
+
+  function updateFocusFromPointer(event) {
+    const rect = previewBox.getBoundingClientRect();
+    setFocus(
+      ((event.clientX - rect.left) / rect.width) * 100,
+      ((event.clientY - rect.top) / rect.height) * 100
+    );
+  }
+  previewBox.addEventListener('pointerdown', event => {
+    draggingFocus = true;
+    previewBox.setPointerCapture(event.pointerId);
+    updateFocusFromPointer(event);
+  });
+  previewBox.addEventListener('pointermove', event => {
+    if (draggingFocus) updateFocusFromPointer(event);
+  });
+  previewBox.addEventListener('pointerup', () => { draggingFocus = false; });
+  previewBox.addEventListener('pointercancel', () => { draggingFocus = false; });
+
+  preview.addEventListener('error', () => {
+    if (loadError) loadError.hidden = false;
+  });
+  updateRemoveButton();
+})();
@@ -0,0 +1,117 @@
+// 页面数据（文案、接口地址等）由模板以 JSON 提供
+const PAGE_DATA = JSON.parse(document.getElementById('pageData').textContent);
+
+(function () {
+  const input = document.getElementById('importFileInput');
+  const status = document.getElementById('importFileStatus');
+  if (!input || !status) return;
+
+  const I18N = PAGE_DATA.importI18n;
+
+  const fmtSize = (bytes) => {
+    if (!Number.isFinite(bytes) || bytes < 0) return '--';
+    if (bytes < 1024) return `${bytes} B`;
+    if (bytes < 1024 * 1024) return `${(bytes / 1024).toFixed(1)} KB`;
+    return `${(bytes / (1024 * 1024)).toFixed(2)} MB`;
+  };
+
+  const escapeHtml = (txt) => String(txt || '')
+    .replace(/&/g, '&amp;')
+    .replace(/</g, '&lt;')
+    .replace(/>/g, '&gt;')
+    .replace(/"/g, '&quot;')
+    .replace(/'/g, '&#39;');
+
+  const setEmpty = () => {
+    status.classList.remove('valid', 'invalid');
+    status.innerHTML = `<span class="empty">${escapeHtml(I18N.none)}</span>`;
+  };
+
+  input.addEventListener('change', () => {
+    const file = input.files && input.files[0];
+    if (!file) {
+      setEmpty();
+      return;
+    }
+
+    const ok = /\.(zip|json|csv)$/i.test(file.name || '');
+    status.classList.toggle('valid', ok);
+    status.classList.toggle('invalid', !ok);
+
+    if (!ok) {
+      status.textContent = I18N.invalid;
+      return;
+    }
+
+    status.innerHTML = `${escapeHtml(I18N.selected)}<strong>${escapeHtml(file.name)}</strong><span style="margin-left:8px;">${escapeHtml(I18N.size)}${escapeHtml(fmtSize(file.size))}</span>`;
+  });
+
+  setEmpty();
+})();
+
+(function () {
+  const status = document.getElementById('exportJobStatus');
+  const buttons = document.querySelectorAll('[data-export-format]');
+  if (!status || !buttons.length || !window.fetch) return;
+
+  const I18N = PAGE_DATA.exportI18n;
+  const startUrl = PAGE_DATA.exportStartUrl;
+  const csrf = PAGE_DATA.csrfToken;
+  let busy = false;
+
+  const show = (text, failed) => {
+    status.hidden = false;
+    status.classList.toggle('invalid', !!failed);
+    status.textContent = text;
+  };
+
+  const poll = async (job) => {
+    while (job.state === 'queued' || job.state === 'running') {
+      const pct = job.total ? Math.floor((job.progress / job.total) * 100) : 0;
+      show(`${I18N.running} ${pct}%`);
+      await new Promise((resolve) => setTimeout(resolve, 700));
+      const res = await fetch(job.status_url, { credentials: 'same-origin' });
+      if (!res.ok) throw new Error('status');
+      job = await res.json();
+    }
+    return job;
+  };
+
+  const follow = async (started) => {
+    if (busy) return;
+    busy = true;
+    try {
+      const job = await poll(await started());
+      if (job.state !== 'done' || !job.download_url) throw new Error(job.error || 'failed');
+      show(I18N.done);
+      window.location.href = job.download_url;
+    } catch (_) {
+      show(I18N.failed, true);
+    } finally {
+      busy = false;
+    }
+  };
+
+  buttons.forEach((btn) => {
+    btn.addEventListener('click', (event) => {
+      event.preventDefault();
+      follow(async () => {
+        const body = new FormData();
+        body.append('format', btn.dataset.exportFormat);
+        const res = await fetch(startUrl, {
+          method: 'POST',
+          body,
+          credentials: 'same-origin',
+          headers: { 'X-CSRF-Token': csrf }
+        });
+        if (!res.ok) throw new Error('start');
+        return res.json();
+      });
+    });
+  });
+
+  // 从 /export 跳转而来：继续跟踪已启动的任务
+  if (PAGE_DATA.exportJob) {
+    follow(async () => PAGE_DATA.exportJob);
+  }
+})();
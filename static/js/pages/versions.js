@@ -0,0 +1,303 @@
+// 页面数据（文案、版本列表等）由模板以 JSON 提供
+const PAGE_DATA = JSON.parse(document.getElementById('pageData').textContent);
+const I18N = PAGE_DATA.i18n;
+const versionsData = PAGE_DATA.versions;
+const versionContentCache = new Map();
+
+async function fetchVersionContent(versionId) {
+  if (versionContentCache.has(versionId)) {
+    return versionContentCache.get(versionId);
+  }
+  const response = await fetch(`/api/prompts/${promptId}/versions/${versionId}`, {
+    headers: { 'Accept': 'application/json' },
+    credentials: 'same-origin'
+  });
+  if (!response.ok) {
+    throw new Error(`HTTP ${response.status}`);
+  }
+  const data = await response.json();
+  versionContentCache.set(versionId, data.content || '');
+  return data.content || '';
+}
+const currentVersionId = PAGE_DATA.currentVersionId;
+const promptId = PAGE_DATA.promptId;
+
+async function viewVersion(versionId) {
+  const version = versionsData.find(v => v.id === versionId);
+  if (!version) {
+    alert(I18N.VERSION_NOT_FOUND);
+    return;
+  }
+  const contentEl = document.getElementById('modalVersionContent');
+  document.getElementById('modalVersionTitle').textContent = `${I18N.VERSION_PREFIX} ${version.version}`;
+  document.getElementById('modalVersionTime').textContent = version.created_at.replace('T', ' ').substring(0, 19);
+  contentEl.textContent = I18N.LOADING;
+  document.getElementById('versionModal').style.display = 'block';
+  try {
+    const content = await fetchVersionContent(versionId);
+    contentEl.textContent = content || I18N.NO_CONTENT;
+  } catch (error) {
+    console.error('Load version error:', error);
+    contentEl.textContent = I18N.PAGE_LOAD_ERROR;
+  }
+}
+
+function closeVersionModal() {
+  document.getElementById('versionModal').style.display = 'none';
+}
+
+async function copyPreviewContent(button) {
+  let content;
+  try {
+    content = await fetchVersionContent(Number(button.getAttribute('data-version-id')));
+  } catch (error) {
+    console.error('Load version error:', error);
+    alert(I18N.COPY_FAIL);
+    return;
+  }
+
+  // Check if clipboard API is available
+  if (!navigator.clipboard) {
+    fallbackCopyTextToClipboard(content, button);
+    return;
+  }
+
+  try {
+    await navigator.clipboard.writeText(content);
+
+    // Show success feedback
+    const originalHTML = button.innerHTML;
+    button.innerHTML = '<i class="fas fa-check"></i>';
+    button.style.background = 'var(--ins)';
+    button.style.borderColor = 'var(--ins)';
+
+    setTimeout(() => {
+      button.innerHTML = originalHTML;
+      button.style.background = '';
+      button.style.borderColor = '';
+    }, 2000);
+  } catch (err) {
+    console.error('Clipboard API failed:', err);
+    // Fallback to traditional method
+    fallbackCopyTextToClipboard(content, button);
+  }
+}
+
+async function copyModalContent() {
+  const content = document.getElementById('modalVersionContent').textContent;
+  if (!content || content === I18N.NO_CONTENT) {
+    return;
+  }
+
+  // Check if clipboard API is available
+  if (!navigator.clipboard) {
+    fallbackCopyTextToClipboard(content, null, true);
+    return;
+  }
+
+  try {
+    await navigator.clipboard.writeText(content);
+
+    // Show success feedback
+    const button = document.querySelector('.copy-modal-btn');
+    const originalHTML = button.innerHTML;
+    button.innerHTML = '<i class="fas fa-check"></i> <span>' + I18N.COPIED + '</span>';
+
+    setTimeout(() => {
+      button.innerHTML = originalHTML;
+    }, 2000);
+  } catch (err) {
+    console.error('Clipboard API failed:', err);
+    // Fallback to traditional method
+    fallbackCopyTextToClipboard(content, null, true);
+  }
+}
+
+function fallbackCopyTextToClipboard(text, button = null, isModal = false) {
+  const textArea = document.createElement("textarea");
+  textArea.value = text;
+
+  // Avoid scrolling to bottom
+  textArea.style.top = "0";
+  textArea.style.left = "0";
+  textArea.style.position = "fixed";
+
+  document.body.appendChild(textArea);
+  textArea.focus();
+  textArea.select();
+
+  try {
+    const successful = document.execCommand('copy');
+    if (successful) {
+      if (button) {
+        // Preview button feedback
+        const originalHTML = button.innerHTML;
+        button.innerHTML = '<i class="fas fa-check"></i>';
+        button.style.background = 'var(--ins)';
+        button.style.borderColor = 'var(--ins)';
+
+        setTimeout(() => {
+          button.innerHTML = originalHTML;
+          button.style.background = '';
+          button.style.borderColor = '';
+        }, 2000);
+      } else if (isModal) {
+        // Modal button feedback
+        const modalBtn = document.querySelector('.copy-modal-btn');
+        const originalHTML = modalBtn.innerHTML;
+        modalBtn.innerHTML = '<i class="fas fa-check"></i> <span>' + I18N.COPIED + '</span>';
+
+        setTimeout(() => {
+          modalBtn.innerHTML = originalHTML;
+        }, 2000);
+      }
+    } else {
+      throw new Error('execCommand failed');
+    }
+  } catch (err) {
+    console.error('Fallback copy failed:', err);
+    alert(I18N.COPY_FAIL);
+  }
+
+  document.body.removeChild(textArea);
+}
+
+function showDiffSelector() {
+  const leftSelect = document.getElementById('leftVersion');
+  const rightSelect = document.getElementById('rightVersion');
+
+  if (!leftSelect || !rightSelect) {
+    alert(I18N.PAGE_LOAD_ERROR);
+    return;
+  }
+
+  document.getElementById('diffModal').style.display = 'block';
+
+  // Set smart defaults
+  if (currentVersionId) {
+    // Set right to current version, left to previous version
+    rightSelect.value = currentVersionId;
+    const currentIndex = versionsData.findIndex(v => v.id === currentVersionId);
+    if (currentIndex < versionsData.length - 1) {
+      leftSelect.value = versionsData[currentIndex + 1].id;
+    }
+  }
+}
+
+function closeDiffModal() {
+  document.getElementById('diffModal').style.display = 'none';
+}
+
+function compareWithCurrent(versionId) {
+  if (currentVersionId && versionId !== currentVersionId) {
+    window.location.href = `/prompt/${promptId}/diff?left=${versionId}&right=${currentVersionId}`;
+  }
+}
+
+function performDiff() {
+  const leftSelect = document.getElementById('leftVersion');
+  const rightSelect = document.getElementById('rightVersion');
+
+  if (!leftSelect || !rightSelect) {
+    alert(I18N.PAGE_LOAD_ERROR);
+    return;
+  }
+
+  const leftId = leftSelect.value;
+  const rightId = rightSelect.value;
+
+  if (!leftId || !rightId) {
+    alert(I18N.SELECT_DIFF_VERSION);
+    return;
+  }
+
+  if (leftId === rightId) {
+    alert(I18N.SELECT_TWO_DIFF);
+    return;
+  }
+
+  window.location.href = `/prompt/${promptId}/diff?left=${leftId}&right=${rightId}`;
+}
+
+function rollbackToVersion(versionId) {
+  const version = versionsData.find(v => v.id === versionId);
+  if (!version) {
+    alert(I18N.VERSION_NOT_FOUND);
+    return;
+  }
+
+  const message = `${I18N.ROLLBACK_CONFIRM_TITLE.replace('{version}', version.version)}\n\n${I18N.ROLLBACK_NOTE_TITLE}\n${I18N.ROLLBACK_NOTE_LINE1.replace('{version}', version.version)}\n${I18N.ROLLBACK_NOTE_LINE2.replace('{current}', (currentVersionId ? (versionsData.find(v => v.id === currentVersionId)?.version || I18N.UNKNOWN) : I18N.UNKNOWN))}\n${I18N.ROLLBACK_NOTE_LINE3}\n${I18N.ROLLBACK_NOTE_LINE4}\n\n${I18N.ROLLBACK_CONFIRM_TAIL}`;
+
+  if (confirm(message)) {
+    try {
+      // Create form for rollback
+      const form = document.createElement('form');
+      form.method = 'POST';
+      form.action = `/prompt/${promptId}/rollback/${versionId}`;
+
+      const csrf = document.createElement('input');
+      csrf.type = 'hidden';
+      csrf.name = '_csrf_token';
+      csrf.value = PAGE_DATA.csrfToken;
+      form.appendChild(csrf);
+
+      // Add bump kind selection
+      const bumpKind = document.createElement('input');
+      bumpKind.type = 'hidden';
+      bumpKind.name = 'bump_kind';
+      bumpKind.value = 'patch'; // Default to patch
+      form.appendChild(bumpKind);
+
+      document.body.appendChild(form);
+      form.submit();
+    } catch (error) {
+      alert(I18N.OPERATION_FAILED);
+      console.error('Rollback error:', error);
+    }
+  }
+}
+
+function editVersionLabel(button) {
+  const form = button.form;
+  const value = window.prompt(I18N.LABEL_PROMPT, form.elements.label.value);
+  if (value === null) return;
+  form.elements.label.value = value.trim();
+  form.elements.pinned.value = form.dataset.pinned;
+  form.submit();
+}
+
+// Close modals when clicking outside
+window.addEventListener('click', (e) => {
+  const versionModal = document.getElementById('versionModal');
+  const diffModal = document.getElementById('diffModal');
+
+  if (e.target === versionModal) {
+    closeVersionModal();
+  }
+  if (e.target === diffModal) {
+    closeDiffModal();
+  }
+});
+
+// Keyboard shortcuts
+document.addEventListener('keydown', (e) => {
+  if (e.key === 'Escape') {
+    closeVersionModal();
+    closeDiffModal();
+  }
+});
+
+// Initialize tooltips and interactions
+document.addEventListener('DOMContentLoaded', () => {
+  // Add hover effects and animations
+  const versionItems = document.querySelectorAll('.version-item');
+  versionItems.forEach(item => {
+    item.addEventListener('mouseenter', () => {
+      item.style.transform = 'translateY(-2px)';
+    });
+
+    item.addEventListener('mouseleave', () => {
+      item.style.transform = '';
+    });
+  });
+});
@@ -0,0 +1,98 @@
+"""Shared fixture for the app integration tests (tests/test_app_*.py).
+
+The app reads its paths from the environment at import time, so this module
+sets them to a temporary directory before the first ``import app``. All
+topic files share that one app instance; ``AppTestCase.setUp`` resets the
+database and caches between tests.
+"""
+
+import atexit
+import io
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from PIL import Image
+
+
+TEST_ROOT = tempfile.mkdtemp(prefix="prompt-manager-tests-")
+os.environ["DB_PATH"] = os.path.join(TEST_ROOT, "data.sqlite3")
+os.environ["COVER_DIR"] = os.path.join(TEST_ROOT, "covers")
+os.environ["STATIC_BUILD_DIR"] = os.path.join(TEST_ROOT, "static-build")
+os.environ["SECRET_KEY"] = "test-secret"
+os.environ["FLASK_DEBUG"] = "1"
+# Several test modules use the same app, so the directory lives until exit.
+atexit.register(shutil.rmtree, TEST_ROOT, True)
+
+import app as prompt_app  # noqa: E402
+
+
+def png_bytes(size=(24, 16)):
+    output = io.BytesIO()
+    Image.new("RGB", size, (70, 120, 180)).save(output, "PNG")
+    return output.getvalue()
+
+
+def wait_for_export(client, job_id, timeout=5):
+    deadline = time.monotonic() + timeout
+    while True:
+        job = client.get(f"/export/jobs/{job_id}").get_json()
+        if job["state"] not in ("queued", "running") or time.monotonic() > deadline:
+            return job
+        time.sleep(0.02)
+
+
+class AppTestCase(unittest.TestCase):
+    def setUp(self):
+        if os.path.exists(prompt_app.DB_PATH):
+            conn = prompt_app.get_db()
+            conn.execute("DELETE FROM versions")
+            conn.execute("DELETE FROM content_blobs")
+            conn.execute("DELETE FROM version_blame")
+            prompt_app.history_search.clear(conn)
+            conn.execute("DELETE FROM version_lineage")
+            conn.execute("DELETE FROM edit_grants")
+            conn.execute("DELETE FROM prompts")
+            conn.execute("UPDATE settings SET value='off' WHERE key='auth_mode'")
+            conn.execute("UPDATE settings SET value='' WHERE key='auth_password_hash'")
+            conn.execute("UPDATE settings SET value='0' WHERE key='auth_session_version'")
+            conn.execute("UPDATE settings SET value='zh' WHERE key='language'")
+            conn.commit()
+            conn.close()
+        shutil.rmtree(prompt_app.COVER_DIR, ignore_errors=True)
+        prompt_app.page_cache.clear()
+        prompt_app.invalidate_settings_cache()
+        prompt_app.auth_rate_limiter.clear()
+        if not os.path.exists(prompt_app.DB_PATH):
+            prompt_app.init_db()
+        else:
+            prompt_app.ensure_cover_dir(prompt_app.COVER_DIR)
+        prompt_app.app.config.update(TESTING=True)
+        self.client = prompt_app.app.test_client()
+
+    def csrf(self):
+        self.client.get("/prompt/new")
+        with self.client.session_transaction() as session:
+            return session["_csrf_token"]
+
+    def create_prompt_with_cover(self, filename="cover.bin", content_type="text/plain"):
+        response = self.client.post(
+            "/prompt/new",
+            data={
+                "_csrf_token": self.csrf(),
+                "name": "带封面的提示词",
+                "content": "两行预览内容",
+                "cover_alt": "测试封面",
+                "cover_focus_x": "25",
+                "cover_focus_y": "75",
+                "image_file": (io.BytesIO(png_bytes()), filename, content_type),
+            },
+            content_type="multipart/form-data",
+        )
+        self.assertEqual(response.status_code, 302)
+        conn = prompt_app.get_db()
+        row = conn.execute("SELECT * FROM prompts").fetchone()
+        conn.close()
+        return row
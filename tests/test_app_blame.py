@@ -0,0 +1,49 @@
+import unittest
+
+from app_testcase import AppTestCase, prompt_app
+
+
+class AppBlameTests(AppTestCase):
+    def test_blame_attributes_lines_to_their_versions(self):
+        row = self.create_prompt_with_cover()
+        first_id = row["current_version_id"]
+        self.client.post(
+            f"/prompt/{row['id']}",
+            data={
+                "_csrf_token": self.csrf(),
+                "name": row["name"],
+                "content": "两行预览内容\n新增一行",
+                "do_save_version": "1",
+                "bump_kind": "patch",
+                "cover_focus_x": "50",
+                "cover_focus_y": "50",
+            },
+        )
+        response = self.client.get(f"/api/prompts/{row['id']}/blame")
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+        second_id = data["version"]["id"]
+        self.assertNotEqual(second_id, first_id)
+        self.assertEqual(data["lines"][-1], "新增一行")
+        self.assertEqual(data["runs"][-1], [second_id, 1])
+        self.assertEqual(data["origins"][str(second_id)]["archived"], False)
+        page = self.client.get(f"/prompt/{row['id']}/blame?version={second_id}")
+        self.assertEqual(page.status_code, 200)
+        self.assertIn("新增一行", page.get_data(as_text=True))
+
+    def test_blame_view_does_not_write_and_backfill_stores_history(self):
+        row = self.create_prompt_with_cover()
+        conn = prompt_app.get_db()
+        conn.execute("DELETE FROM version_blame")
+        conn.commit()
+        conn.close()
+        data = self.client.get(f"/api/prompts/{row['id']}/blame").get_json()
+        self.assertEqual(data["runs"], [[row["current_version_id"], 1]])
+        conn = prompt_app.get_db()
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM version_blame").fetchone()[0], 0)
+        conn.close()
+        self.assertEqual(prompt_app.backfill_blame_history(pause=0), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
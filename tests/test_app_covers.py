@@ -1,78 +1,15 @@
 import io
 import json
 import os
-import shutil
-import tempfile
 import unittest
 import zipfile
 
-from PIL import Image
 from werkzeug.datastructures import FileStorage
 
+from app_testcase import AppTestCase, png_bytes, prompt_app
 
-TEST_ROOT = tempfile.mkdtemp(prefix="prompt-manager-tests-")
-os.environ["DB_PATH"] = os.path.join(TEST_ROOT, "data.sqlite3")
-os.environ["COVER_DIR"] = os.path.join(TEST_ROOT, "covers")
-os.environ["SECRET_KEY"] = "test-secret"
-os.environ["FLASK_DEBUG"] = "1"
-
-import app as prompt_app  # noqa: E402
-
-
-def png_bytes(size=(24, 16)):
-    output = io.BytesIO()
-    Image.new("RGB", size, (70, 120, 180)).save(output, "PNG")
-    return output.getvalue()
-
-
-class AppCoverTests(unittest.TestCase):
-    @classmethod
-    def tearDownClass(cls):
-        shutil.rmtree(TEST_ROOT, ignore_errors=True)
-
-    def setUp(self):
-        if os.path.exists(prompt_app.DB_PATH):
-            conn = prompt_app.get_db()
-            conn.execute("DELETE FROM versions")
-            conn.execute("DELETE FROM prompts")
-            conn.execute("UPDATE settings SET value='off' WHERE key='auth_mode'")
-            conn.execute("UPDATE settings SET value='' WHERE key='auth_password_hash'")
-            conn.execute("UPDATE settings SET value='0' WHERE key='auth_session_version'")
-            conn.commit()
-            conn.close()
-        shutil.rmtree(prompt_app.COVER_DIR, ignore_errors=True)
-        if not os.path.exists(prompt_app.DB_PATH):
-            prompt_app.init_db()
-        else:
-            prompt_app.ensure_cover_dir(prompt_app.COVER_DIR)
-        prompt_app.app.config.update(TESTING=True)
-        self.client = prompt_app.app.test_client()
-
-    def csrf(self):
-        self.client.get("/prompt/new")
-        with self.client.session_transaction() as session:
-            return session["_csrf_token"]
-
-    def create_prompt_with_cover(self, filename="cover.bin", content_type="text/plain"):
-        response = self.client.post(
-            "/prompt/new",
-            data={
-                "_csrf_token": self.csrf(),
-                "name": "带封面的提示词",
-                "content": "两行预览内容",
-                "cover_alt": "测试封面",
-                "cover_focus_x": "25",
-                "cover_focus_y": "75",
-                "image_file": (io.BytesIO(png_bytes()), filename, content_type),
-            },
-            content_type="multipart/form-data",
-        )
-        self.assertEqual(response.status_code, 302)
-        conn = prompt_app.get_db()
-        row = conn.execute("SELECT * FROM prompts").fetchone()
-        conn.close()
-        return row
 
+class AppCoverTests(AppTestCase):
     def test_real_image_content_is_used_instead_of_client_mime(self):
         row = self.create_prompt_with_cover()
         self.assertIsNone(row["image_data"])
@@ -0,0 +1,90 @@
+import unittest
+from unittest import mock
+
+from app_testcase import AppTestCase, prompt_app
+
+
+class AppDiffTests(AppTestCase):
+    def test_repeated_diff_views_are_served_from_cache(self):
+        row = self.create_prompt_with_cover()
+        self.client.post(
+            f"/prompt/{row['id']}",
+            data={
+                "_csrf_token": self.csrf(),
+                "name": row["name"],
+                "content": "两行预览内容\n新增一行",
+                "do_save_version": "1",
+                "bump_kind": "patch",
+                "cover_focus_x": "50",
+                "cover_focus_y": "50",
+            },
+        )
+        self.client.get("/")  # consume the save flash message
+        prompt_app.diff_cache.clear()
+        url = f"/prompt/{row['id']}/diff?left={row['current_version_id']}&mode=line"
+        first = self.client.get(url)
+        prompt_app.page_cache.clear()
+        second = self.client.get(url)
+        self.assertEqual((first.headers["X-Diff-Cache"], second.headers["X-Diff-Cache"]), ("miss", "hit"))
+        self.assertEqual(first.get_data(), second.get_data())
+
+    def test_degraded_diffs_are_not_cached(self):
+        row = self.create_prompt_with_cover()
+        self.client.post(
+            f"/prompt/{row['id']}",
+            data={
+                "_csrf_token": self.csrf(),
+                "name": row["name"],
+                "content": "两行预览内容 改写\n新增一行",
+                "do_save_version": "1",
+                "bump_kind": "patch",
+                "cover_focus_x": "50",
+                "cover_focus_y": "50",
+            },
+        )
+        self.client.get("/")  # consume the save flash message
+        prompt_app.diff_cache.clear()
+        url = f"/prompt/{row['id']}/diff?left={row['current_version_id']}"
+        api_url = f"/api/prompts/{row['id']}/diff?left={row['current_version_id']}"
+        with mock.patch.object(prompt_app, "DIFF_TIME_BUDGET", -1):
+            exhausted = self.client.get(api_url).get_json()
+            page = self.client.get(url)
+        self.assertTrue(exhausted["diff"]["degraded"])
+        self.assertNotIn("X-Page-Cache", page.headers)
+        full = self.client.get(api_url)
+        self.assertEqual(full.headers["X-Diff-Cache"], "miss")
+        self.assertFalse(full.get_json()["diff"]["degraded"])
+        self.assertEqual(self.client.get(url).headers["X-Page-Cache"], "miss")
+        self.assertEqual(self.client.get(url).headers["X-Page-Cache"], "hit")
+        self.assertEqual(self.client.get(api_url).headers["X-Diff-Cache"], "hit")
+
+    def test_diff_api_returns_compact_rows(self):
+        row = self.create_prompt_with_cover()
+        self.client.post(
+            f"/prompt/{row['id']}",
+            data={
+                "_csrf_token": self.csrf(),
+                "name": row["name"],
+                "content": "两行预览内容\n新增一行</script>",
+                "do_save_version": "1",
+                "bump_kind": "patch",
+                "cover_focus_x": "50",
+                "cover_focus_y": "50",
+            },
+        )
+        prompt_app.diff_cache.clear()
+        response = self.client.get(f"/api/prompts/{row['id']}/diff?mode=line")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["X-Diff-Cache"], "miss")
+        data = response.get_json()
+        self.assertEqual(data["left"]["id"], row["current_version_id"])
+        self.assertEqual(data["diff"]["mode"], "line")
+        self.assertIn(["+", 1, "新增一行</script>"], data["diff"]["rows"])
+        page = self.client.get(f"/prompt/{row['id']}/diff").get_data(as_text=True)
+        self.assertIn("新增一行\\u003c/script>", page)
+        missing = self.client.get(f"/api/prompts/{row['id']}/diff?left=999999")
+        self.assertEqual(missing.status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
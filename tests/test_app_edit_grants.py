@@ -0,0 +1,77 @@
+import unittest
+from unittest import mock
+
+from app_testcase import AppTestCase, prompt_app
+
+
+class AppEditGrantTests(AppTestCase):
+    def test_edit_grant_skips_password_hash_until_auth_version_changes(self):
+        row = self.create_prompt_with_cover()
+        conn = prompt_app.get_db()
+        prompt_app.set_setting(conn, "auth_mode", "per")
+        prompt_app.set_setting(conn, "auth_password_hash", prompt_app.hash_pw("secret"))
+        conn.commit()
+        conn.close()
+        token = self.csrf()
+
+        def save(content, password=""):
+            self.client.post(
+                f"/prompt/{row['id']}",
+                data={
+                    "_csrf_token": token,
+                    "name": row["name"],
+                    "content": content,
+                    "save_password": password,
+                    "do_save_version": "1",
+                    "bump_kind": "patch",
+                    "cover_focus_x": "50",
+                    "cover_focus_y": "50",
+                },
+            )
+            conn = prompt_app.get_db()
+            count = conn.execute("SELECT COUNT(*) FROM versions WHERE prompt_id=?", (row["id"],)).fetchone()[0]
+            conn.close()
+            return count
+
+        with mock.patch.object(prompt_app.password_pool, "check", wraps=prompt_app.password_pool.check) as check:
+            self.assertEqual(save("没有密码"), 1)
+            self.assertEqual(save("第一次保存", "secret"), 2)
+            self.assertEqual(save("第二次保存"), 3)
+            self.assertEqual(save("第三次保存"), 4)
+            self.assertEqual(check.call_count, 2)
+        conn = prompt_app.get_db()
+        prompt_app.bump_auth_session_version(conn)
+        conn.commit()
+        conn.close()
+        self.assertEqual(save("授权已失效"), 4)
+
+    def test_replayed_edit_grant_cookie_is_revoked_on_logout(self):
+        row = self.create_prompt_with_cover()
+        conn = prompt_app.get_db()
+        prompt_app.set_setting(conn, "auth_mode", "per")
+        prompt_app.set_setting(conn, "auth_password_hash", prompt_app.hash_pw("secret"))
+        conn.commit()
+        conn.close()
+        token = self.csrf()
+
+        def save(client, content, password=""):
+            client.post(
+                f"/prompt/{row['id']}",
+                data={"_csrf_token": token, "name": row["name"], "content": content,
+                      "save_password": password, "do_save_version": "1"},
+            )
+            conn = prompt_app.get_db()
+            count = conn.execute("SELECT COUNT(*) FROM versions WHERE prompt_id=?", (row["id"],)).fetchone()[0]
+            conn.close()
+            return count
+
+        self.assertEqual(save(self.client, "授权保存", "secret"), 2)
+        stolen = self.client.get_cookie("session").value
+        self.client.get("/logout")
+        replay = prompt_app.app.test_client()
+        replay.set_cookie("session", stolen)
+        self.assertEqual(save(replay, "重放的授权"), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import json
+import unittest
+
+from app_testcase import AppTestCase, prompt_app, wait_for_export
+
+
+class AppExportTests(AppTestCase):
+    def test_export_starts_a_job_instead_of_building_in_the_request(self):
+        self.create_prompt_with_cover()
+        builds = []
+        original = prompt_app.export_jobs.build_artifact
+
+        def counting(export_format, progress, as_of=None):
+            builds.append(export_format)
+            return original(export_format, progress, as_of)
+
+        prompt_app.export_jobs.build_artifact = counting
+        try:
+            response = self.client.get("/export?format=csv")
+            self.assertEqual(response.status_code, 302)
+            self.assertIn("/settings?export_job=csv-g", response.headers["Location"])
+            job_id = response.headers["Location"].split("export_job=")[1]
+            self.assertEqual(wait_for_export(self.client, job_id)["state"], "done")
+            settings = self.client.get(f"/settings?export_job={job_id}").get_data(as_text=True)
+            self.assertIn(f"/export/jobs/{job_id}/download", settings)
+
+            started = self.client.get("/export?format=json", headers={"Accept": "application/json"})
+            self.assertEqual(started.status_code, 202)
+            self.assertEqual(wait_for_export(self.client, started.get_json()["id"])["state"], "done")
+
+            cached = self.client.get("/export?format=json")
+            self.assertEqual(cached.status_code, 200)
+            self.assertEqual(len(json.loads(cached.get_data())["prompts"]), 1)
+            self.assertEqual(builds, ["csv", "json"])
+        finally:
+            prompt_app.export_jobs.build_artifact = original
+
+    def test_settings_ignores_an_unknown_export_job(self):
+        response = self.client.get("/settings?export_job=../../etc-g1")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('"exportJob": null', response.get_data(as_text=True))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+import unittest
+
+from app_testcase import AppTestCase, prompt_app
+
+
+class AppHistorySearchTests(AppTestCase):
+    def test_history_search_finds_old_versions_but_not_locked_prompts(self):
+        row = self.create_prompt_with_cover()
+        self.client.post(
+            f"/prompt/{row['id']}",
+            data={
+                "_csrf_token": self.csrf(),
+                "name": row["name"],
+                "content": "全新的内容",
+                "do_save_version": "1",
+                "bump_kind": "patch",
+                "cover_focus_x": "50",
+                "cover_focus_y": "50",
+            },
+        )
+        found = self.client.get("/api/search/versions?q=预览内容").get_json()
+        self.assertEqual([item["version_id"] for item in found["items"]], [row["current_version_id"]])
+        self.assertFalse(found["items"][0]["is_current"])
+        self.assertEqual(self.client.get("/api/search/versions?q=预览").status_code, 400)
+        conn = prompt_app.get_db()
+        conn.execute("UPDATE settings SET value='per' WHERE key='auth_mode'")
+        conn.execute("UPDATE prompts SET require_password=1 WHERE id=?", (row["id"],))
+        conn.commit()
+        conn.close()
+        hidden = self.client.get("/api/search/versions?q=预览内容").get_json()
+        self.assertEqual(hidden["total"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,28 @@
+import unittest
+
+from app_testcase import AppTestCase, prompt_app
+
+
+class AppLanguageTests(AppTestCase):
+    def test_auto_language_follows_accept_language(self):
+        conn = prompt_app.get_db()
+        prompt_app.set_setting(conn, "language", "auto")
+        prompt_app.bump_data_generation(conn)
+        conn.commit()
+        conn.close()
+        english = self.client.get("/settings", headers={"Accept-Language": "en-US,en;q=0.9"})
+        self.assertIn('<html lang="en">', english.get_data(as_text=True))
+        self.assertIn("Accept-Language", english.headers["Vary"])
+        chinese = self.client.get("/settings", headers={"Accept-Language": "zh-CN"})
+        self.assertIn('<html lang="zh-CN">', chinese.get_data(as_text=True))
+        conn = prompt_app.get_db()
+        prompt_app.set_setting(conn, "language", "zh")
+        conn.commit()
+        conn.close()
+        fixed = self.client.get("/settings", headers={"Accept-Language": "en-US"})
+        self.assertIn('<html lang="zh-CN">', fixed.get_data(as_text=True))
+        self.assertNotIn("Accept-Language", fixed.headers.get("Vary", ""))
+
+
+if __name__ == "__main__":
+    unittest.main()
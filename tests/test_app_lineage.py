@@ -0,0 +1,47 @@
+import unittest
+
+from app_testcase import AppTestCase, prompt_app
+
+
+class AppLineageTests(AppTestCase):
+    def test_diff_defaults_to_parent_and_lineage_api(self):
+        row = self.create_prompt_with_cover()
+        root_id = row["current_version_id"]
+        conn = prompt_app.get_db()
+        trunk_id = prompt_app.create_version(conn, row["id"], "1.0.1", "主线", "2024-01-02T00:00:00", root_id)
+        branch_id = prompt_app.create_version(conn, row["id"], "1.0.2", "分支", "2024-01-03T00:00:00", root_id)
+        conn.execute("UPDATE prompts SET current_version_id=? WHERE id=?", (branch_id, row["id"]))
+        conn.commit()
+        conn.close()
+        data = self.client.get(f"/api/prompts/{row['id']}/diff").get_json()
+        self.assertEqual((data["left"]["id"], data["right"]["id"]), (root_id, branch_id))
+        ancestors = self.client.get(f"/api/prompts/{row['id']}/versions/{branch_id}/ancestors").get_json()
+        self.assertEqual([(i["id"], i["depth"]) for i in ancestors["items"]], [(root_id, 1)])
+        descendants = self.client.get(f"/api/prompts/{row['id']}/versions/{root_id}/descendants").get_json()
+        self.assertEqual(sorted(i["id"] for i in descendants["items"]), sorted([trunk_id, branch_id]))
+        common = self.client.get(
+            f"/api/prompts/{row['id']}/versions/common-ancestor?a={trunk_id}&b={branch_id}"
+        ).get_json()
+        self.assertEqual(common["ancestor"]["id"], root_id)
+        missing = self.client.get(f"/api/prompts/{row['id']}/versions/common-ancestor?a={trunk_id}&b=999999")
+        self.assertEqual(missing.status_code, 404)
+
+    def test_lineage_reads_do_not_write_and_backfill_links_history(self):
+        row = self.create_prompt_with_cover()
+        root_id = row["current_version_id"]
+        conn = prompt_app.get_db()
+        child_id = prompt_app.create_version(conn, row["id"], "1.0.1", "子版本", "2024-01-02T00:00:00", root_id)
+        conn.execute("DELETE FROM version_lineage")
+        conn.commit()
+        conn.close()
+        url = f"/api/prompts/{row['id']}/versions/{child_id}/ancestors"
+        self.assertEqual(self.client.get(url).get_json()["items"], [])
+        conn = prompt_app.get_db()
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM version_lineage").fetchone()[0], 0)
+        conn.close()
+        self.assertEqual(prompt_app.backfill_lineage_history(pause=0), 2)
+        self.assertEqual([i["id"] for i in self.client.get(url).get_json()["items"]], [root_id])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+
+from app_testcase import AppTestCase, prompt_app
+
+
+class AppPageCacheTests(AppTestCase):
+    def test_pages_are_cached_per_generation_with_etag(self):
+        row = self.create_prompt_with_cover()
+        self.client.get("/")  # consume the create flash message
+        url = f"/prompt/{row['id']}/versions"
+        first = self.client.get(url)
+        second = self.client.get(url)
+        self.assertEqual((first.headers["X-Page-Cache"], second.headers["X-Page-Cache"]), ("miss", "hit"))
+        self.assertEqual(first.get_data(), second.get_data())
+        self.assertIn(self.csrf(), first.get_data(as_text=True))
+        self.assertNotIn(prompt_app.CSRF_PLACEHOLDER, first.get_data(as_text=True))
+        revalidated = self.client.get(url, headers={"If-None-Match": first.headers["ETag"]})
+        self.assertEqual(revalidated.status_code, 304)
+        self.client.post(
+            f"/prompt/{row['id']}/versions/{row['current_version_id']}/keep",
+            data={"_csrf_token": self.csrf(), "pinned": "1", "label": "发布版"},
+        )
+        changed = self.client.get(url, headers={"If-None-Match": first.headers["ETag"]})
+        self.assertEqual((changed.status_code, changed.headers["X-Page-Cache"]), (200, "miss"))
+        other = prompt_app.app.test_client().get(url)
+        self.assertNotEqual(other.headers["ETag"], first.headers["ETag"])
+        self.assertNotIn(self.csrf(), other.get_data(as_text=True))
+
+    def test_page_cache_does_not_leak_unlocked_prompts(self):
+        row = self.create_prompt_with_cover()
+        conn = prompt_app.get_db()
+        conn.execute("UPDATE prompts SET require_password=1 WHERE id=?", (row["id"],))
+        prompt_app.set_setting(conn, "auth_mode", "per")
+        prompt_app.set_setting(conn, "auth_password_hash", prompt_app.hash_pw("secret"))
+        prompt_app.bump_data_generation(conn)
+        conn.commit()
+        conn.close()
+        self.client.post(
+            f"/prompt/{row['id']}/unlock",
+            data={"_csrf_token": self.csrf(), "password": "secret"},
+        )
+        self.client.get("/")  # consume any flash message
+        url = f"/prompt/{row['id']}"
+        unlocked = self.client.get(url)
+        self.assertEqual(unlocked.status_code, 200)
+        self.assertIn("两行预览内容", unlocked.get_data(as_text=True))
+        stranger = prompt_app.app.test_client().get(url)
+        self.assertEqual(stranger.status_code, 302)
+        self.assertIn("/unlock", stranger.headers["Location"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,31 @@
+import unittest
+
+from app_testcase import AppTestCase, prompt_app
+
+
+class AppRateLimitTests(AppTestCase):
+    def test_login_rate_limit_ignores_spoofed_forwarded_for(self):
+        token = self.csrf()
+        conn = prompt_app.get_db()
+        prompt_app.set_setting(conn, "auth_mode", "global")
+        prompt_app.set_setting(conn, "auth_password_hash", prompt_app.hash_pw("secret"))
+        conn.commit()
+        conn.close()
+        for attempt in range(prompt_app.RATE_LIMIT_MAX_FAILURES):
+            self.client.post(
+                "/login",
+                data={"_csrf_token": token, "password": "wrong"},
+                # 客户端伪造的地址在前，反向代理追加的真实地址在后
+                headers={"X-Forwarded-For": f"203.0.113.{attempt}, 198.51.100.7"},
+            )
+        response = self.client.post(
+            "/login",
+            data={"_csrf_token": token, "password": "secret"},
+            headers={"X-Forwarded-For": "198.51.100.7"},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(prompt_app.auth_rate_limiter), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
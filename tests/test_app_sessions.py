@@ -0,0 +1,39 @@
+import unittest
+from unittest import mock
+
+from app_testcase import AppTestCase, prompt_app
+
+
+class AppSessionTests(AppTestCase):
+    def test_server_side_session_keeps_unlocked_set_out_of_cookie(self):
+        for _ in range(3):
+            self.create_prompt_with_cover()
+        conn = prompt_app.get_db()
+        rows = conn.execute("SELECT id FROM prompts").fetchall()
+        conn.execute("UPDATE prompts SET require_password=1")
+        prompt_app.set_setting(conn, "auth_mode", "per")
+        prompt_app.set_setting(conn, "auth_password_hash", prompt_app.hash_pw("secret"))
+        conn.commit()
+        conn.close()
+        store = prompt_app.session_store.MemorySessionStore()
+        interface = prompt_app.session_store.ServerSessionInterface(store)
+        with mock.patch.object(prompt_app.app, "session_interface", interface):
+            client = prompt_app.app.test_client()
+            client.get("/prompt/new")
+            for row in rows:
+                with client.session_transaction() as session:
+                    token = session["_csrf_token"]
+                client.post(f"/prompt/{row['id']}/unlock", data={"_csrf_token": token, "password": "secret"})
+            cookie = client.get_cookie("session").value
+            self.assertLess(len(cookie), 80)
+            for row in rows:
+                response = client.get(f"/prompt/{row['id']}/cover/full")
+                self.assertEqual(response.status_code, 200)
+                response.close()
+            (data, _), = [store.load(sid, 0) for sid in store._rows]
+            ids = sorted(row["id"] for row in rows)
+            self.assertEqual(data["unlocked_prompts"], f"{ids[0]}-{ids[-1]}")
+
+
+if __name__ == "__main__":
+    unittest.main()
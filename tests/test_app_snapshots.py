@@ -0,0 +1,99 @@
+import json
+import unittest
+
+from app_testcase import AppTestCase, prompt_app, wait_for_export
+
+
+class AppSnapshotTests(AppTestCase):
+    def test_as_of_views_show_the_version_in_effect_at_that_time(self):
+        row = self.create_prompt_with_cover()
+        self.client.post(
+            f"/prompt/{row['id']}",
+            data={
+                "_csrf_token": self.csrf(),
+                "name": row["name"],
+                "content": "后来改写的内容",
+                "do_save_version": "1",
+                "bump_kind": "patch",
+                "cover_focus_x": "50",
+                "cover_focus_y": "50",
+            },
+        )
+        self.client.get("/")  # consume the save flash message
+        conn = prompt_app.get_db()
+        conn.execute("UPDATE versions SET created_at='2024-01-01T00:00:00' WHERE id=?", (row["current_version_id"],))
+        conn.execute("UPDATE versions SET created_at='2024-06-01T00:00:00' WHERE id!=?", (row["current_version_id"],))
+        conn.commit()
+        conn.close()
+        listing = self.client.get("/?as_of=2024-03-01").get_data(as_text=True)
+        self.assertIn("两行预览内容", listing)
+        self.assertNotIn("后来改写的内容", listing)
+        self.assertNotIn("两行预览内容", self.client.get("/?as_of=2024-03-01&q=改写").get_data(as_text=True))
+        detail = self.client.get(f"/prompt/{row['id']}?as_of=2024-03-01").get_data(as_text=True)
+        self.assertIn("两行预览内容", detail)
+        self.assertIn("disabled", detail)
+        before = self.client.get(f"/prompt/{row['id']}?as_of=2023-01-01")
+        self.assertEqual(before.status_code, 302)
+        started = self.client.get("/export?format=json&as_of=2024-03-01", headers={"Accept": "application/json"})
+        self.assertEqual(started.status_code, 202)
+        job_id = started.get_json()["id"]
+        self.assertIn("-t20240301235959", job_id)
+        self.assertEqual(wait_for_export(self.client, job_id)["state"], "done")
+        exported = json.loads(self.client.get("/export?format=json&as_of=2024-03-01").get_data())
+        self.assertEqual(exported["as_of"], "2024-03-01T23:59:59.999999")
+        self.assertEqual([v["content"] for v in exported["prompts"][0]["versions"]], ["两行预览内容"])
+        self.assertEqual(exported["prompts"][0]["current_version_id"], row["current_version_id"])
+
+    def save_version(self, row, content):
+        self.client.post(
+            f"/prompt/{row['id']}",
+            data={
+                "_csrf_token": self.csrf(),
+                "name": row["name"],
+                "content": content,
+                "do_save_version": "1",
+                "bump_kind": "patch",
+                "cover_focus_x": "50",
+                "cover_focus_y": "50",
+            },
+        )
+        self.client.get("/")  # consume the save flash message
+
+    def test_versions_pruned_without_archive_are_flagged_as_a_gap(self):
+        row = self.create_prompt_with_cover()
+        self.save_version(row, "六月的内容")
+        conn = prompt_app.get_db()
+        conn.execute("UPDATE versions SET created_at='2024-01-01T00:00:00', pinned=1 WHERE id=?", (row["current_version_id"],))
+        conn.execute("UPDATE versions SET created_at='2024-06-01T00:00:00' WHERE id!=?", (row["current_version_id"],))
+        conn.execute("UPDATE settings SET value='1' WHERE key='version_cleanup_threshold'")
+        conn.commit()
+        conn.close()
+        self.addCleanup(self.restore_threshold)
+        prompt_app.invalidate_settings_cache()
+        self.save_version(row, "最新内容")
+        conn = prompt_app.get_db()
+        self.assertIsNone(conn.execute("SELECT 1 FROM versions WHERE created_at='2024-06-01T00:00:00'").fetchone())
+        conn.close()
+
+        warning = "该时间点之前的部分版本已被清理"
+        self.assertNotIn(warning, self.client.get(f"/prompt/{row['id']}?as_of=2024-03-01").get_data(as_text=True))
+        detail = self.client.get(f"/prompt/{row['id']}?as_of=2024-07-01").get_data(as_text=True)
+        self.assertIn("两行预览内容", detail)
+        self.assertIn(warning, detail)
+        self.assertIn("pruned-gap", self.client.get("/?as_of=2024-07-01").get_data(as_text=True))
+        self.assertNotIn("pruned-gap", self.client.get("/?as_of=2024-03-01").get_data(as_text=True))
+        started = self.client.get("/export?format=json&as_of=2024-07-01", headers={"Accept": "application/json"})
+        self.assertEqual(wait_for_export(self.client, started.get_json()["id"])["state"], "done")
+        exported = json.loads(self.client.get("/export?format=json&as_of=2024-07-01").get_data())
+        self.assertTrue(exported["prompts"][0]["pruned_gap"])
+
+    def restore_threshold(self):
+        conn = prompt_app.get_db()
+        conn.execute("UPDATE settings SET value='200' WHERE key='version_cleanup_threshold'")
+        conn.commit()
+        conn.close()
+        prompt_app.invalidate_settings_cache()
+
+
+if __name__ == "__main__":
+    unittest.main()
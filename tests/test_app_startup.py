@@ -0,0 +1,36 @@
+import os
+import subprocess
+import sys
+import unittest
+from unittest import mock
+
+from app_testcase import AppTestCase, prompt_app
+
+
+class AppStartupTests(AppTestCase):
+    def test_import_does_not_load_pillow(self):
+        script = "import sys, app; print('PIL' in sys.modules)"
+        result = subprocess.run(
+            [sys.executable, "-c", script],
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+            env=dict(os.environ), capture_output=True, text=True, check=True,
+        )
+        self.assertEqual(result.stdout.strip(), "False")
+
+    def test_warm_up_compiles_templates_and_migrates_once(self):
+        timings = prompt_app.warm_up()
+        self.assertEqual(
+            set(timings),
+            {"database", "settings", "translations", "assets", "precompressed", "templates"},
+        )
+        cache = prompt_app.app.jinja_env.cache
+        for name in prompt_app.app.jinja_env.list_templates():
+            self.assertTrue(any(key[1] == name for key in cache.keys()), name)
+        with mock.patch.object(prompt_app, "migrate_schema") as migrate:
+            self.assertEqual(self.client.get("/").status_code, 200)
+            self.assertEqual(self.client.get("/").status_code, 200)
+        migrate.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import gzip
+import json
+import os
+import unittest
+
+from app_testcase import AppTestCase, prompt_app
+
+
+class AppStaticTests(AppTestCase):
+    def test_pages_are_compressed_and_still_revalidate(self):
+        row = self.create_prompt_with_cover()
+        self.client.get("/")  # consume the create flash message
+        url = f"/prompt/{row['id']}/versions"
+        plain = self.client.get(url)
+        response = self.client.get(url, headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response.headers["Vary"])
+        self.assertEqual(gzip.decompress(response.get_data()), plain.get_data())
+        self.assertTrue(response.headers["ETag"].startswith("W/"))
+        revalidated = self.client.get(
+            url, headers={"Accept-Encoding": "gzip", "If-None-Match": response.headers["ETag"]}
+        )
+        self.assertEqual(revalidated.status_code, 304)
+
+    def test_static_urls_are_content_hashed_and_immutable(self):
+        with prompt_app.app.test_request_context():
+            url = prompt_app.static_asset("js/main.js")
+        version = prompt_app.assets.file_hash(os.path.join(prompt_app.app.static_folder, "js", "main.js"))
+        self.assertTrue(url.endswith(f"/static/js/main.js?v={version}"))
+        fingerprinted = self.client.get(url)
+        self.assertIn("immutable", fingerprinted.headers["Cache-Control"])
+        self.assertIn("max-age=31536000", fingerprinted.headers["Cache-Control"])
+        fingerprinted.close()
+        stale = self.client.get("/static/js/main.js?v=000000000000")
+        self.assertIn("no-cache", stale.headers["Cache-Control"])
+        self.assertNotIn("immutable", stale.headers["Cache-Control"])
+        stale.close()
+
+    def test_page_styles_and_scripts_are_served_as_bundles(self):
+        row = self.create_prompt_with_cover()
+        self.client.get("/")  # consume the create flash message
+        html = self.client.get(f"/prompt/{row['id']}/versions").get_data(as_text=True)
+        self.assertNotIn("<style>", html)
+        self.assertIn("/static/dist/versions.min.css?v=", html)
+        self.assertIn("/static/dist/versions.min.js?v=", html)
+        start = html.index('id="pageData">') + len('id="pageData">')
+        data = json.loads(html[start:html.index("</script>", start)])
+        self.assertEqual(data["promptId"], row["id"])
+        self.assertEqual(data["csrfToken"], self.csrf())
+        self.assertEqual(data["currentVersionId"], row["current_version_id"])
+        bundle = self.client.get("/static/dist/versions.min.js")
+        self.assertEqual(bundle.status_code, 200)
+        self.assertIn(b"PAGE_DATA", bundle.data)
+        bundle.close()
+
+    def test_build_output_stays_out_of_the_static_sources(self):
+        prompt_app.warm_up()
+        build_dir = os.environ["STATIC_BUILD_DIR"]
+        self.assertTrue(os.path.isfile(os.path.join(build_dir, "dist", "main.min.js")))
+        for folder, _, names in os.walk(prompt_app.app.static_folder):
+            self.assertNotIn(os.path.join(prompt_app.app.static_folder, "dist"), folder)
+            self.assertFalse([n for n in names if n.endswith((".gz", ".br"))], folder)
+        response = self.client.get("/static/dist/main.min.js", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        with open(os.path.join(build_dir, "dist", "main.min.js"), "rb") as handle:
+            self.assertEqual(gzip.decompress(response.get_data()), handle.read())
+        response.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+import unittest
+
+from app_testcase import AppTestCase, prompt_app
+
+
+class AppVersionTests(AppTestCase):
+    def test_unchanged_content_does_not_create_a_version(self):
+        row = self.create_prompt_with_cover()
+        form = {
+            "name": "改名但内容不变",
+            "content": "两行预览内容",
+            "do_save_version": "1",
+            "bump_kind": "patch",
+            "cover_focus_x": "50",
+            "cover_focus_y": "50",
+        }
+        response = self.client.post(f"/prompt/{row['id']}", data={**form, "_csrf_token": self.csrf()})
+        self.assertEqual(response.status_code, 302)
+        response = self.client.post(
+            f"/prompt/{row['id']}/rollback/{row['current_version_id']}",
+            data={"_csrf_token": self.csrf(), "bump_kind": "patch"},
+        )
+        self.assertEqual(response.status_code, 302)
+        conn = prompt_app.get_db()
+        updated = conn.execute("SELECT name, current_version_id FROM prompts WHERE id=?", (row["id"],)).fetchone()
+        count = conn.execute("SELECT COUNT(*) FROM versions WHERE prompt_id=?", (row["id"],)).fetchone()[0]
+        conn.close()
+        self.assertEqual(updated["name"], "改名但内容不变")
+        self.assertEqual(updated["current_version_id"], row["current_version_id"])
+        self.assertEqual(count, 1)
+
+    def test_rollback_to_a_snapshot_shares_its_blob_and_is_listed(self):
+        row = self.create_prompt_with_cover()
+        conn = prompt_app.get_db()
+        conn.execute("INSERT OR REPLACE INTO settings(key, value) VALUES('version_snapshot_interval', '1')")
+        conn.commit()
+        conn.close()
+        prompt_app.invalidate_settings_cache()
+        bodies = ["保存的快照正文 " * 40, "另一版正文 " * 40]
+        for body in bodies:
+            response = self.client.post(
+                f"/prompt/{row['id']}",
+                data={
+                    "_csrf_token": self.csrf(),
+                    "name": row["name"],
+                    "content": body,
+                    "do_save_version": "1",
+                    "bump_kind": "patch",
+                    "cover_focus_x": "50",
+                    "cover_focus_y": "50",
+                },
+            )
+            self.assertEqual(response.status_code, 302)
+        conn = prompt_app.get_db()
+        snapshot = conn.execute(
+            "SELECT id, storage FROM versions WHERE prompt_id=? ORDER BY id LIMIT 1 OFFSET 1", (row["id"],)
+        ).fetchone()
+        conn.close()
+        self.assertEqual(snapshot["storage"], "blob")
+        response = self.client.post(
+            f"/prompt/{row['id']}/rollback/{snapshot['id']}",
+            data={"_csrf_token": self.csrf(), "bump_kind": "patch"},
+        )
+        self.assertEqual(response.status_code, 302)
+        conn = prompt_app.get_db()
+        current = conn.execute(
+            "SELECT v.content, v.storage FROM prompts p JOIN versions v ON v.id=p.current_version_id WHERE p.id=?",
+            (row["id"],),
+        ).fetchone()
+        blobs = conn.execute("SELECT COUNT(*) FROM content_blobs").fetchone()[0]
+        conn.close()
+        self.assertEqual(tuple(current), ("", "blob"))
+        self.assertEqual(blobs, 2)
+        page = self.client.get("/", query_string={"q": "保存的快照"}).get_data(as_text=True)
+        self.assertIn("保存的快照正文", page)
+        self.assertIn(row["name"], page)
+
+    def test_versions_api_is_paginated_and_loads_content_on_demand(self):
+        row = self.create_prompt_with_cover()
+        for n in range(3):
+            self.client.post(
+                f"/prompt/{row['id']}",
+                data={
+                    "_csrf_token": self.csrf(),
+                    "name": row["name"],
+                    "content": f"第 {n} 次修改",
+                    "do_save_version": "1",
+                    "bump_kind": "patch",
+                    "cover_focus_x": "50",
+                    "cover_focus_y": "50",
+                },
+            )
+        listing = self.client.get(f"/api/prompts/{row['id']}/versions?per_page=3").get_json()
+        self.assertEqual((listing["total"], listing["has_more"]), (4, True))
+        self.assertEqual([item["version"] for item in listing["items"]], ["1.0.3", "1.0.2", "1.0.1"])
+        self.assertNotIn("content", listing["items"][0])
+        self.assertEqual(listing["items"][0]["lines_added"], 1)
+        by_size = self.client.get(f"/api/prompts/{row['id']}/versions?order=changes").get_json()["items"]
+        changes = [item["chars_changed"] for item in by_size]
+        self.assertEqual(changes, sorted(changes, reverse=True))
+        self.assertEqual(by_size[-1]["version"], "1.0.0")
+        self.assertTrue(listing["items"][0]["is_current"])
+        oldest = self.client.get(f"/api/prompts/{row['id']}/versions?per_page=3&page=2").get_json()["items"][0]
+        self.assertEqual(oldest["size"], len("两行预览内容"))
+        detail = self.client.get(f"/api/prompts/{row['id']}/versions/{oldest['id']}").get_json()
+        self.assertEqual(detail["content"], "两行预览内容")
+        page = self.client.get(f"/prompt/{row['id']}/versions")
+        self.assertNotIn("两行预览内容", page.get_data(as_text=True))
+
+    def test_versions_api_requires_unlock_for_protected_prompt(self):
+        row = self.create_prompt_with_cover()
+        conn = prompt_app.get_db()
+        conn.execute("UPDATE settings SET value='per' WHERE key='auth_mode'")
+        conn.execute("UPDATE prompts SET require_password=1 WHERE id=?", (row["id"],))
+        conn.commit()
+        conn.close()
+        response = self.client.get(f"/api/prompts/{row['id']}/versions/{row['current_version_id']}")
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.get_json(), {"error": "auth_required"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import io
+import os
+import threading
+import unittest
+from unittest import mock
+
+from write_queue import WriteQueueTimeout
+
+from app_testcase import AppTestCase, png_bytes, prompt_app
+
+
+class AppWriteQueueTests(AppTestCase):
+    def test_concurrent_saves_go_through_write_queue(self):
+        clients = [prompt_app.app.test_client() for _ in range(8)]
+        tokens = []
+        for client in clients:
+            client.get("/prompt/new")
+            with client.session_transaction() as session:
+                tokens.append(session["_csrf_token"])
+        committed = prompt_app.write_queue.committed
+        statuses = []
+
+        def create(index):
+            response = clients[index].post(
+                "/prompt/new",
+                data={"_csrf_token": tokens[index], "name": f"并发 {index}", "content": f"内容 {index}"},
+            )
+            statuses.append(response.status_code)
+
+        threads = [threading.Thread(target=create, args=(i,)) for i in range(len(clients))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(10)
+        self.assertEqual(statuses, [302] * len(clients))
+        self.assertEqual(prompt_app.write_queue.committed - committed, len(clients))
+        conn = prompt_app.get_db()
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM prompts").fetchone()[0], len(clients))
+        self.assertEqual(conn.execute("SELECT COUNT(*) FROM versions").fetchone()[0], len(clients))
+        self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        conn.close()
+
+    def test_legacy_password_hash_is_upgraded_through_write_queue(self):
+        legacy = prompt_app.hashlib.sha256(b"secret").hexdigest()
+        conn = prompt_app.get_db()
+        conn.execute("UPDATE settings SET value=? WHERE key='auth_password_hash'", (legacy,))
+        conn.commit()
+        conn.close()
+        committed = prompt_app.write_queue.committed
+        response = self.client.post("/login", data={"_csrf_token": self.csrf(), "password": "secret"})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(prompt_app.write_queue.committed, committed + 1)
+        conn = prompt_app.get_db()
+        upgraded = prompt_app.get_setting(conn, "auth_password_hash")
+        conn.close()
+        self.assertNotEqual(upgraded, legacy)
+        self.assertTrue(prompt_app.password_pool.check(upgraded, "secret"))
+
+    def test_full_write_queue_returns_503(self):
+        row = self.create_prompt_with_cover()
+        with mock.patch.object(prompt_app.write_queue, "submit", side_effect=prompt_app.WriteQueueBusy("busy")):
+            response = self.client.post(f"/prompt/{row['id']}/pin", data={"_csrf_token": self.csrf()})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers["Retry-After"], "1")
+        self.assertIn("服务器繁忙", response.get_data(as_text=True))
+        conn = prompt_app.get_db()
+        conn.execute("UPDATE settings SET value='en' WHERE key='language'")
+        conn.commit()
+        conn.close()
+        prompt_app.invalidate_settings_cache()
+        with mock.patch.object(prompt_app.write_queue, "submit", side_effect=prompt_app.WriteQueueBusy("busy")):
+            response = self.client.post(f"/prompt/{row['id']}/pin", data={"_csrf_token": self.csrf()})
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("The server is busy", response.get_data(as_text=True))
+
+    def test_cover_survives_a_timeout_while_the_write_is_running(self):
+        started = threading.Event()
+        release = threading.Event()
+        create_version = prompt_app.create_version
+
+        def slow_create_version(*args, **kwargs):
+            started.set()
+            release.wait(5)
+            return create_version(*args, **kwargs)
+
+        def post_new(name):
+            return self.client.post(
+                "/prompt/new",
+                data={
+                    "_csrf_token": self.csrf(),
+                    "name": name,
+                    "content": "内容",
+                    "image_file": (io.BytesIO(png_bytes()), "cover.png", "image/png"),
+                },
+                content_type="multipart/form-data",
+            )
+
+        with mock.patch.object(prompt_app, "create_version", slow_create_version), \
+                mock.patch.object(prompt_app.write_queue, "timeout", 0.05):
+            response = post_new("超时但已提交")
+            self.assertEqual(response.status_code, 503)
+            self.assertTrue(started.is_set())
+            release.set()
+        prompt_app.write_queue.submit(lambda conn: None)  # wait for the running write to commit
+        conn = prompt_app.get_db()
+        row = conn.execute("SELECT * FROM prompts WHERE name='超时但已提交'").fetchone()
+        conn.close()
+        self.assertIsNotNone(row)
+        for filename in prompt_app.cover_filenames(row):
+            self.assertTrue(os.path.isfile(os.path.join(prompt_app.COVER_DIR, filename)), filename)
+        response = self.client.get(f"/prompt/{row['id']}/cover/full")
+        self.assertEqual(response.status_code, 200)
+        response.close()
+
+        # A write that was cancelled before it started never commits, so its files go.
+        before = set(os.listdir(prompt_app.COVER_DIR))
+        cancelled = WriteQueueTimeout("late", cancelled=True)
+        with mock.patch.object(prompt_app.write_queue, "submit", side_effect=cancelled):
+            self.assertEqual(post_new("已取消").status_code, 503)
+        self.assertEqual(set(os.listdir(prompt_app.COVER_DIR)), before)
+
+
+if __name__ == "__main__":
+    unittest.main()
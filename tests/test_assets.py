@@ -0,0 +1,135 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import assets
+
+
+class AssetManifestTests(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="prompt-assets-")
+        os.makedirs(os.path.join(self.root, "css"))
+        self.write("css/style.css", b"body { margin: 0; }\n")
+        self.write("css/style.css.gz", b"compressed copy")
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def write(self, name, data):
+        with open(os.path.join(self.root, *name.split("/")), "wb") as handle:
+            handle.write(data)
+
+    def test_manifest_hashes_content_and_skips_compressed_copies(self):
+        files = assets.build_manifest(self.root)
+        self.assertEqual(set(files), {"css/style.css"})
+        self.assertEqual(len(files["css/style.css"]), assets.HASH_LENGTH)
+        before = files["css/style.css"]
+        os.utime(os.path.join(self.root, "css", "style.css"), (0, 0))
+        self.assertEqual(assets.build_manifest(self.root)["css/style.css"], before)
+        self.write("css/style.css", b"body { margin: 1px; }\n")
+        self.assertNotEqual(assets.build_manifest(self.root)["css/style.css"], before)
+
+    def test_persisted_manifest_round_trip(self):
+        path = os.path.join(self.root, "manifest.json")
+        assets.write_manifest(path, {"css/style.css": "abc123"})
+        self.assertEqual(assets.read_manifest(path), {"css/style.css": "abc123"})
+        manifest = assets.AssetManifest(self.root, manifest_path=path)
+        self.assertEqual(manifest.version("css/style.css"), "abc123")
+        self.assertTrue(manifest.is_current("css/style.css", "abc123"))
+        self.assertFalse(manifest.is_current("css/style.css", None))
+        self.write("manifest.json", b"{not json")
+        with self.assertRaises(assets.ManifestError):
+            assets.read_manifest(path)
+        fallback = assets.AssetManifest(self.root, manifest_path=path)
+        self.assertEqual(fallback.version("css/style.css"), assets.file_hash(os.path.join(self.root, "css", "style.css")))
+
+    def test_live_mode_sees_edits_without_rebuild(self):
+        manifest = assets.AssetManifest(self.root, live=True)
+        first = manifest.version("css/style.css")
+        self.write("css/style.css", b"body { padding: 0; }\n")
+        self.assertNotEqual(manifest.version("css/style.css"), first)
+        self.assertIsNone(manifest.version("css/missing.css"))
+
+
+    def test_bundles_can_be_built_outside_the_static_sources(self):
+        build = tempfile.mkdtemp(prefix="prompt-bundles-build-")
+        self.addCleanup(shutil.rmtree, build, True)
+        bundles = {"dist/style.min.css": ["css/style.css"]}
+        manifest = assets.AssetManifest(self.root, bundles=bundles, build_root=build)
+        files = manifest.load()
+        self.assertEqual(files["dist/style.min.css"], assets.file_hash(os.path.join(build, "dist", "style.min.css")))
+        self.assertIn("css/style.css", files)
+        self.assertEqual(manifest.directory("dist/style.min.css"), build)
+        self.assertEqual(manifest.directory("css/style.css"), self.root)
+        self.assertFalse(os.path.exists(os.path.join(self.root, "dist")))
+
+class MinifyTests(unittest.TestCase):
+    def test_css_drops_comments_and_layout_whitespace(self):
+        source = "/* card */\n.card  >  .title ,\n.a :hover {\n  content: \"  x  \";\n  margin: calc(1px + 2px);\n}\n"
+        self.assertEqual(
+            assets.minify_css(source),
+            '.card>.title,.a :hover{content:"  x  ";margin:calc(1px + 2px)}\n',
+        )
+
+    def test_js_keeps_literals_and_line_breaks(self):
+        source = (
+            "// header\n"
+            "const url = 'http://x//y'; /* note */\n"
+            "const re = /\\/\\/[/]+/g;\n"
+            "    const html = `<p>\n  ${ items.map(i => `<b>${i}</b>`).join('') }\n</p>`;\n"
+            "const half = total / 2 / count;\n"
+            "return\n"
+            "  value\n"
+        )
+        self.assertEqual(
+            assets.minify_js(source),
+            "const url = 'http://x//y';\n"
+            "const re = /\\/\\/[/]+/g;\n"
+            "const html = `<p>\n  ${ items.map(i => `<b>${i}</b>`).join('') }\n</p>`;\n"
+            "const half = total / 2 / count;\n"
+            "return\n"
+            "value\n",
+        )
+
+    def test_bundles_rebuild_only_when_sources_change(self):
+        root = tempfile.mkdtemp(prefix="prompt-bundles-")
+        self.addCleanup(shutil.rmtree, root, True)
+        os.makedirs(os.path.join(root, "js"))
+        with open(os.path.join(root, "js", "page.js"), "w", encoding="utf-8") as handle:
+            handle.write("// page\nrun();\n")
+        bundles = {"dist/page.min.js": ["js/page.js"]}
+        self.assertEqual(assets.build_bundles(root, bundles), ["dist/page.min.js"])
+        self.assertEqual(assets.build_bundles(root, bundles), [])
+        with open(os.path.join(root, "dist", "page.min.js"), encoding="utf-8") as handle:
+            self.assertEqual(handle.read(), "run();\n")
+        manifest = assets.AssetManifest(root, bundles=bundles)
+        self.assertIn("dist/page.min.js", manifest.load())
+        self.assertNotIn(assets.BUNDLE_MANIFEST, manifest.load())
+
+    def test_bundle_staleness_is_decided_by_content_not_mtime(self):
+        root = tempfile.mkdtemp(prefix="prompt-bundles-")
+        self.addCleanup(shutil.rmtree, root, True)
+        os.makedirs(os.path.join(root, "js"))
+        source = os.path.join(root, "js", "page.js")
+        with open(source, "w", encoding="utf-8") as handle:
+            handle.write("run();\n")
+        bundles = {"dist/page.min.js": ["js/page.js"]}
+        target = os.path.join(root, "dist", "page.min.js")
+        self.assertEqual(assets.build_bundles(root, bundles), ["dist/page.min.js"])
+        # A source that looks newer but is unchanged is not rebuilt ...
+        os.utime(target, (0, 0))
+        self.assertEqual(assets.build_bundles(root, bundles), [])
+        # ... while an edit is picked up even when its mtime is older than the bundle.
+        with open(source, "w", encoding="utf-8") as handle:
+            handle.write("stop();\n")
+        os.utime(source, (0, 0))
+        self.assertEqual(assets.build_bundles(root, bundles), ["dist/page.min.js"])
+        with open(target, "w", encoding="utf-8") as handle:
+            handle.write("tampered();\n")
+        self.assertEqual(assets.build_bundles(root, bundles), ["dist/page.min.js"])
+        with open(target, encoding="utf-8") as handle:
+            self.assertEqual(handle.read(), "stop();\n")
+
+if __name__ == "__main__":
+    unittest.main()
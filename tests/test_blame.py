@@ -0,0 +1,94 @@
+import sqlite3
+import unittest
+
+import blame
+import version_store
+
+
+SCHEMA = """
+CREATE TABLE versions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    prompt_id INTEGER NOT NULL,
+    version TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at TEXT,
+    parent_version_id INTEGER,
+    storage TEXT DEFAULT 'full',
+    delta_base_id INTEGER,
+    codec TEXT,
+    content_hash TEXT,
+    size INTEGER,
+    lines_added INTEGER,
+    lines_removed INTEGER,
+    chars_changed INTEGER,
+    similarity REAL,
+    pinned INTEGER DEFAULT 0,
+    label TEXT
+);
+CREATE TABLE content_blobs (hash TEXT PRIMARY KEY, content BLOB NOT NULL, codec TEXT, size INTEGER);
+CREATE TABLE version_blame (version_id INTEGER PRIMARY KEY, prompt_id INTEGER NOT NULL, runs TEXT NOT NULL);
+"""
+
+
+class BlameTests(unittest.TestCase):
+    def setUp(self):
+        version_store.clear_cache()
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+
+    def tearDown(self):
+        self.conn.close()
+
+    def save(self, contents, record=True):
+        parent = None
+        ids = []
+        for n, content in enumerate(contents):
+            parent_content = version_store.load_content(self.conn, parent) if parent else None
+            vid = version_store.insert_version(self.conn, 1, f"1.0.{n}", content, f"2024-01-0{n + 1}", parent)
+            if record:
+                blame.record_version(self.conn, vid, 1, content, parent, parent_content)
+            ids.append(vid)
+            parent = vid
+        return ids
+
+    def test_runs_round_trip(self):
+        origins = [3, 3, 3, 7, 3, 9, 9]
+        self.assertEqual(blame.encode_runs(origins), "[[3,3],[7,1],[3,1],[9,2]]")
+        self.assertEqual(blame.decode_runs(blame.encode_runs(origins)), origins)
+
+    def test_lines_keep_the_version_that_introduced_them(self):
+        first, second, third = self.save([
+            "role\ntone\nformat",
+            "role\ntone: calm\nformat\nexamples",
+            "intro\nrole\ntone: calm\nexamples",
+        ])
+        self.assertEqual(blame.blame_for(self.conn, first), [first] * 3)
+        self.assertEqual(blame.blame_for(self.conn, second), [first, second, first, second])
+        self.assertEqual(blame.blame_for(self.conn, third), [third, first, second, second])
+
+    def test_missing_entries_are_computed_without_writing(self):
+        ids = self.save(["a\nb", "a\nb\nc", "z\na\nb\nc"], record=False)
+        self.assertEqual(blame.blame_for(self.conn, ids[-1]), [ids[2], ids[0], ids[0], ids[1]])
+        stored = self.conn.execute("SELECT COUNT(*) FROM version_blame").fetchone()[0]
+        self.assertEqual(stored, 0)
+
+    def test_backfill_stores_missing_entries_in_batches(self):
+        ids = self.save(["a\nb", "a\nb\nc", "z\na\nb\nc"], record=False)
+        self.assertEqual(blame.backfill(self.conn, 0, batch_size=2), (ids[1], 2))
+        self.assertEqual(blame.backfill(self.conn, ids[1], batch_size=2), (None, 1))
+        self.assertEqual(blame.backfill(self.conn, 0), (None, 0))
+        row = self.conn.execute("SELECT runs FROM version_blame WHERE version_id=?", (ids[-1],)).fetchone()
+        self.assertEqual(blame.decode_runs(row["runs"]), [ids[2], ids[0], ids[0], ids[1]])
+
+    def test_forget_drops_entries(self):
+        ids = self.save(["a", "a\nb"])
+        blame.forget(self.conn, ids[:1])
+        remaining = [r[0] for r in self.conn.execute("SELECT version_id FROM version_blame")]
+        self.assertEqual(remaining, ids[1:])
+        # The surviving entry still names the pruned origin.
+        self.assertEqual(blame.blame_for(self.conn, ids[1]), [ids[0], ids[1]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,147 @@
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+
+import assets
+import compression
+from compression import CompressionMiddleware, PrecompressedStatic, negotiate
+
+
+TEXT = ("<p>" + "提示词内容 " * 400 + "</p>").encode("utf-8")
+
+
+def make_app(body=TEXT, content_type="text/html; charset=utf-8", chunks=None, headers=()):
+    def app(environ, start_response):
+        response_headers = [("Content-Type", content_type), ("ETag", '"abc"'), *headers]
+        if chunks is None:
+            response_headers.append(("Content-Length", str(len(body))))
+        start_response("200 OK", response_headers)
+        return list(chunks) if chunks is not None else [body]
+    return app
+
+
+def call(app, accept="gzip"):
+    captured = {}
+
+    def start_response(status, headers, exc_info=None):
+        captured["status"] = status
+        captured["headers"] = dict(headers)
+        return lambda data: None
+
+    body = b"".join(app({"REQUEST_METHOD": "GET", "HTTP_ACCEPT_ENCODING": accept}, start_response))
+    return captured["headers"], body
+
+
+class NegotiationTests(unittest.TestCase):
+    def test_quality_values_and_preference(self):
+        self.assertEqual(negotiate("gzip, deflate", ["br", "gzip"]), "gzip")
+        self.assertEqual(negotiate("gzip, br", ["br", "gzip"]), "br")
+        self.assertEqual(negotiate("br;q=0.5, gzip", ["br", "gzip"]), "gzip")
+        self.assertEqual(negotiate("*", ["br", "gzip"]), "br")
+        self.assertIsNone(negotiate("gzip;q=0", ["gzip"]))
+        self.assertIsNone(negotiate("", ["gzip"]))
+
+
+class MiddlewareTests(unittest.TestCase):
+    def test_large_text_response_is_gzipped(self):
+        headers, body = call(CompressionMiddleware(make_app()))
+        self.assertEqual(headers["Content-Encoding"], "gzip")
+        self.assertEqual(headers["Vary"], "Accept-Encoding")
+        self.assertEqual(headers["ETag"], 'W/"abc"')
+        self.assertNotIn("Content-Length", headers)
+        self.assertEqual(gzip.decompress(body), TEXT)
+
+    def test_small_binary_and_unaccepted_responses_pass_through(self):
+        headers, body = call(CompressionMiddleware(make_app(b"<p>short</p>")))
+        self.assertNotIn("Content-Encoding", headers)
+        self.assertEqual(body, b"<p>short</p>")
+        headers, _ = call(CompressionMiddleware(make_app(content_type="image/png")))
+        self.assertNotIn("Content-Encoding", headers)
+        headers, body = call(CompressionMiddleware(make_app()), accept="identity")
+        self.assertNotIn("Content-Encoding", headers)
+        self.assertEqual(body, TEXT)
+
+    def test_streamed_response_is_flushed_per_chunk(self):
+        chunks = [b"id,name\n", b"1,alpha\n", b"2,beta\n"]
+        app = CompressionMiddleware(make_app(content_type="text/csv", chunks=chunks), min_size=10**6)
+        captured = {}
+
+        def start_response(status, headers, exc_info=None):
+            captured.update(headers)
+
+        parts = list(app({"REQUEST_METHOD": "GET", "HTTP_ACCEPT_ENCODING": "gzip"}, start_response))
+        self.assertEqual(captured["Content-Encoding"], "gzip")
+        self.assertGreaterEqual(len(parts), len(chunks))
+        self.assertEqual(gzip.decompress(b"".join(parts)), b"".join(chunks))
+
+
+class PrecompressedStaticTests(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="prompt-static-")
+        os.makedirs(os.path.join(self.root, "css"))
+        with open(os.path.join(self.root, "css", "style.css"), "wb") as handle:
+            handle.write(b".card { color: #333; }\n" * 200)
+        with open(os.path.join(self.root, "tiny.js"), "wb") as handle:
+            handle.write(b"1;")
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_variants_are_built_once_and_negotiated(self):
+        static = PrecompressedStatic(self.root, min_size=100)
+        self.assertEqual(set(static.prepare()), {"css/style.css"})
+        digest = assets.file_hash(os.path.join(self.root, "css", "style.css"))
+        with open(os.path.join(self.root, "css", f"style.css.{digest}.gz"), "rb") as handle:
+            self.assertEqual(gzip.decompress(handle.read()), b".card { color: #333; }\n" * 200)
+        self.assertEqual(static.lookup("css/style.css", "gzip"), ("gzip", f"css/style.css.{digest}.gz"))
+        self.assertEqual(static.lookup("css/style.css", "identity"), (None, "css/style.css"))
+        self.assertEqual(static.lookup("tiny.js", "gzip"), (None, "tiny.js"))
+        if compression.brotli is not None:
+            self.assertEqual(static.lookup("css/style.css", "br, gzip")[0], "br")
+
+    def test_variants_follow_content_not_mtime(self):
+        path = os.path.join(self.root, "css", "style.css")
+        PrecompressedStatic(self.root, min_size=100).prepare()
+        old = assets.file_hash(path)
+        # Neither a legacy unhashed copy nor an older mtime may pass old content off as new.
+        with open(os.path.join(self.root, "css", "style.css.gz"), "wb") as handle:
+            handle.write(gzip.compress(b"legacy"))
+        with open(path, "wb") as handle:
+            handle.write(b".card { color: #000; }\n" * 200)
+        os.utime(path, (0, 0))
+        new = assets.file_hash(path)
+        static = PrecompressedStatic(self.root, min_size=100, hashes=lambda: {"css/style.css": new})
+        encoding, variant = static.lookup("css/style.css", "gzip")
+        self.assertEqual((encoding, variant), ("gzip", f"css/style.css.{new}.gz"))
+        with open(os.path.join(self.root, *variant.split("/")), "rb") as handle:
+            self.assertEqual(gzip.decompress(handle.read()), b".card { color: #000; }\n" * 200)
+        leftovers = [n for n in os.listdir(os.path.join(self.root, "css")) if n.endswith(".gz")]
+        self.assertEqual(leftovers, [f"style.css.{new}.gz"])
+        self.assertNotEqual(old, new)
+
+    def test_source_that_differs_from_manifest_is_not_precompressed(self):
+        static = PrecompressedStatic(self.root, min_size=100, hashes=lambda: {"css/style.css": "0" * 12})
+        self.assertEqual(static.prepare(), {})
+        self.assertEqual(static.lookup("css/style.css", "gzip"), (None, "css/style.css"))
+
+    def test_variants_can_be_written_to_a_separate_build_root(self):
+        build = tempfile.mkdtemp(prefix="prompt-static-build-")
+        self.addCleanup(shutil.rmtree, build, True)
+        static = PrecompressedStatic(self.root, min_size=100, build_root=build)
+        encoding, variant = static.lookup("css/style.css", "gzip")
+        self.assertEqual(encoding, "gzip")
+        self.assertTrue(os.path.isfile(os.path.join(build, *variant.split("/"))))
+        self.assertEqual(sorted(os.listdir(os.path.join(self.root, "css"))), ["style.css"])
+
+    def test_live_mode_skips_variants_of_edited_files(self):
+        static = PrecompressedStatic(self.root, min_size=100, live=True)
+        self.assertEqual(static.lookup("css/style.css", "gzip")[0], "gzip")
+        with open(os.path.join(self.root, "css", "style.css"), "ab") as handle:
+            handle.write(b".edited {}\n")
+        self.assertEqual(static.lookup("css/style.css", "gzip"), (None, "css/style.css"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import difflib
+import json
+import unittest
+
+import diff_engine
+
+
+def numbered(count, changed=()):
+    return "\n".join(f"changed {i}" if i in changed else f"line {i}" for i in range(count))
+
+
+class DiffEngineTests(unittest.TestCase):
+    def assert_opcodes_rebuild(self, a_lines, b_lines):
+        ops = diff_engine.line_opcodes(a_lines, b_lines, budget_seconds=None)
+        rebuilt = []
+        for tag, i1, i2, j1, j2 in ops:
+            if tag == "equal":
+                self.assertEqual(a_lines[i1:i2], b_lines[j1:j2])
+            rebuilt.extend(b_lines[j1:j2])
+        self.assertEqual(rebuilt, b_lines)
+        self.assertEqual(sum(i2 - i1 for _, i1, i2, _, _ in ops), len(a_lines))
+        return ops
+
+    def test_line_opcodes_cover_both_sides(self):
+        cases = [
+            ([], []),
+            (["a"], []),
+            ([], ["a"]),
+            (["a", "b", "c"], ["a", "x", "c", "d"]),
+            (["x", "x", "y", "x"], ["y", "x", "x", "x", "z"]),
+            (["a", "b", "c", "d"], ["d", "c", "b", "a"]),
+        ]
+        for a_lines, b_lines in cases:
+            with self.subTest(a=a_lines, b=b_lines):
+                self.assert_opcodes_rebuild(a_lines, b_lines)
+
+    def test_matches_as_many_lines_as_difflib_on_edits(self):
+        a_lines = numbered(300).splitlines()
+        b_lines = numbered(300, changed={5, 50, 51, 200}).splitlines()
+        ops = self.assert_opcodes_rebuild(a_lines, b_lines)
+        equal = sum(i2 - i1 for tag, i1, i2, _, _ in ops if tag == "equal")
+        reference = sum(size for _, _, size in difflib.SequenceMatcher(None, a_lines, b_lines).get_matching_blocks())
+        self.assertEqual(equal, reference)
+
+    def test_word_mode_marks_changed_tokens(self):
+        result = diff_engine.compute_diff("keep the tone calm", "keep the tone friendly", context=None)
+        row = result.rows[0]
+        self.assertEqual(row["op"], "change")
+        self.assertEqual([row["right"][s:e] for s, e in row["right_spans"]], ["friendly"])
+        self.assertEqual(diff_engine.compact_rows(result.rows)[0][-1], [14, 22])
+        self.assertNotIn("left_spans", diff_engine.compute_diff("a", "b", mode="line").rows[0])
+
+    def test_unchanged_runs_collapse_into_skip_rows(self):
+        result = diff_engine.compute_diff(numbered(100), numbered(100, changed={50}))
+        skips = [row for row in result.rows if row["op"] == "skip"]
+        self.assertEqual([(r["a"], r["count"]) for r in skips], [(0, 47), (54, 46)])
+        self.assertEqual(len(result.rows), 2 + 3 + 1 + 3)
+        self.assertIn(["~", 54, 54, 46], json.loads(diff_engine.to_json(result))["rows"])
+
+    def test_exhausted_budget_falls_back_to_line_level(self):
+        result = diff_engine.compute_diff("a b c\nsame", "a x c\nsame", budget_seconds=0, context=None)
+        self.assertTrue(result.degraded)
+        self.assertNotIn("right_spans", result.rows[0])
+        self.assertTrue(json.loads(diff_engine.to_json(result))["degraded"])
+
+    def test_compact_spans_use_utf16_offsets(self):
+        result = diff_engine.compute_diff("😀 calm", "😀 friendly", context=None)
+        row = diff_engine.compact_rows(result.rows)[0]
+        self.assertEqual(row[:5], ["!", 0, 0, "😀 calm", "😀 friendly"])
+        self.assertEqual(row[6], [3, 11])
+
+
+class DiffCacheTests(unittest.TestCase):
+    def test_hits_and_misses_are_counted(self):
+        cache = diff_engine.DiffCache(max_chars=100)
+        key = cache.key("a", "b", "word")
+        self.assertIsNone(cache.get(key))
+        cache.put(key, "<table>")
+        self.assertEqual(cache.get(key), "<table>")
+        self.assertEqual(cache.get(cache.key("a", "b", "line")), None)
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"], stats["chars"]), (1, 2, 1, 7))
+
+    def test_cache_is_bounded_by_rendered_size(self):
+        cache = diff_engine.DiffCache(max_chars=10)
+        cache.put("first", "x" * 4)
+        cache.put("second", "y" * 4)
+        cache.get("first")
+        cache.put("third", "z" * 4)
+        self.assertIsNone(cache.get("second"))
+        self.assertEqual(cache.get("first"), "x" * 4)
+        cache.put("huge", "w" * 11)
+        self.assertIsNone(cache.get("huge"))
+        self.assertLessEqual(cache.stats()["chars"], 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
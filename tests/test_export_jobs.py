@@ -0,0 +1,93 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import export_jobs
+
+
+class ExportJobManagerTests(unittest.TestCase):
+    def setUp(self):
+        self.export_dir = tempfile.mkdtemp(prefix="prompt-manager-exports-")
+        self.builds = 0
+        self.release = threading.Event()
+        self.release.set()
+
+    def tearDown(self):
+        shutil.rmtree(self.export_dir, ignore_errors=True)
+
+    def build(self, export_format, progress, as_of=None):
+        self.builds += 1
+        self.release.wait(5)
+        progress(1, 2)
+        progress(2, 2)
+        return 7, f"{export_format}-payload".encode()
+
+    def manager(self):
+        return export_jobs.ExportJobManager(self.export_dir, self.build)
+
+    def wait_done(self, manager, job_id):
+        for _ in range(200):
+            status = manager.status(job_id)
+            if status and status["state"] in ("done", "failed") and not manager.is_running(job_id):
+                return status
+            threading.Event().wait(0.01)
+        self.fail("export job did not finish")
+
+    def test_unchanged_generation_is_served_from_cache(self):
+        manager = self.manager()
+        path = manager.run_sync("json", 7)
+        with open(path, "rb") as artifact:
+            self.assertEqual(artifact.read(), b"json-payload")
+        self.assertEqual(manager.run_sync("json", 7), path)
+        status = manager.start("json", 7)
+        self.assertEqual(status["state"], "done")
+        self.assertEqual(self.builds, 1)
+
+    def test_concurrent_starts_share_one_job(self):
+        self.release.clear()
+        first = self.manager()
+        second = self.manager()
+        job = first.start("zip", 7)
+        again = second.start("zip", 7)
+        self.assertEqual(job["id"], again["id"])
+        self.release.set()
+        status = self.wait_done(first, job["id"])
+        self.assertEqual(status["state"], "done")
+        self.assertEqual(status["progress"], 2)
+        self.assertEqual(self.builds, 1)
+        self.assertTrue(os.path.isfile(first.artifact_for(job["id"])))
+
+    def test_new_generation_replaces_old_artifacts(self):
+        manager = self.manager()
+        manager.run_sync("csv", 7)
+        os.rename(
+            os.path.join(self.export_dir, "prompts-g7.csv"),
+            os.path.join(self.export_dir, "prompts-g3.csv"),
+        )
+        manager.run_sync("csv", 7)
+        self.assertEqual(
+            sorted(name for name in os.listdir(self.export_dir) if name.startswith("prompts-")),
+            ["prompts-g7.csv"],
+        )
+
+    def test_failed_build_is_reported_and_can_be_retried(self):
+        def broken(export_format, progress, as_of=None):
+            raise RuntimeError("disk full")
+
+        manager = export_jobs.ExportJobManager(self.export_dir, broken)
+        self.assertIsNone(manager.run_sync("json", 1))
+        self.assertEqual(manager.status("json-g1")["state"], "failed")
+        manager.build_artifact = self.build
+        self.assertTrue(manager.run_sync("json", 1))
+
+    def test_job_ids_are_validated(self):
+        with self.assertRaises(export_jobs.ExportJobError):
+            export_jobs.parse_job_id("../../etc-g1")
+        with self.assertRaises(export_jobs.ExportJobError):
+            export_jobs.job_id_for("xml", 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import sqlite3
+import unittest
+
+import history_search
+import version_store
+
+
+SCHEMA = """
+CREATE TABLE prompts (id INTEGER PRIMARY KEY, name TEXT, current_version_id INTEGER);
+CREATE TABLE versions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    prompt_id INTEGER NOT NULL,
+    version TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at TEXT,
+    parent_version_id INTEGER,
+    storage TEXT DEFAULT 'full',
+    delta_base_id INTEGER,
+    codec TEXT,
+    content_hash TEXT,
+    size INTEGER,
+    lines_added INTEGER,
+    lines_removed INTEGER,
+    chars_changed INTEGER,
+    similarity REAL,
+    pinned INTEGER DEFAULT 0,
+    label TEXT
+);
+CREATE TABLE content_blobs (hash TEXT PRIMARY KEY, content BLOB NOT NULL, codec TEXT, size INTEGER);
+"""
+
+
+class HistorySearchTests(unittest.TestCase):
+    def setUp(self):
+        version_store.clear_cache()
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+        if not history_search.create_index(self.conn):
+            self.skipTest("SQLite without FTS5 trigram support")
+
+    def tearDown(self):
+        self.conn.close()
+
+    def save(self, prompt_id, contents, index=True):
+        self.conn.execute("INSERT OR IGNORE INTO prompts(id, name) VALUES(?, ?)", (prompt_id, f"prompt {prompt_id}"))
+        parent = None
+        ids = []
+        for n, content in enumerate(contents):
+            parent = version_store.insert_version(
+                self.conn, prompt_id, f"1.0.{n}", content, f"2024-01-{n + 1:02d}", parent,
+                policy=version_store.StoragePolicy(snapshot_interval=3),
+            )
+            if index:
+                history_search.index_version(self.conn, parent, content)
+            ids.append(parent)
+        self.conn.execute("UPDATE prompts SET current_version_id=? WHERE id=?", (parent, prompt_id))
+        return ids
+
+    def test_finds_phrases_only_present_in_old_versions(self):
+        ids = self.save(1, ["请使用正式语气回答\n" * 20, "请使用轻松语气回答\n" * 20, "Keep it brief\n" * 20])
+        result = history_search.search(self.conn, "正式语气")
+        self.assertEqual([item["version_id"] for item in result.items], [ids[0]])
+        self.assertEqual(result.items[0]["snippet"]["match"], "正式语气")
+        self.assertFalse(result.items[0]["is_current"])
+        self.assertEqual(history_search.search(self.conn, "KEEP IT").items[0]["version_id"], ids[2])
+
+    def test_results_are_paginated_newest_first(self):
+        ids = self.save(1, [f"shared phrase {n}" for n in range(5)])
+        first = history_search.search(self.conn, "shared phrase", page=1, per_page=2)
+        second = history_search.search(self.conn, "shared phrase", page=3, per_page=2)
+        self.assertEqual(first.total, 5)
+        self.assertTrue(first.has_more)
+        self.assertEqual([i["version_id"] for i in first.items], [ids[4], ids[3]])
+        self.assertEqual([i["version_id"] for i in second.items], [ids[0]])
+        self.assertFalse(second.has_more)
+
+    def test_excluded_prompts_and_short_queries_return_nothing(self):
+        self.save(1, ["secret wording"])
+        self.save(2, ["public wording"])
+        result = history_search.search(self.conn, "wording", exclude_prompt_ids={1})
+        self.assertEqual([i["prompt_id"] for i in result.items], [2])
+        self.assertEqual(history_search.search(self.conn, "wo").total, 0)
+
+    def test_unindexed_versions_are_not_found(self):
+        ids = self.save(1, ["first draft", "second draft"])
+        history_search.unindex_versions(self.conn, ids[:1])
+        version_store.delete_versions(self.conn, ids[:1])
+        self.assertEqual([i["version_id"] for i in history_search.search(self.conn, "draft").items], [ids[1]])
+
+    def test_backfill_indexes_existing_versions_once(self):
+        ids = self.save(1, ["legacy text one", "legacy text two"], index=False)
+        self.assertEqual(history_search.backfill(self.conn, 0, batch_size=10), (None, 2))
+        self.assertEqual(history_search.backfill(self.conn, 0, batch_size=10), (None, 0))
+        self.assertEqual(history_search.search(self.conn, "legacy").total, len(ids))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,37 @@
+import unittest
+
+import i18n
+
+
+class NegotiateTests(unittest.TestCase):
+    def test_region_tags_and_quality_values(self):
+        self.assertEqual(i18n.negotiate("en-US,en;q=0.9"), "en")
+        self.assertEqual(i18n.negotiate("zh-CN,zh;q=0.9,en;q=0.8"), "zh")
+        self.assertEqual(i18n.negotiate("fr-FR, en;q=0.5"), "en")
+        self.assertEqual(i18n.negotiate("en;q=0.4, zh-TW;q=0.6"), "zh")
+        self.assertEqual(i18n.negotiate("en;q=0"), "zh")
+        self.assertEqual(i18n.negotiate("fr, de"), "zh")
+        self.assertEqual(i18n.negotiate(""), "zh")
+
+    def test_resolve_prefers_fixed_setting_over_browser(self):
+        self.assertEqual(i18n.resolve("en", "zh-CN"), ("en", False))
+        self.assertEqual(i18n.resolve("zh", "en-US"), ("zh", False))
+        self.assertEqual(i18n.resolve("auto", "en-US"), ("en", True))
+        self.assertEqual(i18n.resolve(None, "en-US"), ("zh", False))
+        self.assertEqual(i18n.resolve("klingon", ""), ("zh", False))
+
+
+class CatalogTests(unittest.TestCase):
+    def test_translate_falls_back_to_source_text(self):
+        self.assertEqual(i18n.translate("en", "设置"), "Settings")
+        self.assertEqual(i18n.translate("en", "没有译文的句子"), "没有译文的句子")
+        self.assertEqual(i18n.translate("zh", "设置"), "设置")
+        self.assertEqual(i18n.translate("en", None), "")
+
+    def test_catalog_is_loaded_once(self):
+        self.assertIs(i18n.catalog("en"), i18n.catalog("en"))
+        self.assertEqual(i18n.catalog("zh"), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
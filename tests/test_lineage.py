@@ -0,0 +1,102 @@
+import sqlite3
+import unittest
+
+import lineage
+
+
+SCHEMA = """
+CREATE TABLE versions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    prompt_id INTEGER NOT NULL,
+    version TEXT NOT NULL,
+    content TEXT NOT NULL DEFAULT '',
+    created_at TEXT,
+    parent_version_id INTEGER
+);
+CREATE TABLE version_lineage (
+    ancestor_id INTEGER NOT NULL,
+    descendant_id INTEGER NOT NULL,
+    depth INTEGER NOT NULL,
+    PRIMARY KEY (ancestor_id, descendant_id)
+);
+CREATE INDEX idx_version_lineage_descendant ON version_lineage(descendant_id, depth);
+"""
+
+
+class LineageTests(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+        self.count = 0
+
+    def tearDown(self):
+        self.conn.close()
+
+    def save(self, parent=None, record=True, prompt_id=1):
+        self.count += 1
+        cur = self.conn.execute(
+            "INSERT INTO versions(prompt_id, version, created_at, parent_version_id) VALUES(?,?,?,?)",
+            (prompt_id, f"1.0.{self.count}", f"2024-01-{self.count:02d}", parent),
+        )
+        if record:
+            lineage.record_version(self.conn, cur.lastrowid, parent)
+        return cur.lastrowid
+
+    def chain(self, length, record=True):
+        ids = []
+        parent = None
+        for _ in range(length):
+            parent = self.save(parent, record)
+            ids.append(parent)
+        return ids
+
+    def test_ancestors_and_descendants_are_nearest_first(self):
+        a, b, c, d = self.chain(4)
+        self.assertEqual([(r["id"], r["depth"]) for r in lineage.ancestors(self.conn, d)], [(c, 1), (b, 2), (a, 3)])
+        self.assertEqual([(r["id"], r["depth"]) for r in lineage.descendants(self.conn, a)], [(b, 1), (c, 2), (d, 3)])
+        self.assertEqual([r["id"] for r in lineage.ancestors(self.conn, d, limit=2)], [c, b])
+        self.assertEqual(lineage.nearest_ancestor(self.conn, d), c)
+        self.assertIsNone(lineage.nearest_ancestor(self.conn, a))
+
+    def test_common_ancestor_of_branches(self):
+        root, trunk = self.chain(2)
+        left = self.save(trunk)
+        right = self.save(self.save(trunk))
+        found = lineage.common_ancestor(self.conn, left, right)
+        self.assertEqual((found["id"], found["depth_a"], found["depth_b"]), (trunk, 1, 2))
+        self.assertEqual(lineage.common_ancestor(self.conn, left, trunk)["id"], trunk)
+        other = self.save(prompt_id=2)
+        self.assertIsNone(lineage.common_ancestor(self.conn, left, other))
+
+    def test_pruned_versions_keep_paths_between_survivors(self):
+        a, b, c, d = self.chain(4)
+        self.conn.execute("DELETE FROM versions WHERE id IN (?,?)", (b, c))
+        lineage.forget(self.conn, [b, c])
+        self.assertEqual([(r["id"], r["depth"]) for r in lineage.ancestors(self.conn, d)], [(a, 3)])
+        self.assertEqual(lineage.nearest_ancestor(self.conn, d), a)
+        leftover = self.conn.execute(
+            "SELECT COUNT(*) FROM version_lineage WHERE ancestor_id IN (?,?) OR descendant_id IN (?,?)",
+            (b, c, b, c),
+        ).fetchone()[0]
+        self.assertEqual(leftover, 0)
+
+    def test_queries_only_read_and_backfill_links_legacy_versions(self):
+        a, b, c = self.chain(3, record=False)
+        self.assertEqual(lineage.descendants(self.conn, a), [])
+        self.assertIsNone(lineage.common_ancestor(self.conn, b, c))
+        self.assertEqual(self.conn.execute("SELECT COUNT(*) FROM version_lineage").fetchone()[0], 0)
+        self.assertEqual(lineage.backfill(self.conn, 0, batch_size=2), (b, 2))
+        self.assertEqual(lineage.backfill(self.conn, b, batch_size=2), (None, 1))
+        self.assertEqual(lineage.backfill(self.conn, 0), (None, 0))
+        self.assertEqual([r["id"] for r in lineage.descendants(self.conn, a)], [b, c])
+        d = self.save(c)
+        self.assertEqual([r["id"] for r in lineage.ancestors(self.conn, d)], [c, b, a])
+
+    def test_new_version_links_unindexed_parent_chain(self):
+        a, b = self.chain(2, record=False)
+        c = self.save(b)
+        self.assertEqual([r["id"] for r in lineage.ancestors(self.conn, c)], [b, a])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+
+from page_cache import CSRF_PLACEHOLDER, PageCache, make_page
+
+
+class PageCacheTests(unittest.TestCase):
+    def test_key_separates_auth_context_and_language(self):
+        base = PageCache.key("index", [("q", "a")], ("per", False, ()), "zh", 3)
+        self.assertNotEqual(base, PageCache.key("index", [("q", "a")], ("per", False, (7,)), "zh", 3))
+        self.assertNotEqual(base, PageCache.key("index", [("q", "a")], ("per", False, ()), "en", 3))
+        self.assertEqual(base, PageCache.key("index", [("q", "a")], ("per", False, ()), "zh", 3))
+
+    def test_new_generation_drops_older_pages(self):
+        cache = PageCache()
+        old = PageCache.key("index", [], ("off", False, ()), "zh", 1)
+        new = PageCache.key("index", [], ("off", False, ()), "zh", 2)
+        cache.put(old, make_page("<p>old</p>"))
+        cache.put(new, make_page("<p>new</p>"))
+        self.assertIsNone(cache.get(old))
+        self.assertEqual(cache.get(new).body, "<p>new</p>")
+        self.assertEqual(cache.stats()["entries"], 1)
+
+    def test_eviction_respects_char_budget(self):
+        cache = PageCache(max_chars=10)
+        keys = [PageCache.key(f"p{i}", [], (), "zh", 1) for i in range(3)]
+        for key in keys:
+            cache.put(key, make_page("x" * 4))
+        self.assertIsNone(cache.get(keys[0]))
+        self.assertIsNotNone(cache.get(keys[2]))
+        self.assertLessEqual(cache.stats()["chars"], 10)
+
+    def test_token_is_filled_in_per_session(self):
+        page = make_page(f'<input value="{CSRF_PLACEHOLDER}">')
+        self.assertEqual(page.render("abc"), '<input value="abc">')
+        self.assertNotEqual(page.etag("abc"), page.etag("xyz"))
+        self.assertEqual(page.etag("abc"), page.etag("abc"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,38 @@
+import threading
+import unittest
+
+from password_pool import PasswordPool, PasswordPoolBusy
+
+
+class PasswordPoolTests(unittest.TestCase):
+    def test_hash_and_check_run_on_pool_threads(self):
+        pool = PasswordPool(workers=1)
+        hashed = pool.hash("secret")
+        self.assertTrue(pool.check(hashed, "secret"))
+        self.assertFalse(pool.check(hashed, "wrong"))
+        self.assertEqual(pool.run(lambda: threading.current_thread().name)[:13], "password-hash")
+
+    def test_overloaded_pool_rejects_instead_of_queueing(self):
+        pool = PasswordPool(workers=1, max_pending=1, wait=0.05)
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow():
+            started.set()
+            release.wait(5)
+            return "done"
+
+        results = []
+        holder = threading.Thread(target=lambda: results.append(pool.run(slow)))
+        holder.start()
+        self.assertTrue(started.wait(5))
+        with self.assertRaises(PasswordPoolBusy):
+            pool.run(lambda: None)
+        release.set()
+        holder.join(5)
+        self.assertEqual(results, ["done"])
+        self.assertIsNone(pool.run(lambda: None))
+
+
+if __name__ == "__main__":
+    unittest.main()
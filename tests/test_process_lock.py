@@ -0,0 +1,67 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import process_lock
+from process_lock import ProcessLock
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HOLDER_SCRIPT = """
+import sys
+from process_lock import ProcessLock
+lock = ProcessLock(sys.argv[1])
+lock.acquire()
+print("locked", flush=True)
+sys.stdin.read()
+"""
+
+
+@unittest.skipIf(process_lock.fcntl is None, "flock is not available")
+class ProcessLockTests(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="prompt-locks-")
+        self.addCleanup(shutil.rmtree, self.root, True)
+        self.path = os.path.join(self.root, "jobs.lock")
+
+    def start_holder(self):
+        holder = subprocess.Popen(
+            [sys.executable, "-c", HOLDER_SCRIPT, self.path],
+            cwd=ROOT, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+        )
+        self.addCleanup(holder.kill)
+        self.assertEqual(holder.stdout.readline().strip(), "locked")
+        return holder
+
+    def test_lock_excludes_other_processes_until_holder_exits(self):
+        holder = self.start_holder()
+        lock = ProcessLock(self.path)
+        self.assertFalse(lock.acquire(blocking=False))
+        self.assertFalse(lock.held)
+        holder.stdin.close()
+        holder.wait(timeout=10)
+        self.assertTrue(lock.acquire(blocking=False))
+        self.assertTrue(lock.held)
+        lock.release()
+
+    def test_killed_holder_releases_lock(self):
+        holder = self.start_holder()
+        holder.kill()
+        holder.wait(timeout=10)
+        with ProcessLock(self.path) as lock:
+            self.assertTrue(lock.held)
+
+    def test_threads_of_one_process_exclude_each_other(self):
+        lock = ProcessLock(self.path)
+        self.assertTrue(lock.acquire(blocking=False))
+        self.assertFalse(lock.acquire(blocking=False))
+        lock.release()
+        self.assertTrue(lock.acquire(blocking=False))
+        lock.release()
+
+
+if __name__ == "__main__":
+    unittest.main()
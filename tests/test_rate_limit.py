@@ -0,0 +1,116 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import unittest
+
+from rate_limit import RateLimiter
+
+
+def record_failures(path, key, count):
+    limiter = RateLimiter(path, limit=1000, window=300)
+    for _ in range(count):
+        limiter.hit(key)
+
+
+class FakeClock:
+    def __init__(self, now=3000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class RateLimiterTests(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="prompt-ratelimit-")
+        self.addCleanup(shutil.rmtree, self.root, True)
+        self.path = os.path.join(self.root, "limits", "ratelimit.sqlite3")
+        self.clock = FakeClock()
+
+    def limiter(self, **kwargs):
+        kwargs.setdefault("limit", 3)
+        kwargs.setdefault("window", 100)
+        return RateLimiter(self.path, clock=self.clock, **kwargs)
+
+    def test_limit_applies_per_key_and_reset_clears_it(self):
+        limiter = self.limiter()
+        for _ in range(3):
+            self.assertFalse(limiter.is_limited("login:1.2.3.4"))
+            limiter.hit("login:1.2.3.4")
+        self.assertTrue(limiter.is_limited("login:1.2.3.4"))
+        self.assertFalse(limiter.is_limited("login:5.6.7.8"))
+        self.assertFalse(limiter.is_limited("unlock:1.2.3.4"))
+        limiter.reset("login:1.2.3.4")
+        self.assertFalse(limiter.is_limited("login:1.2.3.4"))
+        self.assertEqual(len(limiter), 0)
+
+    def test_previous_window_decays_linearly(self):
+        limiter = self.limiter(limit=4)
+        for _ in range(4):
+            limiter.hit("k")
+        self.clock.now = 3100.0  # start of the next window: all 4 still count
+        self.assertTrue(limiter.is_limited("k"))
+        self.clock.now = 3150.0  # half the previous window has slid out
+        self.assertEqual(limiter.failures("k"), 2.0)
+        self.assertFalse(limiter.is_limited("k"))
+        limiter.hit("k")
+        self.assertEqual(limiter.failures("k"), 3.0)
+        self.clock.now = 3300.0
+        self.assertEqual(limiter.failures("k"), 0.0)
+
+    def test_new_keys_evict_least_recently_touched(self):
+        limiter = self.limiter(max_keys=3)
+        for index, key in enumerate(["a", "b", "c"]):
+            self.clock.now = 3000.0 + index
+            limiter.hit(key)
+        self.clock.now = 3010.0
+        limiter.hit("a")
+        limiter.hit("d")
+        self.assertEqual(len(limiter), 3)
+        self.assertEqual(limiter.failures("b"), 0.0)
+        self.assertEqual(limiter.failures("a"), 2.0)
+        self.assertEqual(limiter.failures("c"), 1.0)
+        self.assertEqual(limiter.failures("d"), 1.0)
+
+    def test_storage_errors_fail_open(self):
+        limiter = RateLimiter(os.path.join(self.root, "missing", "dir", "x"), limit=1, window=10)
+        os.makedirs(os.path.join(self.root, "missing", "dir", "x"))  # a directory, not a database
+        with self.assertLogs("rate_limit", "ERROR"):
+            limiter.hit("k")
+        with self.assertLogs("rate_limit", "ERROR"):
+            self.assertFalse(limiter.is_limited("k"))
+
+
+class CrossProcessTests(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="prompt-ratelimit-")
+        self.addCleanup(shutil.rmtree, self.root, True)
+        self.path = os.path.join(self.root, "ratelimit.sqlite3")
+
+    def test_workers_share_one_counter(self):
+        context = multiprocessing.get_context("spawn")
+        workers = [
+            context.Process(target=record_failures, args=(self.path, "login:10.0.0.1", 25))
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(timeout=60)
+            self.assertEqual(worker.exitcode, 0)
+        limiter = RateLimiter(self.path, limit=100, window=300)
+        self.assertEqual(round(limiter.failures("login:10.0.0.1")), 100)
+        self.assertTrue(limiter.is_limited("login:10.0.0.1"))
+
+    def test_failures_in_one_process_limit_another(self):
+        context = multiprocessing.get_context("spawn")
+        worker = context.Process(target=record_failures, args=(self.path, "unlock:10.0.0.2", 8))
+        worker.start()
+        worker.join(timeout=60)
+        self.assertEqual(worker.exitcode, 0)
+        self.assertTrue(RateLimiter(self.path, limit=8, window=300).is_limited("unlock:10.0.0.2"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,169 @@
+import random
+import sqlite3
+import unittest
+from datetime import datetime, timedelta
+
+import retention
+import version_store
+
+
+SCHEMA = """
+CREATE TABLE prompts (id INTEGER PRIMARY KEY, current_version_id INTEGER);
+CREATE TABLE versions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    prompt_id INTEGER NOT NULL,
+    version TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at TEXT,
+    parent_version_id INTEGER,
+    storage TEXT DEFAULT 'full',
+    delta_base_id INTEGER,
+    codec TEXT,
+    content_hash TEXT,
+    size INTEGER,
+    lines_added INTEGER,
+    lines_removed INTEGER,
+    chars_changed INTEGER,
+    similarity REAL,
+    pinned INTEGER DEFAULT 0,
+    label TEXT
+);
+CREATE INDEX idx_versions_prompt_created ON versions(prompt_id, created_at, id);
+CREATE TABLE content_blobs (hash TEXT PRIMARY KEY, content BLOB NOT NULL, codec TEXT, size INTEGER);
+CREATE TABLE versions_archive (
+    id INTEGER PRIMARY KEY,
+    prompt_id INTEGER NOT NULL,
+    version TEXT NOT NULL,
+    content BLOB NOT NULL,
+    codec TEXT,
+    content_hash TEXT,
+    created_at TEXT,
+    parent_version_id INTEGER,
+    label TEXT,
+    archived_at TEXT
+);
+"""
+
+NOW = datetime(2024, 3, 31, 12, 0, 0)
+
+# Straightforward window-function statement of the policy over the whole
+# history, used to check the bounded query.
+REFERENCE_SQL = """
+WITH ranked AS (
+    SELECT id, created_at, pinned, label,
+        ROW_NUMBER() OVER (ORDER BY created_at DESC, id DESC) AS recency,
+        ROW_NUMBER() OVER (PARTITION BY substr(created_at, 1, 10) ORDER BY created_at DESC, id DESC) AS day_rank,
+        ROW_NUMBER() OVER (PARTITION BY strftime('%Y-%W', created_at) ORDER BY created_at DESC, id DESC) AS week_rank
+    FROM versions WHERE prompt_id = 1
+)
+SELECT id FROM ranked
+WHERE recency > :keep_last
+  AND id IS NOT (SELECT current_version_id FROM prompts WHERE id = 1)
+  AND NOT (COALESCE(pinned, 0) = 1 OR COALESCE(label, '') != '')
+  AND NOT (day_rank = 1 AND created_at >= :daily_cutoff)
+  AND NOT (week_rank = 1 AND created_at >= :weekly_cutoff)
+ORDER BY created_at, id
+"""
+
+
+class RetentionTests(unittest.TestCase):
+    def setUp(self):
+        version_store.clear_cache()
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+        self.conn.execute("INSERT INTO prompts(id) VALUES(1)")
+
+    def tearDown(self):
+        self.conn.close()
+
+    def save(self, stamps):
+        parent = None
+        ids = []
+        for n, stamp in enumerate(stamps):
+            parent = version_store.insert_version(
+                self.conn, 1, f"1.0.{n}", f"revision {n}\n" * 30, stamp, parent,
+                policy=version_store.StoragePolicy(snapshot_interval=3),
+            )
+            ids.append(parent)
+        self.conn.execute("UPDATE prompts SET current_version_id=? WHERE id=1", (parent,))
+        return ids
+
+    def test_keep_last_only_prunes_the_oldest(self):
+        ids = self.save([f"2024-03-{day:02d}T10:00:00" for day in range(1, 8)])
+        policy = retention.RetentionPolicy(keep_last=3)
+        self.assertEqual(retention.prunable_version_ids(self.conn, 1, policy, NOW), ids[:4])
+
+    def test_nothing_to_prune_within_keep_last(self):
+        self.save(["2024-03-01T10:00:00", "2024-03-02T10:00:00"])
+        self.assertEqual(retention.prunable_version_ids(self.conn, 1, retention.RetentionPolicy(keep_last=2), NOW), [])
+
+    def test_daily_and_weekly_checkpoints_survive(self):
+        ids = self.save([
+            "2024-02-01T09:00:00",  # week checkpoint, outside daily window
+            "2024-03-28T09:00:00",
+            "2024-03-28T18:00:00",  # last of its day
+            "2024-03-30T08:00:00",
+            "2024-03-30T09:00:00",
+        ])
+        daily = retention.RetentionPolicy(keep_last=1, daily_days=7)
+        self.assertEqual(retention.prunable_version_ids(self.conn, 1, daily, NOW), [ids[0], ids[1], ids[3]])
+        both = retention.RetentionPolicy(keep_last=1, daily_days=7, weekly_weeks=10)
+        self.assertEqual(retention.prunable_version_ids(self.conn, 1, both, NOW), [ids[1], ids[3]])
+
+    def test_pinned_and_labelled_versions_are_kept(self):
+        ids = self.save([f"2024-03-{day:02d}T10:00:00" for day in range(1, 6)])
+        self.conn.execute("UPDATE versions SET pinned=1 WHERE id=?", (ids[0],))
+        self.conn.execute("UPDATE versions SET label='release' WHERE id=?", (ids[1],))
+        policy = retention.RetentionPolicy(keep_last=1)
+        self.assertEqual(retention.prunable_version_ids(self.conn, 1, policy, NOW), ids[2:4])
+        unmarked = retention.RetentionPolicy(keep_last=1, keep_marked=False)
+        self.assertEqual(retention.prunable_version_ids(self.conn, 1, unmarked, NOW), ids[:4])
+
+    def test_archived_versions_keep_their_content(self):
+        ids = self.save([f"2024-03-{day:02d}T10:00:00" for day in range(1, 6)])
+        self.conn.execute("UPDATE versions SET pinned=1 WHERE id=?", (ids[2],))
+        doomed = retention.prunable_version_ids(self.conn, 1, retention.RetentionPolicy(keep_last=1), NOW)
+        self.assertEqual(version_store.archive_versions(self.conn, doomed, "2024-04-01T00:00:00"), 3)
+        archived = self.conn.execute("SELECT * FROM versions_archive ORDER BY id").fetchall()
+        self.assertEqual([r["id"] for r in archived], doomed)
+        self.assertEqual(
+            [version_store.decompress_payload(r["content"], r["codec"]) for r in archived],
+            [f"revision {n}\n" * 30 for n in (0, 1, 3)],
+        )
+        version_store.clear_cache()
+        self.assertEqual(version_store.load_content(self.conn, ids[2]), "revision 2\n" * 30)
+        remaining = [r["id"] for r in self.conn.execute("SELECT id FROM versions ORDER BY id")]
+        self.assertEqual(remaining, [ids[2], ids[4]])
+
+    def test_matches_full_history_reference(self):
+        rng = random.Random(7)
+        start = datetime(2023, 12, 20, 8, 0, 0)
+        stamps = sorted(
+            (start + timedelta(minutes=rng.randrange(0, 60 * 24 * 110))).isoformat() for _ in range(120)
+        )
+        stamps[10] = stamps[11]  # identical timestamps are ordered by id
+        ids = self.save(stamps)
+        for vid in rng.sample(ids, 6):
+            self.conn.execute("UPDATE versions SET pinned=1 WHERE id=?", (vid,))
+        for keep_last, days, weeks in [(1, 0, 0), (10, 7, 0), (10, 0, 8), (25, 30, 20), (200, 7, 4)]:
+            policy = retention.RetentionPolicy(keep_last=keep_last, daily_days=days, weekly_weeks=weeks)
+            expected = [r[0] for r in self.conn.execute(REFERENCE_SQL, {
+                "keep_last": keep_last,
+                "daily_cutoff": retention._cutoff(NOW, days),
+                "weekly_cutoff": retention._cutoff(NOW, weeks * 7),
+            })]
+            with self.subTest(keep_last=keep_last, days=days, weeks=weeks):
+                self.assertEqual(retention.prunable_version_ids(self.conn, 1, policy, NOW), expected)
+
+    def test_candidates_are_a_range_below_the_boundary(self):
+        plan = " ".join(r[3] for r in self.conn.execute("EXPLAIN QUERY PLAN " + retention._PRUNABLE_SQL, {
+            "prompt_id": 1, "boundary_at": "", "boundary_id": 0, "keep_marked": 1,
+            "daily_cutoff": "", "weekly_cutoff": "",
+        }))
+        self.assertIn("SEARCH c USING INDEX idx_versions_prompt_created (prompt_id=? AND created_at<?)", plan)
+        self.assertNotIn("SCAN", plan)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from flask import Flask, session
+
+from session_store import (
+    MemorySessionStore,
+    ServerSessionInterface,
+    SqliteSessionStore,
+    pack_ids,
+    unpack_ids,
+)
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def make_app(store, clock, **kwargs):
+    app = Flask(__name__)
+    app.secret_key = "test-secret"
+    app.session_interface = ServerSessionInterface(store, lifetime=100, sweep_interval=10, clock=clock, **kwargs)
+
+    @app.route("/set/<value>")
+    def set_value(value):
+        session["value"] = value
+        session["unlocked"] = pack_ids(range(1, 500))
+        return "ok"
+
+    @app.route("/get")
+    def get_value():
+        return session.get("value", "-")
+
+    @app.route("/login")
+    def login():
+        session.regenerate()
+        session["auth_ok"] = True
+        return "ok"
+
+    @app.route("/clear")
+    def clear():
+        session.clear()
+        return "ok"
+
+    return app
+
+
+class PackIdsTests(unittest.TestCase):
+    def test_round_trip_as_ranges(self):
+        self.assertEqual(pack_ids([9, 1, 2, 3, 5, 6]), "1-3,5-6,9")
+        self.assertEqual(unpack_ids("1-3,5-6,9"), {1, 2, 3, 5, 6, 9})
+        self.assertEqual(pack_ids([]), "")
+        self.assertEqual(unpack_ids(""), set())
+        self.assertEqual(len(pack_ids(range(1, 1000))), len("1-999"))
+
+    def test_accepts_legacy_lists_and_skips_garbage(self):
+        self.assertEqual(unpack_ids([4, 2]), {2, 4})
+        self.assertEqual(unpack_ids("3,x,7-8"), {3, 7, 8})
+
+
+class ServerSessionTests(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="prompt-sessions-")
+        self.addCleanup(shutil.rmtree, self.root, True)
+        self.path = os.path.join(self.root, "sessions.sqlite3")
+        self.clock = FakeClock()
+
+    def cookie(self, client):
+        return client.get_cookie("session").value
+
+    def test_cookie_carries_only_signed_id(self):
+        for store in (MemorySessionStore(), SqliteSessionStore(self.path)):
+            with self.subTest(store=type(store).__name__):
+                client = make_app(store, self.clock).test_client()
+                self.assertIsNone(client.get("/get").headers.get("Set-Cookie"))
+                client.get("/set/hello")
+                cookie = self.cookie(client)
+                self.assertLess(len(cookie), 80)
+                self.assertNotIn("hello", cookie)
+                response = client.get("/get")
+                self.assertEqual(response.get_data(as_text=True), "hello")
+                self.assertIsNone(response.headers.get("Set-Cookie"))
+                self.assertEqual(len(store), 1)
+
+    def test_tampered_cookie_starts_fresh_session(self):
+        client = make_app(MemorySessionStore(), self.clock).test_client()
+        client.get("/set/hello")
+        client.set_cookie("session", self.cookie(client)[:-2] + "xx")
+        self.assertEqual(client.get("/get").get_data(as_text=True), "-")
+
+    def test_regenerate_moves_data_to_new_id(self):
+        store = MemorySessionStore()
+        client = make_app(store, self.clock).test_client()
+        client.get("/set/hello")
+        before = self.cookie(client)
+        client.get("/login")
+        self.assertNotEqual(self.cookie(client), before)
+        self.assertEqual(client.get("/get").get_data(as_text=True), "hello")
+        self.assertEqual(len(store), 1)
+
+    def test_idle_sessions_expire_and_are_swept(self):
+        store = SqliteSessionStore(self.path)
+        client = make_app(store, self.clock).test_client()
+        client.get("/set/hello")
+        self.clock.now += 60
+        self.assertEqual(client.get("/get").get_data(as_text=True), "hello")
+        self.clock.now += 60  # touched 60s in, so still alive
+        self.assertEqual(client.get("/get").get_data(as_text=True), "hello")
+        self.clock.now += 101
+        self.assertEqual(client.get("/get").get_data(as_text=True), "-")
+        self.assertEqual(len(store), 0)
+
+    def test_clearing_session_deletes_row_and_cookie(self):
+        store = SqliteSessionStore(self.path)
+        client = make_app(store, self.clock).test_client()
+        client.get("/set/hello")
+        client.get("/clear")
+        self.assertIsNone(client.get_cookie("session"))
+        self.assertEqual(len(store), 0)
+
+    def test_stores_in_other_processes_see_updates(self):
+        first = SqliteSessionStore(self.path)
+        second = SqliteSessionStore(self.path)
+        first.save("sid", {"n": 1}, self.clock.now + 100)
+        self.assertEqual(second.load("sid", self.clock.now)[0], {"n": 1})
+        first.save("sid", {"n": 2}, self.clock.now + 100)
+        self.assertEqual(second.load("sid", self.clock.now)[0], {"n": 2})
+        first.delete("sid")
+        self.assertIsNone(second.load("sid", self.clock.now))
+
+    def test_cache_is_bounded(self):
+        store = SqliteSessionStore(self.path, cache_size=2)
+        for sid in ("a", "b", "c"):
+            store.save(sid, {"sid": sid}, self.clock.now + 100)
+        self.assertEqual(list(store._cache), ["b", "c"])
+        self.assertEqual(store.load("a", self.clock.now)[0], {"sid": "a"})
+
+
+if __name__ == "__main__":
+    unittest.main()
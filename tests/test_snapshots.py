@@ -0,0 +1,123 @@
+import sqlite3
+import unittest
+
+import snapshots
+import version_store
+
+
+SCHEMA = """
+CREATE TABLE prompts (
+    id INTEGER PRIMARY KEY,
+    current_version_id INTEGER,
+    history_pruned_from TEXT,
+    history_pruned_to TEXT
+);
+CREATE TABLE versions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    prompt_id INTEGER NOT NULL,
+    version TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at TEXT,
+    parent_version_id INTEGER,
+    storage TEXT DEFAULT 'full',
+    delta_base_id INTEGER,
+    codec TEXT,
+    content_hash TEXT,
+    size INTEGER,
+    lines_added INTEGER,
+    lines_removed INTEGER,
+    chars_changed INTEGER,
+    similarity REAL,
+    pinned INTEGER DEFAULT 0,
+    label TEXT
+);
+CREATE INDEX idx_versions_prompt_created ON versions(prompt_id, created_at, id);
+CREATE TABLE content_blobs (hash TEXT PRIMARY KEY, content BLOB NOT NULL, codec TEXT, size INTEGER);
+CREATE TABLE versions_archive (
+    id INTEGER PRIMARY KEY,
+    prompt_id INTEGER NOT NULL,
+    version TEXT NOT NULL,
+    content BLOB NOT NULL,
+    codec TEXT,
+    content_hash TEXT,
+    created_at TEXT,
+    parent_version_id INTEGER,
+    label TEXT,
+    archived_at TEXT
+);
+CREATE INDEX idx_versions_archive_prompt ON versions_archive(prompt_id, created_at);
+"""
+
+
+class SnapshotTests(unittest.TestCase):
+    def setUp(self):
+        version_store.clear_cache()
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+
+    def tearDown(self):
+        self.conn.close()
+
+    def save(self, prompt_id, history):
+        self.conn.execute("INSERT INTO prompts(id) VALUES(?)", (prompt_id,))
+        parent = None
+        ids = []
+        for n, (stamp, content) in enumerate(history):
+            parent = version_store.insert_version(self.conn, prompt_id, f"1.0.{n}", content, stamp, parent)
+            ids.append(parent)
+        self.conn.execute("UPDATE prompts SET current_version_id=? WHERE id=?", (parent, prompt_id))
+        return ids
+
+    def test_parse_as_of(self):
+        self.assertEqual(snapshots.parse_as_of("2024-03-01"), "2024-03-01T23:59:59.999999")
+        self.assertEqual(snapshots.parse_as_of("2024-03-01T08:30"), "2024-03-01T08:30:00")
+        self.assertEqual(snapshots.parse_as_of("2024-03-01T08:30:00+08:00"), "2024-03-01T00:30:00")
+        self.assertIsNone(snapshots.parse_as_of("yesterday"))
+        self.assertIsNone(snapshots.parse_as_of(""))
+
+    def test_resolves_latest_version_at_or_before_time(self):
+        a = self.save(1, [("2024-01-01T10:00:00", "a1"), ("2024-02-01T10:00:00", "a2"), ("2024-03-01T10:00:00", "a3")])
+        b = self.save(2, [("2024-02-15T10:00:00", "b1")])
+        snap = snapshots.with_content(self.conn, snapshots.resolve(self.conn, "2024-02-10T00:00:00"))
+        self.assertEqual(set(snap), {1})
+        self.assertEqual((snap[1]["id"], snap[1]["content"]), (a[1], "a2"))
+        snap = snapshots.resolve(self.conn, "2024-02-01T10:00:00", prompt_ids=[1, 2])
+        self.assertEqual(snap[1]["id"], a[1])
+        self.assertEqual(snapshots.resolve(self.conn, "2024-12-31T00:00:00")[2]["id"], b[0])
+
+    def test_archived_versions_still_answer_the_past(self):
+        ids = self.save(1, [("2024-01-01T10:00:00", "old text"), ("2024-02-01T10:00:00", "new text")])
+        version_store.archive_versions(self.conn, ids[:1], "2024-03-01T00:00:00")
+        entry = snapshots.resolve(self.conn, "2024-01-15")[1]
+        self.assertTrue(entry["archived"])
+        self.assertEqual(snapshots.load_content(self.conn, entry), "old text")
+        self.assertFalse(snapshots.resolve(self.conn, "2024-02-15")[1]["archived"])
+
+    def test_deleted_history_is_reported_as_a_gap(self):
+        ids = self.save(1, [
+            ("2024-01-01T10:00:00", "kept"),
+            ("2024-02-01T10:00:00", "pruned"),
+            ("2024-03-01T10:00:00", "pruned too"),
+            ("2024-04-01T10:00:00", "current"),
+        ])
+        snapshots.note_pruned(self.conn, 1, ids[1:3])
+        version_store.delete_versions(self.conn, ids[1:3])
+        self.assertFalse(snapshots.resolve(self.conn, "2024-01-15")[1]["pruned_gap"])
+        for moment in ("2024-02-15", "2024-03-15"):
+            entry = snapshots.resolve(self.conn, moment)[1]
+            self.assertEqual(entry["id"], ids[0])
+            self.assertTrue(entry["pruned_gap"])
+        self.assertFalse(snapshots.resolve(self.conn, "2024-04-15")[1]["pruned_gap"])
+
+    def test_query_uses_the_prompt_created_index(self):
+        plan = " ".join(
+            row[-1] for row in self.conn.execute(
+                "EXPLAIN QUERY PLAN " + snapshots._AS_OF_SQL.format(where=""), {"as_of": "2024"}
+            )
+        )
+        self.assertIn("idx_versions_prompt_created", plan)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,207 @@
+import sqlite3
+import unittest
+
+import version_store
+
+
+SCHEMA = """
+CREATE TABLE prompts (id INTEGER PRIMARY KEY, current_version_id INTEGER);
+CREATE TABLE versions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    prompt_id INTEGER NOT NULL,
+    version TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at TEXT,
+    parent_version_id INTEGER,
+    storage TEXT DEFAULT 'full',
+    delta_base_id INTEGER,
+    codec TEXT,
+    content_hash TEXT,
+    size INTEGER,
+    lines_added INTEGER,
+    lines_removed INTEGER,
+    chars_changed INTEGER,
+    similarity REAL
+);
+CREATE TABLE content_blobs (hash TEXT PRIMARY KEY, content BLOB NOT NULL, codec TEXT, size INTEGER);
+"""
+
+
+def long_text(n, edit=None):
+    lines = [f"line {i}: keep answers short, cite sources, stay polite." for i in range(40)]
+    if edit is not None:
+        lines[edit] = f"line {edit}: edited in revision {n}."
+    return "\n".join(lines) + "\n"
+
+
+class VersionStoreTests(unittest.TestCase):
+    def setUp(self):
+        version_store.clear_cache()
+        self.conn = sqlite3.connect(":memory:")
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+        self.conn.execute("INSERT INTO prompts(id) VALUES(1)")
+
+    def tearDown(self):
+        self.conn.close()
+
+    def save_chain(self, count, interval=4):
+        ids, texts, parent = [], [], None
+        for n in range(count):
+            text = long_text(n, edit=n % 40)
+            parent = version_store.insert_version(
+                self.conn, 1, f"1.0.{n}", text, f"2024-01-01T00:00:{n:02d}", parent,
+                policy=version_store.StoragePolicy(snapshot_interval=interval),
+            )
+            ids.append(parent)
+            texts.append(text)
+        return ids, texts
+
+    def storage(self):
+        return [r["storage"] for r in self.conn.execute("SELECT storage FROM versions ORDER BY id")]
+
+    def test_delta_round_trip_preserves_line_endings(self):
+        base = "a\r\nb\nc"
+        for target in ("a\r\nB\nc", "", "x\ny\n", "a\r\nb\nc\nd", "c"):
+            with self.subTest(target=target):
+                self.assertEqual(version_store.apply_delta(base, version_store.encode_delta(base, target)), target)
+
+    def test_superseded_versions_become_deltas_with_periodic_snapshots(self):
+        ids, texts = self.save_chain(9, interval=4)
+        self.assertEqual(
+            self.storage(),
+            ["delta", "delta", "delta", "blob", "delta", "delta", "delta", "blob", "full"],
+        )
+        for vid, text in zip(ids, texts):
+            self.assertEqual(version_store.load_content(self.conn, vid), text)
+
+    def test_reconstruction_uses_cache(self):
+        ids, texts = self.save_chain(5, interval=10)
+        self.assertEqual(version_store.load_content(self.conn, ids[0]), texts[0])
+        self.conn.execute("DELETE FROM versions WHERE id=?", (ids[-1],))
+        self.assertEqual(version_store.load_content(self.conn, ids[0]), texts[0])
+
+    def test_deleting_a_base_materializes_surviving_dependants(self):
+        ids, texts = self.save_chain(6, interval=10)
+        version_store.delete_versions(self.conn, ids[2:5])
+        version_store.clear_cache()
+        for vid, text in ((ids[0], texts[0]), (ids[1], texts[1]), (ids[5], texts[5])):
+            self.assertEqual(version_store.load_content(self.conn, vid), text)
+
+    def test_repack_encodes_existing_full_history(self):
+        parent = None
+        texts = []
+        for n in range(5):
+            text = long_text(n, edit=n)
+            cur = self.conn.execute(
+                "INSERT INTO versions(prompt_id, version, content, created_at, parent_version_id) VALUES(1,?,?,?,?)",
+                (f"1.0.{n}", text, f"2024-01-01T00:00:0{n}", parent),
+            )
+            parent = cur.lastrowid
+            texts.append(text)
+        self.conn.execute("UPDATE prompts SET current_version_id=? WHERE id=1", (parent,))
+        policy = version_store.StoragePolicy(snapshot_interval=10)
+        self.assertEqual(version_store.repack_prompt(self.conn, 1, policy), 4)
+        version_store.clear_cache()
+        rows = self.conn.execute("SELECT * FROM versions ORDER BY id").fetchall()
+        self.assertEqual([r["content"] for r in version_store.with_content(self.conn, rows)], texts)
+
+    def test_snapshots_are_compressed_and_current_version_stays_plain(self):
+        ids, texts = self.save_chain(9, interval=4)
+        rows = {r["id"]: r for r in self.conn.execute("SELECT * FROM versions")}
+        blob = self.conn.execute("SELECT * FROM content_blobs WHERE hash=?", (rows[ids[3]]["content_hash"],)).fetchone()
+        self.assertEqual(blob["codec"], "zlib")
+        self.assertIsInstance(blob["content"], bytes)
+        self.assertLess(len(blob["content"]), len(texts[3]) / 4)
+        self.assertEqual(rows[ids[-1]]["codec"], "")
+        self.assertEqual(rows[ids[-1]]["content"], texts[-1])
+        version_store.materialize(self.conn, [ids[2], ids[3]])
+        self.assertEqual(self.conn.execute("SELECT content FROM versions WHERE id=?", (ids[2],)).fetchone()[0], texts[2])
+        self.assertEqual(self.storage()[ids[3] - 1], "blob")
+
+    def test_recompression_pass_rewrites_rows_in_batches(self):
+        texts = [long_text(n, edit=n) for n in range(5)]
+        for n, text in enumerate(texts):
+            self.conn.execute(
+                "INSERT INTO versions(prompt_id, version, content, created_at) VALUES(1,'1.0.0',?,?)",
+                (text, f"2024-01-01T00:00:0{n}"),
+            )
+        self.conn.execute("UPDATE prompts SET current_version_id=5 WHERE id=1")
+        policy = version_store.StoragePolicy(codec="lzma")
+        last_id, rewritten = version_store.recompress_versions(self.conn, policy, 0, batch_size=2)
+        self.assertEqual((last_id, rewritten), (2, 2))
+        last_id, rewritten = version_store.recompress_versions(self.conn, policy, last_id, batch_size=2)
+        self.assertEqual((last_id, rewritten), (4, 2))
+        self.assertEqual(version_store.recompress_versions(self.conn, policy, last_id, batch_size=2), (None, 0))
+        codecs = [r["codec"] for r in self.conn.execute("SELECT codec FROM versions ORDER BY id")]
+        self.assertEqual(codecs, ["lzma", "lzma", "lzma", "lzma", None])
+        rows = self.conn.execute("SELECT * FROM versions ORDER BY id").fetchall()
+        self.assertEqual([r["content"] for r in version_store.with_content(self.conn, rows)], texts)
+        off = version_store.StoragePolicy(codec=None)
+        self.assertEqual(version_store.recompress_versions(self.conn, off, 0, batch_size=10), (None, 4))
+
+    def test_identical_snapshots_share_one_blob(self):
+        text = long_text(0)
+        policy = version_store.StoragePolicy(snapshot_interval=1)
+        parent = None
+        for n, body in enumerate([text, long_text(1, edit=1), text, long_text(3, edit=3), text]):
+            parent = version_store.insert_version(self.conn, 1, f"1.0.{n}", body, f"t{n}", parent, policy=policy)
+        stored = self.conn.execute("SELECT storage, content_hash FROM versions ORDER BY id").fetchall()
+        # The last save repeats a stored body, so even the current version refers to the blob.
+        self.assertEqual([r["storage"] for r in stored], ["blob", "blob", "blob", "blob", "blob"])
+        self.assertEqual(stored[0]["content_hash"], stored[2]["content_hash"])
+        self.assertEqual(self.conn.execute("SELECT COUNT(*) FROM content_blobs").fetchone()[0], 3)
+        version_store.clear_cache()
+        self.assertEqual(version_store.load_content(self.conn, 1), text)
+        self.assertEqual(version_store.load_content(self.conn, 3), text)
+
+    def test_rollback_to_a_snapshot_reuses_its_blob(self):
+        ids, texts = self.save_chain(5, interval=4)
+        self.assertEqual(self.storage()[3], "blob")
+        policy = version_store.StoragePolicy(snapshot_interval=4)
+        restored = version_store.insert_version(self.conn, 1, "1.0.5", texts[3], "t5", ids[-1], policy=policy)
+        version_store.materialize(self.conn, [restored])
+        row = self.conn.execute("SELECT content, storage, size FROM versions WHERE id=?", (restored,)).fetchone()
+        self.assertEqual(tuple(row), ("", "blob", len(texts[3])))
+        self.assertEqual(self.conn.execute("SELECT COUNT(*) FROM content_blobs").fetchone()[0], 1)
+        version_store.clear_cache()
+        self.assertEqual(version_store.load_content(self.conn, restored), texts[3])
+        # Once the snapshot itself is gone, the current version still keeps the blob alive.
+        version_store.delete_versions(self.conn, [ids[3]], policy)
+        self.assertEqual(version_store.load_content(self.conn, restored), texts[3])
+        self.assertEqual(version_store.load_content(self.conn, ids[4]), texts[4])
+
+    def test_blobs_are_collected_when_last_reference_goes(self):
+        text = long_text(0)
+        policy = version_store.StoragePolicy(snapshot_interval=1)
+        parent = None
+        for n, body in enumerate([text, text, long_text(2, edit=2)]):
+            parent = version_store.insert_version(self.conn, 1, f"1.0.{n}", body, f"t{n}", parent, policy=policy)
+        version_store.delete_versions(self.conn, [1], policy)
+        self.assertEqual(self.conn.execute("SELECT COUNT(*) FROM content_blobs").fetchone()[0], 1)
+        version_store.delete_versions(self.conn, [2], policy)
+        self.assertEqual(self.conn.execute("SELECT COUNT(*) FROM content_blobs").fetchone()[0], 0)
+
+    def test_backfill_metadata_covers_legacy_rows(self):
+        self.conn.execute("INSERT INTO versions(prompt_id, version, content) VALUES(1,'1.0.0','hello')")
+        self.assertEqual(version_store.backfill_metadata(self.conn), 1)
+        row = self.conn.execute("SELECT content_hash, size FROM versions").fetchone()
+        self.assertEqual(tuple(row), (version_store.content_hash("hello"), 5))
+
+    def test_diff_stats_are_recorded_at_insert(self):
+        first = version_store.insert_version(self.conn, 1, "1.0.0", "a\nb\nc\n", "t0")
+        second = version_store.insert_version(self.conn, 1, "1.0.1", "a\nB\nc\nd\n", "t1", first)
+        rows = self.conn.execute(
+            "SELECT lines_added, lines_removed, chars_changed, similarity FROM versions ORDER BY id"
+        ).fetchall()
+        self.assertEqual(tuple(rows[0]), (3, 0, 6, None))
+        self.assertEqual(tuple(rows[1]), (2, 1, 6, round(1 - 6 / 14, 4)))
+        self.assertEqual(version_store.diff_stats("same", "same")["similarity"], 1.0)
+        self.conn.execute("UPDATE versions SET lines_added=NULL WHERE id=?", (second,))
+        self.assertEqual(version_store.backfill_diff_stats(self.conn, 0, batch_size=10), (second, 1))
+        self.assertEqual(version_store.backfill_diff_stats(self.conn, second), (None, 0))
+        self.assertEqual(self.conn.execute("SELECT lines_added FROM versions WHERE id=?", (second,)).fetchone()[0], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+from write_queue import WriteQueue, WriteQueueFull, WriteQueueTimeout, may_have_committed
+
+
+class WriteQueueTests(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="prompt-writes-")
+        self.addCleanup(shutil.rmtree, self.root, True)
+        self.path = os.path.join(self.root, "data.sqlite3")
+        conn = sqlite3.connect(self.path)
+        conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT UNIQUE)")
+        conn.commit()
+        conn.close()
+
+    def connect(self):
+        return sqlite3.connect(self.path)
+
+    def names(self):
+        conn = self.connect()
+        try:
+            return sorted(r[0] for r in conn.execute("SELECT name FROM items"))
+        finally:
+            conn.close()
+
+    def hold_writer(self, queue):
+        """Block the writer thread until the returned event is set."""
+        started = threading.Event()
+        release = threading.Event()
+
+        def blocker(conn):
+            started.set()
+            release.wait(5)
+
+        holder = threading.Thread(target=queue.submit, args=(blocker,))
+        holder.start()
+        self.assertTrue(started.wait(5))
+        return release, holder
+
+    def test_returns_result_after_commit(self):
+        queue = WriteQueue(self.connect)
+        item_id = queue.submit(lambda conn: conn.execute("INSERT INTO items(name) VALUES('a')").lastrowid)
+        self.assertEqual(item_id, 1)
+        self.assertEqual(self.names(), ["a"])
+
+    def test_concurrent_writes_share_one_commit(self):
+        queue = WriteQueue(self.connect, max_batch=32)
+        release, holder = self.hold_writer(queue)
+        results = {}
+
+        def insert(name):
+            results[name] = queue.submit(lambda conn: conn.execute("INSERT INTO items(name) VALUES(?)", (name,)).rowcount)
+
+        writers = [threading.Thread(target=insert, args=(f"n{i}",)) for i in range(10)]
+        for writer in writers:
+            writer.start()
+        while queue._queue.qsize() < 10:
+            threading.Event().wait(0.001)
+        release.set()
+        holder.join(5)
+        for writer in writers:
+            writer.join(5)
+        self.assertEqual(results, {f"n{i}": 1 for i in range(10)})
+        self.assertEqual(len(self.names()), 10)
+        self.assertEqual(queue.committed, 11)
+        self.assertEqual(queue.batches, 2)
+
+    def test_failing_write_is_rolled_back_alone(self):
+        queue = WriteQueue(self.connect)
+        release, holder = self.hold_writer(queue)
+        outcomes = {}
+
+        def run(name, op):
+            try:
+                outcomes[name] = queue.submit(op)
+            except Exception as exc:
+                outcomes[name] = exc
+
+        def broken(conn):
+            conn.execute("INSERT INTO items(name) VALUES('half')")
+            conn.execute("INSERT INTO items(name) VALUES('dup')")
+            conn.execute("INSERT INTO items(name) VALUES('dup')")
+
+        threads = [
+            threading.Thread(target=run, args=("ok", lambda conn: conn.execute("INSERT INTO items(name) VALUES('ok')").rowcount)),
+            threading.Thread(target=run, args=("broken", broken)),
+        ]
+        for thread in threads:
+            thread.start()
+        while queue._queue.qsize() < 2:
+            threading.Event().wait(0.001)
+        release.set()
+        holder.join(5)
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(outcomes["ok"], 1)
+        self.assertIsInstance(outcomes["broken"], sqlite3.IntegrityError)
+        self.assertEqual(self.names(), ["ok"])
+        self.assertEqual(queue.batches, 2)
+
+    def test_full_queue_rejects_instead_of_waiting(self):
+        queue = WriteQueue(self.connect, max_pending=1, wait=0.05)
+        release, holder = self.hold_writer(queue)
+        waiting = threading.Thread(target=queue.submit, args=(lambda conn: None,))
+        waiting.start()
+        while queue._queue.qsize() < 1:
+            threading.Event().wait(0.001)
+        with self.assertRaises(WriteQueueFull):
+            queue.submit(lambda conn: None)
+        release.set()
+        holder.join(5)
+        waiting.join(5)
+        self.assertIsNone(queue.submit(lambda conn: None))
+
+    def test_stuck_writer_times_out_and_cancels_waiting_writes(self):
+        queue = WriteQueue(self.connect, timeout=0.05)
+        started = threading.Event()
+        release = threading.Event()
+
+        def stuck(conn):
+            started.set()
+            release.wait(5)
+            conn.execute("INSERT INTO items(name) VALUES('late')")
+
+        with self.assertRaises(WriteQueueTimeout) as running:
+            queue.submit(stuck)
+        self.assertTrue(started.wait(5))
+        self.assertFalse(running.exception.cancelled)
+        self.assertTrue(may_have_committed(running.exception))
+        with self.assertRaises(WriteQueueTimeout) as pending:
+            queue.submit(lambda conn: conn.execute("INSERT INTO items(name) VALUES('cancelled')"))
+        self.assertTrue(pending.exception.cancelled)
+        self.assertFalse(may_have_committed(pending.exception))
+        self.assertFalse(may_have_committed(WriteQueueFull("full")))
+        release.set()
+        queue.timeout = 5
+        self.assertEqual(queue.submit(lambda conn: conn.execute("INSERT INTO items(name) VALUES('next')").rowcount), 1)
+        # The running write still committed; the one that never started did not.
+        self.assertEqual(self.names(), ["late", "next"])
+
+    def test_writes_cannot_be_nested(self):
+        queue = WriteQueue(self.connect)
+        with self.assertRaises(RuntimeError):
+            queue.submit(lambda conn: queue.submit(lambda inner: None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,637 @@
+"""Version content storage: reverse line deltas, shared snapshots, compression.
+
+The newest version of a prompt is always stored in full: as plain text, or as
+a reference to an identical body that already is a shared blob. When a
+version is superseded it is rewritten as a compact line delta against its
+successor, except every ``snapshot_interval``-th version, which becomes a full
+snapshot so reconstruction never walks more than ``snapshot_interval - 1``
+deltas. Snapshots live once per distinct body in ``content_blobs`` keyed by
+the SHA-256 ``content_hash`` that every version row carries, so identical
+content (rollbacks, repeated saves) is stored a single time. Payloads above a
+size threshold are compressed and the codec is recorded per row. Reconstructed
+texts are kept in a small memory-bounded LRU cache.
+"""
+
+from __future__ import annotations
+
+import difflib
+import hashlib
+import json
+import lzma
+import threading
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+
+
+STORAGE_FULL = "full"
+STORAGE_DELTA = "delta"
+STORAGE_BLOB = "blob"
+DEFAULT_SNAPSHOT_INTERVAL = 10
+DEFAULT_COMPRESS_THRESHOLD = 1024
+CODECS = ("zlib", "lzma")
+# A delta is only kept when it is clearly smaller than the text it replaces.
+MAX_DELTA_RATIO = 0.75
+# Compressed payloads must save at least this much to be worth decoding.
+MAX_COMPRESSED_RATIO = 0.9
+# Bodies shorter than this stay inline; a blob row would cost more than it saves.
+BLOB_MIN_BYTES = 256
+CACHE_MAX_CHARS = 8 * 1024 * 1024
+
+
+@dataclass(frozen=True)
+class StoragePolicy:
+    snapshot_interval: int = DEFAULT_SNAPSHOT_INTERVAL
+    codec: str | None = "zlib"
+    compress_threshold: int = DEFAULT_COMPRESS_THRESHOLD
+
+
+DEFAULT_POLICY = StoragePolicy()
+
+
+class VersionStorageError(RuntimeError):
+    """Stored version content could not be reconstructed."""
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+# -- delta encoding --------------------------------------------------------
+def encode_delta(base: str, target: str) -> str:
+    """Encode ``target`` as line operations against ``base``.
+
+    The result is a JSON list whose items are a positive int (copy that many
+    base lines), a negative int (skip that many base lines) or a string
+    (insert it verbatim).
+    """
+    base_lines = base.splitlines(keepends=True)
+    target_lines = target.splitlines(keepends=True)
+    ops: list = []
+
+    def push(op):
+        if ops and type(ops[-1]) is type(op) and (isinstance(op, str) or (ops[-1] > 0) == (op > 0)):
+            ops[-1] += op
+        else:
+            ops.append(op)
+
+    matcher = difflib.SequenceMatcher(None, base_lines, target_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            push(i2 - i1)
+            continue
+        if i2 > i1:
+            push(-(i2 - i1))
+        if j2 > j1:
+            push("".join(target_lines[j1:j2]))
+    if ops and isinstance(ops[-1], int) and ops[-1] < 0:
+        ops.pop()
+    return json.dumps(ops, ensure_ascii=False, separators=(",", ":"))
+
+
+def apply_delta(base: str, delta: str) -> str:
+    base_lines = base.splitlines(keepends=True)
+    out: list[str] = []
+    pos = 0
+    for op in json.loads(delta):
+        if isinstance(op, str):
+            out.append(op)
+        elif op > 0:
+            out.extend(base_lines[pos:pos + op])
+            pos += op
+        else:
+            pos -= op
+    return "".join(out)
+
+
+# -- change stats ----------------------------------------------------------
+def diff_stats(parent: str | None, text: str) -> dict:
+    """Line-level change size of ``text`` against its parent version.
+
+    ``chars_changed`` counts the characters of removed plus inserted lines and
+    ``similarity`` is the matching share of both texts (1.0 = identical), or
+    None for a version without a parent.
+    """
+    lines = text.splitlines(keepends=True)
+    if parent is None:
+        return {"lines_added": len(lines), "lines_removed": 0, "chars_changed": len(text), "similarity": None}
+    parent_lines = parent.splitlines(keepends=True)
+    added = removed = changed = 0
+    matcher = difflib.SequenceMatcher(None, parent_lines, lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        removed += i2 - i1
+        added += j2 - j1
+        changed += sum(map(len, parent_lines[i1:i2])) + sum(map(len, lines[j1:j2]))
+    total = len(parent) + len(text)
+    similarity = 1.0 if not total else round(1 - changed / total, 4)
+    return {"lines_added": added, "lines_removed": removed, "chars_changed": changed, "similarity": similarity}
+
+
+# -- payload codecs --------------------------------------------------------
+def compress_payload(text: str, policy: StoragePolicy = DEFAULT_POLICY):
+    """Return ``(value, codec)`` to store for ``text`` under ``policy``."""
+    raw = text.encode("utf-8")
+    if policy.codec not in CODECS or len(raw) < policy.compress_threshold:
+        return text, ""
+    if policy.codec == "lzma":
+        packed = lzma.compress(raw, preset=6)
+    else:
+        packed = zlib.compress(raw, 6)
+    if len(packed) > len(raw) * MAX_COMPRESSED_RATIO:
+        return text, ""
+    return packed, policy.codec
+
+
+def decompress_payload(value, codec) -> str:
+    if not codec:
+        return value
+    if codec == "zlib":
+        return zlib.decompress(value).decode("utf-8")
+    if codec == "lzma":
+        return lzma.decompress(value).decode("utf-8")
+    raise VersionStorageError(f"Unknown content codec {codec!r}")
+
+
+def _payload(row) -> str:
+    return decompress_payload(row["content"], row["codec"] if "codec" in row.keys() else None)
+
+
+# -- reconstruction cache --------------------------------------------------
+class ContentCache:
+    """Thread-safe LRU of reconstructed texts, bounded by total characters."""
+
+    def __init__(self, max_chars: int = CACHE_MAX_CHARS):
+        self.max_chars = max_chars
+        self._items: OrderedDict = OrderedDict()
+        self._chars = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value: str) -> None:
+        if len(value) > self.max_chars:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self._chars -= len(old)
+            self._items[key] = value
+            self._chars += len(value)
+            while self._chars > self.max_chars:
+                _, evicted = self._items.popitem(last=False)
+                self._chars -= len(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._chars = 0
+
+
+_cache = ContentCache()
+
+
+def clear_cache() -> None:
+    _cache.clear()
+
+
+def _cache_key(row):
+    # Cache entries are content-addressed, which also keeps them honest when
+    # an import reuses version ids.
+    if "content_hash" in row.keys() and row["content_hash"]:
+        return row["content_hash"]
+    value = row["content"]
+    return row["id"], zlib.crc32(value if isinstance(value, bytes) else value.encode("utf-8"))
+
+
+# -- reading ---------------------------------------------------------------
+def _storage(row) -> str:
+    keys = row.keys()
+    return (row["storage"] if "storage" in keys else None) or STORAGE_FULL
+
+
+_ROW_COLUMNS = "id, content, storage, delta_base_id, codec, content_hash"
+
+
+def _blob_text(conn, digest) -> str:
+    blob = conn.execute("SELECT content, codec FROM content_blobs WHERE hash=?", (digest,)).fetchone()
+    if blob is None:
+        raise VersionStorageError(f"Missing content blob {digest}")
+    return decompress_payload(blob["content"], blob["codec"])
+
+
+def _full_text(conn, row) -> str:
+    """Text of a row stored in full, either inline or as a shared blob."""
+    if _storage(row) == STORAGE_BLOB:
+        cached = _cache.get(row["content_hash"])
+        if cached is not None:
+            return cached
+        text = _blob_text(conn, row["content_hash"])
+        _cache.put(row["content_hash"], text)
+        return text
+    return _payload(row)
+
+
+def row_content(conn, row) -> str:
+    """Return the full text of a ``versions`` row (any storage or codec)."""
+    if _storage(row) != STORAGE_DELTA:
+        return _full_text(conn, row)
+    key = _cache_key(row)
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached
+
+    chain = [row]
+    seen = {row["id"]}
+    current = row
+    text = None
+    while _storage(current) == STORAGE_DELTA:
+        base = conn.execute(
+            f"SELECT {_ROW_COLUMNS} FROM versions WHERE id=?",
+            (current["delta_base_id"],),
+        ).fetchone()
+        if base is None or base["id"] in seen:
+            raise VersionStorageError(f"Broken delta chain for version {row['id']}")
+        if _storage(base) == STORAGE_DELTA:
+            hit = _cache.get(_cache_key(base))
+            if hit is not None:
+                text = hit
+                break
+            chain.append(base)
+            seen.add(base["id"])
+            current = base
+            continue
+        text = _full_text(conn, base)
+        break
+    for link in reversed(chain):
+        text = apply_delta(text, _payload(link))
+        _cache.put(_cache_key(link), text)
+    return text
+
+
+def load_content(conn, version_id) -> str | None:
+    row = conn.execute(
+        f"SELECT {_ROW_COLUMNS} FROM versions WHERE id=?",
+        (version_id,),
+    ).fetchone()
+    return row_content(conn, row) if row else None
+
+
+def with_content(conn, rows) -> list[dict]:
+    """Convert ``versions`` rows to dicts whose ``content`` is the full text."""
+    result = []
+    for row in rows:
+        item = dict(row)
+        item["content"] = row_content(conn, row)
+        item.pop("storage", None)
+        item.pop("delta_base_id", None)
+        item.pop("codec", None)
+        result.append(item)
+    return result
+
+
+# -- writing ---------------------------------------------------------------
+def _delta_run_below(conn, version_id, limit: int) -> int:
+    """Count consecutive delta-stored ancestors of ``version_id`` (up to limit)."""
+    count = 0
+    row = conn.execute("SELECT parent_version_id FROM versions WHERE id=?", (version_id,)).fetchone()
+    seen = {version_id}
+    while row and row["parent_version_id"] and count < limit:
+        parent_id = row["parent_version_id"]
+        if parent_id in seen:
+            break
+        seen.add(parent_id)
+        row = conn.execute(
+            "SELECT parent_version_id, storage FROM versions WHERE id=?",
+            (parent_id,),
+        ).fetchone()
+        if not row or _storage(row) != STORAGE_DELTA:
+            break
+        count += 1
+    return count
+
+
+def _write(conn, version_id, text: str, storage: str, base_id, policy: StoragePolicy | None) -> None:
+    """Store ``text`` inline for a version; ``policy=None`` keeps it plain."""
+    value, codec = compress_payload(text, policy) if policy else (text, "")
+    conn.execute(
+        "UPDATE versions SET content=?, storage=?, delta_base_id=?, codec=? WHERE id=?",
+        (value, storage, base_id, codec, version_id),
+    )
+
+
+def _store_snapshot(conn, version_id, text: str, digest: str, policy: StoragePolicy) -> None:
+    """Keep a superseded version in full, sharing the body through content_blobs."""
+    if len(text.encode("utf-8")) < BLOB_MIN_BYTES:
+        _write(conn, version_id, text, STORAGE_FULL, None, policy)
+        return
+    value, codec = compress_payload(text, policy)
+    conn.execute(
+        "INSERT OR IGNORE INTO content_blobs(hash, content, codec, size) VALUES(?,?,?,?)",
+        (digest, value, codec, len(text)),
+    )
+    conn.execute(
+        "UPDATE versions SET content='', storage=?, delta_base_id=NULL, codec='', content_hash=? WHERE id=?",
+        (STORAGE_BLOB, digest, version_id),
+    )
+
+
+def blob_exists(conn, digest) -> bool:
+    return conn.execute("SELECT 1 FROM content_blobs WHERE hash=?", (digest,)).fetchone() is not None
+
+
+def demote_version(conn, version_id, successor_id, successor_content: str,
+                   policy: StoragePolicy = DEFAULT_POLICY) -> bool:
+    """Rewrite a superseded inline version as a blob reference, delta or snapshot."""
+    row = conn.execute(
+        f"SELECT {_ROW_COLUMNS} FROM versions WHERE id=?",
+        (version_id,),
+    ).fetchone()
+    if not row or _storage(row) != STORAGE_FULL:
+        return False
+    content = _payload(row)
+    digest = row["content_hash"] or content_hash(content)
+    if blob_exists(conn, digest):
+        _store_snapshot(conn, version_id, content, digest, policy)
+        return True
+    interval = max(1, int(policy.snapshot_interval or 1))
+    if interval > 1 and _delta_run_below(conn, version_id, interval - 1) < interval - 1:
+        delta = encode_delta(successor_content, content)
+        if len(delta) < len(content) * MAX_DELTA_RATIO:
+            _write(conn, version_id, delta, STORAGE_DELTA, successor_id, policy)
+            return True
+    _store_snapshot(conn, version_id, content, digest, policy)
+    return True
+
+
+def insert_version(conn, prompt_id, version, content, created_at, parent_version_id=None,
+                   version_id=None, policy: StoragePolicy = DEFAULT_POLICY) -> int:
+    """Insert a new version and re-encode the parent it supersedes.
+
+    The new version is stored as plain inline text, unless its body already
+    exists in ``content_blobs`` (e.g. a rollback to a snapshot), in which case
+    it refers to that blob instead of keeping a second copy.
+    """
+    parent = load_content(conn, parent_version_id) if parent_version_id else None
+    stats = diff_stats(parent, content)
+    digest = content_hash(content)
+    storage, value = STORAGE_FULL, content
+    if len(content.encode("utf-8")) >= BLOB_MIN_BYTES and blob_exists(conn, digest):
+        storage, value = STORAGE_BLOB, ""
+    cur = conn.execute(
+        """
+        INSERT INTO versions(id, prompt_id, version, content, created_at, parent_version_id,
+                             storage, delta_base_id, codec, content_hash, size,
+                             lines_added, lines_removed, chars_changed, similarity)
+        VALUES(?,?,?,?,?,?,?,NULL,'',?,?,?,?,?,?)
+        """,
+        (version_id, prompt_id, version, value, created_at, parent_version_id, storage,
+         digest, len(content), stats["lines_added"], stats["lines_removed"],
+         stats["chars_changed"], stats["similarity"]),
+    )
+    new_id = version_id if version_id is not None else cur.lastrowid
+    if parent_version_id:
+        demote_version(conn, parent_version_id, new_id, content, policy)
+    return new_id
+
+
+def materialize(conn, version_ids) -> None:
+    """Store the given versions in full (e.g. the current version).
+
+    Deltas and compressed payloads become plain inline text; versions that
+    refer to a shared blob already hold their full body and are left as is.
+    """
+    for version_id in version_ids:
+        row = conn.execute(
+            f"SELECT {_ROW_COLUMNS} FROM versions WHERE id=?",
+            (version_id,),
+        ).fetchone()
+        if not row or _storage(row) == STORAGE_BLOB or (_storage(row) == STORAGE_FULL and not row["codec"]):
+            continue
+        _write(conn, version_id, row_content(conn, row), STORAGE_FULL, None, None)
+
+
+def gc_blobs(conn, digests=None) -> int:
+    """Delete content blobs no version refers to any more."""
+    if digests is None:
+        cur = conn.execute(
+            """
+            DELETE FROM content_blobs
+            WHERE NOT EXISTS (
+                SELECT 1 FROM versions v WHERE v.content_hash = content_blobs.hash AND v.storage = ?
+            )
+            """,
+            (STORAGE_BLOB,),
+        )
+        return cur.rowcount
+    removed = 0
+    for digest in set(d for d in digests if d):
+        cur = conn.execute(
+            """
+            DELETE FROM content_blobs
+            WHERE hash=? AND NOT EXISTS (
+                SELECT 1 FROM versions WHERE content_hash=? AND storage=?
+            )
+            """,
+            (digest, digest, STORAGE_BLOB),
+        )
+        removed += cur.rowcount
+    return removed
+
+
+def delete_versions(conn, version_ids, policy: StoragePolicy = DEFAULT_POLICY) -> None:
+    """Delete versions, first re-basing any surviving delta that depends on them."""
+    ids = sorted(set(version_ids))
+    if not ids:
+        return
+    doomed = set(ids)
+    dependants = set()
+    digests = []
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        marks = ",".join("?" * len(chunk))
+        for row in conn.execute(
+            f"SELECT id FROM versions WHERE delta_base_id IN ({marks})",
+            chunk,
+        ).fetchall():
+            if row["id"] not in doomed:
+                dependants.add(row["id"])
+        digests.extend(
+            row["content_hash"]
+            for row in conn.execute(
+                f"SELECT content_hash FROM versions WHERE id IN ({marks}) AND storage=?",
+                [*chunk, STORAGE_BLOB],
+            ).fetchall()
+        )
+    # Survivors may depend on each other, so reconstruct all before rewriting any.
+    texts = {vid: load_content(conn, vid) for vid in dependants}
+    for vid, text in texts.items():
+        _store_snapshot(conn, vid, text, content_hash(text), policy)
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        conn.execute(f"DELETE FROM versions WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+    gc_blobs(conn, digests)
+
+
+def archive_versions(conn, version_ids, archived_at: str, policy: StoragePolicy = DEFAULT_POLICY) -> int:
+    """Move versions into versions_archive as compressed full text, then delete them."""
+    ids = sorted(set(version_ids))
+    if not ids:
+        return 0
+    archive_policy = StoragePolicy(codec=policy.codec or "zlib", compress_threshold=0)
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        rows = conn.execute(
+            f"SELECT * FROM versions WHERE id IN ({','.join('?' * len(chunk))})",
+            chunk,
+        ).fetchall()
+        for row in rows:
+            text = row_content(conn, row)
+            value, codec = compress_payload(text, archive_policy)
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO versions_archive(
+                    id, prompt_id, version, content, codec, content_hash, created_at,
+                    parent_version_id, label, archived_at
+                ) VALUES(?,?,?,?,?,?,?,?,?,?)
+                """,
+                (row["id"], row["prompt_id"], row["version"], value, codec,
+                 row["content_hash"] or content_hash(text), row["created_at"],
+                 row["parent_version_id"], row["label"], archived_at),
+            )
+    delete_versions(conn, ids, policy)
+    return len(ids)
+
+
+def backfill_metadata(conn, batch_size: int = 500) -> int:
+    """Fill content_hash and size for rows written before they were recorded."""
+    filled = 0
+    while True:
+        rows = conn.execute(
+            f"SELECT {_ROW_COLUMNS} FROM versions WHERE content_hash IS NULL OR size IS NULL LIMIT ?",
+            (batch_size,),
+        ).fetchall()
+        if not rows:
+            return filled
+        for row in rows:
+            text = row_content(conn, row)
+            conn.execute(
+                "UPDATE versions SET content_hash=?, size=? WHERE id=?",
+                (content_hash(text), len(text), row["id"]),
+            )
+        filled += len(rows)
+
+
+def backfill_diff_stats(conn, after_id: int = 0, batch_size: int = 200):
+    """Compute missing diff statistics for one batch of versions.
+
+    Returns ``(last_id, filled)``; ``last_id`` is None once no rows remain.
+    """
+    rows = conn.execute(
+        f"""
+        SELECT {_ROW_COLUMNS}, parent_version_id FROM versions
+        WHERE id > ? AND lines_added IS NULL
+        ORDER BY id LIMIT ?
+        """,
+        (after_id, batch_size),
+    ).fetchall()
+    if not rows:
+        return None, 0
+    for row in rows:
+        parent = load_content(conn, row["parent_version_id"]) if row["parent_version_id"] else None
+        stats = diff_stats(parent, row_content(conn, row))
+        conn.execute(
+            """
+            UPDATE versions SET lines_added=?, lines_removed=?, chars_changed=?, similarity=?
+            WHERE id=?
+            """,
+            (stats["lines_added"], stats["lines_removed"], stats["chars_changed"], stats["similarity"], row["id"]),
+        )
+    return rows[-1]["id"], len(rows)
+
+
+def repack_prompt(conn, prompt_id, policy: StoragePolicy = DEFAULT_POLICY) -> int:
+    """Delta-encode the existing full history of one prompt; return rows rewritten."""
+    rows = conn.execute(
+        "SELECT id, parent_version_id FROM versions WHERE prompt_id=? ORDER BY created_at ASC, id ASC",
+        (prompt_id,),
+    ).fetchall()
+    current = conn.execute("SELECT current_version_id FROM prompts WHERE id=?", (prompt_id,)).fetchone()
+    current_id = current["current_version_id"] if current else None
+    child_of = {}
+    for row in rows:
+        if row["parent_version_id"] and row["parent_version_id"] not in child_of:
+            child_of[row["parent_version_id"]] = row["id"]
+    rewritten = 0
+    for row in rows:
+        successor_id = child_of.get(row["id"])
+        if not successor_id or row["id"] == current_id:
+            continue
+        if demote_version(conn, row["id"], successor_id, load_content(conn, successor_id), policy):
+            rewritten += 1
+    return rewritten
+
+
+def recompress_versions(conn, policy: StoragePolicy = DEFAULT_POLICY, after_id: int = 0,
+                        batch_size: int = 200) -> tuple[int | None, int]:
+    """Re-encode one batch of inline payloads with ``policy``'s codec.
+
+    Rows written before content hashes existed get theirs filled in as well.
+    Returns ``(last_id, rewritten)``; pass ``last_id`` back in to continue and
+    stop once it is ``None``. Current versions are left as plain text.
+    """
+    rows = conn.execute(
+        f"""
+        SELECT {_ROW_COLUMNS} FROM versions
+        WHERE id > ? AND id NOT IN (
+            SELECT current_version_id FROM prompts WHERE current_version_id IS NOT NULL
+        )
+        ORDER BY id LIMIT ?
+        """,
+        (after_id, batch_size),
+    ).fetchall()
+    target = policy.codec if policy.codec in CODECS else ""
+    rewritten = 0
+    for row in rows:
+        if not row["content_hash"]:
+            conn.execute(
+                "UPDATE versions SET content_hash=? WHERE id=?",
+                (content_hash(row_content(conn, row)), row["id"]),
+            )
+        if _storage(row) == STORAGE_BLOB or (row["codec"] and row["codec"] == target):
+            continue
+        value, codec = compress_payload(_payload(row), policy)
+        if row["codec"] is not None and codec == row["codec"]:
+            continue
+        conn.execute(
+            "UPDATE versions SET content=?, codec=? WHERE id=?",
+            (value, codec, row["id"]),
+        )
+        rewritten += 1
+    return (rows[-1]["id"] if len(rows) == batch_size else None), rewritten
+
+
+def recompress_blobs(conn, policy: StoragePolicy = DEFAULT_POLICY, after_hash: str = "",
+                     batch_size: int = 200) -> tuple[str | None, int]:
+    """Re-encode one batch of shared content blobs; see recompress_versions()."""
+    rows = conn.execute(
+        "SELECT hash, content, codec FROM content_blobs WHERE hash > ? ORDER BY hash LIMIT ?",
+        (after_hash, batch_size),
+    ).fetchall()
+    target = policy.codec if policy.codec in CODECS else ""
+    rewritten = 0
+    for row in rows:
+        if (row["codec"] or "") == target:
+            continue
+        value, codec = compress_payload(decompress_payload(row["content"], row["codec"]), policy)
+        if codec == (row["codec"] or ""):
+            continue
+        conn.execute("UPDATE content_blobs SET content=?, codec=? WHERE hash=?", (value, codec, row["hash"]))
+        rewritten += 1
+    return (rows[-1]["hash"] if len(rows) == batch_size else None), rewritten
@@ -0,0 +1,215 @@
+"""Single-writer queue with group commit for SQLite.
+
+SQLite allows one writer at a time. When every request thread opens its own
+connection and commits on its own, concurrent edits queue on the database
+lock, pay one fsync each, and fail with "database is locked" once the busy
+timeout runs out.
+
+``WriteQueue`` funnels writes through one writer thread per process that owns
+one connection. Request handlers pass a function ``op(conn)`` to ``submit``
+and block until it has been committed:
+
+- operations that arrive close together (up to ``max_batch``, waiting at most
+  ``max_delay`` seconds for more) share one ``BEGIN IMMEDIATE`` transaction
+  and one commit;
+- each operation runs inside its own savepoint, so one that raises is rolled
+  back alone and its exception is re-raised in the caller, while the rest of
+  the batch still commits;
+- at most ``max_pending`` operations may wait; a caller that cannot enqueue
+  within ``wait`` seconds gets ``WriteQueueFull`` instead of piling up;
+- a caller waits at most ``timeout`` seconds for its result and then gets
+  ``WriteQueueTimeout``. An operation the writer has not started yet is
+  cancelled (``cancelled=True``); one that is already running may still
+  commit. ``may_have_committed`` tells callers which failures leave the
+  outcome unknown, e.g. before they clean up files written for the op.
+
+Operations must not call ``commit()`` or ``rollback()`` themselves. Across
+worker processes SQLite's own lock still arbitrates between the writers.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+
+WRITE_QUEUE_MAX_BATCH = 32
+WRITE_QUEUE_MAX_DELAY_SECONDS = 0.002
+WRITE_QUEUE_MAX_PENDING = 256
+WRITE_QUEUE_WAIT_SECONDS = 5.0
+WRITE_QUEUE_TIMEOUT_SECONDS = 30.0
+
+logger = logging.getLogger(__name__)
+
+
+class WriteQueueBusy(RuntimeError):
+    """The writer cannot take or finish a write in time."""
+
+
+class WriteQueueFull(WriteQueueBusy):
+    """Too many writes are already waiting for the writer thread."""
+
+
+class WriteQueueTimeout(WriteQueueBusy):
+    """The writer did not finish a write within the caller's timeout.
+
+    ``cancelled`` is True when the write never started and never will.
+    """
+
+    def __init__(self, message: str, cancelled: bool = False):
+        super().__init__(message)
+        self.cancelled = cancelled
+
+
+def may_have_committed(exc: BaseException) -> bool:
+    """Whether a write that raised ``exc`` from ``submit`` may still have committed.
+
+    Only a timeout on an operation that was already running is ambiguous:
+    a full queue or a cancelled job never ran, and an operation that raised
+    was rolled back to its savepoint.
+    """
+    return isinstance(exc, WriteQueueTimeout) and not exc.cancelled
+
+
+_PENDING, _RUNNING, _CANCELLED = "pending", "running", "cancelled"
+
+
+class _Job:
+    __slots__ = ("op", "done", "result", "error", "state", "lock")
+
+    def __init__(self, op):
+        self.op = op
+        self.done = threading.Event()
+        self.result = None
+        self.error: BaseException | None = None
+        self.state = _PENDING
+        self.lock = threading.Lock()
+
+    def move(self, old: str, new: str) -> bool:
+        with self.lock:
+            if self.state != old:
+                return False
+            self.state = new
+            return True
+
+
+class WriteQueue:
+    def __init__(
+        self,
+        connect,
+        max_batch: int = WRITE_QUEUE_MAX_BATCH,
+        max_delay: float = WRITE_QUEUE_MAX_DELAY_SECONDS,
+        max_pending: int = WRITE_QUEUE_MAX_PENDING,
+        wait: float = WRITE_QUEUE_WAIT_SECONDS,
+        timeout: float = WRITE_QUEUE_TIMEOUT_SECONDS,
+    ):
+        self.connect = connect
+        self.max_batch = max(1, max_batch)
+        self.max_delay = max_delay
+        self.wait = wait
+        self.timeout = timeout
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, max_pending))
+        self._thread: threading.Thread | None = None
+        self._pid: int | None = None
+        self._start_lock = threading.Lock()
+        self._local = threading.local()
+        self.batches = 0
+        self.committed = 0
+
+    def _ensure_writer(self) -> None:
+        # Start on first use; a forked worker process starts its own writer.
+        pid = os.getpid()
+        if self._pid == pid and self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._pid == pid and self._thread is not None and self._thread.is_alive():
+                return
+            if self._pid != pid:
+                self._queue = queue.Queue(maxsize=self._queue.maxsize)
+            self._pid = pid
+            self._thread = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+            self._thread.start()
+
+    def submit(self, op):
+        """Run ``op(conn)`` on the writer thread and return its result once committed."""
+        if getattr(self._local, "writer", False):
+            raise RuntimeError("write operations cannot submit further writes")
+        self._ensure_writer()
+        job = _Job(op)
+        try:
+            self._queue.put(job, timeout=self.wait)
+        except queue.Full:
+            raise WriteQueueFull("too many pending writes") from None
+        if not job.done.wait(self.timeout):
+            if job.move(_PENDING, _CANCELLED):
+                raise WriteQueueTimeout("write was not started in time; it was cancelled", cancelled=True)
+            if not job.done.is_set():
+                raise WriteQueueTimeout("write did not finish in time; it may still commit")
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def _take_batch(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        self._local.writer = True
+        conn = None
+        while True:
+            batch = self._take_batch()
+            try:
+                if conn is None:
+                    conn = self.connect()
+                    conn.isolation_level = None  # transactions are managed explicitly below
+                self._commit_batch(conn, batch)
+            except Exception as exc:
+                logger.exception("Write batch of %d failed", len(batch))
+                for job in batch:
+                    if job.error is None:
+                        job.result = None
+                        job.error = exc
+                if conn is not None:
+                    try:
+                        if conn.in_transaction:
+                            conn.execute("ROLLBACK")
+                    except sqlite3.Error:
+                        conn.close()
+                        conn = None
+            for job in batch:
+                job.done.set()
+
+    def _commit_batch(self, conn, batch: list) -> None:
+        batch[:] = [job for job in batch if job.move(_PENDING, _RUNNING)]
+        if not batch:
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        for job in batch:
+            conn.execute("SAVEPOINT write_op")
+            try:
+                job.result = job.op(conn)
+            except Exception as exc:
+                job.error = exc
+                conn.execute("ROLLBACK TO write_op")
+            conn.execute("RELEASE write_op")
+        conn.execute("COMMIT")
+        self.batches += 1
+        self.committed += sum(1 for job in batch if job.error is None)